@@ -6,21 +6,49 @@
 
 import json
 import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
-from shared_util import custom_boto_config, custom_logging
+from shared_util import custom_boto_config, custom_logging, service_helper
+from shared_util.stream_helper import KinesisBatchWriter
 
 from util import config_helper, ddb_helper, event_bus_helper
-from util.ddb_helper import get_query_tracker
+from util.ddb_helper import get_query_trackers
 from util.event_bus_helper import ConfigEvent
+from util.feed_session import get_feed_session
 from util.newscatcher_helper import create_and_publish_record, retrieve_feed, retrieve_feed_from_all_topics
+from util.poll_scheduler import PollScheduler, is_adaptive_polling_enabled
 
 logger = custom_logging.get_logger(__name__)
 
+# number of urls of a batch mode config event that are processed in parallel
+MAX_CONCURRENT_URLS = 4
+# a url is not started when the invocation has less time left than this (in milliseconds), so that the urls in
+# flight can finish. Each url fetches its feeds in parallel, with a timeout per feed request
+TERMINATION_INTERVAL = 60000
+
 
 class IncorrectEventNameSpaceError(Exception):
     pass
 
 
+class UrlProcessingError(Exception):
+    pass
+
+
+def get_search_query(query):
+    # if search_query is set empty or as ALL or as '*', it not filter any records, hence setting  it as None
+    if query == "" or query == "ALL" or query == "*":
+        return None
+    return query
+
+
+def get_due_urls(url_list, account, query):
+    """With adaptive polling only the urls that are due to be polled for the config are published, else all of them"""
+    if not url_list or not is_adaptive_polling_enabled():
+        return url_list
+    return PollScheduler(account, get_search_query(query)).get_due_urls(url_list)
+
+
 def publish_config_handler(event, _):  # NOSONAR - lambda signature
     """ If lambda environment variable is set to read from os.environ, if not read from DDB """
     if os.environ.get("CONFIG_PARAM", None):
@@ -28,7 +56,9 @@ def publish_config_handler(event, _):  # NOSONAR - lambda signature
         This condition is executed if the config is setup through lambda environment variable. This allows for
         only 1 configuration item to be created with a query parameter
         """
-        url_list = config_helper.retrieve_urls_using_json(os.environ["CONFIG_PARAM"])
+        url_list = get_due_urls(
+            config_helper.retrieve_urls_using_json(os.environ["CONFIG_PARAM"]), "url_params", os.environ["SEARCH_QUERY"]
+        )
         logger.debug(f"Print url list: {url_list}")
         config_event = ConfigEvent(
             platform="newsfeeds", account="url_params", query=os.environ["SEARCH_QUERY"], url_list=url_list
@@ -40,11 +70,17 @@ def publish_config_handler(event, _):  # NOSONAR - lambda signature
         """
         If the lambda environment variable is not set, it will look for configuration in the dynamodb table
         """
-        config_list = ddb_helper.get_config()
+        config_list = ddb_helper.get_cached_config()
         for item in config_list:
 
-            url_list = config_helper.retrieve_urls(
-                country=item.get("country", None), language=item.get("language", None), topic=item.get("topic", None)
+            url_list = get_due_urls(
+                config_helper.retrieve_urls(
+                    country=item.get("country", None),
+                    language=item.get("language", None),
+                    topic=item.get("topic", None),
+                ),
+                item["account"],
+                item["query"],
             )
 
             config_event = ConfigEvent(
@@ -55,33 +91,159 @@ def publish_config_handler(event, _):  # NOSONAR - lambda signature
             logger.debug(f"Event published is: {config_event}")
 
 
-def process_config_handler(event, _):  # NOSONAR - lambda signature
-    if event["source"] == os.environ["INGESTION_NAMESPACE"]:
-        data = event["detail"]
+def process_url(data, url, stream_writer, feed_cache, dynamodb_client=None):
+    """
+    Retrieve the news feeds of a url, publish the new articles and move the query trackers of the feeds. A url of a
+    batch mode config event is processed in a worker thread, with the 'dynamodb_client' created by the handler thread
+    """
+    if data.get("topic", None) is None:
+        logger.debug("Since topic is none, gettting news feed for all available topics")
+        aggregated_feed = retrieve_feed_from_all_topics(url, feed_cache=feed_cache)
+    else:
+        logger.debug(f"Retrieving news feed for topic: {data['topic']}")
+        aggregated_feed = [retrieve_feed(url, topic=data["topic"], feed_cache=feed_cache)]
 
-        aggregated_feed = None
-        if data.get("topic", None) is None:
-            logger.debug("Since topic is none, gettting news feed for all available topics")
-            aggregated_feed = retrieve_feed_from_all_topics(data["url"])
-        else:
-            logger.debug(f"Retrieving news feed for topic: {data['topic']}")
-            aggregated_feed = retrieve_feed(data.url, topic=data["topic"])
+    account = data["account"]
+    search_query = get_search_query(data.get("query", None))
+
+    if is_adaptive_polling_enabled():
+        # the arrival rate of the url sets when it is polled next for the config, whether or not its articles are
+        # published
+        PollScheduler(account, search_query, dynamodb_client=dynamodb_client).record_poll(
+            url, [article for feed in aggregated_feed for article in feed["articles"]]
+        )
 
+    # feeds that have not changed since the last poll have nothing to publish or to track
+    aggregated_feed = [feed for feed in aggregated_feed if feed["articles"]]
+    if not aggregated_feed:
+        return
+
+    # the feeds of a url are returned by newscatcher with the same (clean) url
+    feed_url = aggregated_feed[0]["url"]
+    trackers = get_query_trackers(
+        account, feed_url, search_query, [feed["topic"] for feed in aggregated_feed], dynamodb_client=dynamodb_client
+    )
+
+    seen_cache = ddb_helper.get_seen_article_cache()
+    claimed_ids = []
+    newest_published_timestamps = {}
+    try:
         for feed in aggregated_feed:
-            account = data["account"]
-            url = data["url"]
-            search_query = data.get("query", None)
+            newest_published_timestamps[feed["topic"]] = create_and_publish_record(
+                feed,
+                account,
+                data["platform"],
+                trackers[feed["topic"]]["LAST_PUBLISHED_TIMESTAMP"],
+                search_query,
+                case_insensitive=os.environ.get("QUERY_CASE_INSENSITIVE", "false").lower() == "true",
+                whole_word=os.environ.get("QUERY_WHOLE_WORD", "false").lower() == "true",
+                seen_cache=seen_cache,
+                claimed_ids=claimed_ids,
+            )
 
-            # if search_query is set empty or as ALL or as '*', it not filter any records, hence setting  it as None
-            if search_query == "" or search_query == "ALL" or search_query == "*":
-                search_query = None
+        # flush before moving the trackers so that a failed write does not skip articles on the next run. Only the
+        # trackers of feeds that published articles are moved, to the published timestamp of their newest article
+        stream_writer.flush()
+    except Exception:
+        # the articles claimed by this run may not have been published, the next run should publish them
+        if seen_cache and claimed_ids:
+            seen_cache.release(account, search_query, claimed_ids)
+        raise
+
+    with ddb_helper.QueryTrackerWriter(dynamodb_client=dynamodb_client) as tracker_writer:
+        for topic, published_timestamp in newest_published_timestamps.items():
+            if published_timestamp:
+                tracker_writer.put(account, feed_url, search_query, topic, published_timestamp)
+
+    # the feeds were processed, the next poll can skip them until they change
+    if feed_cache:
+        feed_cache.save([feed.get("rss_endpoint", None) for feed in aggregated_feed])
+
+
+def process_url_with_writer(data, url, feed_cache, kds_client, dynamodb_client):
+    """
+    Process a url of a batch mode config event with a stream writer of its own, so that the flush of a url only sends
+    (and fails on) the records of that url before its query trackers are moved
+    """
+    with KinesisBatchWriter(kds_client=kds_client) as stream_writer:
+        process_url(data, url, stream_writer, feed_cache, dynamodb_client=dynamodb_client)
+
+
+def process_url_batch(data, context, feed_cache):
+    """
+    Process the urls of a batch mode config event concurrently. A url is only started if the invocation has more than
+    TERMINATION_INTERVAL milliseconds left. Returns the urls that were not started, so that they can be published in
+    a follow-up config event, and the urls that failed
+    """
+    pending_urls = list(data["urls"])
+    failed_urls = []
+    in_flight = {}  # future -> url
+
+    # the boto3 clients are created before the workers start, creating them concurrently is not thread safe. The
+    # clients are thread safe once created, unlike resources
+    kds_client = service_helper.get_service_client("kinesis")
+    dynamodb_client = service_helper.get_service_client("dynamodb")
+
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_URLS) as executor:
+        while pending_urls or in_flight:
+            has_time = context is None or context.get_remaining_time_in_millis() > TERMINATION_INTERVAL
+            while pending_urls and has_time and len(in_flight) < MAX_CONCURRENT_URLS:
+                url = pending_urls.pop(0)
+                future = executor.submit(process_url_with_writer, data, url, feed_cache, kds_client, dynamodb_client)
+                in_flight[future] = url
+
+            if not in_flight:
+                break
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                url = in_flight.pop(future)
+                if future.exception():
+                    logger.error(f"Failed to process {url}: {future.exception()}")
+                    failed_urls.append(url)
+
+    return pending_urls, failed_urls
+
+
+def process_config_handler(event, context):  # NOSONAR - lambda signature
+    if event["source"] == os.environ["INGESTION_NAMESPACE"]:
+        data = event["detail"]
+        feed_cache = ddb_helper.FeedCache(data["account"], get_search_query(data.get("query", None)))
 
-            tracker = get_query_tracker(account, url, search_query, feed["topic"])
-            create_and_publish_record(
-                feed, account, data["platform"], tracker["LAST_PUBLISHED_TIMESTAMP"], search_query
+        if "urls" in data:
+            logger.debug(f"Processing {len(data['urls'])} urls in batch mode")
+            unfinished_urls, failed_urls = process_url_batch(data, context, feed_cache)
+        else:
+            with KinesisBatchWriter() as stream_writer:
+                process_url(data, data["url"], stream_writer, feed_cache)
+            unfinished_urls, failed_urls = [], []
+
+        logger.info(f"Feed cache stats: {feed_cache.get_stats()}")
+        # latency histograms of the feed requests of this invocation, per host
+        logger.info(f"Feed fetch stats: {get_feed_session().get_stats(reset=True)}")
+        seen_cache = ddb_helper.get_seen_article_cache()
+        if seen_cache:
+            logger.info(f"Seen article cache stats: {seen_cache.get_stats()}")
+
+        if unfinished_urls:
+            # checkpoint the urls that could not be started in this invocation as a follow-up config event
+            logger.warning(f"Publishing {len(unfinished_urls)} unfinished urls in a follow-up config event")
+            event_bus_helper.publish_config(
+                ConfigEvent(
+                    platform=data["platform"],
+                    account=data["account"],
+                    query=data.get("query", None),
+                    url_list=unfinished_urls,
+                    topic=data.get("topic", None),
+                ),
+                urls_per_event=len(unfinished_urls),
             )
 
-            ddb_helper.update_query_tracker(account, feed["url"], search_query, feed["topic"])
+        if failed_urls:
+            # the event is retried, which processes the failed urls again. The unfinished urls were published first so
+            # that they are not lost once the retries are exhausted; the urls that were processed, like the unfinished
+            # urls by the time the event is retried, have moved their query trackers and do not publish again
+            raise UrlProcessingError(f"Failed to process {len(failed_urls)} urls: {failed_urls}")
 
     else:
         logger.error("Target resource not configured for received namespace")
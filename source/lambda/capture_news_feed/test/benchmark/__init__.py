@@ -0,0 +1,5 @@
+#!/usr/bin/env python
+######################################################################################################################
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+######################################################################################################################
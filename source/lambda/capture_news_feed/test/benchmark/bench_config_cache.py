@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+######################################################################################################################
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+######################################################################################################################
+
+"""
+Reports the read cost of 'ddb_helper.get_config' on a config table with many configurations, most of them disabled:
+a scan of the table with the 'enabled' filter, and 'get_cached_config' once the configurations are cached (a version
+check every TTL). Read capacity units are
+estimated from the size of the items read, as DynamoDB charges them (0.5 RCU per 4 KB for eventually consistent reads,
+summed per page). Times are measured against moto and are only indicative.
+
+Run from the lambda function root directory: python -m test.benchmark.bench_config_cache --configs 10000 --enabled 0.2
+"""
+
+import argparse
+import math
+import os
+import random
+import time
+from decimal import Decimal
+from unittest import mock
+
+import boto3
+from moto import mock_dynamodb
+
+TABLE_NAME = "benchconfigtable"
+VERSION_KEY = '{"account": "CONFIG_VERSION"}'
+PAGE_BYTES = 1024 * 1024
+COUNTRIES = ["US", "GB", "FR", "ES", "DE", "IN", "CA", "AU"]
+LANGUAGES = ["en", "fr", "es", "de"]
+TOPICS = ["tech", "news", "business", "science", "finance", "sport", "world"]
+
+
+def get_item_size(item):
+    """Size of an item as DynamoDB counts it: attribute names plus values"""
+    size = 0
+    for name, value in item.items():
+        size += len(name.encode("utf-8"))
+        if isinstance(value, str):
+            size += len(value.encode("utf-8"))
+        elif isinstance(value, bool):
+            size += 1
+        elif isinstance(value, (int, Decimal)):
+            size += 1 + math.ceil(len(str(value)) / 2)
+    return size
+
+
+def get_scan_rcus(item_sizes):
+    """Eventually consistent scan: 0.5 RCU per 4 KB of the items read in a page of up to 1 MB"""
+    rcus, page_bytes = 0.0, 0
+    for size in item_sizes:
+        if page_bytes + size > PAGE_BYTES:
+            rcus += math.ceil(page_bytes / 4096) * 0.5
+            page_bytes = 0
+        page_bytes += size
+    return rcus + math.ceil(page_bytes / 4096) * 0.5
+
+
+def create_configs(rng, config_count, enabled_ratio):
+    configs = []
+    for index in range(config_count):
+        config = {
+            "account": f"account{index}",
+            "platform": "newsfeeds",
+            "query": ",".join(rng.sample(["economy", "election", "weather", "football", "stocks", "climate"], 3)),
+            "country": rng.choice(COUNTRIES),
+            "language": rng.choice(LANGUAGES),
+            "topic": rng.choice(TOPICS),
+            "enabled": rng.random() < enabled_ratio,
+        }
+        configs.append(config)
+    return configs
+
+
+def measure(name, function, repeat=3):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    elapsed = (time.perf_counter() - start) / repeat
+    return name, result, elapsed
+
+
+# moto does not call AWS, but boto3 needs credentials and a region to sign the requests
+@mock_dynamodb
+@mock.patch.dict(
+    os.environ,
+    {
+        "AWS_ACCESS_KEY_ID": "fakeaccesskey",
+        "AWS_SECRET_ACCESS_KEY": "fakesecretkey",
+        "AWS_REGION": "us-east-1",
+        "DDB_CONFIG_TABLE_NAME": TABLE_NAME,
+        "DDB_CONFIG_VERSION_KEY": VERSION_KEY,
+    },
+)
+def main(config_count, enabled_ratio, invocations_per_day, ttl_seconds):
+    from util import ddb_helper
+
+    rng = random.Random(7)
+    configs = create_configs(rng, config_count, enabled_ratio)
+    enabled_count = sum(1 for config in configs if config["enabled"])
+
+    ddb = boto3.resource("dynamodb", region_name=os.environ["AWS_REGION"])
+    table = ddb.create_table(
+        TableName=TABLE_NAME,
+        KeySchema=[{"AttributeName": "account", "KeyType": "HASH"}],
+        AttributeDefinitions=[{"AttributeName": "account", "AttributeType": "S"}],
+        BillingMode="PAY_PER_REQUEST",
+    )
+    with table.batch_writer() as batch:
+        for config in configs:
+            batch.put_item(Item=config)
+    ddb_helper.update_config_version(dynamodb=ddb)
+
+    sizes = [get_item_size(config) for config in configs]
+    print(f"configurations: {config_count} ({enabled_count} enabled), {sum(sizes) / 1024:.0f} KB")
+
+    results = [measure("table scan with filter", lambda: ddb_helper.get_config(dynamodb=ddb))]
+    config_cache = ddb_helper.ConfigCache(ttl_seconds=ttl_seconds)
+    config_cache.get(dynamodb=ddb)
+    results.append(measure("cached (within TTL)", lambda: config_cache.get(dynamodb=ddb), repeat=100))
+    expired_cache = ddb_helper.ConfigCache(ttl_seconds=0)
+    expired_cache.get(dynamodb=ddb)
+    results.append(measure("cached (version check)", lambda: expired_cache.get(dynamodb=ddb), repeat=20))
+
+    version_check_rcus = 0.5
+    rcus_per_read = [get_scan_rcus(sizes), 0.0, version_check_rcus]
+    for (name, result, elapsed), rcus in zip(results, rcus_per_read):
+        assert len(result) == enabled_count
+        print(f"{name:24}: {rcus:8.1f} RCU per read, {elapsed * 1000:9.3f} ms per read")
+
+    # one publish per invocation; with the cache, the version is checked at most once per TTL
+    version_checks = min(invocations_per_day, 24 * 3600 / ttl_seconds)
+    print(f"RCU per day with {invocations_per_day} invocations:")
+    print(f"  table scan with filter  : {rcus_per_read[0] * invocations_per_day:10.1f}")
+    cached_rcus = rcus_per_read[0] + version_checks * version_check_rcus
+    print(f"  cache + version item    : {cached_rcus:10.1f} (warm container, 1 scan)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--configs", type=int, default=10000)
+    parser.add_argument("--enabled", type=float, default=0.2, help="ratio of enabled configurations")
+    parser.add_argument("--invocations", type=int, default=96, help="publish_config_handler invocations per day")
+    parser.add_argument("--ttl", type=int, default=300, help="config cache TTL in seconds")
+    args = parser.parse_args()
+    main(args.configs, args.enabled, args.invocations, args.ttl)
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+######################################################################################################################
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+######################################################################################################################
+
+"""
+Reports the build time and memory footprint of the url index of the newscatcher catalog, and compares evaluating
+url configurations with 'config_helper.retrieve_urls' through the index against running a SQL query per
+configuration on the shared catalog connection. A synthetic catalog of the same shape as package_rss.db is used.
+
+Run from the lambda function root directory: python -m test.benchmark.bench_config_helper --sites 5000 --configs 10000
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from test.benchmark.bench_newscatcher import COUNTRIES, LANGUAGES, TOPICS, create_entries
+from test.fixtures.catalog_fixture import create_catalog, use_catalog
+
+
+def sql_urls(newscatcher, topic, language, country):
+    conditionals, values = [], []
+    for column, value in (("topic_unified", topic), ("clean_country", country), ("language", language)):
+        if value is not None:
+            conditionals.append(f"{column} = ?")
+            values.append(value)
+
+    if not conditionals:
+        return [row[0] for row in newscatcher.query_catalog("SELECT clean_url from rss_main")]
+
+    sql = (
+        "SELECT DISTINCT clean_url from rss_main WHERE "
+        + " AND ".join(conditionals)
+        + " AND main = 1 ORDER BY IFNULL(Globalrank,999999);"
+    )
+    return [row[0] for row in newscatcher.query_catalog(sql, values)]
+
+
+def main(site_count, config_count):
+    from util import config_helper, newscatcher
+
+    rng = random.Random(7)
+    configs = [
+        (rng.choice(TOPICS + ["ALL"]), rng.choice(LANGUAGES + ["ALL"]), rng.choice(COUNTRIES + ["ALL"]))
+        for _ in range(config_count)
+    ]
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_file = create_catalog(os.path.join(temp_dir, "package_rss.db"), entries=create_entries(site_count))
+        patcher = use_catalog(db_file)
+        newscatcher.get_catalog_connection()
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        url_index = newscatcher.get_url_index()
+        build_elapsed = time.perf_counter() - start
+        index_bytes, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        print(f"catalog rows: {site_count * len(TOPICS)}, configurations: {config_count}")
+        print(f"url index: {len(url_index)} keys, built in {build_elapsed:.3f}s, {index_bytes / (1024 * 1024):.2f} MB")
+
+        def none_if_all(value):
+            return None if value == "ALL" else value
+
+        start = time.perf_counter()
+        for topic, language, country in configs:
+            sql_urls(newscatcher, none_if_all(topic), none_if_all(language), none_if_all(country))
+        sql_elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        # urls() prints a message for configurations without websites
+        with contextlib.redirect_stdout(io.StringIO()):
+            for topic, language, country in configs:
+                config_helper.retrieve_urls(country=country, language=language, topic=topic)
+        index_elapsed = time.perf_counter() - start
+
+        print(f"sql per configuration : {sql_elapsed:8.3f}s {sql_elapsed / config_count * 1e6:10.1f} us/config")
+        print(f"url index             : {index_elapsed:8.3f}s {index_elapsed / config_count * 1e6:10.1f} us/config")
+
+        patcher.stop()
+        newscatcher.close_catalog_connection()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sites", type=int, default=5000)
+    parser.add_argument("--configs", type=int, default=10000)
+    args = parser.parse_args()
+    main(args.sites, args.configs)
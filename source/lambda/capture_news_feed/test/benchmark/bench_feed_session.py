@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+######################################################################################################################
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+######################################################################################################################
+
+"""
+Downloads the feeds of a number of websites (one feed per topic, as 'retrieve_feed_from_all_topics' does) from local
+feed servers, once with a new urllib connection per request (the previous fetch path) and once on the pooled
+'FeedSession', and reports the wall time, the TCP connections opened and the bytes received (before decompression).
+Every new connection waits 'connect-latency' seconds before it is served, to stand in for the TCP and TLS handshakes
+of a remote website; the feed servers answer with gzip when the request accepts it.
+
+Run from the lambda function root directory: python -m test.benchmark.bench_feed_session --sites 20 --topics 6
+"""
+
+import argparse
+import gzip
+import socketserver
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from test.fixtures.feed_server_fixture import FeedServer, create_rss_document
+
+TOPICS = ["news", "tech", "business", "sport", "world", "science", "finance", "health"]
+
+
+def fetch_with_urllib(url):
+    """Returns the bytes received for the body, as sent by the server"""
+    with urllib.request.urlopen(urllib.request.Request(url), timeout=10) as response:
+        response.read()
+        return int(response.headers["Content-Length"])
+
+
+def run(fetch, urls, workers):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        received = sum(executor.map(fetch, urls))
+    return time.perf_counter() - start, received
+
+
+def main(site_count, topic_count, connect_latency, workers):
+    from util.feed_session import FeedSession
+
+    topics = TOPICS[:topic_count]
+    document_size = len(create_rss_document("news"))
+    print(
+        f"{site_count} sites x {topic_count} topics, {workers} threads, {connect_latency * 1000:.0f} ms per connection"
+    )
+    print(f"feed document: {document_size} bytes, {len(gzip.compress(create_rss_document('news')))} bytes gzipped")
+
+    results = {}
+    for name in ("urllib, new connection", "pooled session"):
+        servers = [FeedServer(compress=True).__enter__() for _ in range(site_count)]
+        try:
+            session = FeedSession()
+            fetch = fetch_with_urllib
+            if name == "pooled session":
+                fetch = lambda url: int(session.get(url).headers["content-length"])  # noqa: E731
+            # the handshake latency is paid once per new connection
+            original_setup = socketserver.StreamRequestHandler.setup
+            seen_ports = set()
+
+            def setup(handler):
+                if handler.client_address not in seen_ports:
+                    seen_ports.add(handler.client_address)
+                    time.sleep(connect_latency)
+                original_setup(handler)
+
+            urls = [f"{server.base_url}/{topic}" for topic in topics for server in servers]
+            with mock.patch("socketserver.StreamRequestHandler.setup", setup):
+                elapsed, received = run(fetch, urls, workers)
+            connections = sum(len(server.client_ports) for server in servers)
+            results[name] = elapsed
+            print(f"  {name:24}: {elapsed:6.2f} s, {connections:4} connections, {received / 1024:6.1f} KB received")
+        finally:
+            for server in servers:
+                server.__exit__(None, None, None)
+
+        if name == "pooled session":
+            print(f"  latency of all hosts: {session.get_stats()['all']}")
+    print(f"speed-up: {results['urllib, new connection'] / results['pooled session']:.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sites", type=int, default=20)
+    parser.add_argument("--topics", type=int, default=6)
+    parser.add_argument("--connect-latency", type=float, default=0.05, help="seconds per new connection")
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+    main(args.sites, args.topics, args.connect_latency, args.workers)
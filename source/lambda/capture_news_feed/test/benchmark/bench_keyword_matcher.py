@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+######################################################################################################################
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+######################################################################################################################
+
+"""
+Throughput benchmark for filtering articles by the keywords of a search query. The previous loop,
+'any(keyword in text for keyword in query_str_list)', is compared with the Aho-Corasick 'KeywordMatcher' for growing
+numbers of keywords. Synthetic article summaries are used, and about one in ten contains one of the keywords.
+
+Run from the lambda function root directory: python -m test.benchmark.bench_keyword_matcher --articles 20000
+"""
+
+import argparse
+import random
+import time
+
+WORDS = (
+    "the market economy report company growth quarter results weather storm city council election vote policy "
+    "science study research health team season match player music film travel food price energy climate"
+).split()
+
+
+def create_keywords(keyword_count, rng):
+    return [
+        f"{rng.choice(['brand', 'product', 'acme', 'zeta'])}{index} {rng.choice(WORDS)}"
+        for index in range(keyword_count)
+    ]
+
+
+def create_articles(article_count, keywords, rng):
+    articles = []
+    for _ in range(article_count):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(40, 120))]
+        if rng.random() < 0.1:
+            words.insert(rng.randrange(len(words)), rng.choice(keywords))
+        articles.append(" ".join(words))
+    return articles
+
+
+def report(name, article_count, elapsed):
+    print(f"{name:28s}: {elapsed:8.3f}s {article_count / elapsed:12.1f} articles/sec")
+
+
+def main(article_count, keyword_counts):
+    from util.keyword_matcher import get_keyword_matcher
+
+    rng = random.Random(42)
+    for keyword_count in keyword_counts:
+        keywords = create_keywords(keyword_count, rng)
+        articles = create_articles(article_count, keywords, rng)
+        query_str = ",".join(keywords)
+        print(f"articles: {article_count}, keywords: {keyword_count}")
+
+        start = time.perf_counter()
+        query_str_list = query_str.split(",")
+        previous_matches = [any(keyword in text for keyword in query_str_list) for text in articles]
+        report("any(keyword in text)", article_count, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        matcher = get_keyword_matcher(query_str)
+        matches = [bool(matcher.find(text)) for text in articles]
+        report("keyword matcher", article_count, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        matcher = get_keyword_matcher(query_str, case_insensitive=True, whole_word=True)
+        for text in articles:
+            matcher.find(text)
+        report("keyword matcher, words/case", article_count, time.perf_counter() - start)
+
+        assert matches == previous_matches, "matchers disagree"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--articles", type=int, default=20000)
+    parser.add_argument("--keywords", type=int, nargs="+", default=[5, 25, 50, 200])
+    args = parser.parse_args()
+    main(args.articles, args.keywords)
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+######################################################################################################################
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+######################################################################################################################
+
+"""
+Micro-benchmark for the catalog lookups of 'urls()' and 'get_news()'. The previous access pattern (a new connection
+to the database file per call and SQL built with str.format) is compared with the shared, indexed in-memory catalog.
+A synthetic catalog of the same shape as package_rss.db is used, and feeds are not fetched.
+
+Run from the lambda function root directory: python -m test.benchmark.bench_newscatcher --sites 5000 --lookups 2000
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from unittest.mock import patch
+
+from test.fixtures.catalog_fixture import create_catalog, use_catalog
+
+TOPICS = ["news", "tech", "business", "sport", "world"]
+LANGUAGES = ["en", "fr", "es", "de", "it", "ja"]
+COUNTRIES = ["US", "GB", "CA", "FR", "ES", "DE", "IT", "JP", "IN", "AU"]
+
+
+def create_entries(site_count):
+    rng = random.Random(42)
+    entries = []
+    for index in range(site_count):
+        language, country = rng.choice(LANGUAGES), rng.choice(COUNTRIES)
+        for topic_index, topic in enumerate(TOPICS):
+            entries.append(
+                (
+                    f"site{index}.com",
+                    f"https://site{index}.com/rss/{topic}",
+                    topic,
+                    language,
+                    country,
+                    1 if topic_index == 0 else 0,
+                    rng.randint(1, 100000),
+                )
+            )
+    return entries
+
+
+def previous_urls(db_file, topic, language, country):
+    db = sqlite3.connect(db_file, isolation_level=None)
+    sql = (
+        "SELECT DISTINCT clean_url from rss_main WHERE topic_unified = '{}' AND clean_country = '{}' AND "
+        "language = '{}' AND main = 1 ORDER BY IFNULL(Globalrank,999999);"
+    ).format(topic, country, language)
+    ret = db.execute(sql).fetchall()
+    db.close()
+    return [x[0] for x in ret]
+
+
+def previous_get_news_lookup(db_file, url, topic):
+    sql = """SELECT rss_url, topic_unified, language, clean_country from rss_main
+             WHERE clean_url = '{}' AND topic_unified = '{}';""".format(url, topic)
+    db = sqlite3.connect(db_file, isolation_level=None)
+    result = db.execute(sql).fetchone()
+    db.close()
+    return result
+
+
+def report(name, lookup_count, elapsed):
+    print(f"{name:32s}: {elapsed:8.3f}s {lookup_count / elapsed:12.1f} lookups/sec")
+
+
+def main(site_count, lookup_count):
+    from util import newscatcher
+
+    rng = random.Random(7)
+    url_params = [(rng.choice(TOPICS), rng.choice(LANGUAGES), rng.choice(COUNTRIES)) for _ in range(lookup_count)]
+    news_params = [(f"site{rng.randrange(site_count)}.com", rng.choice(TOPICS)) for _ in range(lookup_count)]
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_file = create_catalog(os.path.join(temp_dir, "package_rss.db"), entries=create_entries(site_count))
+        patcher = use_catalog(db_file)
+
+        start = time.perf_counter()
+        newscatcher.get_catalog_connection()
+        print(f"catalog rows: {site_count * len(TOPICS)}, lookups: {lookup_count}")
+        print(f"{'load and index catalog (once)':32s}: {time.perf_counter() - start:8.3f}s")
+
+        start = time.perf_counter()
+        for params in url_params:
+            previous_urls(db_file, *params)
+        report("urls() per-call connection", lookup_count, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        # urls() prints a message for combinations without websites
+        with contextlib.redirect_stdout(io.StringIO()):
+            for topic, language, country in url_params:
+                newscatcher.urls(topic=topic, language=language, country=country)
+        report("urls() shared catalog", lookup_count, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for params in news_params:
+            previous_get_news_lookup(db_file, *params)
+        report("get_news() per-call connection", lookup_count, time.perf_counter() - start)
+
+        canned_feed = {"entries": [{"title": "fake article"}]}
+        with patch.object(newscatcher, "fetch_feed", return_value=canned_feed):
+            start = time.perf_counter()
+            for url, topic in news_params:
+                newscatcher.Newscatcher(url, topic=topic).get_news()
+            report("get_news() shared catalog", lookup_count, time.perf_counter() - start)
+
+        patcher.stop()
+        newscatcher.close_catalog_connection()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sites", type=int, default=5000)
+    parser.add_argument("--lookups", type=int, default=2000)
+    args = parser.parse_args()
+    main(args.sites, args.lookups)
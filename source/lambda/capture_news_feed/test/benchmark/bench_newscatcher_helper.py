@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+######################################################################################################################
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+######################################################################################################################
+
+"""
+Compares fetching the feeds of all topics of a url one at a time against the concurrent
+'retrieve_feed_from_all_topics'. Feeds are served by a local HTTP stand-in with injected latency, and one of the
+topics is a dead feed that only responds after the fetch timeout.
+
+Run from the lambda function root directory: python -m test.benchmark.bench_newscatcher_helper --latency-ms 200
+"""
+
+import argparse
+import time
+from unittest.mock import patch
+
+from test.fixtures.feed_server_fixture import FeedServer
+
+DEAD_TOPIC = "music"
+
+
+def create_newscatcher_stand_in(base_url, timeout):
+    from util.newscatcher import fetch_feed
+
+    class LocalNewscatcher:
+        """Stand-in for 'Newscatcher' that fetches each topic from the local server instead of the RSS catalog"""
+
+        def __init__(self, website, topic=None):
+            self.url = website
+            self.topic = topic
+
+        def get_news(self, feed_cache=None):
+            feed = fetch_feed(f"{base_url}/{self.topic}", timeout=timeout, feed_cache=feed_cache)
+            if feed.get("status", None) == 304:
+                feed["entries"] = []
+            elif not feed["entries"]:
+                return None
+            return {
+                "url": self.url,
+                "topic": self.topic,
+                "language": "en",
+                "country": "US",
+                "articles": feed["entries"],
+            }
+
+    return LocalNewscatcher
+
+
+def run(base_url, timeout, max_workers):
+    from util import newscatcher_helper
+
+    with patch.object(newscatcher_helper, "Newscatcher", create_newscatcher_stand_in(base_url, timeout)):
+        start = time.perf_counter()
+        aggregated_feed = newscatcher_helper.retrieve_feed_from_all_topics("fakenews.com", max_workers=max_workers)
+        return time.perf_counter() - start, len(aggregated_feed)
+
+
+def main(latency_ms, timeout):
+    latency = latency_ms / 1000
+    print(f"topics: 13, latency: {latency_ms}ms, fetch timeout: {timeout}s")
+    for scenario, path_latency in (("all healthy", {}), ("1 dead feed", {f"/{DEAD_TOPIC}": timeout * 2})):
+        with FeedServer(latency=latency, path_latency=path_latency) as feed_server:
+            sequential_elapsed, sequential_feeds = run(feed_server.base_url, timeout, max_workers=1)
+            concurrent_elapsed, concurrent_feeds = run(feed_server.base_url, timeout, max_workers=8)
+
+        print(f"{scenario}")
+        print(f"  sequential : {sequential_elapsed:8.3f}s {sequential_feeds:4d} feeds")
+        print(f"  concurrent : {concurrent_elapsed:8.3f}s {concurrent_feeds:4d} feeds")
+        print(f"  speedup    : {sequential_elapsed / concurrent_elapsed:8.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--timeout", type=float, default=2)
+    args = parser.parse_args()
+    main(args.latency_ms, args.timeout)
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+######################################################################################################################
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+######################################################################################################################
+
+"""
+Simulates polling news feeds for a number of days, once with every feed fetched on every scheduled invocation and
+once with the adaptive schedule of 'poll_scheduler', and reports the fetches, the articles missed (pushed out of
+the feed before a poll) and the delay between the publication and the capture of an article. Half of the feeds
+publish less than once a day, the others up to 'max-rate' articles per hour; articles arrive as a Poisson process.
+
+Run from the lambda function root directory: python -m test.benchmark.bench_poll_scheduler --feeds 600 --days 7
+"""
+
+import argparse
+import bisect
+import math
+import random
+import statistics
+from datetime import datetime, timedelta, timezone
+
+# number of most recent articles in a feed
+FEED_SIZE = 20
+
+
+def create_arrivals(rng, feed_count, days, max_rate, start):
+    """Publication times of the articles of each feed, sorted"""
+    feeds = []
+    for index in range(feed_count):
+        if index % 2:
+            rate_per_day = 10 ** rng.uniform(-1.3, 0)  # 0.05 to 1 article a day
+        else:
+            rate_per_day = 10 ** rng.uniform(0, math.log10(24 * max_rate))  # 1 a day to max_rate an hour
+        arrivals, elapsed = [], rng.expovariate(rate_per_day)
+        while elapsed < days:
+            arrivals.append(start + timedelta(days=elapsed))
+            elapsed += rng.expovariate(rate_per_day)
+        feeds.append(arrivals)
+    return feeds
+
+
+def get_feed(arrivals, now):
+    """The articles of the feed at 'now'"""
+    end = bisect.bisect_right(arrivals, now)
+    return arrivals[max(0, end - FEED_SIZE) : end]
+
+
+def simulate(feeds, start, days, invocation_interval, adaptive):
+    from util.poll_scheduler import compute_schedule, is_due
+
+    min_interval, max_interval = invocation_interval, timedelta(hours=24)
+    schedules = [None] * len(feeds)
+    captured = [set() for _ in feeds]
+    last_polls = [start] * len(feeds)
+    delays = []
+    fetches = 0
+
+    now = start
+    while now < start + timedelta(days=days):
+        for index, arrivals in enumerate(feeds):
+            if adaptive and not is_due(schedules[index], now):
+                continue
+
+            fetches += 1
+            last_polls[index] = now
+            feed = get_feed(arrivals, now)
+            for published in feed:
+                if published not in captured[index]:
+                    captured[index].add(published)
+                    delays.append((now - published).total_seconds() / 60)
+            if adaptive:
+                articles = [{"published_parsed": published.timetuple()} for published in feed]
+                schedules[index] = compute_schedule(schedules[index], articles, now, min_interval, max_interval)
+        now += invocation_interval
+
+    # the articles published after the last poll of a feed are not missed, they are captured by the next poll
+    published_count = sum(bisect.bisect_right(arrivals, last_poll) for arrivals, last_poll in zip(feeds, last_polls))
+    captured_count = sum(len(articles) for articles in captured)
+    delays.sort()
+    return {
+        "fetches": fetches,
+        "missed": published_count - captured_count,
+        "captured": captured_count,
+        "median_delay": statistics.median(delays) if delays else 0,
+        "p95_delay": delays[int(len(delays) * 0.95)] if delays else 0,
+    }
+
+
+def main(feed_count, days, invocation_minutes, max_rate):
+    rng = random.Random(7)
+    start = datetime(2021, 3, 1, tzinfo=timezone.utc)
+    feeds = create_arrivals(rng, feed_count, days, max_rate, start)
+    invocation_interval = timedelta(minutes=invocation_minutes)
+
+    quiet_feeds = sum(1 for arrivals in feeds if len(arrivals) < days)
+    print(f"feeds: {feed_count} ({quiet_feeds} with less than 1 article a day), articles: {sum(map(len, feeds))}")
+    print(f"scheduled invocation every {invocation_minutes} minutes for {days} days, {FEED_SIZE} articles per feed")
+
+    fixed = simulate(feeds, start, days, invocation_interval, adaptive=False)
+    adaptive = simulate(feeds, start, days, invocation_interval, adaptive=True)
+    for name, result in (("fixed schedule", fixed), ("adaptive schedule", adaptive)):
+        print(
+            f"{name:18}: {result['fetches']:8} fetches, {result['captured']:7} captured, {result['missed']:5} missed, "
+            f"delay median {result['median_delay']:6.1f} min, p95 {result['p95_delay']:7.1f} min"
+        )
+    print(f"fetch reduction: {1 - adaptive['fetches'] / fixed['fetches']:.1%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--feeds", type=int, default=600)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--invocation-minutes", type=int, default=15)
+    parser.add_argument("--max-rate", type=int, default=10, help="articles per hour of the busiest feeds")
+    args = parser.parse_args()
+    main(args.feeds, args.days, args.invocation_minutes, args.max_rate)
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+######################################################################################################################
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+######################################################################################################################
+
+"""
+Cold start and warm latency of the domain extraction used by 'newscatcher.clean_url': the bundled public suffix trie
+of 'public_suffix' against 'tldextract'. Each cold start runs in a new interpreter and reports the import time and
+the latency of the first call. tldextract is run with an empty cache directory, as on a new lambda container, and
+without fetching the list ('suffix_list_urls=()'); with the default settings it first tries to download the list,
+which adds a network round trip (or a timeout when the function has no internet access) to the first call.
+
+Run from the lambda function root directory: python -m test.benchmark.bench_public_suffix --cold-starts 5
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+COLD_START_SCRIPT = {
+    "public_suffix": """
+import time
+start = time.perf_counter()
+from util.public_suffix import extract
+imported = time.perf_counter()
+extract("https://www.bbc.co.uk/news")
+first_call = time.perf_counter()
+""",
+    "tldextract": """
+import time
+start = time.perf_counter()
+import tldextract
+extract = tldextract.TLDExtract(suffix_list_urls=(), cache_dir=CACHE_DIR, include_psl_private_domains=False)
+imported = time.perf_counter()
+extract("https://www.bbc.co.uk/news")
+first_call = time.perf_counter()
+""",
+}
+REPORT = """
+import json
+print(json.dumps({"import": imported - start, "first_call": first_call - imported}))
+"""
+
+
+def cold_start(name):
+    with tempfile.TemporaryDirectory() as cache_dir:
+        script = f"CACHE_DIR = {cache_dir!r}\n" + COLD_START_SCRIPT[name] + REPORT
+        output = subprocess.run([sys.executable, "-c", script], capture_output=True, check=True, text=True)
+    return json.loads(output.stdout)
+
+
+def create_urls(rng, host_count, url_count):
+    suffixes = ["com", "co.uk", "com.au", "fr", "de", "co.jp", "net", "org", "news", "city.kobe.jp"]
+    hosts = [f"www.site{index}.{rng.choice(suffixes)}" for index in range(host_count)]
+    return [f"https://{rng.choice(hosts)}/article/{index}" for index in range(url_count)]
+
+
+def measure_warm(extract, urls):
+    start = time.perf_counter()
+    for url in urls:
+        extract(url)
+    return (time.perf_counter() - start) / len(urls)
+
+
+def main(cold_starts, host_count, url_count):
+    print(f"cold starts (median of {cold_starts} new interpreters):")
+    for name in COLD_START_SCRIPT:
+        results = [cold_start(name) for _ in range(cold_starts)]
+        import_ms = statistics.median(result["import"] for result in results) * 1000
+        first_call_ms = statistics.median(result["first_call"] for result in results) * 1000
+        print(f"  {name:14}: import {import_ms:7.2f} ms, first call {first_call_ms:7.2f} ms")
+
+    import tldextract
+
+    from util import public_suffix
+
+    urls = create_urls(random.Random(7), host_count, url_count)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        tld_extract = tldextract.TLDExtract(suffix_list_urls=(), cache_dir=cache_dir, include_psl_private_domains=False)
+        tld_extract(urls[0])
+        tldextract_us = measure_warm(tld_extract, urls) * 1e6
+
+    public_suffix.split_hostname.cache_clear()
+    first_pass_us = measure_warm(public_suffix.extract, urls) * 1e6
+    second_pass_us = measure_warm(public_suffix.extract, urls) * 1e6
+    print(f"warm calls ({url_count} urls on {host_count} hosts):")
+    print(f"  tldextract                : {tldextract_us:6.2f} us per url")
+    print(f"  public_suffix, first pass: {first_pass_us:6.2f} us per url")
+    print(f"  public_suffix, memoized  : {second_pass_us:6.2f} us per url")
+    print(f"  cache: {public_suffix.split_hostname.cache_info()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cold-starts", type=int, default=5)
+    parser.add_argument("--hosts", type=int, default=2000)
+    parser.add_argument("--urls", type=int, default=50000)
+    args = parser.parse_args()
+    # the cold start interpreters import 'util' from the lambda function root directory
+    os.environ["PYTHONPATH"] = os.pathsep.join(filter(None, [os.getcwd(), os.environ.get("PYTHONPATH", None)]))
+    main(args.cold_starts, args.hosts, args.urls)
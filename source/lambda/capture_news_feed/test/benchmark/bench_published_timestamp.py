@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+######################################################################################################################
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+######################################################################################################################
+
+"""
+Micro-benchmark for parsing the published date of articles. The previous chain of nested strptime attempts is
+compared with 'newscatcher_helper.get_published_timestamp', which uses an RFC 822 fast path and remembers the format
+of each site. Every synthetic site publishes its dates in one of the four supported formats.
+
+Run from the lambda function root directory: python -m test.benchmark.bench_published_timestamp --dates 100000
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+FORMATS = [
+    "%a, %d %b %Y %H:%M:%S +0200",
+    "%a, %d %b %Y %H:%M:%S GMT",
+    "%a, %d %b %Y %H:%M:%S",
+    "%A, %B %d, %Y %I:%M %p +0200",
+]
+
+
+def previous_get_published_timestamp(str_date):
+    from util.newscatcher_helper import (
+        rss_datetime_fromat_1,
+        rss_datetime_fromat_2,
+        rss_datetime_fromat_3,
+        rss_datetime_fromat_4,
+    )
+
+    try:
+        published_datetime = datetime.strptime(str_date, rss_datetime_fromat_1)
+    except ValueError:
+        try:
+            published_datetime = datetime.strptime(str_date, rss_datetime_fromat_2)
+        except ValueError:
+            try:
+                published_datetime = datetime.strptime(str_date, rss_datetime_fromat_3)
+            except ValueError:
+                published_datetime = datetime.strptime(str_date, rss_datetime_fromat_4)
+    return published_datetime.replace(tzinfo=timezone.utc)
+
+
+def create_dates(date_count, site_count):
+    rng = random.Random(42)
+    site_formats = [FORMATS[index % len(FORMATS)] for index in range(site_count)]
+    start = datetime(2021, 1, 1)
+    dates = []
+    for _ in range(date_count):
+        site = rng.randrange(site_count)
+        published = start + timedelta(seconds=rng.randrange(365 * 24 * 3600))
+        dates.append((f"site{site}.com", published.strftime(site_formats[site])))
+    return dates
+
+
+def report(name, date_count, elapsed):
+    print(f"{name:24s}: {elapsed:8.3f}s {date_count / elapsed:12.1f} dates/sec")
+
+
+def main(date_count, site_count):
+    from util import newscatcher_helper
+
+    dates = create_dates(date_count, site_count)
+    print(f"dates: {date_count}, sites: {site_count}")
+
+    start = time.perf_counter()
+    previous_results = [previous_get_published_timestamp(str_date) for _, str_date in dates]
+    report("nested strptime", date_count, time.perf_counter() - start)
+
+    newscatcher_helper._site_timestamp_formats.clear()
+    start = time.perf_counter()
+    results = [newscatcher_helper.get_published_timestamp(str_date, site=site) for site, str_date in dates]
+    report("fast path + site memory", date_count, time.perf_counter() - start)
+
+    assert results == previous_results, "parsers disagree"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--dates", type=int, default=100000)
+    parser.add_argument("--sites", type=int, default=200)
+    args = parser.parse_args()
+    main(args.dates, args.sites)
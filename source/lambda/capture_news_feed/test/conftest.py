@@ -28,5 +28,13 @@ def aws_environment_variables():
     os.environ["STREAM_NAME"] = "fakestream"
 
 
+@pytest.fixture(autouse=True)
+def clear_config_cache():
+    """The config cache is kept across invocations, each test starts with an empty one"""
+    from util import ddb_helper
+
+    ddb_helper._config_cache.clear()
+
+
 collect_ignore_glob = ["tests/*.py"]  # crhelper library
 collect_ignore = []
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+######################################################################################################################
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+######################################################################################################################
+
+import sqlite3
+from unittest import mock
+
+CATALOG_ENTRIES = [
+    # clean_url, rss_url, topic_unified, language, clean_country, main, Globalrank
+    ("fakenews.com", "{base_url}/fakenews/news", "news", "en", "US", 1, 10),
+    ("fakenews.com", "{base_url}/fakenews/tech", "tech", "en", "US", 0, 10),
+    ("fakenews.com", "{base_url}/fakenews/sport", "sport", "en", "US", 0, 10),
+    ("othernews.com", "{base_url}/othernews/news", "news", "en", "US", 1, 5),
+    ("othernews.com", "{base_url}/othernews/business", "business", "en", "US", 0, 5),
+    ("unrankednews.com", "{base_url}/unrankednews/news", "news", "en", "US", 1, None),
+    ("fakenouvelles.ca", "{base_url}/fakenouvelles/news", "news", "fr", "CA", 1, 100),
+    ("fakenoticias.es", "{base_url}/fakenoticias/tech", "tech", "es", "ES", 1, 50),
+]
+
+
+def create_catalog(db_file, base_url="http://127.0.0.1", entries=None):
+    """Create an 'rss_main' table with the columns used by 'util.newscatcher' in a new SQLite database file"""
+    db = sqlite3.connect(db_file)
+    db.execute(
+        "CREATE TABLE rss_main (clean_url TEXT, rss_url TEXT, topic_unified TEXT, language TEXT, clean_country TEXT, "
+        "main INTEGER, Globalrank INTEGER)"
+    )
+    db.executemany(
+        "INSERT INTO rss_main VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [
+            (clean_url, rss_url.format(base_url=base_url), *values)
+            for clean_url, rss_url, *values in (entries if entries else CATALOG_ENTRIES)
+        ],
+    )
+    db.commit()
+    db.close()
+    return db_file
+
+
+def use_catalog(db_file):
+    """Point 'util.newscatcher' at the catalog in db_file. Returns the patcher, which should be stopped after use"""
+    from util import newscatcher
+
+    newscatcher.close_catalog_connection()
+    patcher = mock.patch.object(newscatcher, "DB_FILE", db_file)
+    patcher.start()
+    return patcher
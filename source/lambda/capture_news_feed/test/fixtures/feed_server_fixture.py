@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+######################################################################################################################
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+######################################################################################################################
+
+import gzip
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+LAST_MODIFIED = "Fri, 01 Jan 2021 00:00:00 GMT"
+TRICKLE_BYTES = 64
+
+
+def create_rss_document(title, article_count=10):
+    now = datetime.now(timezone.utc)
+    items = "".join(f"""
+        <item>
+            <title>{title} article {index}</title>
+            <link>https://www.fakenews.com/{title}/{index}</link>
+            <guid>https://www.fakenews.com/{title}/{index}</guid>
+            <description>Fake summary of {title} article {index} about the economy and the weather</description>
+            <pubDate>{(now - timedelta(minutes=index)).strftime("%a, %d %b %Y %H:%M:%S %z")}</pubDate>
+        </item>""" for index in range(article_count))
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<rss version="2.0">
+    <channel>
+        <title>{title}</title>
+        <link>https://www.fakenews.com/{title}</link>
+        <description>Fake {title} feed</description>{items}
+    </channel>
+</rss>""".encode("utf-8")
+
+
+class FeedServer:
+    """
+    Local HTTP stand-in for RSS providers. Every path is served as a canned RSS document after 'latency' seconds.
+    Paths listed in 'path_latency' use their own latency instead, which allows simulating slow or dead feeds. With
+    'trickle_delay', the body is sent in pieces of 'TRICKLE_BYTES' bytes, 'trickle_delay' seconds apart.
+
+    Each path has a fixed ETag and Last-Modified value, and requests with a matching 'If-None-Match' header are answered
+    with 304 Not Modified. Connections are kept alive (HTTP/1.1) and, with 'compress', documents are gzip encoded for
+    the requests that accept it.
+    """
+
+    def __init__(self, latency=0, path_latency=None, compress=False, trickle_delay=0):
+        self.latency = latency
+        self.path_latency = path_latency if path_latency else {}
+        self.compress = compress
+        self.trickle_delay = trickle_delay
+        self.request_count = 0
+        self.not_modified_count = 0
+        self.client_ports = set()
+        self._lock = threading.Lock()
+
+        feed_server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):  # NOSONAR - http.server naming convention
+                with feed_server._lock:
+                    feed_server.request_count += 1
+                    feed_server.client_ports.add(self.client_address[1])
+                time.sleep(feed_server.path_latency.get(self.path, feed_server.latency))
+                etag = f'"{self.path}-v1"'
+                try:
+                    if self.headers.get("If-None-Match", None) == etag:
+                        with feed_server._lock:
+                            feed_server.not_modified_count += 1
+                        self.send_response(304)
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+
+                    body = create_rss_document(self.path.strip("/") or "main")
+                    self.send_response(200)
+                    if feed_server.compress and "gzip" in self.headers.get("Accept-Encoding", ""):
+                        body = gzip.compress(body)
+                        self.send_header("Content-Encoding", "gzip")
+                    self.send_header("Content-Type", "application/rss+xml; charset=utf-8")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.send_header("ETag", etag)
+                    self.send_header("Last-Modified", LAST_MODIFIED)
+                    self.end_headers()
+                    if not feed_server.trickle_delay:
+                        self.wfile.write(body)
+                        return
+
+                    for index in range(0, len(body), TRICKLE_BYTES):
+                        self.wfile.write(body[index : index + TRICKLE_BYTES])
+                        self.wfile.flush()
+                        time.sleep(feed_server.trickle_delay)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # client gave up waiting
+
+            def log_message(self, format, *args):  # NOSONAR - silence request logging
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture()
+def get_feed_server():
+    with FeedServer() as feed_server:
+        yield feed_server
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+######################################################################################################################
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+######################################################################################################################
+
+import unittest
+
+from util.article_pipeline import ArticlePipeline, ArticleStage
+
+
+class ListSink:
+    def __init__(self):
+        self.items = []
+
+    def put(self, item):
+        self.items.append(item)
+
+    def get_stats(self):
+        return {"records": len(self.items)}
+
+
+class TestArticlePipeline(unittest.TestCase):
+    def test_stages_filter_and_count(self):
+        pipeline = ArticlePipeline(
+            [
+                ArticleStage("even", lambda item: item if item % 2 == 0 else None),
+                ArticleStage("double", lambda item: item * 2),
+            ],
+            ListSink(),
+        )
+        sink = pipeline.run(range(10))
+
+        self.assertEqual(sink.items, [0, 4, 8, 12, 16])
+        stats = pipeline.get_stats()
+        self.assertEqual(stats["even"]["in"], 10)
+        self.assertEqual(stats["even"]["out"], 5)
+        self.assertEqual(stats["even"]["dropped"], 5)
+        self.assertEqual(stats["double"]["in"], 5)
+        self.assertEqual(stats["sink"], {"records": 5})
+        self.assertGreaterEqual(stats["double"]["seconds"], 0)
+
+    def test_items_are_streamed(self):
+        calls = []
+
+        def record(name):
+            def function(item):
+                calls.append((name, item))
+                return item
+
+            return function
+
+        ArticlePipeline(
+            [ArticleStage("first", record("first")), ArticleStage("second", record("second"))], ListSink()
+        ).run([1, 2])
+        # each item goes through all the stages before the next item is read
+        self.assertEqual(calls, [("first", 1), ("second", 1), ("first", 2), ("second", 2)])
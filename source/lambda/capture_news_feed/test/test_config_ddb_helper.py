@@ -6,6 +6,7 @@
 
 import os
 import unittest
+from unittest import mock
 
 import boto3
 from boto3.dynamodb.conditions import Attr, Key
@@ -99,3 +100,60 @@ class TestConfigDDBHelper(unittest.TestCase):
     def tearDown(self):
         self.table.delete()
         self.dynamodb = None
+
+
+@mock_dynamodb
+class TestConfigCache(unittest.TestCase):
+    def setUp(self):
+        self.table = ddb_setup(os.environ["DDB_CONFIG_TABLE_NAME"]).Table(os.environ["DDB_CONFIG_TABLE_NAME"])
+        self.item = {"account": "testnews", "platform": "newscatcher", "query": "fakebrand", "enabled": True}
+        self.table.put_item(Item=self.item)
+
+    def tearDown(self):
+        self.table.delete()
+
+    def test_cached_within_ttl(self):
+        config_cache = ddb_helper.ConfigCache(ttl_seconds=300)
+        self.assertEqual(config_cache.get(), [self.item])
+
+        self.table.put_item(Item={**self.item, "account": "othernews"})
+        self.assertEqual(config_cache.get(), [self.item])
+        self.assertEqual(config_cache.get_stats(), {"hits": 1, "version_checks": 0, "scans": 1})
+
+    @mock.patch.dict(os.environ, {"DDB_CONFIG_VERSION_KEY": '{"account": "CONFIG_VERSION"}'})
+    def test_version_change_is_detected(self):
+        config_cache = ddb_helper.ConfigCache(ttl_seconds=0)
+        self.assertEqual(ddb_helper.update_config_version(), 1)
+        config_cache.get()
+        # unchanged version, the configurations are not scanned again
+        self.assertEqual(config_cache.get(), [self.item])
+        self.assertEqual(config_cache.get_stats(), {"hits": 0, "version_checks": 1, "scans": 1})
+
+        self.table.put_item(Item={**self.item, "account": "othernews"})
+        self.assertEqual(ddb_helper.update_config_version(), 2)
+        self.assertEqual(len(config_cache.get()), 2)
+        self.assertEqual(config_cache.get_stats()["scans"], 2)
+
+    @mock.patch.dict(os.environ, {"DDB_CONFIG_VERSION_KEY": '{"account": "CONFIG_VERSION"}'})
+    def test_without_version_item(self):
+        config_cache = ddb_helper.ConfigCache(ttl_seconds=0)
+        config_cache.get()
+        config_cache.get()
+        self.assertEqual(config_cache.get_stats(), {"hits": 0, "version_checks": 0, "scans": 2})
+
+    def test_without_version_key(self):
+        config_cache = ddb_helper.ConfigCache(ttl_seconds=0)
+        self.assertIsNone(ddb_helper.update_config_version())
+        config_cache.get()
+        config_cache.get()
+        self.assertEqual(config_cache.get_stats(), {"hits": 0, "version_checks": 0, "scans": 2})
+
+    @mock.patch.dict(os.environ, {"DDB_CONFIG_VERSION_KEY": '{"account": "CONFIG_VERSION"}'})
+    def test_version_item_is_not_a_config(self):
+        ddb_helper.update_config_version()
+        self.assertEqual(ddb_helper.get_config(), [self.item])
+
+    def test_cache_returns_copies(self):
+        config_cache = ddb_helper.ConfigCache(ttl_seconds=300)
+        config_cache.get().append({"account": "fakeaccount"})
+        self.assertEqual(config_cache.get(), [self.item])
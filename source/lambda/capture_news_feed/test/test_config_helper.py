@@ -5,9 +5,11 @@
 ######################################################################################################################
 
 import os
+import tempfile
 import unittest
 
-from util import config_helper
+from test.fixtures.catalog_fixture import create_catalog, use_catalog
+from util import config_helper, newscatcher
 
 
 class TestConfigHelper(unittest.TestCase):
@@ -70,3 +72,32 @@ class TestConfigHelper(unittest.TestCase):
     def test_for_type_error_retrieve_urls(self):
         with self.assertRaises(TypeError):
             config_helper.retrieve_urls(country="ZYX", topic="tech")
+
+
+class TestConfigHelperWithCatalog(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.catalog_patcher = use_catalog(create_catalog(os.path.join(self.temp_dir.name, "package_rss.db")))
+
+    def tearDown(self):
+        self.catalog_patcher.stop()
+        newscatcher.close_catalog_connection()
+        self.temp_dir.cleanup()
+
+    def test_retrieve_urls_with_all_wildcard(self):
+        self.assertEqual(
+            config_helper.retrieve_urls(country="ALL", language="en", topic="ALL"),
+            ["othernews.com", "fakenews.com", "unrankednews.com"],
+        )
+        self.assertEqual(
+            config_helper.retrieve_urls(country="ALL", language="ALL", topic="news"),
+            ["othernews.com", "fakenews.com", "fakenouvelles.ca", "unrankednews.com"],
+        )
+        self.assertEqual(len(config_helper.retrieve_urls(country="ALL", language="ALL", topic="ALL")), 8)
+
+    def test_retrieve_urls_using_json_with_topics(self):
+        param_str = '{"country":"ALL", "language":"ALL", "topic": "tech,business"}'
+        self.assertEqual(config_helper.retrieve_urls_using_json(param_str), ["fakenoticias.es"])
+
+        param_str = '{"country":"ALL", "language":"fr", "topic": "ALL"}'
+        self.assertEqual(config_helper.retrieve_urls_using_json(param_str), ["fakenouvelles.ca"])
@@ -7,27 +7,29 @@
 import json
 import os
 import unittest
+from unittest.mock import patch
 
 import boto3
 from botocore.exceptions import ClientError
 from botocore.stub import Stubber
 from shared_util import custom_boto_config, custom_logging
+from shared_util.event_bridge_helper import MAX_ATTEMPTS
 from util.event_bus_helper import ConfigEvent, publish_config
 
 
-def create_expected_params(data):
+def create_expected_entry(data):
     return {
-        "Entries": [
-            {
-                "Detail": data,
-                "DetailType": "config",
-                "EventBusName": os.environ["EVENT_BUS_NAME"],
-                "Source": os.environ["INGESTION_NAMESPACE"],
-            }
-        ]
+        "Detail": data,
+        "DetailType": "config",
+        "EventBusName": os.environ["EVENT_BUS_NAME"],
+        "Source": os.environ["INGESTION_NAMESPACE"],
     }
 
 
+def create_expected_params(data):
+    return {"Entries": [create_expected_entry(data)]}
+
+
 def create_event_data(url: str, topic=None):
     event = {
         "platform": "fakeplatform",
@@ -78,47 +80,81 @@ class TestEventBusHelper(unittest.TestCase):
         self.assertEqual(service_response["FailedEntryCount"], failed_count)
 
     def test_publish_config(self):
-        event_id = "fakeeventid"
-        failed_count = 0
-        url_list = []
+        url_list = [f"fakeurl{loop_index}.com" for loop_index in range(2)]
 
-        for loop_index in range(2):
-            url = f"fakeurl{loop_index}.com"
-            data = create_event_data(url)
+        # both urls are published in a single put_events call
+        expected_params = {"Entries": [create_expected_entry(create_event_data(url)) for url in url_list]}
+        response = {
+            "Entries": [{"EventId": "fakeeventid0"}, {"EventId": "fakeeventid1"}],
+            "FailedEntryCount": 0,
+        }
+        self.stubber.add_response("put_events", response, expected_params)
+        self.stubber.activate()
 
-            url_list.append(url)
+        config_event = ConfigEvent(platform="fakeplatform", account="fakeaccount", query="fakequery", url_list=url_list)
+        self.assertIsNone(publish_config(config_event, event_bus=self.event_bus))
 
-            expected_params = create_expected_params(data)
-            response = {
-                "Entries": [{"EventId": event_id}],
-                "FailedEntryCount": failed_count,
-            }
-            self.stubber.add_response("put_events", response, expected_params)
+    def test_publish_config_in_batches_of_10(self):
+        url_list = [f"fakeurl{loop_index}.com" for loop_index in range(15)]
+        entries = [create_expected_entry(create_event_data(url)) for url in url_list]
 
+        for batch in [entries[0:10], entries[10:15]]:
+            response = {"Entries": [{"EventId": "fakeeventid"} for _ in batch], "FailedEntryCount": 0}
+            self.stubber.add_response("put_events", response, {"Entries": batch})
         self.stubber.activate()
 
         config_event = ConfigEvent(platform="fakeplatform", account="fakeaccount", query="fakequery", url_list=url_list)
         self.assertIsNone(publish_config(config_event, event_bus=self.event_bus))
 
     def test_publish_config_with_topic(self):
-        event_id = "fakeeventid"
-        failed_count = 0
-        url_list = []
         topic = "tech"
+        url_list = [f"fakeurl{loop_index}.com" for loop_index in range(2)]
 
-        for loop_index in range(2):
-            url = f"fakeurl{loop_index}.com"
-            data = create_event_data(url, topic=topic)
+        expected_params = {"Entries": [create_expected_entry(create_event_data(url, topic=topic)) for url in url_list]}
+        response = {
+            "Entries": [{"EventId": "fakeeventid0"}, {"EventId": "fakeeventid1"}],
+            "FailedEntryCount": 0,
+        }
+        self.stubber.add_response("put_events", response, expected_params)
+        self.stubber.activate()
 
-            url_list.append(url)
+        config_event = ConfigEvent(
+            platform="fakeplatform", account="fakeaccount", query="fakequery", url_list=url_list, topic=topic
+        )
+        self.assertIsNone(publish_config(config_event, event_bus=self.event_bus))
+
+    def test_publish_config_in_batch_mode(self):
+        url_list = [f"fakeurl{loop_index}.com" for loop_index in range(7)]
+        details = [
+            json.dumps({"platform": "fakeplatform", "account": "fakeaccount", "query": "fakequery", "urls": url_group})
+            for url_group in [url_list[0:3], url_list[3:6], url_list[6:7]]
+        ]
+
+        response = {"Entries": [{"EventId": "fakeeventid"} for _ in details], "FailedEntryCount": 0}
+        self.stubber.add_response(
+            "put_events", response, {"Entries": [create_expected_entry(detail) for detail in details]}
+        )
+        self.stubber.activate()
+
+        config_event = ConfigEvent(platform="fakeplatform", account="fakeaccount", query="fakequery", url_list=url_list)
+        self.assertIsNone(publish_config(config_event, event_bus=self.event_bus, urls_per_event=3))
 
-            expected_params = create_expected_params(data)
-            response = {
-                "Entries": [{"EventId": event_id}],
-                "FailedEntryCount": failed_count,
+    @patch.dict(os.environ, {"URLS_PER_EVENT": "50"})
+    def test_publish_config_in_batch_mode_from_environment(self):
+        topic = "tech"
+        url_list = [f"fakeurl{loop_index}.com" for loop_index in range(20)]
+        detail = json.dumps(
+            {
+                "platform": "fakeplatform",
+                "account": "fakeaccount",
+                "query": "fakequery",
+                "urls": url_list,
+                "topic": topic,
             }
-            self.stubber.add_response("put_events", response, expected_params)
+        )
 
+        response = {"Entries": [{"EventId": "fakeeventid"}], "FailedEntryCount": 0}
+        self.stubber.add_response("put_events", response, {"Entries": [create_expected_entry(detail)]})
         self.stubber.activate()
 
         config_event = ConfigEvent(
@@ -141,21 +177,27 @@ class TestEventBusHelper(unittest.TestCase):
         with self.assertRaises(ClientError):
             publish_config(config_event)
 
-    def test_publish_config_with_failures(self):
-        failed_count = 1
-
-        for loop_index in range(2):
-            data = create_event_data(f"fakeurl{loop_index}.com")
-            expected_params = create_expected_params(data)
+    @patch("shared_util.batch_writer.time.sleep")
+    def test_publish_config_with_failures(self, mocked_sleep):
+        url_list = ["fakeurl0.com", "fakeurl1.com"]
+        entries = [create_expected_entry(create_event_data(url)) for url in url_list]
 
-            response = {"FailedEntryCount": failed_count}
-            self.stubber.add_response("put_events", response, expected_params)
+        # the first url is accepted, the second one fails and is resubmitted until attempts are exhausted
+        self.stubber.add_response(
+            "put_events",
+            {"FailedEntryCount": 1, "Entries": [{"EventId": "fakeeventid"}, {"ErrorCode": "InternalFailure"}]},
+            {"Entries": entries},
+        )
+        for _ in range(MAX_ATTEMPTS - 1):
+            self.stubber.add_response(
+                "put_events",
+                {"FailedEntryCount": 1, "Entries": [{"ErrorCode": "InternalFailure"}]},
+                {"Entries": [entries[1]]},
+            )
 
         self.stubber.activate()
 
-        config_event = ConfigEvent(
-            platform="fakeplatform", account="fakeaccount", query="fakequery", url_list=["fakeurl0.com", "fakeurl1.com"]
-        )
+        config_event = ConfigEvent(platform="fakeplatform", account="fakeaccount", query="fakequery", url_list=url_list)
         self.assertIsNone(publish_config(config_event, event_bus=self.event_bus))
 
     def test_fail_event_bus(self):
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+######################################################################################################################
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+######################################################################################################################
+
+import os
+import time
+import unittest
+from unittest import mock
+
+import urllib3
+from test.fixtures.feed_server_fixture import FeedServer
+from util import newscatcher
+from util.feed_session import (
+    FeedSession,
+    LatencyHistogram,
+    ResponseTimeoutError,
+    ResponseTooLargeError,
+    get_feed_session,
+)
+
+
+class TestFeedSession(unittest.TestCase):
+    def test_connections_are_kept_alive(self):
+        session = FeedSession()
+        with FeedServer() as feed_server:
+            for topic in ("news", "tech", "sport"):
+                response = session.get(f"{feed_server.base_url}/{topic}")
+                self.assertEqual(response.status, 200)
+
+        self.assertEqual(feed_server.request_count, 3)
+        self.assertEqual(len(feed_server.client_ports), 1)
+
+    def test_gzip_response_is_decompressed(self):
+        session = FeedSession()
+        with FeedServer(compress=True) as feed_server:
+            response = session.get(f"{feed_server.base_url}/tech")
+
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        self.assertTrue(response.content.startswith(b"<?xml"))
+        self.assertEqual(response.url, f"{feed_server.base_url}/tech")
+
+    def test_response_size_limit(self):
+        with FeedServer() as feed_server:
+            with self.assertRaises(ResponseTooLargeError):
+                FeedSession(max_response_bytes=1000).get(f"{feed_server.base_url}/tech")
+            # the limit applies to the decompressed content
+            feed_server.compress = True
+            with self.assertRaises(ResponseTooLargeError):
+                FeedSession(max_response_bytes=1000).get(f"{feed_server.base_url}/tech")
+
+    def test_read_timeout(self):
+        session = FeedSession(connect_timeout=1, read_timeout=0.2)
+        with FeedServer(latency=2) as feed_server:
+            start = time.perf_counter()
+            with self.assertRaises(urllib3.exceptions.HTTPError):
+                session.get(f"{feed_server.base_url}/tech")
+            elapsed = time.perf_counter() - start
+
+        self.assertLess(elapsed, 1.5)
+        stats = session.get_stats()
+        self.assertEqual(stats["all"]["errors"], 1)
+
+    def test_total_timeout(self):
+        # every read is well within the read timeout, but the whole response takes seconds
+        session = FeedSession(read_timeout=1, total_timeout=0.5)
+        with FeedServer(trickle_delay=0.05) as feed_server:
+            start = time.perf_counter()
+            with self.assertRaises(ResponseTimeoutError):
+                session.get(f"{feed_server.base_url}/tech")
+            elapsed = time.perf_counter() - start
+
+        self.assertLess(elapsed, 1.5)
+        self.assertEqual(session.get_stats()["all"]["errors"], 1)
+
+    def test_abandoned_response_connection_is_not_reused(self):
+        session = FeedSession(max_response_bytes=1000)
+        with FeedServer() as feed_server:
+            with self.assertRaises(ResponseTooLargeError):
+                session.get(f"{feed_server.base_url}/tech")
+            session.max_response_bytes = 1024 * 1024
+            self.assertEqual(session.get(f"{feed_server.base_url}/tech").status, 200)
+
+        # the request after the abandoned response opened a new connection
+        self.assertEqual(len(feed_server.client_ports), 2)
+
+    def test_timeouts_from_environment(self):
+        with mock.patch.dict(
+            os.environ,
+            {
+                "FEED_CONNECT_TIMEOUT_SECONDS": "1",
+                "FEED_READ_TIMEOUT_SECONDS": "5",
+                "FEED_MAX_RESPONSE_BYTES": "2048",
+                "FEED_TOTAL_TIMEOUT_SECONDS": "20",
+            },
+        ):
+            session = FeedSession()
+        self.assertEqual(session.timeout.connect_timeout, 1)
+        self.assertEqual(session.timeout.read_timeout, 5)
+        self.assertEqual(session.total_timeout, 20)
+        self.assertEqual(session.max_response_bytes, 2048)
+
+    def test_latency_histogram_per_host(self):
+        session = FeedSession()
+        with FeedServer() as feed_server, FeedServer(latency=0.3) as slow_feed_server:
+            session.get(f"{feed_server.base_url}/news")
+            session.get(f"{feed_server.base_url}/tech")
+            session.get(f"{slow_feed_server.base_url}/news")
+
+        stats = session.get_stats(reset=True)
+        fast_host, slow_host = feed_server.base_url[len("http://") :], slow_feed_server.base_url[len("http://") :]
+        self.assertEqual(stats[fast_host]["requests"], 2)
+        self.assertEqual(stats[slow_host]["requests"], 1)
+        self.assertEqual(stats[slow_host]["buckets"], {"<=500": 1})
+        self.assertEqual(stats["all"]["requests"], 3)
+        self.assertEqual(session.get_stats(), {"all": LatencyHistogram().to_dict()})
+
+    def test_get_feed_session(self):
+        self.assertIs(get_feed_session(), get_feed_session())
+
+
+class TestLatencyHistogram(unittest.TestCase):
+    def test_percentiles(self):
+        histogram = LatencyHistogram()
+        for latency_ms in [10] * 90 + [700] * 9 + [20000]:
+            histogram.record(latency_ms)
+        histogram.record(60, error=True)
+
+        stats = histogram.to_dict()
+        self.assertEqual(stats["requests"], 101)
+        self.assertEqual(stats["errors"], 1)
+        self.assertEqual(stats["p50_ms"], 50)
+        self.assertEqual(stats["p99_ms"], 1000)
+        self.assertEqual(stats["buckets"], {"<=50": 90, "<=100": 1, "<=1000": 9, ">10000": 1})
+        self.assertIsNone(histogram.get_percentile(100))
+
+
+class TestFetchFeedOnSession(unittest.TestCase):
+    def test_fetch_gzip_feed(self):
+        with FeedServer(compress=True) as feed_server:
+            feed = newscatcher.fetch_feed(f"{feed_server.base_url}/tech")
+
+        self.assertEqual(len(feed["entries"]), 10)
+        self.assertEqual(feed["entries"][0]["title"], "tech article 0")
+
+    def test_fetch_feed_too_large(self):
+        with FeedServer() as feed_server, mock.patch.object(get_feed_session(), "max_response_bytes", 1000):
+            feed = newscatcher.fetch_feed(f"{feed_server.base_url}/tech")
+
+        self.assertEqual(feed["entries"], [])
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+######################################################################################################################
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+######################################################################################################################
+
+import random
+import unittest
+from unittest import mock
+
+from util.keyword_matcher import MIN_AUTOMATON_KEYWORDS, KeywordMatcher, get_keyword_matcher
+
+
+class TestKeywordMatcher(unittest.TestCase):
+    def create_matchers(self, keywords, **kwargs):
+        """The matcher with the automaton and the one with a substring search per keyword, for the same keywords"""
+        matchers = []
+        for min_automaton_keywords in [1, len(keywords) + 1]:
+            with mock.patch("util.keyword_matcher.MIN_AUTOMATON_KEYWORDS", min_automaton_keywords):
+                matchers.append(KeywordMatcher(keywords, **kwargs))
+        self.assertEqual([matcher.uses_automaton for matcher in matchers], [True, False])
+        return matchers
+
+    def test_find(self):
+        for matcher in self.create_matchers(["he", "she", "his", "hers"]):
+            with self.subTest(uses_automaton=matcher.uses_automaton):
+                self.assertEqual(matcher.find("ushers"), ["she", "he", "hers"])
+                self.assertEqual(matcher.find("this is history"), ["his"])
+                self.assertEqual(matcher.find("nothing to see"), [])
+                self.assertEqual(matcher.find(""), [])
+                self.assertEqual(matcher.find(None), [])
+
+    def test_same_result_as_substring_search(self):
+        rng = random.Random(3)
+        keywords = ["".join(rng.choice("abc") for _ in range(rng.randint(1, 4))) for _ in range(20)]
+        automaton_matcher, substring_matcher = self.create_matchers(keywords)
+        for _ in range(200):
+            text = "".join(rng.choice("abcd") for _ in range(rng.randint(0, 30)))
+            self.assertEqual(set(automaton_matcher.find(text)), {keyword for keyword in keywords if keyword in text})
+            self.assertEqual(automaton_matcher.matches(text), any(keyword in text for keyword in keywords))
+            # both matchers return the keywords in the same order
+            self.assertEqual(substring_matcher.find(text), automaton_matcher.find(text))
+            self.assertEqual(substring_matcher.matches(text), automaton_matcher.matches(text))
+
+    def test_automaton_threshold(self):
+        self.assertFalse(KeywordMatcher([f"fake{index}" for index in range(MIN_AUTOMATON_KEYWORDS - 1)]).uses_automaton)
+        self.assertTrue(KeywordMatcher([f"fake{index}" for index in range(MIN_AUTOMATON_KEYWORDS)]).uses_automaton)
+
+    def test_case_insensitive(self):
+        for matcher in self.create_matchers(["Amazon"]):
+            self.assertEqual(matcher.find("AMAZON and amazon"), [])
+        for matcher in self.create_matchers(["Amazon"], case_insensitive=True):
+            self.assertEqual(matcher.find("AMAZON and amazon"), ["Amazon"])
+
+    def test_whole_word(self):
+        for matcher in self.create_matchers(["cat", "new york"], whole_word=True):
+            with self.subTest(uses_automaton=matcher.uses_automaton):
+                self.assertEqual(matcher.find("concatenate category"), [])
+                self.assertEqual(matcher.find("the cat, in New York and new york."), ["cat", "new york"])
+                self.assertEqual(matcher.find("cat_1 cats"), [])
+                self.assertTrue(matcher.matches("cat"))
+
+        # a longer keyword that is not a whole word does not hide a shorter one that is
+        for matcher in self.create_matchers(["ab", "b"], whole_word=True):
+            self.assertEqual(matcher.find("ab! a b"), ["ab", "b"])
+
+    def test_empty_and_duplicate_keywords(self):
+        matcher = KeywordMatcher(["fake", "", "fake"])
+        self.assertEqual(matcher.keywords, ["fake"])
+        self.assertFalse(matcher.matches("no match"))
+
+    def test_cached_per_query(self):
+        matcher = get_keyword_matcher("fake,query")
+        self.assertIs(get_keyword_matcher("fake,query"), matcher)
+        self.assertIsNot(get_keyword_matcher("fake,query", case_insensitive=True), matcher)
+        self.assertEqual(matcher.keywords, ["fake", "query"])
@@ -4,9 +4,11 @@
 # SPDX-License-Identifier: Apache-2.0
 ######################################################################################################################
 
+import itertools
 import json
 import os
 import unittest
+from datetime import datetime, timedelta, timezone
 from functools import wraps
 from test.fixtures.event_bus_fixture import get_event_bus_stubber
 from test.test_stream_helper import stream_setup
@@ -17,6 +19,7 @@ import pytest
 from botocore import stub
 from moto import mock_dynamodb, mock_kinesis, mock_sts
 from shared_util import custom_boto_config
+from shared_util.event_bridge_helper import MAX_ATTEMPTS
 
 
 def create_event_data_for_ddb(url: str):
@@ -163,6 +166,34 @@ def get_news_sites_for_US_en():
     ]
 
 
+def add_put_events_responses(stubber, details, failed=False):
+    """Add stubbed responses for config events that are published in batches of 10 entries"""
+    entries = [
+        {
+            "EventBusName": os.environ["EVENT_BUS_NAME"],
+            "Source": os.environ["INGESTION_NAMESPACE"],
+            "Detail": detail,
+            "DetailType": "config",
+        }
+        for detail in details
+    ]
+    for index in range(0, len(entries), 10):
+        batch = entries[index : index + 10]
+        if failed:
+            # first entry of every batch fails on each attempt, the rest are accepted on the first attempt
+            results = [{"ErrorCode": "InternalFailure"}] + [{"EventId": "fakeeventid"} for _ in batch[1:]]
+            stubber.add_response("put_events", {"Entries": results, "FailedEntryCount": 1}, {"Entries": batch})
+            for _ in range(MAX_ATTEMPTS - 1):
+                stubber.add_response(
+                    "put_events",
+                    {"Entries": [{"ErrorCode": "InternalFailure"}], "FailedEntryCount": 1},
+                    {"Entries": batch[0:1]},
+                )
+        else:
+            results = [{"EventId": "fakeeventid"} for _ in batch]
+            stubber.add_response("put_events", {"Entries": results, "FailedEntryCount": 0}, {"Entries": batch})
+
+
 def lambda_event_bus_event():
     return {
         "version": "0",
@@ -184,21 +215,7 @@ def test_invoke_lambda_for_ddb_config(get_event_bus_stubber):
     create_ddb_table_for_US_en()
     site_list = get_news_sites_for_US_en()
 
-    for site in site_list:
-        get_event_bus_stubber.add_response(
-            "put_events",
-            {"Entries": [{"EventId": "fakeeventid"}], "FailedEntryCount": 0},
-            {
-                "Entries": [
-                    {
-                        "EventBusName": os.environ["EVENT_BUS_NAME"],
-                        "Source": os.environ["INGESTION_NAMESPACE"],
-                        "Detail": create_event_data_for_ddb(site),
-                        "DetailType": "config",
-                    }
-                ]
-            },
-        )
+    add_put_events_responses(get_event_bus_stubber, [create_event_data_for_ddb(site) for site in site_list])
     get_event_bus_stubber.activate()
 
     from lambda_function import publish_config_handler
@@ -214,21 +231,7 @@ def test_invoke_lambda_for_json_str(get_event_bus_stubber):
     lambda_event = create_cw_schedule_event()
     site_list = get_news_sites_for_US_en()
 
-    for site in site_list:
-        get_event_bus_stubber.add_response(
-            "put_events",
-            {"Entries": [{"EventId": "fakeeventid"}], "FailedEntryCount": 0},
-            {
-                "Entries": [
-                    {
-                        "EventBusName": os.environ["EVENT_BUS_NAME"],
-                        "Source": os.environ["INGESTION_NAMESPACE"],
-                        "Detail": create_event_data_for_json_str(site),
-                        "DetailType": "config",
-                    }
-                ]
-            },
-        )
+    add_put_events_responses(get_event_bus_stubber, [create_event_data_for_json_str(site) for site in site_list])
     get_event_bus_stubber.activate()
 
     from lambda_function import publish_config_handler
@@ -238,26 +241,15 @@ def test_invoke_lambda_for_json_str(get_event_bus_stubber):
 
 @mock_sts
 @mock_dynamodb
-def test_invoke_lambda_for_ddb_config_with_failed_count(get_event_bus_stubber):
+@mock.patch("shared_util.batch_writer.time.sleep")
+def test_invoke_lambda_for_ddb_config_with_failed_count(mocked_sleep, get_event_bus_stubber):
     lambda_event = create_cw_schedule_event()
     create_ddb_table_for_US_en()
     site_list = get_news_sites_for_US_en()
 
-    for site in site_list:
-        get_event_bus_stubber.add_response(
-            "put_events",
-            {"Entries": [{"EventId": "fakeeventid"}], "FailedEntryCount": 1},
-            {
-                "Entries": [
-                    {
-                        "EventBusName": os.environ["EVENT_BUS_NAME"],
-                        "Source": os.environ["INGESTION_NAMESPACE"],
-                        "Detail": create_event_data_for_ddb(site),
-                        "DetailType": "config",
-                    }
-                ]
-            },
-        )
+    add_put_events_responses(
+        get_event_bus_stubber, [create_event_data_for_ddb(site) for site in site_list], failed=True
+    )
     get_event_bus_stubber.activate()
 
     from lambda_function import publish_config_handler
@@ -275,3 +267,239 @@ def test_invoke_process_config_handler():
     create_kinesis_streams()
     created_ddb_for_tracker()
     assert None == process_config_handler(lambda_event, None)
+
+
+def create_batch_mode_event(url_list):
+    event = create_event_bus_consumer_event()
+    event["detail"].pop("url")
+    event["detail"]["urls"] = url_list
+    return event
+
+
+@mock_sts
+@mock.patch("lambda_function.event_bus_helper.publish_config")
+@mock.patch("lambda_function.process_url")
+def test_process_config_handler_batch_mode(mocked_process_url, mocked_publish_config):
+    url_list = [f"fakeurl{index}.com" for index in range(10)]
+    from lambda_function import process_config_handler
+
+    context = mock.MagicMock()
+    context.get_remaining_time_in_millis.return_value = 600000
+    assert None == process_config_handler(create_batch_mode_event(url_list), context)
+
+    assert sorted(call.args[1] for call in mocked_process_url.call_args_list) == sorted(url_list)
+    # each url is published with a stream writer of its own
+    assert len({id(call.args[2]) for call in mocked_process_url.call_args_list}) == len(url_list)
+    # with the clients created by the handler thread
+    assert len({id(call.args[2].kds_client) for call in mocked_process_url.call_args_list}) == 1
+    assert len({id(call.kwargs["dynamodb_client"]) for call in mocked_process_url.call_args_list}) == 1
+    mocked_publish_config.assert_not_called()
+
+
+@mock_sts
+@mock.patch("lambda_function.event_bus_helper.publish_config")
+@mock.patch("lambda_function.process_url")
+def test_process_config_handler_batch_mode_checkpoints_unfinished_urls(mocked_process_url, mocked_publish_config):
+    url_list = [f"fakeurl{index}.com" for index in range(10)]
+    from lambda_function import TERMINATION_INTERVAL, process_config_handler
+
+    # there is time to start urls twice, after that the invocation is about to time out
+    context = mock.MagicMock()
+    context.get_remaining_time_in_millis.side_effect = itertools.chain(
+        [TERMINATION_INTERVAL * 2] * 2, itertools.repeat(TERMINATION_INTERVAL // 2)
+    )
+    assert None == process_config_handler(create_batch_mode_event(url_list), context)
+
+    started_count = mocked_process_url.call_count
+    assert 4 < started_count < 10
+    mocked_publish_config.assert_called_once()
+    config_event = mocked_publish_config.call_args.args[0]
+    assert config_event.url_list == url_list[started_count:]
+    assert config_event.account == "url_params"
+    assert mocked_publish_config.call_args.kwargs["urls_per_event"] == len(url_list) - started_count
+
+
+@mock_sts
+@mock.patch("lambda_function.event_bus_helper.publish_config")
+@mock.patch("lambda_function.process_url")
+def test_process_config_handler_batch_mode_with_failed_url(mocked_process_url, mocked_publish_config):
+    url_list = [f"fakeurl{index}.com" for index in range(5)]
+    from lambda_function import UrlProcessingError, process_config_handler
+
+    def fake_process_url(data, url, stream_writer, feed_cache, dynamodb_client=None):
+        if url == "fakeurl2.com":
+            raise ValueError("fake error")
+
+    mocked_process_url.side_effect = fake_process_url
+    # the event is retried
+    with pytest.raises(UrlProcessingError, match="fakeurl2.com"):
+        process_config_handler(create_batch_mode_event(url_list), None)
+
+    assert mocked_process_url.call_count == len(url_list)
+    mocked_publish_config.assert_not_called()
+
+
+@mock_sts
+@mock.patch("lambda_function.event_bus_helper.publish_config")
+@mock.patch("lambda_function.process_url")
+def test_process_config_handler_batch_mode_checkpoints_unfinished_urls_on_failure(
+    mocked_process_url, mocked_publish_config
+):
+    url_list = [f"fakeurl{index}.com" for index in range(10)]
+    from lambda_function import TERMINATION_INTERVAL, UrlProcessingError, process_config_handler
+
+    def fake_process_url(data, url, stream_writer, feed_cache, dynamodb_client=None):
+        if url == "fakeurl0.com":
+            raise ValueError("fake error")
+
+    mocked_process_url.side_effect = fake_process_url
+    context = mock.MagicMock()
+    context.get_remaining_time_in_millis.side_effect = itertools.chain(
+        [TERMINATION_INTERVAL * 2] * 2, itertools.repeat(TERMINATION_INTERVAL // 2)
+    )
+    with pytest.raises(UrlProcessingError, match="fakeurl0.com"):
+        process_config_handler(create_batch_mode_event(url_list), context)
+
+    # the urls that were not started are published before the event fails
+    started_count = mocked_process_url.call_count
+    assert started_count < 10
+    mocked_publish_config.assert_called_once()
+    assert mocked_publish_config.call_args.args[0].url_list == url_list[started_count:]
+
+
+@mock_sts
+@mock.patch("lambda_function.process_url")
+def test_process_config_handler_single_url(mocked_process_url):
+    from lambda_function import process_config_handler
+
+    assert None == process_config_handler(create_event_bus_consumer_event(), None)
+    mocked_process_url.assert_called_once()
+    assert mocked_process_url.call_args.args[1] == "cnn.com"
+
+
+def create_feed(topic, published_dates):
+    return {
+        "url": "fakenews.com",
+        "language": "en",
+        "country": "US",
+        "topic": topic,
+        "articles": [
+            {
+                "summary": "Fake article about fakequery",
+                "published": published,
+                "links": [{"type": "text/html", "href": "https://www.fakenews.com/article"}],
+            }
+            for published in published_dates
+        ],
+    }
+
+
+@mock_sts
+@mock_dynamodb
+@mock.patch("lambda_function.retrieve_feed_from_all_topics")
+def test_process_url_moves_trackers_of_published_feeds(mocked_retrieve_feed):
+    from lambda_function import process_url
+    from util import ddb_helper
+
+    created_ddb_for_tracker()
+    hour_ago = datetime.now(timezone.utc).replace(microsecond=0) - timedelta(hours=1)
+    rss_format = "%a, %d %b %Y %H:%M:%S GMT"
+    mocked_retrieve_feed.return_value = [
+        create_feed("news", [hour_ago.strftime(rss_format), (hour_ago + timedelta(minutes=30)).strftime(rss_format)]),
+        create_feed("tech", [hour_ago.strftime(rss_format)]),
+        create_feed("sport", []),
+    ]
+    with ddb_helper.QueryTrackerWriter() as tracker_writer:
+        tracker_writer.put("url_params", "fakenews.com", None, "tech", hour_ago + timedelta(minutes=1))
+
+    stream_writer = mock.MagicMock()
+    with mock.patch("util.newscatcher_helper.buffer_data_into_stream") as mocked_buffer:
+        process_url(create_event_bus_consumer_event()["detail"], "fakenews.com", stream_writer, None)
+
+    # the tech article is older than the tracker of the tech feed
+    assert mocked_buffer.call_count == 2
+    stream_writer.flush.assert_called_once()
+
+    trackers = ddb_helper.get_query_trackers("url_params", "fakenews.com", None, ["news", "tech"])
+    assert trackers["news"]["LAST_PUBLISHED_TIMESTAMP"] == (hour_ago + timedelta(minutes=30)).isoformat()
+    assert trackers["tech"]["LAST_PUBLISHED_TIMESTAMP"] == (hour_ago + timedelta(minutes=1)).isoformat()
+
+
+@mock_sts
+@mock_dynamodb
+@mock.patch("lambda_function.retrieve_feed_from_all_topics")
+def test_process_url_saves_feed_cache_after_publishing(mocked_retrieve_feed):
+    from lambda_function import process_url
+
+    created_ddb_for_tracker()
+    hour_ago = datetime.now(timezone.utc).replace(microsecond=0) - timedelta(hours=1)
+    news_feed = create_feed("news", [hour_ago.strftime("%a, %d %b %Y %H:%M:%S GMT")])
+    news_feed["rss_endpoint"] = "https://www.fakenews.com/rss/news"
+    mocked_retrieve_feed.return_value = [news_feed]
+
+    feed_cache = mock.MagicMock()
+    stream_writer = mock.MagicMock()
+    stream_writer.flush.side_effect = Exception("fake stream error")
+    with mock.patch("util.newscatcher_helper.buffer_data_into_stream"):
+        with pytest.raises(Exception):
+            process_url(create_event_bus_consumer_event()["detail"], "fakenews.com", stream_writer, feed_cache)
+        # the feed is downloaded again on the next poll, since its articles were not published
+        feed_cache.save.assert_not_called()
+
+        stream_writer.flush.side_effect = None
+        process_url(create_event_bus_consumer_event()["detail"], "fakenews.com", stream_writer, feed_cache)
+
+    feed_cache.save.assert_called_once_with(["https://www.fakenews.com/rss/news"])
+
+
+@mock_sts
+@mock_dynamodb
+@mock.patch.dict(os.environ, {"SKIP_SEEN_ARTICLES": "true"})
+@mock.patch("util.ddb_helper._seen_article_cache", None)
+@mock.patch("lambda_function.retrieve_feed_from_all_topics")
+def test_process_url_skips_seen_articles(mocked_retrieve_feed):
+    from lambda_function import process_url
+    from util import ddb_helper
+
+    created_ddb_for_tracker()
+    hour_ago = datetime.now(timezone.utc).replace(microsecond=0) - timedelta(hours=1)
+    news_feed = create_feed("news", [hour_ago.strftime("%a, %d %b %Y %H:%M:%S GMT")])
+    news_feed["articles"][0]["id"] = "https://www.fakenews.com/article"
+    mocked_retrieve_feed.return_value = [news_feed]
+
+    stream_writer = mock.MagicMock()
+    stream_writer.flush.side_effect = Exception("fake stream error")
+    with mock.patch("util.newscatcher_helper.buffer_data_into_stream") as mocked_buffer:
+        with pytest.raises(Exception):
+            process_url(create_event_bus_consumer_event()["detail"], "fakenews.com", stream_writer, None)
+        # the article was not published, hence it is published again
+        stream_writer.flush.side_effect = None
+        with mock.patch("lambda_function.ddb_helper.QueryTrackerWriter"):
+            process_url(create_event_bus_consumer_event()["detail"], "fakenews.com", stream_writer, None)
+        # the trackers were not moved, but the article was published already
+        process_url(create_event_bus_consumer_event()["detail"], "fakenews.com", stream_writer, None)
+
+    assert mocked_buffer.call_count == 2
+    assert ddb_helper.get_seen_article_cache().get_stats() == {"claims": 2, "memory_hits": 1, "conflicts": 0}
+
+
+@mock_sts
+@mock_dynamodb
+@mock.patch.dict(os.environ, {"CONFIG_PARAM": '{"country":"US", "language":"en"}', "SEARCH_QUERY": "fakequery"})
+@mock.patch.dict(os.environ, {"ADAPTIVE_POLLING": "true"})
+@mock.patch("lambda_function.event_bus_helper.publish_config")
+@mock.patch("lambda_function.config_helper.retrieve_urls_using_json")
+def test_publish_config_handler_publishes_due_urls(mocked_retrieve_urls, mocked_publish_config):
+    from lambda_function import process_url, publish_config_handler
+
+    created_ddb_for_tracker()
+    mocked_retrieve_urls.return_value = ["fakenews.com", "othernews.com"]
+    # the url is polled for the config of the lambda environment variables
+    data = {**create_event_bus_consumer_event()["detail"], "query": "fakequery"}
+    with mock.patch("lambda_function.retrieve_feed_from_all_topics", return_value=[create_feed("news", [])]):
+        process_url(data, "fakenews.com", mock.MagicMock(), None)
+
+    publish_config_handler(create_cw_schedule_event(), None)
+
+    # fakenews.com was just polled and is not due yet
+    assert mocked_publish_config.call_args.args[0].url_list == ["othernews.com"]
@@ -5,6 +5,7 @@
 ######################################################################################################################
 
 import os
+import time
 import unittest
 from datetime import datetime, timedelta, timezone
 from unittest import mock
@@ -48,6 +49,25 @@ class TestEventBusHelper(unittest.TestCase):
         newscatcher_helper.retrieve_feed_from_all_topics(url)
         self.assertEqual(mocked_feed_call.call_count, len(newscatcher_helper.get_topic_list()))
 
+    @mock.patch("util.newscatcher_helper.retrieve_feed")
+    def test_retrieve_feed_from_all_topics_concurrently(self, mocked_feed_call):
+        def fake_retrieve_feed(url, topic=None, feed_cache=None):
+            if topic == "food":
+                raise newscatcher_helper.TopicNotSupportedError(f"Topic {topic} is not supported")
+            time.sleep(0.2)
+            return {"url": url, "topic": topic}
+
+        mocked_feed_call.side_effect = fake_retrieve_feed
+
+        start = time.perf_counter()
+        aggregated_feed = newscatcher_helper.retrieve_feed_from_all_topics("cnn.com")
+        elapsed = time.perf_counter() - start
+
+        expected_topics = [topic for topic in newscatcher_helper.get_topic_list() if topic != "food"]
+        self.assertEqual([feed["topic"] for feed in aggregated_feed], expected_topics)
+        # 12 feeds of 0.2 seconds on 8 workers take 2 rounds, sequentially they would take 2.4 seconds
+        self.assertLess(elapsed, 1.2)
+
     @mock_kinesis
     @mock_dynamodb
     def test_create_and_publish_record(self):
@@ -55,13 +75,16 @@ class TestEventBusHelper(unittest.TestCase):
         news_feed = newscatcher_helper.retrieve_feed("latimes.com")
         today = datetime.now(timezone.utc)
         yesterday_timestamp = (today - timedelta(days=1)).isoformat()
-        self.assertIsNone(
-            newscatcher_helper.create_and_publish_record(
-                news_feed,
-                "fakeaccount",
-                "newscatcher",
-                last_published_timestamp=yesterday_timestamp,
-            )
+        newest_published_timestamp = newscatcher_helper.create_and_publish_record(
+            news_feed,
+            "fakeaccount",
+            "newscatcher",
+            last_published_timestamp=yesterday_timestamp,
+        )
+        # the newest published article, if any, is newer than the tracker
+        self.assertTrue(
+            newest_published_timestamp is None
+            or newest_published_timestamp > datetime.fromisoformat(yesterday_timestamp)
         )
 
     @mock_kinesis
@@ -75,13 +98,16 @@ class TestEventBusHelper(unittest.TestCase):
         for article in news_feed["articles"]:
             article.pop("published_parsed", None)
 
-        self.assertIsNone(
-            newscatcher_helper.create_and_publish_record(
-                news_feed,
-                "fakeaccount",
-                "newscatcher",
-                last_published_timestamp=yesterday_timestamp,
-            )
+        newest_published_timestamp = newscatcher_helper.create_and_publish_record(
+            news_feed,
+            "fakeaccount",
+            "newscatcher",
+            last_published_timestamp=yesterday_timestamp,
+        )
+        # the newest published article, if any, is newer than the tracker
+        self.assertTrue(
+            newest_published_timestamp is None
+            or newest_published_timestamp > datetime.fromisoformat(yesterday_timestamp)
         )
 
     @mock_kinesis
@@ -115,9 +141,214 @@ class TestEventBusHelper(unittest.TestCase):
 
         original_text_large = " ".join(original_text_large_arr)
 
+        text_array = newscatcher_helper.slice_text_into_arrays(original_text_large)
+        self.assertEqual(len(text_array), 2)
+        self.assertTrue(all(len(text.encode("utf-8")) <= 5000 for text in text_array))
+        self.assertEqual("".join(text_array), original_text_large)
+
+
+class TestPublishedTimestamp(unittest.TestCase):
+    def setUp(self):
+        newscatcher_helper._site_timestamp_formats.clear()
+
+    def test_supported_formats(self):
+        expected = datetime(2021, 3, 18, 20, 6, 58, tzinfo=timezone.utc)
+        for str_date in [
+            "Thu, 18 Mar 2021 20:06:58 +0200",
+            "Thu, 18 Mar 2021 20:06:58 GMT",
+            "Thu, 18 Mar 2021 20:06:58",
+            "18 Mar 2021 20:06:58 -0500",
+        ]:
+            self.assertEqual(newscatcher_helper.get_published_timestamp(str_date), expected)
+
+        self.assertEqual(
+            newscatcher_helper.get_published_timestamp("Thursday, March 18, 2021 08:06 PM +0200"),
+            datetime(2021, 3, 18, 20, 6, tzinfo=timezone.utc),
+        )
+
+    def test_fast_path_matches_strptime(self):
+        str_date = "Mon, 01 Feb 2021 09:30:00 +0000"
+        self.assertEqual(
+            newscatcher_helper.parse_rfc822_timestamp(str_date),
+            datetime.strptime(str_date, newscatcher_helper.rss_datetime_fromat_1).replace(tzinfo=None),
+        )
+        # not RFC 822, the 12-hour clock has to be handled by strptime
+        self.assertIsNone(newscatcher_helper.parse_rfc822_timestamp("Thursday, March 18, 2021 08:06 PM +0200"))
+        self.assertIsNone(newscatcher_helper.parse_rfc822_timestamp("Thu, 31 Feb 2021 20:06:58 +0200"))
+
+    def test_format_is_remembered_per_site(self):
+        site = "fakenews.com"
+        newscatcher_helper.get_published_timestamp("Thursday, March 18, 2021 08:06 PM +0200", site=site)
+        self.assertEqual(newscatcher_helper._site_timestamp_formats[site], newscatcher_helper.rss_datetime_fromat_4)
+
+        with mock.patch.object(
+            newscatcher_helper, "parse_rfc822_timestamp", wraps=newscatcher_helper.parse_rfc822_timestamp
+        ) as mocked_fast_path:
+            newscatcher_helper.get_published_timestamp("Friday, March 19, 2021 09:15 AM +0200", site=site)
+            mocked_fast_path.assert_not_called()
+
+        # the site changed its format, the new one is learned
+        newscatcher_helper.get_published_timestamp("Sat, 20 Mar 2021 10:00:00 GMT", site=site)
+        self.assertEqual(newscatcher_helper._site_timestamp_formats[site], newscatcher_helper.RFC822_FORMAT)
+
+    def test_invalid_timestamp(self):
+        with self.assertRaises(ValueError):
+            newscatcher_helper.get_published_timestamp("2021-03-18T20:06:58", site="fakenews.com")
+        self.assertNotIn("fakenews.com", newscatcher_helper._site_timestamp_formats)
+
+
+class TestQueryKeywords(unittest.TestCase):
+    def setUp(self):
+        self.news_feed = {
+            "url": "fakenews.com",
+            "language": "en",
+            "country": "US",
+            "topic": "news",
+            "articles": [
+                {
+                    "summary": summary,
+                    "published": "Thu, 18 Mar 2021 20:06:58 GMT",
+                    "links": [{"type": "text/html", "href": "https://www.fakenews.com/article"}],
+                }
+                for summary in ["Fake <b>Economy</b> news", "The weather today", "economy and weather"]
+            ],
+        }
+
+    @mock.patch("util.newscatcher_helper.buffer_data_into_stream")
+    def test_matched_keywords_are_published(self, mocked_buffer):
+        newest_published_timestamp = newscatcher_helper.create_and_publish_record(
+            self.news_feed, "fakeaccount", "newscatcher", query_str="economy,weather"
+        )
+        self.assertEqual(newest_published_timestamp, datetime(2021, 3, 18, 20, 6, 58, tzinfo=timezone.utc))
+        records = [call.args[0] for call in mocked_buffer.call_args_list]
+        self.assertEqual(len(records), 2)
+        self.assertEqual(records[0]["feed"]["metadata"]["matched_keywords"], ["weather"])
+        self.assertEqual(records[1]["feed"]["metadata"]["matched_keywords"], ["economy", "weather"])
+
+    @mock.patch("util.newscatcher_helper.buffer_data_into_stream")
+    def test_case_insensitive_query(self, mocked_buffer):
+        newscatcher_helper.create_and_publish_record(
+            self.news_feed, "fakeaccount", "newscatcher", query_str="economy", case_insensitive=True
+        )
+        self.assertEqual(mocked_buffer.call_count, 2)
+
+    @mock.patch("util.newscatcher_helper.buffer_data_into_stream")
+    def test_without_query(self, mocked_buffer):
+        newscatcher_helper.create_and_publish_record(self.news_feed, "fakeaccount", "newscatcher")
+        self.assertEqual(mocked_buffer.call_count, 3)
+        self.assertNotIn("matched_keywords", mocked_buffer.call_args.args[0]["feed"]["metadata"])
+
+    @mock.patch("util.newscatcher_helper.buffer_data_into_stream")
+    def test_pipeline_stats(self, mocked_buffer):
+        self.news_feed["articles"].append({"summary": "economy", "published": "not a date", "links": []})
+        self.news_feed["articles"].append(
+            {"summary": "economy", "published": "Fri, 19 Mar 2021 20:06:58 GMT", "links": []}
+        )
+
+        pipeline = newscatcher_helper.create_article_pipeline(
+            self.news_feed, "fakeaccount", "newscatcher", "2021-03-01T00:00:00+00:00", "economy"
+        )
+        sink = pipeline.run({"article": article} for article in self.news_feed["articles"])
+
+        stats = pipeline.get_stats()
+        self.assertEqual(stats["parse_timestamp"]["dropped"], 1)
+        self.assertEqual(stats["filter_timestamp"]["out"], 4)
+        self.assertEqual(stats["filter_query"]["out"], 2)
+        # the last article has no link to the article
+        self.assertEqual(stats["create_record"]["dropped"], 1)
+        self.assertEqual(stats["sink"]["records"], 1)
+        self.assertEqual(sink.newest_published_timestamp, datetime(2021, 3, 18, 20, 6, 58, tzinfo=timezone.utc))
+        self.assertEqual(mocked_buffer.call_count, 1)
+
+
+class TestInferPublishedDate(unittest.TestCase):
+    def test_try_parsing_published_date(self):
+        articles = [
+            {"id": "https://www.cnn.com/2021/03/18/tech/fake-article/index.html"},
+            {"id": "https://www.cnn.com/videos/fake-article"},
+            {"title": "no id"},
+            {"id": "https://www.cnn.com/2021/03/17/tech/fake-article", "published": "Wed, 17 Mar 2021 10:00:00 GMT"},
+        ]
+        parsed_articles = newscatcher_helper.try_parsing_published_date(articles)
+
+        self.assertEqual(len(parsed_articles), 2)
+        self.assertEqual(parsed_articles[0]["published"], "Thu, 18 Mar 2021 00:00:00 +0000")
+        self.assertEqual(parsed_articles[0]["published_parsed"][:3], [2021, 3, 18])
+        self.assertEqual(parsed_articles[1]["published"], "Wed, 17 Mar 2021 10:00:00 GMT")
+
+    def test_try_parsing_published_date_is_linear(self):
+        articles = [{"title": "no id"} for _ in range(20000)]
+        start = time.perf_counter()
+        with mock.patch.object(newscatcher_helper.logger, "error"):
+            self.assertEqual(newscatcher_helper.try_parsing_published_date(articles), [])
+        self.assertLess(time.perf_counter() - start, 2)
+
+
+class TestArticleId(unittest.TestCase):
+    def setUp(self):
+        self.news_feed = {
+            "url": "fakenews.com",
+            "language": "en",
+            "country": "US",
+            "topic": "news",
+            "articles": [
+                {
+                    "id": f"https://www.fakenews.com/article/{index}",
+                    "summary": "Fake economy news " * 300,
+                    "published": "Thu, 18 Mar 2021 20:06:58 GMT",
+                    "links": [{"type": "text/html", "href": f"https://www.fakenews.com/article/{index}"}],
+                }
+                for index in range(2)
+            ],
+        }
+
+    def test_get_article_id(self):
+        article = self.news_feed["articles"][0]
+        self.assertEqual(newscatcher_helper.get_article_id(article), newscatcher_helper.get_article_id(dict(article)))
+        self.assertNotEqual(
+            newscatcher_helper.get_article_id(article),
+            newscatcher_helper.get_article_id(self.news_feed["articles"][1]),
+        )
+        # without guid the link identifies the article, without both its content does
+        self.assertEqual(
+            newscatcher_helper.get_article_id({"link": article["id"]}), newscatcher_helper.get_article_id(article)
+        )
+        self.assertNotEqual(
+            newscatcher_helper.get_article_id({"title": "fake title", "published": "Thu, 18 Mar 2021 20:06:58 GMT"}),
+            newscatcher_helper.get_article_id({"title": "fake title", "published": "Fri, 19 Mar 2021 20:06:58 GMT"}),
+        )
+
+    @mock.patch("util.newscatcher_helper.buffer_data_into_stream")
+    def test_record_ids_are_deterministic(self, mocked_buffer):
+        # the record is reused for each slice, hence its id is read when it is buffered
+        published_ids = []
+        mocked_buffer.side_effect = lambda record, partition_key=None: published_ids.append(record["feed"]["id_str"])
+
+        newscatcher_helper.create_and_publish_record(self.news_feed, "fakeaccount", "newscatcher")
+        first_ids, published_ids[:] = list(published_ids), []
+        newscatcher_helper.create_and_publish_record(self.news_feed, "fakeaccount", "newscatcher")
+        second_ids = list(published_ids)
+
+        self.assertEqual(first_ids, second_ids)
+        # one id per slice of the text of each article
+        self.assertEqual(len(set(first_ids)), len(first_ids))
+        article_id = newscatcher_helper.get_article_id(self.news_feed["articles"][0])
+        self.assertEqual(first_ids[0], f"{article_id}#fakenews.com#0")
+        self.assertEqual(first_ids[1], f"{article_id}#fakenews.com#1")
+
+    @mock.patch("util.newscatcher_helper.buffer_data_into_stream")
+    def test_seen_articles_are_skipped(self, mocked_buffer):
+        seen_cache = mock.MagicMock()
+        seen_cache.claim.side_effect = lambda account, query, record_id: record_id.startswith(
+            newscatcher_helper.get_article_id(self.news_feed["articles"][1])
+        )
+        claimed_ids = []
+        newest_published_timestamp = newscatcher_helper.create_and_publish_record(
+            self.news_feed, "fakeaccount", "newscatcher", seen_cache=seen_cache, claimed_ids=claimed_ids
+        )
+
+        self.assertEqual(newest_published_timestamp, datetime(2021, 3, 18, 20, 6, 58, tzinfo=timezone.utc))
         self.assertEqual(
-            len(newscatcher_helper.slice_text_into_arrays(original_text_large)),
-            len(original_text_large) // 1250
-            if len(original_text_large) % 1250 == 0
-            else 1 + len(original_text_large) // 1250,
+            claimed_ids, [f"{newscatcher_helper.get_article_id(self.news_feed['articles'][1])}#fakenews.com"]
         )
+        self.assertEqual({call.kwargs["partition_key"] for call in mocked_buffer.call_args_list}, set(claimed_ids))
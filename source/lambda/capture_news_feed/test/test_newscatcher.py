@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+######################################################################################################################
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+######################################################################################################################
+
+import os
+import socket
+import tempfile
+import time
+import unittest
+
+from moto import mock_dynamodb
+from test.fixtures.catalog_fixture import create_catalog, use_catalog
+from test.fixtures.feed_server_fixture import FeedServer
+from test.test_query_ddb_helper import ddb_setup
+from util import ddb_helper, newscatcher
+
+
+class TestFetchFeed(unittest.TestCase):
+    def test_fetch_feed(self):
+        with FeedServer() as feed_server:
+            feed = newscatcher.fetch_feed(f"{feed_server.base_url}/tech")
+
+        self.assertEqual(len(feed["entries"]), 10)
+        self.assertEqual(feed["entries"][0]["title"], "tech article 0")
+        self.assertEqual(feed_server.request_count, 1)
+
+    def test_fetch_feed_timeout(self):
+        with FeedServer(latency=2) as feed_server:
+            start = time.perf_counter()
+            feed = newscatcher.fetch_feed(f"{feed_server.base_url}/tech", timeout=0.2)
+            elapsed = time.perf_counter() - start
+
+        self.assertEqual(feed["entries"], [])
+        self.assertLess(elapsed, 1.5)
+
+    def test_fetch_feed_connection_refused(self):
+        # bind a port without listening on it, so that connections to it are refused
+        with socket.socket() as unused_socket:
+            unused_socket.bind(("127.0.0.1", 0))
+            port = unused_socket.getsockname()[1]
+            feed = newscatcher.fetch_feed(f"http://127.0.0.1:{port}/tech", timeout=1)
+
+        self.assertEqual(feed["entries"], [])
+
+    @mock_dynamodb
+    def test_fetch_feed_conditionally(self):
+        ddb_setup(os.environ["TARGET_DDB_TABLE"])
+        feed_cache = ddb_helper.FeedCache("fakeaccount", "fakequery")
+
+        with FeedServer() as feed_server:
+            rss_endpoint = f"{feed_server.base_url}/tech"
+            first_feed = newscatcher.fetch_feed(rss_endpoint, feed_cache=feed_cache)
+            feed_cache.save([rss_endpoint])
+            second_feed = newscatcher.fetch_feed(rss_endpoint, feed_cache=feed_cache)
+
+        self.assertEqual(len(first_feed["entries"]), 10)
+        self.assertEqual(second_feed, {"entries": [], "status": 304})
+        self.assertEqual(feed_server.not_modified_count, 1)
+
+        stats = feed_cache.get_stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["bytes_saved"], feed_cache.get(rss_endpoint)["content_length"])
+        self.assertGreater(stats["bytes_saved"], 0)
+
+
+class TestCatalog(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.feed_server = FeedServer().__enter__()
+        self.catalog_patcher = use_catalog(
+            create_catalog(os.path.join(self.temp_dir.name, "package_rss.db"), base_url=self.feed_server.base_url)
+        )
+
+    def tearDown(self):
+        self.catalog_patcher.stop()
+        newscatcher.close_catalog_connection()
+        self.feed_server.__exit__(None, None, None)
+        self.temp_dir.cleanup()
+
+    def test_urls(self):
+        self.assertEqual(
+            newscatcher.urls(language="EN", country="us"), ["othernews.com", "fakenews.com", "unrankednews.com"]
+        )
+        self.assertEqual(newscatcher.urls(topic="News", language="fr"), ["fakenouvelles.ca"])
+        self.assertEqual(newscatcher.urls(topic="tech"), ["fakenoticias.es"])
+        self.assertIsNone(newscatcher.urls(language="jk"))
+        self.assertEqual(len(newscatcher.urls()), 8)
+
+    def test_url_index(self):
+        url_index = newscatcher.get_url_index()
+        self.assertIs(newscatcher.get_url_index(), url_index)
+
+        self.assertEqual(url_index[("news", "en", "US")], ["othernews.com", "fakenews.com", "unrankednews.com"])
+        self.assertEqual(
+            url_index[("news", None, None)], ["othernews.com", "fakenews.com", "fakenouvelles.ca", "unrankednews.com"]
+        )
+        self.assertEqual(url_index[(None, "fr", None)], ["fakenouvelles.ca"])
+        self.assertEqual(url_index[(None, None, "ES")], ["fakenoticias.es"])
+        # only the main feed of a website is indexed
+        self.assertNotIn(("sport", None, None), url_index)
+
+        # the list returned by urls() can be changed without changing the index
+        newscatcher.urls(language="fr").append("fakeurl.com")
+        self.assertEqual(newscatcher.urls(language="fr"), ["fakenouvelles.ca"])
+
+    def test_urls_values_are_not_interpolated(self):
+        self.assertIsNone(newscatcher.urls(language="en' OR '1'='1"))
+
+    def test_get_news(self):
+        news = newscatcher.Newscatcher("https://www.FakeNews.com").get_news()
+        self.assertEqual(news["url"], "fakenews.com")
+        self.assertEqual(news["topic"], "news")
+        self.assertEqual(news["language"], "en")
+        self.assertEqual(news["country"], "US")
+        self.assertEqual(news["articles"][0]["title"], "fakenews/news article 0")
+
+        news = newscatcher.Newscatcher("fakenews.com", topic="sport").get_news(n=3)
+        self.assertEqual(news["topic"], "sport")
+        self.assertEqual(len(news["articles"]), 3)
+
+    def test_get_news_not_supported(self):
+        self.assertIsNone(newscatcher.Newscatcher("fakenews.com", topic="music").get_news())
+        self.assertIsNone(newscatcher.Newscatcher("notinthecatalog.com").get_news())
+        self.assertEqual(self.feed_server.request_count, 0)
+
+    def test_single_connection_with_indexes(self):
+        connection = newscatcher.get_catalog_connection()
+        self.assertIs(newscatcher.get_catalog_connection(), connection)
+
+        index_names = [row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'")]
+        self.assertEqual(sorted(index_names), ["idx_rss_main_language", "idx_rss_main_topic", "idx_rss_main_website"])
+
+        query_plan = connection.execute(
+            "EXPLAIN QUERY PLAN SELECT rss_url, topic_unified, language, clean_country from rss_main "
+            "WHERE clean_url = ? AND topic_unified = ?;",
+            ("fakenews.com", "tech"),
+        ).fetchall()
+        self.assertIn("USING COVERING INDEX idx_rss_main_website", query_plan[0][-1])
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+######################################################################################################################
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+######################################################################################################################
+
+import os
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+from moto import mock_dynamodb
+from test.test_query_ddb_helper import ddb_setup
+from util.poll_scheduler import PollScheduler, compute_schedule, count_new_articles, is_due
+
+MIN_INTERVAL = timedelta(minutes=15)
+MAX_INTERVAL = timedelta(hours=24)
+RSS_FORMAT = "%a, %d %b %Y %H:%M:%S GMT"
+
+
+def create_articles(published_timestamps):
+    return [{"published": published_timestamp.strftime(RSS_FORMAT)} for published_timestamp in published_timestamps]
+
+
+class TestComputeSchedule(unittest.TestCase):
+    def setUp(self):
+        self.now = datetime(2021, 3, 18, 12, 0, 0, tzinfo=timezone.utc)
+
+    def test_count_new_articles(self):
+        articles = create_articles([self.now - timedelta(hours=hours) for hours in (1, 2, 3)])
+        articles.append({"published": "not a date"})
+        articles.append({"title": "no published date"})
+        self.assertEqual(count_new_articles(articles, self.now - timedelta(hours=2, minutes=30)), 2)
+
+    def test_count_articles_of_several_feeds_once(self):
+        articles = create_articles([self.now - timedelta(hours=1)] * 3)
+        articles[0]["id"] = articles[1]["id"] = "https://www.fakenews.com/article1"
+        articles[2]["link"] = "https://www.fakenews.com/article2"
+        # the same article in the news and tech feeds of the url
+        self.assertEqual(count_new_articles(articles + [dict(articles[2])], self.now - timedelta(hours=2)), 2)
+
+    def test_first_poll(self):
+        # 12 articles in the last 24 hours is one article every 2 hours
+        articles = create_articles([self.now - timedelta(hours=2 * index + 1) for index in range(12)])
+        schedule = compute_schedule(None, articles, self.now, MIN_INTERVAL, MAX_INTERVAL)
+
+        self.assertAlmostEqual(schedule["arrival_rate"], 0.5)
+        self.assertEqual(schedule["interval"], timedelta(hours=2))
+        self.assertEqual(schedule["next_due"], self.now + timedelta(hours=2))
+
+        schedule = compute_schedule(None, [], self.now, MIN_INTERVAL, MAX_INTERVAL)
+        self.assertEqual(schedule["interval"], MIN_INTERVAL)
+
+    def test_busy_feed_is_polled_at_min_interval(self):
+        articles = create_articles([self.now - timedelta(minutes=5 * index) for index in range(288)])
+        schedule = compute_schedule(None, articles, self.now, MIN_INTERVAL, MAX_INTERVAL)
+        self.assertEqual(schedule["interval"], MIN_INTERVAL)
+
+    def test_backoff_is_capped(self):
+        schedule = compute_schedule(None, [], self.now, MIN_INTERVAL, MAX_INTERVAL)
+        intervals = []
+        for _ in range(10):
+            schedule = compute_schedule(schedule, [], schedule["next_due"], MIN_INTERVAL, MAX_INTERVAL)
+            intervals.append(schedule["interval"])
+
+        self.assertEqual(intervals[:3], [timedelta(minutes=30), timedelta(hours=1), timedelta(hours=2)])
+        self.assertEqual(intervals[-1], MAX_INTERVAL)
+
+    def test_new_article_resets_backoff(self):
+        schedule = compute_schedule(None, [], self.now, MIN_INTERVAL, MAX_INTERVAL)
+        schedule["interval"] = timedelta(hours=16)
+        now = self.now + timedelta(hours=4)
+        schedule = compute_schedule(
+            schedule, create_articles([now - timedelta(minutes=10)] * 2), now, MIN_INTERVAL, MAX_INTERVAL
+        )
+
+        # 2 articles in 4 hours, smoothed with the previous rate of 0
+        self.assertAlmostEqual(schedule["arrival_rate"], 0.25)
+        self.assertEqual(schedule["interval"], timedelta(hours=4))
+
+    def test_is_due(self):
+        self.assertTrue(is_due(None, self.now))
+        self.assertTrue(is_due({"next_due": self.now - timedelta(minutes=5)}, self.now))
+        self.assertTrue(is_due({"next_due": self.now + timedelta(seconds=30)}, self.now))
+        self.assertFalse(is_due({"next_due": self.now + timedelta(minutes=5)}, self.now))
+
+
+@mock_dynamodb
+class TestPollScheduler(unittest.TestCase):
+    def setUp(self):
+        self.table = ddb_setup(os.environ["TARGET_DDB_TABLE"]).Table(os.environ["TARGET_DDB_TABLE"])
+        self.now = datetime.now(timezone.utc).replace(microsecond=0)
+
+    def tearDown(self):
+        self.table.delete()
+
+    def test_record_poll_and_get_due_urls(self):
+        scheduler = PollScheduler("fakeaccount", "fakequery")
+        scheduler.record_poll("quietnews.com", [], now=self.now)
+        scheduler.record_poll(
+            "busynews.com",
+            create_articles([self.now - timedelta(minutes=5 * index) for index in range(288)]),
+            now=self.now,
+        )
+
+        self.assertEqual(scheduler.get_schedule("quietnews.com")["next_due"], self.now + MIN_INTERVAL)
+        urls = ["busynews.com", "newnews.com", "quietnews.com"]
+        self.assertEqual(scheduler.get_due_urls(urls, now=self.now), ["newnews.com"])
+        self.assertEqual(scheduler.get_due_urls(urls, now=self.now + MIN_INTERVAL), urls)
+
+        # no new article, the quiet url backs off
+        scheduler.record_poll("quietnews.com", [], now=self.now + MIN_INTERVAL)
+        self.assertEqual(scheduler.get_due_urls(urls, now=self.now + 2 * MIN_INTERVAL), ["busynews.com", "newnews.com"])
+
+    def test_schedules_per_configuration(self):
+        articles = create_articles([self.now - timedelta(minutes=5 * index) for index in range(288)])
+        PollScheduler("fakeaccount", "fakequery").record_poll("busynews.com", articles, now=self.now)
+        # another configuration polling the url does not find new articles, it does not back off the first one
+        PollScheduler("fakeaccount", "otherquery").record_poll("busynews.com", [], now=self.now)
+        PollScheduler("fakeaccount", "otherquery").record_poll("busynews.com", [], now=self.now + MIN_INTERVAL)
+
+        schedule = PollScheduler("fakeaccount", "fakequery").get_schedule("busynews.com")
+        self.assertEqual(schedule["interval"], MIN_INTERVAL)
+        other_schedule = PollScheduler("fakeaccount", "otherquery").get_schedule("busynews.com")
+        self.assertEqual(other_schedule["interval"], 2 * MIN_INTERVAL)
+
+    def test_get_due_urls_in_batches(self):
+        scheduler = PollScheduler("fakeaccount", "fakequery")
+        urls = [f"fakenews{index}.com" for index in range(250)]
+        for url in urls[:150]:
+            scheduler.record_poll(url, [], now=self.now)
+
+        # 3 BatchGetItem requests of up to 100 keys
+        self.assertEqual(scheduler.get_due_urls(urls, now=self.now), urls[150:])
+
+    def test_intervals_from_environment(self):
+        with mock.patch.dict(os.environ, {"MIN_POLL_INTERVAL_MINUTES": "60", "MAX_POLL_INTERVAL_MINUTES": "120"}):
+            scheduler = PollScheduler("fakeaccount", "fakequery")
+        self.assertEqual(scheduler.min_interval, timedelta(hours=1))
+        self.assertEqual(scheduler.max_interval, timedelta(hours=2))
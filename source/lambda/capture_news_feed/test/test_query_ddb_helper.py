@@ -7,8 +7,10 @@
 import os
 import unittest
 from datetime import datetime, timedelta, timezone
+from unittest import mock
 
 import boto3
+from botocore.exceptions import ClientError
 from moto import mock_dynamodb
 from shared_util import custom_boto_config
 from util import ddb_helper
@@ -55,9 +57,6 @@ class TestQueryDDBHelper(unittest.TestCase):
         new_item = {"ID": self.record_id, "LAST_PUBLISHED_TIMESTAMP": "fake123456791", "platform": "newscatcher"}
         self.assertIsNone(ddb_helper.update_query(new_item))
 
-    def test_update_query_tracker(self):
-        self.assertIsNone(ddb_helper.update_query_tracker("url_params", "cnn.com", "fakequery", topic="news"))
-
     def test_get_query_tracker(self):
         account = "testnews"
         url = "fakeurl.com"
@@ -94,3 +93,187 @@ class TestQueryDDBHelper(unittest.TestCase):
             - (datetime.now(timezone.utc) - timedelta(days=30))
             < timedelta(seconds=5)
         )
+
+
+@mock_dynamodb
+class TestQueryTrackers(unittest.TestCase):
+    def setUp(self):
+        self.table = ddb_setup(os.environ["TARGET_DDB_TABLE"]).Table(os.environ["TARGET_DDB_TABLE"])
+        self.published_timestamp = datetime(2021, 3, 18, 20, 6, 58, tzinfo=timezone.utc)
+
+    def tearDown(self):
+        self.table.delete()
+
+    def test_get_query_trackers(self):
+        with ddb_helper.QueryTrackerWriter() as tracker_writer:
+            tracker_writer.put("fakeaccount", "fakeurl.com", "fakequery", "news", self.published_timestamp)
+        # a tracker written before watermark items were introduced
+        self.table.put_item(
+            Item={"ID": "fakeaccount#fakeurl.com#tech#fakequery", "LAST_PUBLISHED_TIMESTAMP": "2021-03-01T00:00:00"}
+        )
+
+        with mock.patch.object(ddb_helper, "get_query_tracker", wraps=ddb_helper.get_query_tracker) as mocked_query:
+            trackers = ddb_helper.get_query_trackers(
+                "fakeaccount", "fakeurl.com", "fakequery", ["news", "tech", "sport"]
+            )
+            self.assertEqual(mocked_query.call_count, 2)
+
+        self.assertEqual(trackers["news"]["LAST_PUBLISHED_TIMESTAMP"], self.published_timestamp.isoformat())
+        self.assertEqual(trackers["tech"]["LAST_PUBLISHED_TIMESTAMP"], "2021-03-01T00:00:00")
+        self.assertLess(
+            datetime.fromisoformat(trackers["sport"]["LAST_PUBLISHED_TIMESTAMP"]),
+            datetime.now(timezone.utc) - timedelta(days=29),
+        )
+
+    def test_get_query_trackers_retries_unprocessed_keys(self):
+        dynamodb_client = mock.MagicMock()
+        key = {"ID": {"S": "fakeaccount#fakeurl.com#news"}, "LAST_PUBLISHED_TIMESTAMP": {"S": "WATERMARK"}}
+        item = {**key, "WATERMARK": {"S": self.published_timestamp.isoformat()}}
+        table_name = os.environ["TARGET_DDB_TABLE"]
+        dynamodb_client.batch_get_item.side_effect = [
+            {"Responses": {}, "UnprocessedKeys": {table_name: {"Keys": [key]}}},
+            {"Responses": {table_name: [item]}, "UnprocessedKeys": {}},
+        ]
+
+        with mock.patch.object(ddb_helper.time, "sleep"):
+            trackers = ddb_helper.get_query_trackers("fakeaccount", "fakeurl.com", None, ["news"], dynamodb_client)
+
+        self.assertEqual(dynamodb_client.batch_get_item.call_count, 2)
+        self.assertEqual(trackers["news"]["LAST_PUBLISHED_TIMESTAMP"], self.published_timestamp.isoformat())
+
+    def test_tracker_writer_batches(self):
+        dynamodb_client = mock.MagicMock()
+        dynamodb_client.batch_write_item.return_value = {"UnprocessedItems": {}}
+
+        with ddb_helper.QueryTrackerWriter(dynamodb_client) as tracker_writer:
+            for index in range(30):
+                tracker_writer.put("fakeaccount", f"fakeurl{index}.com", None, "news", self.published_timestamp)
+            # the newest watermark of a tracker is written
+            tracker_writer.put(
+                "fakeaccount", "fakeurl29.com", None, "news", self.published_timestamp + timedelta(hours=1)
+            )
+            tracker_writer.put(
+                "fakeaccount", "fakeurl29.com", None, "news", self.published_timestamp - timedelta(hours=1)
+            )
+
+        self.assertEqual(dynamodb_client.batch_write_item.call_count, 2)
+        last_batch = dynamodb_client.batch_write_item.call_args.kwargs["RequestItems"][os.environ["TARGET_DDB_TABLE"]]
+        self.assertEqual(len(last_batch), 5)
+        self.assertEqual(
+            last_batch[-1]["PutRequest"]["Item"]["WATERMARK"]["S"],
+            (self.published_timestamp + timedelta(hours=1)).isoformat(),
+        )
+        # the time to live attribute is a number of seconds
+        expires_at = (datetime.now(timezone.utc) + timedelta(days=ddb_helper.TRACKER_TTL_DAYS)).timestamp()
+        self.assertAlmostEqual(int(last_batch[-1]["PutRequest"]["Item"]["EXP_DATE"]["N"]), expires_at, delta=60)
+
+    def test_tracker_writer_max_attempts(self):
+        dynamodb_client = mock.MagicMock()
+        dynamodb_client.batch_write_item.side_effect = lambda RequestItems: {"UnprocessedItems": RequestItems}
+
+        tracker_writer = ddb_helper.QueryTrackerWriter(dynamodb_client)
+        tracker_writer.put("fakeaccount", "fakeurl.com", None, "news", self.published_timestamp)
+        with mock.patch.object(ddb_helper.time, "sleep"):
+            with self.assertRaises(ddb_helper.QueryTrackerWriteError):
+                tracker_writer.flush()
+        self.assertEqual(dynamodb_client.batch_write_item.call_count, ddb_helper.MAX_ATTEMPTS)
+
+
+@mock_dynamodb
+class TestFeedCache(unittest.TestCase):
+    def setUp(self):
+        self.table = ddb_setup(os.environ["TARGET_DDB_TABLE"]).Table(os.environ["TARGET_DDB_TABLE"])
+        self.rss_endpoint = "https://www.fakenews.com/rss/tech"
+
+    def tearDown(self):
+        self.table.delete()
+
+    def test_get_not_cached(self):
+        self.assertIsNone(ddb_helper.FeedCache("fakeaccount", "fakequery").get(self.rss_endpoint))
+
+    def test_record_miss_and_hit(self):
+        feed_cache = ddb_helper.FeedCache("fakeaccount", "fakequery")
+        feed_cache.record_miss(self.rss_endpoint, '"fakeetag"', "Fri, 01 Jan 2021 00:00:00 GMT", 1024)
+
+        # the values are only saved once the feed was processed
+        self.assertIsNone(ddb_helper.FeedCache("fakeaccount", "fakequery").get(self.rss_endpoint))
+        feed_cache.save([self.rss_endpoint])
+
+        cached_feed = ddb_helper.FeedCache("fakeaccount", "fakequery").get(self.rss_endpoint)
+        self.assertEqual(
+            cached_feed,
+            {"etag": '"fakeetag"', "last_modified": "Fri, 01 Jan 2021 00:00:00 GMT", "content_length": 1024},
+        )
+
+        feed_cache.record_hit(self.rss_endpoint, cached_feed)
+        self.assertEqual(feed_cache.get_stats(), {"hits": 1, "misses": 1, "bytes_saved": 1024})
+
+        cache_id = f"FEED_CACHE#fakeaccount#fakequery#{self.rss_endpoint}"
+        item = self.table.get_item(Key={"ID": cache_id, "LAST_PUBLISHED_TIMESTAMP": "FEED_CACHE"})["Item"]
+        # the time to live attribute is a number of seconds
+        expires_at = (datetime.now(timezone.utc) + timedelta(days=7)).timestamp()
+        self.assertAlmostEqual(int(item["EXP_DATE"]), expires_at, delta=60)
+
+    def test_cache_per_configuration(self):
+        feed_cache = ddb_helper.FeedCache("fakeaccount", "fakequery")
+        feed_cache.record_miss(self.rss_endpoint, '"fakeetag"', None, 1024)
+        feed_cache.save([self.rss_endpoint])
+
+        self.assertIsNotNone(ddb_helper.FeedCache("fakeaccount", "fakequery").get(self.rss_endpoint))
+        self.assertIsNone(ddb_helper.FeedCache("fakeaccount", "otherquery").get(self.rss_endpoint))
+        self.assertIsNone(ddb_helper.FeedCache("otheraccount", "fakequery").get(self.rss_endpoint))
+
+    def test_record_miss_without_validators(self):
+        feed_cache = ddb_helper.FeedCache("fakeaccount", "fakequery")
+        feed_cache.record_miss(self.rss_endpoint, None, None, 1024)
+        feed_cache.save([self.rss_endpoint])
+
+        self.assertIsNone(feed_cache.get(self.rss_endpoint))
+        self.assertEqual(feed_cache.get_stats(), {"hits": 0, "misses": 1, "bytes_saved": 0})
+
+
+@mock_dynamodb
+class TestSeenArticleCache(unittest.TestCase):
+    def setUp(self):
+        self.table = ddb_setup(os.environ["TARGET_DDB_TABLE"]).Table(os.environ["TARGET_DDB_TABLE"])
+
+    def tearDown(self):
+        self.table.delete()
+
+    def test_claim_once(self):
+        seen_cache = ddb_helper.SeenArticleCache()
+        self.assertTrue(seen_cache.claim("fakeaccount", "fakequery", "fakeid#fakenews.com"))
+        self.assertFalse(seen_cache.claim("fakeaccount", "fakequery", "fakeid#fakenews.com"))
+        # the article is published once per configuration
+        self.assertTrue(seen_cache.claim("fakeaccount", None, "fakeid#fakenews.com"))
+
+        # a claim made by another container is found in the table
+        other_seen_cache = ddb_helper.SeenArticleCache()
+        self.assertFalse(other_seen_cache.claim("fakeaccount", "fakequery", "fakeid#fakenews.com"))
+
+        self.assertEqual(seen_cache.get_stats(), {"claims": 2, "memory_hits": 1, "conflicts": 0})
+        self.assertEqual(other_seen_cache.get_stats(), {"claims": 0, "memory_hits": 0, "conflicts": 1})
+
+    def test_release(self):
+        seen_cache = ddb_helper.SeenArticleCache()
+        seen_cache.claim("fakeaccount", "fakequery", "fakeid#fakenews.com")
+        seen_cache.release("fakeaccount", "fakequery", ["fakeid#fakenews.com"])
+
+        self.assertTrue(ddb_helper.SeenArticleCache().claim("fakeaccount", "fakequery", "fakeid#fakenews.com"))
+
+    def test_memory_is_bounded(self):
+        seen_cache = ddb_helper.SeenArticleCache(max_entries=2)
+        for index in range(5):
+            seen_cache.claim("fakeaccount", None, f"fakeid{index}")
+
+        self.assertEqual(len(seen_cache._seen), 2)
+        # the evicted ids are still found in the table
+        self.assertFalse(seen_cache.claim("fakeaccount", None, "fakeid0"))
+        self.assertEqual(seen_cache.get_stats()["conflicts"], 1)
+
+    def test_claim_error_does_not_skip(self):
+        seen_cache = ddb_helper.SeenArticleCache(dynamodb_client=mock.MagicMock())
+        seen_cache.dynamodb_client.put_item.side_effect = ClientError(
+            {"Error": {"Code": "ProvisionedThroughputExceededException"}}, "PutItem"
+        )
+        self.assertTrue(seen_cache.claim("fakeaccount", None, "fakeid"))
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+######################################################################################################################
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+######################################################################################################################
+
+import time
+
+from shared_util import custom_logging
+
+logger = custom_logging.get_logger(__name__)
+
+
+class ArticleStage:
+    """
+    A lazy step of the article pipeline. The function is called with each item and returns the item to pass to the next
+    stage, or None to drop it. The stage counts the items it receives and passes on, and the time spent in the function
+    (excluding the time spent in the stages before it)
+    """
+
+    def __init__(self, name, function):
+        self.name = name
+        self.function = function
+        self.items_in = 0
+        self.items_out = 0
+        self.elapsed = 0.0
+
+    def process(self, items):
+        for item in items:
+            self.items_in += 1
+            start = time.perf_counter()
+            result = self.function(item)
+            self.elapsed += time.perf_counter() - start
+            if result is not None:
+                self.items_out += 1
+                yield result
+
+    def get_stats(self):
+        return {
+            "in": self.items_in,
+            "out": self.items_out,
+            "dropped": self.items_in - self.items_out,
+            "seconds": round(self.elapsed, 6),
+        }
+
+
+class ArticlePipeline:
+    """
+    Chains stages into a generator pipeline that streams articles one at a time into a sink. The sink has a 'put'
+    method, which receives the items that passed all the stages, and a 'get_stats' method
+    """
+
+    def __init__(self, stages, sink):
+        self.stages = stages
+        self.sink = sink
+
+    def run(self, articles):
+        items = iter(articles)
+        for stage in self.stages:
+            items = stage.process(items)
+
+        for item in items:
+            self.sink.put(item)
+        return self.sink
+
+    def get_stats(self):
+        stats = {stage.name: stage.get_stats() for stage in self.stages}
+        stats["sink"] = self.sink.get_stats()
+        return stats
@@ -4,14 +4,49 @@
 # SPDX-License-Identifier: Apache-2.0
 ######################################################################################################################
 
+import json
 import os
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
 
-from boto3.dynamodb.conditions import Attr, Key
+from boto3.dynamodb.conditions import Attr
+from boto3.dynamodb.types import TypeDeserializer
+from botocore.exceptions import ClientError
 from shared_util import custom_logging, service_helper
 
 logger = custom_logging.get_logger(__name__)
 
+# prefix of the query tracker table items that hold the conditional request values of RSS feeds
+FEED_CACHE_PREFIX = "FEED_CACHE"
+
+# fixed sort key of the watermark item of a query tracker. With a known sort key the trackers of all the feeds of a
+# url can be read with a single BatchGetItem, instead of one query per feed for the item with the latest timestamp
+WATERMARK_SORT_KEY = "WATERMARK"
+# query trackers expire once they are older than the 30 days that a feed without a tracker looks back, so that an
+# expired tracker does not publish articles again
+TRACKER_TTL_DAYS = 30
+MAX_BATCH_GET_KEYS = 100
+MAX_BATCH_WRITE_ITEMS = 25
+MAX_ATTEMPTS = 5
+BASE_BACKOFF_SECONDS = 0.1
+
+# prefix and fixed sort key of the query tracker table items that mark an article as published for a configuration
+SEEN_ARTICLE_PREFIX = "SEEN_ARTICLE"
+SEEN_ARTICLE_TTL_DAYS = 7
+# number of article ids remembered in memory across invocations of a warm lambda container
+MAX_SEEN_ARTICLES = 10000
+
+DEFAULT_CONFIG_CACHE_TTL_SECONDS = 300
+
+
+_deserializer = TypeDeserializer()
+
+
+class QueryTrackerWriteError(Exception):
+    pass
+
 
 def get_config(dynamodb=None, **scan_kwargs):
     """ This method retrieves configuration list from DDB which are "enabled = True" """
@@ -20,6 +55,8 @@ def get_config(dynamodb=None, **scan_kwargs):
 
     table = dynamodb.Table(os.environ["DDB_CONFIG_TABLE_NAME"])
 
+    # the 'enabled' filter is applied after the read, so the disabled configurations are read (and paid for) too. This
+    # is why 'publish_config_handler' reads the configurations through the cache below, rather than on every run
     config_list = []
     start_key = None
     done = False
@@ -41,6 +78,116 @@ def get_config(dynamodb=None, **scan_kwargs):
     return config_list
 
 
+def get_config_version_key():
+    """
+    Returns the key of the config table item whose 'version' number is incremented whenever a configuration changes,
+    or None if there is none. The config table is not created by this solution, hence its key schema is not known here:
+    the key is set as a JSON object in the 'DDB_CONFIG_VERSION_KEY' lambda environment variable, for example
+    '{"account": "CONFIG_VERSION"}'
+    """
+    version_key = os.environ.get("DDB_CONFIG_VERSION_KEY", None)
+    return json.loads(version_key) if version_key else None
+
+
+def get_config_version(dynamodb=None):
+    """Returns the version number of the configurations, or None if the config table has no version item"""
+    version_key = get_config_version_key()
+    if not version_key:
+        return None
+
+    if not dynamodb:
+        dynamodb = service_helper.get_service_resource("dynamodb")
+
+    table = dynamodb.Table(os.environ["DDB_CONFIG_TABLE_NAME"])
+    item = table.get_item(Key=version_key, ProjectionExpression="version").get("Item", None)
+    return int(item["version"]) if item and "version" in item else None
+
+
+def update_config_version(dynamodb=None):
+    """
+    Increments the version number of the configurations, to be called after a configuration is changed. Returns the
+    new version number, or None if no version item is configured
+    """
+    version_key = get_config_version_key()
+    if not version_key:
+        logger.warning("DDB_CONFIG_VERSION_KEY is not set, the configuration version is not updated")
+        return None
+
+    if not dynamodb:
+        dynamodb = service_helper.get_service_resource("dynamodb")
+
+    table = dynamodb.Table(os.environ["DDB_CONFIG_TABLE_NAME"])
+    response = table.update_item(
+        Key=version_key,
+        UpdateExpression="ADD version :one",
+        ExpressionAttributeValues={":one": 1},
+        ReturnValues="UPDATED_NEW",
+    )
+    return int(response["Attributes"]["version"])
+
+
+class ConfigCache:
+    """
+    This class keeps the enabled configurations across invocations of a warm lambda container. The cached
+    configurations are returned for 'ttl_seconds'; after that the version item of the config table is read, and the
+    configurations are only scanned again if the version changed. Without a version item (see
+    'get_config_version_key') the configurations are scanned again every 'ttl_seconds'
+    """
+
+    def __init__(self, ttl_seconds=None):
+        self.ttl_seconds = (
+            ttl_seconds
+            if ttl_seconds is not None
+            else int(os.environ.get("CONFIG_CACHE_TTL_SECONDS", DEFAULT_CONFIG_CACHE_TTL_SECONDS))
+        )
+
+        self.hits = 0
+        self.version_checks = 0
+        self.scans = 0
+
+        self._config_list = None
+        self._version = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, dynamodb=None):
+        with self._lock:
+            now = time.monotonic()
+            if self._config_list is not None and now < self._expires_at:
+                self.hits += 1
+                return list(self._config_list)
+
+            # the version is read before the scan, so that a change made during the scan is found by the next check
+            version = get_config_version(dynamodb)
+            if self._config_list is not None and version is not None and version == self._version:
+                self.version_checks += 1
+            else:
+                logger.info(f"Scanning configurations, version {version}")
+                self.scans += 1
+                self._config_list = get_config(dynamodb)
+                self._version = version
+
+            self._expires_at = now + self.ttl_seconds
+            return list(self._config_list)
+
+    def clear(self):
+        with self._lock:
+            self._config_list = None
+            self._version = None
+
+    def get_stats(self):
+        with self._lock:
+            return {"hits": self.hits, "version_checks": self.version_checks, "scans": self.scans}
+
+
+_config_cache = ConfigCache()
+
+
+def get_cached_config(dynamodb=None):
+    """Same as 'get_config', from the cache that is kept across invocations of the lambda container"""
+    return _config_cache.get(dynamodb)
+
+
 def update_query(item, **put_item_kwargs):
     """
     This method updates the 'query' (data searched through APIs) details into DDB. THis information
@@ -54,35 +201,32 @@ def update_query(item, **put_item_kwargs):
     table.put_item(Item=item, **put_item_kwargs)
 
 
-def update_query_tracker(account, url, search_query, topic=None):
-    tracker_datetime = datetime.now(timezone.utc)
+def get_tracker_id(account, url, search_query, topic=None):
+    """The hash key of a query tracker is account#url#topic#search_query, topic and search_query are optional"""
     query = "#".join([account, url])
     if topic:
         query = "#".join([query, topic])
     if search_query:
         query = "#".join([query, search_query])
-
-    update_query(
-        {
-            "ID": query,
-            "LAST_PUBLISHED_TIMESTAMP": tracker_datetime.isoformat(),
-            "EXP_DATE": str(int((tracker_datetime + timedelta(days=7)).timestamp() * 1000)),
-        }
-    )
+    return query
 
 
-def get_query_tracker(account, url, search_query, topic=None, **item_kwargs):  # NOSONAR allow passing keyword args
-    dynamodb = service_helper.get_service_resource("dynamodb")
+def get_query_tracker(
+    account, url, search_query, topic=None, dynamodb_client=None, **item_kwargs
+):  # NOSONAR allow passing keyword args
+    """
+    Return the latest query tracker of a feed, or a tracker 30 days in the past if there is none. The trackers are read
+    from worker threads, hence this uses the (thread safe) boto3 client instead of a table resource
+    """
+    if not dynamodb_client:
+        dynamodb_client = service_helper.get_service_client("dynamodb")
 
-    table = dynamodb.Table(os.environ["TARGET_DDB_TABLE"])
-    query = "#".join([account, url])
-    if topic:
-        query = "#".join([query, topic])
-    if search_query:
-        query = "#".join([query, search_query])
+    query = get_tracker_id(account, url, search_query, topic)
     logger.info(f"Query to retrieve tracker is {query}")
-    response = table.query(
-        KeyConditionExpression=Key("ID").eq(query),
+    response = dynamodb_client.query(
+        TableName=os.environ["TARGET_DDB_TABLE"],
+        KeyConditionExpression="ID = :id",
+        ExpressionAttributeValues={":id": {"S": query}},
         Limit=1,
         ScanIndexForward=False,
     )
@@ -90,4 +234,300 @@ def get_query_tracker(account, url, search_query, topic=None, **item_kwargs):  #
         logger.warning("Query tracker is empty")
         return {"LAST_PUBLISHED_TIMESTAMP": (datetime.now(timezone.utc) - timedelta(days=30)).isoformat()}
 
-    return response["Items"][0]  # since limit is 1, it will return only 1 record and hence taking the first index value
+    # since limit is 1, it will return only 1 record and hence taking the first index value
+    return {name: _deserializer.deserialize(value) for name, value in response["Items"][0].items()}
+
+
+def _get_watermark_key(tracker_id):
+    return {"ID": {"S": tracker_id}, "LAST_PUBLISHED_TIMESTAMP": {"S": WATERMARK_SORT_KEY}}
+
+
+def get_query_trackers(account, url, search_query, topics, dynamodb_client=None):
+    """
+    Return the query trackers of the feeds (topics) of a url as a dictionary keyed by topic, reading their watermark
+    items with BatchGetItem. A feed without a watermark item falls back to 'get_query_tracker', which returns the latest
+    tracker written before watermark items were introduced or a tracker 30 days in the past
+    """
+    if not dynamodb_client:
+        dynamodb_client = service_helper.get_service_client("dynamodb")
+    table_name = os.environ["TARGET_DDB_TABLE"]
+
+    tracker_ids = {get_tracker_id(account, url, search_query, topic): topic for topic in topics}
+    trackers = {}
+    pending_keys = [_get_watermark_key(tracker_id) for tracker_id in tracker_ids]
+    for index in range(0, len(pending_keys), MAX_BATCH_GET_KEYS):
+        request_items = {table_name: {"Keys": pending_keys[index : index + MAX_BATCH_GET_KEYS]}}
+        for attempt in range(MAX_ATTEMPTS):
+            response = dynamodb_client.batch_get_item(RequestItems=request_items)
+            for item in response["Responses"].get(table_name, []):
+                trackers[tracker_ids[item["ID"]["S"]]] = {
+                    "ID": item["ID"]["S"],
+                    "LAST_PUBLISHED_TIMESTAMP": item["WATERMARK"]["S"],
+                }
+
+            request_items = response.get("UnprocessedKeys", None)
+            if not request_items:
+                break
+            logger.warning(f"Retrying {len(request_items[table_name]['Keys'])} unprocessed tracker keys")
+            time.sleep(BASE_BACKOFF_SECONDS * (2**attempt))
+
+    for topic in topics:
+        if topic not in trackers:
+            trackers[topic] = get_query_tracker(account, url, search_query, topic, dynamodb_client=dynamodb_client)
+    return trackers
+
+
+class QueryTrackerWriter:
+    """
+    Buffers the watermarks of query trackers and writes them with BatchWriteItem, 25 items per request. The watermark
+    is the published timestamp of the newest article, and should only be put for feeds that published articles.
+    Used as a context manager, the buffered watermarks are written on exit
+    """
+
+    def __init__(self, dynamodb_client=None):
+        self.dynamodb_client = dynamodb_client if dynamodb_client else service_helper.get_service_client("dynamodb")
+        self.table_name = os.environ["TARGET_DDB_TABLE"]
+        self._items = {}
+        self._lock = threading.RLock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
+
+    def put(self, account, url, search_query, topic, published_timestamp: datetime):
+        tracker_id = get_tracker_id(account, url, search_query, topic)
+        item = _get_watermark_key(tracker_id)
+        item["WATERMARK"] = {"S": published_timestamp.isoformat()}
+        item["EXP_DATE"] = {"N": str(int((datetime.now(timezone.utc) + timedelta(days=TRACKER_TTL_DAYS)).timestamp()))}
+
+        with self._lock:
+            # a batch cannot write the same key twice, the newest watermark of a tracker wins
+            buffered_item = self._items.get(tracker_id, None)
+            if not buffered_item or buffered_item["WATERMARK"]["S"] < item["WATERMARK"]["S"]:
+                self._items[tracker_id] = item
+            if len(self._items) >= MAX_BATCH_WRITE_ITEMS:
+                self.flush()
+
+    def flush(self):
+        with self._lock:
+            items, self._items = list(self._items.values()), {}
+
+        for index in range(0, len(items), MAX_BATCH_WRITE_ITEMS):
+            self._send_batch(items[index : index + MAX_BATCH_WRITE_ITEMS])
+
+    def _send_batch(self, items):
+        request_items = {self.table_name: [{"PutRequest": {"Item": item}} for item in items]}
+        for attempt in range(MAX_ATTEMPTS):
+            response = self.dynamodb_client.batch_write_item(RequestItems=request_items)
+            request_items = response.get("UnprocessedItems", None)
+            if not request_items:
+                logger.debug(f"Updated {len(items)} query trackers")
+                return
+            logger.warning(f"Retrying {len(request_items[self.table_name])} unprocessed query trackers")
+            time.sleep(BASE_BACKOFF_SECONDS * (2**attempt))
+
+        raise QueryTrackerWriteError(
+            f"Could not update {len(request_items[self.table_name])} query trackers after {MAX_ATTEMPTS} attempts"
+        )
+
+
+class FeedCache:
+    """
+    This class keeps the ETag and Last-Modified values of fetched RSS feeds in the query tracker table, so that a feed
+    can be requested conditionally on the next poll and not downloaded or parsed again if it has not changed. It counts
+    hits (feed not modified), misses (feed downloaded) and the bytes saved by hits.
+
+    The values are kept per configuration (account and search query), since a feed that has not changed for one
+    configuration may not have been published for another one yet. The values of a downloaded feed are only kept in
+    memory until 'save' is called, after its articles were published and its query tracker moved; a run that fails
+    in between downloads the feed again on the next poll.
+
+    The feeds of a url are fetched from multiple threads, hence this class uses the (thread safe) boto3 client instead
+    of the table resource
+    """
+
+    def __init__(self, account, search_query=None, dynamodb_client=None):
+        self.dynamodb_client = dynamodb_client if dynamodb_client else service_helper.get_service_client("dynamodb")
+        self.table_name = os.environ["TARGET_DDB_TABLE"]
+        self.account = account
+        self.search_query = search_query
+
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self._pending = {}  # rss_endpoint -> item to save once the feed was processed
+        self._lock = threading.Lock()
+
+    def _get_key(self, rss_endpoint):
+        # a fixed sort key so that there is a single cache item per configuration and feed, which is overwritten on
+        # every download
+        return {
+            "ID": {"S": "#".join([FEED_CACHE_PREFIX, self.account, self.search_query or "", rss_endpoint])},
+            "LAST_PUBLISHED_TIMESTAMP": {"S": FEED_CACHE_PREFIX},
+        }
+
+    def get(self, rss_endpoint):
+        """Return the cached 'etag', 'last_modified' and 'content_length' of a feed, or None if it is not cached"""
+        try:
+            response = self.dynamodb_client.get_item(TableName=self.table_name, Key=self._get_key(rss_endpoint))
+        except ClientError as error:
+            # not being able to read the cache should not stop the feed from being fetched unconditionally
+            logger.warning(f"Could not read feed cache for {rss_endpoint}: {error}")
+            return None
+
+        item = response.get("Item", None)
+        if not item:
+            return None
+
+        return {
+            "etag": item.get("ETAG", {}).get("S", None),
+            "last_modified": item.get("LAST_MODIFIED", {}).get("S", None),
+            "content_length": int(item.get("CONTENT_LENGTH", {}).get("N", "0")),
+        }
+
+    def record_hit(self, rss_endpoint, cached_feed):
+        logger.debug(f"Feed {rss_endpoint} not modified since last poll")
+        with self._lock:
+            self.hits += 1
+            self.bytes_saved += cached_feed["content_length"]
+
+    def record_miss(self, rss_endpoint, etag, last_modified, content_length):
+        """Count a download and keep its ETag / Last-Modified values until 'save' is called for the feed"""
+        with self._lock:
+            self.misses += 1
+
+        if not etag and not last_modified:
+            logger.debug(f"Feed {rss_endpoint} does not support conditional requests")
+            return
+
+        item = self._get_key(rss_endpoint)
+        item["CONTENT_LENGTH"] = {"N": str(content_length)}
+        if etag:
+            item["ETAG"] = {"S": etag}
+        if last_modified:
+            item["LAST_MODIFIED"] = {"S": last_modified}
+        with self._lock:
+            self._pending[rss_endpoint] = item
+
+    def save(self, rss_endpoints):
+        """Save the values of the downloaded feeds in 'rss_endpoints', once their articles were published"""
+        for rss_endpoint in rss_endpoints:
+            with self._lock:
+                item = self._pending.pop(rss_endpoint, None)
+            if not item:
+                continue
+
+            # a number of seconds, which is the format of the time to live attribute
+            item["EXP_DATE"] = {"N": str(int((datetime.now(timezone.utc) + timedelta(days=7)).timestamp()))}
+            try:
+                self.dynamodb_client.put_item(TableName=self.table_name, Item=item)
+            except ClientError as error:
+                logger.warning(f"Could not update feed cache for {rss_endpoint}: {error}")
+
+    def get_stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "bytes_saved": self.bytes_saved}
+
+
+class SeenArticleCache:
+    """
+    This class remembers the ids of the articles published for a configuration (account and search query), so that
+    articles that are polled again, after a failed tracker update or by overlapping schedules, are not published twice.
+    The ids of the last 'max_entries' articles are kept in memory; an article that is not in memory is claimed with a
+    conditional put into the query tracker table, which fails if a previous or concurrent run already claimed it.
+    The items expire after 'ttl_days' days.
+
+    A claim is made before the article is published, hence the claims of articles that could not be published should
+    be released so that they are published by the next run
+    """
+
+    def __init__(self, dynamodb_client=None, max_entries=MAX_SEEN_ARTICLES, ttl_days=SEEN_ARTICLE_TTL_DAYS):
+        self.dynamodb_client = dynamodb_client if dynamodb_client else service_helper.get_service_client("dynamodb")
+        self.table_name = os.environ["TARGET_DDB_TABLE"]
+        self.max_entries = max_entries
+        self.ttl_days = ttl_days
+
+        self.claims = 0
+        self.memory_hits = 0
+        self.conflicts = 0
+        self._seen = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _get_key(seen_id):
+        return {"ID": {"S": f"{SEEN_ARTICLE_PREFIX}#{seen_id}"}, "LAST_PUBLISHED_TIMESTAMP": {"S": SEEN_ARTICLE_PREFIX}}
+
+    def _remember(self, seen_id):
+        # called with the lock held
+        self._seen[seen_id] = True
+        self._seen.move_to_end(seen_id)
+        while len(self._seen) > self.max_entries:
+            self._seen.popitem(last=False)
+
+    def claim(self, account, search_query, record_id):
+        """Returns True if the article was not published for the configuration yet, and claims it"""
+        seen_id = "#".join([account, search_query or "", record_id])
+        with self._lock:
+            if seen_id in self._seen:
+                self._seen.move_to_end(seen_id)
+                self.memory_hits += 1
+                return False
+
+        item = self._get_key(seen_id)
+        # a number of seconds, which is the format of the time to live attribute
+        item["EXP_DATE"] = {"N": str(int((datetime.now(timezone.utc) + timedelta(days=self.ttl_days)).timestamp()))}
+        try:
+            self.dynamodb_client.put_item(
+                TableName=self.table_name, Item=item, ConditionExpression="attribute_not_exists(ID)"
+            )
+        except ClientError as error:
+            if error.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                # not being able to claim the article should not stop it from being published
+                logger.warning(f"Could not claim article {record_id}: {error}")
+                return True
+
+            with self._lock:
+                self.conflicts += 1
+                self._remember(seen_id)
+            return False
+
+        with self._lock:
+            self.claims += 1
+            self._remember(seen_id)
+        return True
+
+    def release(self, account, search_query, record_ids):
+        """Forget the claims of articles that could not be published"""
+        for record_id in record_ids:
+            seen_id = "#".join([account, search_query or "", record_id])
+            with self._lock:
+                self._seen.pop(seen_id, None)
+            try:
+                self.dynamodb_client.delete_item(TableName=self.table_name, Key=self._get_key(seen_id))
+            except ClientError as error:
+                logger.warning(f"Could not release article {record_id}: {error}")
+
+    def get_stats(self):
+        with self._lock:
+            return {"claims": self.claims, "memory_hits": self.memory_hits, "conflicts": self.conflicts}
+
+
+_seen_article_cache = None
+_seen_article_cache_lock = threading.Lock()
+
+
+def get_seen_article_cache():
+    """
+    Returns the seen article cache if the 'SKIP_SEEN_ARTICLES' lambda environment variable is 'true', else None. The
+    cache is created once per container, so that its memory is kept across invocations
+    """
+    global _seen_article_cache
+    if os.environ.get("SKIP_SEEN_ARTICLES", "false").lower() != "true":
+        return None
+
+    with _seen_article_cache_lock:
+        if _seen_article_cache is None:
+            _seen_article_cache = SeenArticleCache()
+        return _seen_article_cache
@@ -9,6 +9,7 @@ import json
 import os
 
 from shared_util import custom_logging, service_helper
+from shared_util.event_bridge_helper import EventBridgeBatcher
 
 logger = custom_logging.get_logger(__name__)
 
@@ -29,33 +30,58 @@ class ConfigEvent:
         return f"Query: {self.query} and URLs: {self.url_list}"
 
 
-def publish_config(config_event: ConfigEvent, event_bus=None):
-    if not event_bus:
-        event_bus = service_helper.get_service_client("events")
+def create_config_events(config_event: ConfigEvent, urls_per_event=1):
+    """
+    Create the event details for a config. With 1 url per event every event has a 'url', otherwise the urls are
+    grouped into events that carry a 'urls' list, which 'process_config_handler' processes in batch mode
+    """
+    url_list = config_event.url_list if config_event.url_list else []
+    url_groups = (
+        [url_list[index : index + urls_per_event] for index in range(0, len(url_list), urls_per_event)]
+        if urls_per_event > 1
+        else url_list
+    )
 
-    for url in config_event.url_list:
+    for url_group in url_groups:
         event = {
             "platform": config_event.platform,
             "account": config_event.account,
             "query": config_event.query,
-            "url": url,
         }
+        if urls_per_event > 1:
+            event["urls"] = url_group
+        else:
+            event["url"] = url_group
 
         if config_event.topic:
             event["topic"] = config_event.topic
 
-        service_response = event_bus.put_events(
-            Entries=[
+        yield event
+
+
+def publish_config(config_event: ConfigEvent, event_bus=None, urls_per_event=None):
+    """
+    Publish the config as events on the event bus. The number of urls per event is read from the lambda environment
+    variable 'URLS_PER_EVENT' if not passed, and defaults to 1
+    """
+    if not event_bus:
+        event_bus = service_helper.get_service_client("events")
+
+    if not urls_per_event:
+        urls_per_event = int(os.environ.get("URLS_PER_EVENT", 1))
+
+    with EventBridgeBatcher(event_bus=event_bus) as batcher:
+        for event in create_config_events(config_event, urls_per_event):
+            batcher.put(
                 {
                     "EventBusName": os.environ["EVENT_BUS_NAME"],
                     "Source": os.environ["INGESTION_NAMESPACE"],
                     "Detail": json.dumps(event),
                     "DetailType": "config",
                 }
-            ]
-        )
+            )
 
-        if service_response["FailedEntryCount"]:
-            logger.error(f"Failed to publish following event: {event}")
+    for entry in batcher.failed_entries:
+        logger.error(f"Failed to publish following event: {entry['Detail']}")
 
-        logger.info(f"Published event {event} on event bus with response {service_response}")
+    logger.info(f"Published {batcher.entries_sent} events on event bus in {batcher.batches_sent} calls")
@@ -0,0 +1,251 @@
+#!/usr/bin/env python
+######################################################################################################################
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+######################################################################################################################
+
+import bisect
+import os
+import socket
+import threading
+import time
+from collections import namedtuple
+from urllib.parse import urlparse
+
+import urllib3
+from shared_util import custom_logging
+
+logger = custom_logging.get_logger(__name__)
+
+DEFAULT_CONNECT_TIMEOUT_SECONDS = 3.05
+DEFAULT_READ_TIMEOUT_SECONDS = 10
+# the read timeout applies to each socket read, a response that trickles in is abandoned after this many seconds
+DEFAULT_TOTAL_TIMEOUT_SECONDS = 30
+# feeds are a few hundred KB at most, a larger (or decompressed) response is a misconfigured feed or a gzip bomb
+DEFAULT_MAX_RESPONSE_BYTES = 10 * 1024 * 1024
+# maximum concurrent requests to the same host when feeds are fetched from multiple threads, further requests wait for
+# a pooled connection
+MAX_CONNECTIONS_PER_HOST = 4
+# number of hosts whose connections are kept alive, the least recently used host is closed first
+MAX_POOLED_HOSTS = 100
+MAX_REDIRECTS = 5
+CHUNK_SIZE = 64 * 1024
+
+# upper bounds in milliseconds of the latency histogram buckets, the last bucket has no upper bound
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+FeedResponse = namedtuple("FeedResponse", ["status", "headers", "content", "url"])
+
+
+class ResponseTooLargeError(Exception):
+    pass
+
+
+class ResponseTimeoutError(urllib3.exceptions.TimeoutError):
+    pass
+
+
+class LatencyHistogram:
+    """Request latencies in fixed buckets (LATENCY_BUCKETS_MS), with the count of failed requests"""
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.errors = 0
+        self.total_ms = 0.0
+
+    def record(self, latency_ms, error=False):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS_MS, latency_ms)] += 1
+        self.total_ms += latency_ms
+        if error:
+            self.errors += 1
+
+    def get_percentile(self, percentile):
+        """Upper bound of the bucket that holds the percentile, None if it is in the last bucket"""
+        rank = percentile / 100 * sum(self.counts)
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            cumulative += count
+            if count and cumulative >= rank:
+                return LATENCY_BUCKETS_MS[index] if index < len(LATENCY_BUCKETS_MS) else None
+        return None
+
+    def to_dict(self):
+        labels = [f"<={bound}" for bound in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}"]
+        request_count = sum(self.counts)
+        return {
+            "requests": request_count,
+            "errors": self.errors,
+            "mean_ms": round(self.total_ms / request_count, 1) if request_count else 0,
+            "p50_ms": self.get_percentile(50),
+            "p99_ms": self.get_percentile(99),
+            "buckets": {label: count for label, count in zip(labels, self.counts) if count},
+        }
+
+
+class FeedSession:
+    """
+    HTTP client for the feed downloads. Connections are pooled per host and kept alive, so that the feeds of a website
+    (one per topic) and the websites polled again in a warm container reuse them. Responses are requested with gzip /
+    deflate and decompressed while read; a response larger than 'max_response_bytes' once decompressed is abandoned.
+    A request, including the download of the body, is abandoned after 'total_timeout' seconds. The connection of an
+    abandoned response is closed, not returned to the pool with unread data.
+
+    The latency of each request, including the download of the body, is recorded in a histogram per host
+    """
+
+    def __init__(
+        self,
+        connect_timeout=None,
+        read_timeout=None,
+        max_response_bytes=None,
+        max_connections_per_host=MAX_CONNECTIONS_PER_HOST,
+        total_timeout=None,
+    ):
+        self.total_timeout = (
+            total_timeout
+            if total_timeout
+            else float(os.environ.get("FEED_TOTAL_TIMEOUT_SECONDS", DEFAULT_TOTAL_TIMEOUT_SECONDS))
+        )
+        self.timeout = urllib3.Timeout(
+            connect=(
+                connect_timeout
+                if connect_timeout
+                else float(os.environ.get("FEED_CONNECT_TIMEOUT_SECONDS", DEFAULT_CONNECT_TIMEOUT_SECONDS))
+            ),
+            read=(
+                read_timeout
+                if read_timeout
+                else float(os.environ.get("FEED_READ_TIMEOUT_SECONDS", DEFAULT_READ_TIMEOUT_SECONDS))
+            ),
+            total=self.total_timeout,
+        )
+        self.max_response_bytes = (
+            max_response_bytes
+            if max_response_bytes
+            else int(os.environ.get("FEED_MAX_RESPONSE_BYTES", DEFAULT_MAX_RESPONSE_BYTES))
+        )
+        self.pool_manager = urllib3.PoolManager(
+            num_pools=MAX_POOLED_HOSTS,
+            maxsize=max_connections_per_host,
+            block=True,
+            retries=urllib3.Retry(total=MAX_REDIRECTS, connect=1, read=0, status=0, redirect=MAX_REDIRECTS),
+            headers=urllib3.make_headers(keep_alive=True, accept_encoding=["gzip", "deflate"]),
+        )
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _abort(response):
+        # a read blocks until a chunk is complete, shutting the socket down makes a read of a slow response return
+        connection = getattr(response, "_connection", None)
+        sock = getattr(connection, "sock", None)
+        if sock:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def _read(self, response, deadline):
+        content_length = response.headers.get("Content-Length", None)
+        if content_length and content_length.isdigit() and int(content_length) > self.max_response_bytes:
+            raise ResponseTooLargeError(f"Content-Length {content_length} is over {self.max_response_bytes} bytes")
+
+        # the urllib3 timeouts bound each socket read, the timer bounds the download of the whole body
+        timer = threading.Timer(max(deadline - time.monotonic(), 0), self._abort, (response,))
+        timer.daemon = True
+        timer.start()
+        chunks, size = [], 0
+        try:
+            for chunk in response.stream(CHUNK_SIZE, decode_content=True):
+                size += len(chunk)
+                if size > self.max_response_bytes:
+                    raise ResponseTooLargeError(f"response is over {self.max_response_bytes} bytes")
+                chunks.append(chunk)
+        except (urllib3.exceptions.HTTPError, OSError) as error:
+            if time.monotonic() >= deadline:
+                raise ResponseTimeoutError(f"response not read within {self.total_timeout} seconds") from error
+            raise
+        finally:
+            timer.cancel()
+
+        # an aborted read may end early without an error
+        if time.monotonic() >= deadline:
+            raise ResponseTimeoutError(f"response not read within {self.total_timeout} seconds")
+        return b"".join(chunks)
+
+    def _record(self, host, latency_ms, error):
+        with self._lock:
+            if host not in self._histograms:
+                self._histograms[host] = LatencyHistogram()
+            self._histograms[host].record(latency_ms, error)
+
+    def get(self, url, headers=None, timeout=None):
+        """
+        Downloads 'url' and returns a FeedResponse, with the response headers in lower case. 'timeout' (seconds) applies
+        to both the connection and each read, instead of the timeouts of the session; the whole request is still
+        bounded by the total timeout of the session. Raises the urllib3 errors (a subclass of
+        urllib3.exceptions.HTTPError, ResponseTimeoutError included) and ResponseTooLargeError; responses with an error
+        status are returned
+        """
+        host = urlparse(url).netloc
+        start = time.perf_counter()
+        deadline = time.monotonic() + self.total_timeout
+        error = True
+        try:
+            response = self.pool_manager.request(
+                "GET",
+                url,
+                headers=headers,
+                timeout=(
+                    urllib3.Timeout(connect=timeout, read=timeout, total=self.total_timeout)
+                    if timeout
+                    else self.timeout
+                ),
+                preload_content=False,
+            )
+            content = None
+            try:
+                content = self._read(response, deadline)
+            finally:
+                if content is None:
+                    # the response was not read to the end, its connection is closed instead of being reused
+                    response.close()
+                response.release_conn()
+            error = response.status >= 400
+            return FeedResponse(
+                response.status,
+                {key.lower(): value for key, value in response.headers.items()},
+                content,
+                response.geturl() or url,
+            )
+        finally:
+            self._record(host, (time.perf_counter() - start) * 1000, error)
+
+    def get_stats(self, reset=False):
+        """Latency histograms per host, and of all the hosts under 'all'"""
+        with self._lock:
+            histograms = self._histograms
+            if reset:
+                self._histograms = {}
+
+        total = LatencyHistogram()
+        for histogram in histograms.values():
+            total.counts = [count + other for count, other in zip(total.counts, histogram.counts)]
+            total.errors += histogram.errors
+            total.total_ms += histogram.total_ms
+        stats = {host: histogram.to_dict() for host, histogram in histograms.items()}
+        stats["all"] = total.to_dict()
+        return stats
+
+
+_feed_session = None
+_feed_session_lock = threading.Lock()
+
+
+def get_feed_session():
+    """Returns the session of the container, created on first use so that its connections are kept across invocations"""
+    global _feed_session
+    with _feed_session_lock:
+        if _feed_session is None:
+            _feed_session = FeedSession()
+        return _feed_session
@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+######################################################################################################################
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+######################################################################################################################
+
+import re
+from collections import deque
+from functools import lru_cache
+
+from shared_util import custom_logging
+
+logger = custom_logging.get_logger(__name__)
+
+# number of compiled search queries kept across invocations of a warm lambda container
+MAX_CACHED_MATCHERS = 128
+# below this number of keywords, one substring search per keyword (which runs in C) is faster than the automaton
+MIN_AUTOMATON_KEYWORDS = 25
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton that finds all the keywords of a search query in a single pass over the text, instead of
+    one substring search per keyword. Matching is case-sensitive substring matching by default, which is the same as
+    'keyword in text'. With 'case_insensitive' the keywords and the text are compared in lower case, and with
+    'whole_word' a keyword only matches if it is not preceded or followed by a letter, a digit or '_'
+
+    Most articles do not contain any keyword, hence the text is first searched with a regular expression shaped like
+    the trie of the automaton, which runs in the C regex engine, and the automaton only walks the texts that have a hit.
+    Search queries with fewer than MIN_AUTOMATON_KEYWORDS keywords, the most common ones, are matched with one
+    substring search per keyword instead, and no automaton is built
+    """
+
+    def __init__(self, keywords, case_insensitive=False, whole_word=False):
+        self.case_insensitive = case_insensitive
+        self.whole_word = whole_word
+        # empty keywords (e.g. from a trailing ',' in the query) are ignored
+        self.keywords = list(dict.fromkeys(keyword for keyword in keywords if keyword))
+        self._normalized_keywords = [(keyword, self._normalize(keyword)) for keyword in self.keywords]
+        self.uses_automaton = len(self.keywords) >= MIN_AUTOMATON_KEYWORDS
+
+        # state 0 is the root; each state has its transitions, its failure state and the (keyword, normalized length)
+        # pairs of the keywords ending in it
+        self._transitions = [{}]
+        self._failures = [0]
+        self._outputs = [[]]
+
+        self._prefilter = None
+        if self.uses_automaton:
+            for keyword in self.keywords:
+                self._add_keyword(keyword)
+            # the prefilter is built before the failure links add the outputs of the failure states
+            self._prefilter = re.compile(self._trie_pattern())
+            self._build_failures()
+
+    def _normalize(self, text):
+        return text.lower() if self.case_insensitive else text
+
+    def _add_keyword(self, keyword):
+        normalized_keyword = self._normalize(keyword)
+        state = 0
+        for char in normalized_keyword:
+            next_state = self._transitions[state].get(char, None)
+            if next_state is None:
+                next_state = len(self._transitions)
+                self._transitions.append({})
+                self._failures.append(0)
+                self._outputs.append([])
+                self._transitions[state][char] = next_state
+            state = next_state
+        self._outputs[state].append((keyword, len(normalized_keyword)))
+
+    def _trie_pattern(self, state=0):
+        """Regular expression matching the keywords that continue from 'state', e.g. 'b(?:rand|ook(?:s)?)'"""
+        alternatives = [
+            re.escape(char) + self._trie_pattern(next_state) for char, next_state in self._transitions[state].items()
+        ]
+        if not alternatives:
+            return ""
+
+        pattern = alternatives[0] if len(alternatives) == 1 else f"(?:{'|'.join(alternatives)})"
+        # a keyword ends in this state, hence the longer keywords that continue from it are optional
+        return f"(?:{pattern})?" if self._outputs[state] else pattern
+
+    def _build_failures(self):
+        """Breadth first, so that the failure state of the parent is known before the one of its children"""
+        queue = deque(self._transitions[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._transitions[state].items():
+                queue.append(next_state)
+
+                failure = self._failures[state]
+                while failure and char not in self._transitions[failure]:
+                    failure = self._failures[failure]
+                failure = self._transitions[failure].get(char, 0)
+
+                self._failures[next_state] = failure
+                self._outputs[next_state] = self._outputs[next_state] + self._outputs[failure]
+
+    def _is_word_boundary(self, text, start, end):
+        return (start == 0 or not _is_word_char(text[start - 1])) and (end == len(text) or not _is_word_char(text[end]))
+
+    def _iter_matches(self, text):
+        """Yields each keyword that matches, every time it matches"""
+        normalized_text = self._normalize(text)
+        transitions, failures, outputs = self._transitions, self._failures, self._outputs
+        state = 0
+        for index, char in enumerate(normalized_text):
+            while state and char not in transitions[state]:
+                state = failures[state]
+            state = transitions[state].get(char, 0)
+
+            for keyword, length in outputs[state]:
+                if not self.whole_word or self._is_word_boundary(normalized_text, index + 1 - length, index + 1):
+                    yield keyword
+
+    def _find_end(self, normalized_text, normalized_keyword):
+        """End of the first match of a keyword in the text, None if it does not match"""
+        start = normalized_text.find(normalized_keyword)
+        while start != -1:
+            end = start + len(normalized_keyword)
+            if not self.whole_word or self._is_word_boundary(normalized_text, start, end):
+                return end
+            start = normalized_text.find(normalized_keyword, start + 1)
+        return None
+
+    def _find_substrings(self, text, first_only=False):
+        """Returns the keywords found with one substring search per keyword, in the order of the automaton"""
+        if not text:
+            return []
+        normalized_text = self._normalize(text)
+        found = []
+        for keyword, normalized_keyword in self._normalized_keywords:
+            if normalized_keyword not in normalized_text:
+                continue
+            end = self._find_end(normalized_text, normalized_keyword)
+            if end is not None:
+                if first_only:
+                    return [keyword]
+                # the automaton reports the keywords by end of their first match, the longest first
+                found.append((end, -len(normalized_keyword), keyword))
+        return [keyword for _, _, keyword in sorted(found)]
+
+    def _has_candidate(self, text):
+        return bool(text) and self._prefilter is not None and self._prefilter.search(self._normalize(text)) is not None
+
+    def find(self, text):
+        """Returns the keywords found in the text, in the order in which they first occur"""
+        if not self.uses_automaton:
+            return self._find_substrings(text)
+        if not self._has_candidate(text):
+            return []
+        return list(dict.fromkeys(self._iter_matches(text)))
+
+    def matches(self, text):
+        """Returns True as soon as a keyword is found in the text"""
+        if not self.uses_automaton:
+            return bool(self._find_substrings(text, first_only=True))
+        if not self._has_candidate(text):
+            return False
+        # without whole word matching every hit of the prefilter is a keyword
+        return not self.whole_word or next(self._iter_matches(text), None) is not None
+
+
+def _is_word_char(char):
+    return char.isalnum() or char == "_"
+
+
+@lru_cache(maxsize=MAX_CACHED_MATCHERS)
+def get_keyword_matcher(query_str, case_insensitive=False, whole_word=False):
+    """
+    Returns the matcher for a comma separated search query. The matcher is compiled once per query and options, and
+    is kept across invocations of the lambda container
+    """
+    logger.debug(f"Compiling keyword matcher for {query_str}")
+    return KeywordMatcher(query_str.split(","), case_insensitive=case_insensitive, whole_word=whole_word)
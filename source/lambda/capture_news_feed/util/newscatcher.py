@@ -28,56 +28,168 @@
 ######################################################################################################################
 
 # 2023-07-21: Amazon addition.
+import itertools
 import sqlite3
+import threading
+
 import feedparser
 import pkg_resources
-from tldextract import extract
+import urllib3
+
+from util.feed_session import ResponseTooLargeError, get_feed_session
+from util.public_suffix import extract
 
 DB_FILE = pkg_resources.resource_filename('util', 'newscatcher_data/package_rss.db')
 
+def fetch_feed(rss_endpoint, timeout=None, feed_cache=None):
+    # download the feed on the pooled session of the container (keep-alive, gzip, at most MAX_CONNECTIONS_PER_HOST
+    # requests in flight to the same host, connect / read timeouts and a response size limit), then parse the bytes.
+    # Parsing happens after the connection is returned to the pool so that it does not hold a connection slot.
+    # 'timeout' (seconds) replaces both the connect and read timeouts of the session.
+    # If a feed_cache is passed, the request is sent with the ETag / Last-Modified values of the previous download and
+    # a feed that has not been modified is returned with status 304 and no entries, without being parsed. The values of
+    # a downloaded feed are only saved by feed_cache.save, once its articles were published
+    headers = {'User-Agent': feedparser.USER_AGENT}
+    cached_feed = feed_cache.get(rss_endpoint) if feed_cache else None
+    if cached_feed:
+        if cached_feed['etag']:
+            headers['If-None-Match'] = cached_feed['etag']
+        if cached_feed['last_modified']:
+            headers['If-Modified-Since'] = cached_feed['last_modified']
+
+    try:
+        response = get_feed_session().get(rss_endpoint, headers=headers, timeout=timeout)
+    except (urllib3.exceptions.HTTPError, ResponseTooLargeError, OSError, ValueError) as error:
+        print(f'Could not fetch {rss_endpoint}: {error}')
+        return {'entries': []}
+
+    if response.status == 304 and cached_feed:
+        feed_cache.record_hit(rss_endpoint, cached_feed)
+        return {'entries': [], 'status': 304}
+    if response.status >= 300:
+        print(f'Could not fetch {rss_endpoint}: HTTP Error {response.status}')
+        return {'entries': []}
+
+    response_headers = dict(response.headers)
+    response_headers.setdefault('content-location', response.url)
+    if feed_cache:
+        feed_cache.record_miss(
+            rss_endpoint, response_headers.get('etag', None), response_headers.get('last-modified', None),
+            len(response.content)
+        )
+    return feedparser.parse(response.content, response_headers=response_headers)
+
+
+# indexes for the catalog lookups. The columns a lookup returns are part of the index, so that the lookups are
+# answered from the index alone
+CATALOG_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_rss_main_website ON rss_main '
+    '(clean_url, topic_unified, main, rss_url, language, clean_country)',
+    'CREATE INDEX IF NOT EXISTS idx_rss_main_topic ON rss_main '
+    '(topic_unified, language, clean_country, main, Globalrank, clean_url)',
+    'CREATE INDEX IF NOT EXISTS idx_rss_main_language ON rss_main '
+    '(language, clean_country, main, Globalrank, clean_url)',
+]
+
+_catalog_connection = None
+_catalog_lock = threading.RLock()
+_url_index = None
+
+
+def get_catalog_connection():
+    # the catalog is static data shipped with the package, hence it is copied into an in-memory database once per
+    # process (at cold start) and indexed there; the package directory is read-only in lambda. The connection is
+    # shared by the fetch threads and access to it is serialized through _catalog_lock
+    global _catalog_connection
+    with _catalog_lock:
+        if _catalog_connection is None:
+            source = sqlite3.connect(f'file:{DB_FILE}?mode=ro', uri=True)
+            connection = sqlite3.connect(':memory:', isolation_level=None, check_same_thread=False)
+            try:
+                source.backup(connection)
+            finally:
+                source.close()
+            for index_sql in CATALOG_INDEXES:
+                connection.execute(index_sql)
+            _catalog_connection = connection
+        return _catalog_connection
+
+
+def close_catalog_connection():
+    # close the shared connection, the next lookup loads the catalog again
+    global _catalog_connection, _url_index
+    with _catalog_lock:
+        if _catalog_connection is not None:
+            _catalog_connection.close()
+            _catalog_connection = None
+        _url_index = None
+
+
+def query_catalog(sql, parameters=()):
+    # sqlite3 caches the prepared statement of each distinct sql string on the connection, hence the sql is always
+    # built with '?' placeholders and the values are passed as parameters
+    with _catalog_lock:
+        return get_catalog_connection().execute(sql, parameters).fetchall()
+
+
+def get_url_index():
+    # map of (topic, language, country) to the websites of the catalog in Globalrank order, where None in a key
+    # matches any value. It is built once per process, so that evaluating url configurations are dictionary lookups.
+    # (None, None, None) keeps the semantics of urls() without parameters: every row of the catalog in table order
+    global _url_index
+    with _catalog_lock:
+        if _url_index is None:
+            index = {}
+            rows = query_catalog('SELECT clean_url, topic_unified, language, clean_country from rss_main '
+                                 'WHERE main = 1 ORDER BY IFNULL(Globalrank,999999);')
+            for website, topic, language, country in rows:
+                for key in itertools.product((topic, None), (language, None), (country, None)):
+                    # a dict keeps the first (best ranked) position of a website, like SELECT DISTINCT
+                    index.setdefault(key, {})[website] = None
+
+            _url_index = {key: list(websites) for key, websites in index.items()}
+            _url_index[(None, None, None)] = [row[0] for row in query_catalog('SELECT clean_url from rss_main')]
+        return _url_index
+
+
 class Query:
     # Query class used to build subsequent sql queries
     def __init__(self):
         self.params = {'website': None, 'topic': None}
 
     def build_conditional(self, field, sql_field):
-        # single conditional build
+        # single conditional build, returns the conditional with a placeholder and the value for the placeholder
         field = field.lower()
         sql_field = sql_field.lower()
 
-        if self.params[field] != None:
-            conditional = "{} = '{}'".format(sql_field, self.params[field])
-            return conditional
+        if self.params.get(field, None) != None:
+            return '{} = ?'.format(sql_field), self.params[field]
         return
 
-    def build_where(self):
+    def build_where(self, conv=None):
         # returning the conditional from paramters
-        # the post "WHERE"
+        # the post "WHERE" and the values for its placeholders
         conditionals = []
+        values = []
 
-        conv = {'topic': 'topic_unified', 'website': 'clean_url'}
+        if conv is None:
+            conv = {'topic': 'topic_unified', 'website': 'clean_url'}
 
         for field in conv.keys():
             cond = self.build_conditional(field, conv[field])
             if cond != None:
-                conditionals.append(cond)
+                conditionals.append(cond[0])
+                values.append(cond[1])
 
         if conditionals == []:
-            return
-
-        conditionals[0] = 'WHERE ' + conditionals[0]
-        conditionals = ''' AND '.join([x for x in conditionals if x != None])
-		+ ' ORDER BY IFNULL(Globalrank,999999);'''
+            return '', values
 
-        return conditionals
+        return 'WHERE ' + ' AND '.join(conditionals), values
 
     def build_sql(self):
         # build sql on user qeury
-        db = sqlite3.connect(DB_FILE, isolation_level=None)
-        sql = 'SELECT rss_url from rss_main ' + self.build_where()
-
-        db.close()
-        return sql
+        where, values = self.build_where()
+        return 'SELECT rss_url from rss_main ' + where + ' ORDER BY IFNULL(Globalrank,999999);', values
 
 
 def clean_url(dirty_url):
@@ -91,10 +203,7 @@ class Newscatcher:
     # search engine
     def build_sql(self):
         if self.topic is None:
-            sql = '''SELECT rss_url from rss_main 
-					 WHERE clean_url = '{}';'''
-            sql = sql.format(self.url)
-            return sql
+            return 'SELECT rss_url from rss_main WHERE clean_url = ?;', (self.url,)
 
     def __init__(self, website, topic=None):
         # init with given params
@@ -102,42 +211,34 @@ class Newscatcher:
         self.url = clean_url(website)
         self.topic = topic
 
-    def get_news(self, n=None):
+    def get_news(self, n=None, timeout=None, feed_cache=None):
         # return results based on current stream
         if self.topic is None:
-            sql = '''SELECT rss_url,topic_unified, language, clean_country from rss_main 
-					 WHERE clean_url = '{}' AND main = 1;'''
-            sql = sql.format(self.url)
+            sql = ('SELECT rss_url, topic_unified, language, clean_country from rss_main '
+                   'WHERE clean_url = ? AND main = 1;')
+            parameters = (self.url,)
         else:
-            sql = '''SELECT rss_url, topic_unified, language, clean_country from rss_main 
-					 WHERE clean_url = '{}' AND topic_unified = '{}';'''
-            sql = sql.format(self.url, self.topic)
-
-        db = sqlite3.connect(DB_FILE, isolation_level=None)
-
-        try:
-            rss_endpoint, topic, language, country = db.execute(sql).fetchone()
-            feed = feedparser.parse(rss_endpoint)
-        except: # NOSONAR: python:S5754
-            if self.topic is not None:
-                sql = '''SELECT rss_url from rss_main 
-					 WHERE clean_url = '{}';'''
-                sql = sql.format(self.url)
-
-                if len(db.execute(sql).fetchall()) > 0:
-                    db.close()
-                    print('Topic is not supported')
-                    return
-                else:
-                    print('Website is not supported')
-                    return
-                    db.close()
+            sql = ('SELECT rss_url, topic_unified, language, clean_country from rss_main '
+                   'WHERE clean_url = ? AND topic_unified = ?;')
+            parameters = (self.url, self.topic)
+
+        catalog_entries = query_catalog(sql, parameters)
+        if not catalog_entries:
+            if self.topic is not None and query_catalog('SELECT rss_url from rss_main WHERE clean_url = ?;', (self.url,)):
+                print('Topic is not supported')
             else:
                 print('Website is not supported')
-                return
+            return
+
+        rss_endpoint, topic, language, country = catalog_entries[0]
+        feed = fetch_feed(rss_endpoint, timeout=timeout, feed_cache=feed_cache)
+
+        if feed.get('status', None) == 304:
+            # feed has not changed since the last poll, hence there are no new articles
+            return {'url': self.url, 'topic': topic, 'rss_endpoint': rss_endpoint,
+                    'language': language, 'country': country, 'articles': []}
 
         if feed['entries'] == []:
-            db.close()
             print('\nNo results found check internet connection or query parameters\n')
             return
 
@@ -146,8 +247,7 @@ class Newscatcher:
         else:
             articles = feed['entries'][:n]
 
-        db.close()
-        return {'url': self.url, 'topic': topic,
+        return {'url': self.url, 'topic': topic, 'rss_endpoint': rss_endpoint,
                 'language': language, 'country': country, 'articles': articles}
 
 
@@ -162,40 +262,10 @@ def urls(topic=None, language=None, country=None):
     if topic != None:
         topic = topic.lower()
 
-    db = sqlite3.connect(DB_FILE, isolation_level=None)
-    quick_q = Query()
-    inp = {'topic': topic, 'language': language, 'country': country}
-    for x in inp.keys():
-        quick_q.params[x] = inp[x]
-
-    conditionals = []
-    conv = {'topic': 'topic_unified', 'website': 'clean_url',
-            'country': 'clean_country', 'language': 'language'}
-
-    for field in conv.keys():
-        try:
-            cond = quick_q.build_conditional(field, conv[field])
-        except: # NOSONAR: python:S5754
-            cond = None
-
-        if cond != None:
-            conditionals.append(cond)
-
-    sql = ''
-
-    if conditionals == []:
-        sql = 'SELECT clean_url from rss_main '
-    else:
-        conditionals[0] = ' WHERE ' + conditionals[0]
-        conditionals = ' AND '.join([x for x in conditionals if x is not None])
-        conditionals += ' AND main = 1 ORDER BY IFNULL(Globalrank,999999);'
-        sql = 'SELECT DISTINCT clean_url from rss_main' + conditionals
-
-    ret = db.execute(sql).fetchall()
+    ret = get_url_index().get((topic, language, country), [])
     if len(ret) == 0:
         print('\nNo websites found for given parameters\n')
         return
 
-    db.close()
-    return [x[0] for x in ret]
+    return list(ret)
 # End of Amazon addition.
\ No newline at end of file
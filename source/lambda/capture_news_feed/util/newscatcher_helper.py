@@ -6,13 +6,20 @@
 
 import json
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, datetime, timezone
+from functools import partial
+from hashlib import blake2b
 from urllib.parse import urlparse
 
+from util.article_pipeline import ArticlePipeline, ArticleStage
+from util.keyword_matcher import get_keyword_matcher
 from util.newscatcher import Newscatcher
 from shared_util import custom_logging
 
 from shared_util.stream_helper import buffer_data_into_stream
+from shared_util.text_helper import html_to_text, slice_text_into_arrays
 
 logger = custom_logging.get_logger(__name__)
 
@@ -21,6 +28,31 @@ rss_datetime_fromat_2 = "%a, %d %b %Y %H:%M:%S %Z"
 rss_datetime_fromat_3 = "%a, %d %b %Y %H:%M:%S"
 rss_datetime_fromat_4 = "%A, %B %d, %Y %I:%M %p %z"
 
+RFC822_FORMAT = "rfc822"
+RFC822_PATTERN = re.compile(
+    r"^\s*(?:[A-Za-z]{3},\s*)?(\d{1,2})\s+([A-Za-z]{3})\s+(\d{4})\s+(\d{1,2}):(\d{2})(?::(\d{2}))?"
+    r"(?:\s+(?:[+-]\d{2}:?\d{2}|[A-Za-z]{1,5}))?\s*$"
+)
+RFC822_MONTHS = {
+    month: index + 1
+    for index, month in enumerate(["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"])
+}
+# formats tried in order when the format of a site is not known yet
+TIMESTAMP_FORMATS = [
+    RFC822_FORMAT,
+    rss_datetime_fromat_1,
+    rss_datetime_fromat_2,
+    rss_datetime_fromat_3,
+    rss_datetime_fromat_4,
+]
+_site_timestamp_formats = {}
+
+# number of topic feeds of a url that are fetched in parallel
+MAX_FETCH_WORKERS = 8
+
+# size in bytes of the digest that identifies an article in its record id
+ARTICLE_ID_DIGEST_SIZE = 16
+
 
 class TopicNotSupportedError(Exception):
     pass
@@ -44,61 +76,74 @@ def get_topic_list():
     ]
 
 
-def retrieve_feed_from_all_topics(url):
+def retrieve_feed_from_all_topics(url, max_workers=MAX_FETCH_WORKERS, feed_cache=None):
+    """
+    This method retrieves the news feeds of all topics for a url concurrently, using a bounded thread pool. Each feed
+    request has its own timeout (and requests to the same host are limited) in 'Newscatcher', so a slow or dead feed
+    only delays its own topic. The aggregated feed is in the same order as 'get_topic_list'
+    """
     topic_list = get_topic_list()
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(topic_list))) as executor:
+        futures = [executor.submit(retrieve_feed, url, topic=topic, feed_cache=feed_cache) for topic in topic_list]
+
     aggregated_feed = []
-    for topic in topic_list:
+    for topic, future in zip(topic_list, futures):
         try:
-            aggregated_feed.append(retrieve_feed(url, topic=topic))
+            aggregated_feed.append(future.result())
         except TopicNotSupportedError as error:
             logger.debug(f"Skipping topic {topic} for {url} because {error}")
 
     return aggregated_feed
 
 
+def infer_published_date(feed):
+    """
+    Set the published date of an article without one from the date in its url path (/yyyy/mm/dd/...). Returns False
+    if the date cannot be inferred, in which case the article should not be processed
+    """
+    if feed.get("published", None):
+        return True
+
+    if feed.get("id", None):
+        parsed_date = urlparse(feed["id"]).path.split("/")[1:4]
+        try:
+            d = date(int(parsed_date[0]), int(parsed_date[1]), int(parsed_date[2]))
+            feed["published"] = f"{d.strftime(rss_datetime_fromat_1)}+0000"
+            feed["published_parsed"] = [
+                d.year,
+                d.month,
+                d.day,
+                0,
+                0,
+                0,
+                d.weekday(),
+                d.timetuple().tm_yday,
+                0,
+            ]
+            return True
+        except (ValueError, IndexError):
+            pass
+
+    # Do not process the article because could not infer published date and may result in duplicate processing
+    logger.error(f"Removing article with no published date or url path to infer a published date {json.dumps(feed)}")
+    return False
+
+
 def try_parsing_published_date(articles):
-    for feed in list(articles):
-        if not feed.get("published", None):
-            if feed.get("id", None):
-                parsed_date = urlparse(feed["id"]).path.split("/")[1:4]
-                try:
-                    d = date(int(parsed_date[0]), int(parsed_date[1]), int(parsed_date[2]))
-                    feed["published"] = f"{d.strftime(rss_datetime_fromat_1)}+0000"
-                    feed["published_parsed"] = [
-                        d.year,
-                        d.month,
-                        d.day,
-                        0,
-                        0,
-                        0,
-                        d.weekday(),
-                        d.timetuple().tm_yday,
-                        0,
-                    ]
-                except ValueError:
-                    logger.error(
-                        f"Removing article with no published date or url path to infer a published date {json.dumps(feed)}"
-                    )
-                    articles.remove(feed)
-            else:
-                # Do not process the article because could not infer published date and may result in duplicate processing
-                logger.error(
-                    f"Removing article with no published date or url path to infer a published date {json.dumps(feed)}"
-                )
-                articles.remove(feed)
-
-    return articles
-
-
-def retrieve_feed(url, topic=None):
+    # a single pass that keeps the articles with a (inferred) published date, instead of removing the others one by one
+    return [feed for feed in articles if infer_published_date(feed)]
+
+
+def retrieve_feed(url, topic=None, feed_cache=None):
     """
     This method retrieve the news articles using Newscatcher API. If not topic
     is passed, topic is None and the library defaults to the main topics that
-    are published which are 'News' in most cases
+    are published which are 'News' in most cases. If a 'feed_cache' is passed, the feed is requested conditionally
+    and a feed that has not changed since the last poll is returned with no articles
 
     """
     nc = Newscatcher(website=url, topic=topic)
-    news_feeds = nc.get_news()
+    news_feeds = nc.get_news(feed_cache=feed_cache)
     # patch for cnn.com/tech rss feeds since they don't have the "published" date. Taking date from url path
     if url == "cnn.com" and news_feeds:
         news_feeds["articles"] = try_parsing_published_date(news_feeds["articles"])
@@ -108,20 +153,59 @@ def retrieve_feed(url, topic=None):
     return news_feeds
 
 
-def get_published_timestamp(str_date):
-    published_datetime = None
+def parse_rfc822_timestamp(str_date):
+    """
+    Fast path for RFC 822 dates such as 'Thu, 18 Mar 2021 20:06:58 +0200', which covers rss_datetime_fromat_1 to 3.
+    Returns None if the date is not in that form, without raising an exception
+    """
+    match = RFC822_PATTERN.match(str_date)
+    if not match:
+        return None
+
+    day, month, year, hour, minute, second = match.groups()
+    month = RFC822_MONTHS.get(month.lower(), None)
+    if not month:
+        return None
+
     try:
-        published_datetime = datetime.strptime(str_date, rss_datetime_fromat_1)
+        return datetime(int(year), month, int(day), int(hour), int(minute), int(second or 0))
     except ValueError:
-        try:
-            published_datetime = datetime.strptime(str_date, rss_datetime_fromat_2)
-        except ValueError:
-            try:
-                published_datetime = datetime.strptime(str_date, rss_datetime_fromat_3)
-            except ValueError:
-                published_datetime = datetime.strptime(str_date, rss_datetime_fromat_4)
+        return None
+
+
+def _parse_timestamp(str_date, timestamp_format):
+    if timestamp_format == RFC822_FORMAT:
+        return parse_rfc822_timestamp(str_date)
+
+    try:
+        return datetime.strptime(str_date, timestamp_format)
+    except ValueError:
+        return None
+
+
+def get_published_timestamp(str_date, site=None):
+    """
+    Parse the published date of an article. The RFC 822 fast path is tried first, then the supported strptime formats.
+    All articles of a site use the same format, hence the format that worked is remembered per 'site' and tried first
+    for the next article of that site. As before, the time is returned as UTC without applying the zone offset
+    """
+    site_format = _site_timestamp_formats.get(site, None) if site else None
+    if site_format:
+        published_datetime = _parse_timestamp(str_date, site_format)
+        if published_datetime:
+            return published_datetime.replace(tzinfo=timezone.utc)
+
+    for timestamp_format in TIMESTAMP_FORMATS:
+        if timestamp_format == site_format:
+            continue
 
-    return published_datetime.replace(tzinfo=timezone.utc)
+        published_datetime = _parse_timestamp(str_date, timestamp_format)
+        if published_datetime:
+            if site:
+                _site_timestamp_formats[site] = timestamp_format
+            return published_datetime.replace(tzinfo=timezone.utc)
+
+    raise ValueError(f"time data '{str_date}' does not match any of the supported formats")
 
 
 def get_published_parsed_timestamp(parsed_date):
@@ -137,80 +221,206 @@ def get_published_parsed_timestamp(parsed_date):
     )
 
 
-def create_and_publish_record(news_feed, account_name, platform, last_published_timestamp=None, query_str=None):
-    language = news_feed["language"]
-    url = news_feed["url"]
-    country = news_feed["country"]
-    topic = news_feed["topic"]
-    articles = news_feed["articles"]
+class PublishSink:
+    """
+    End of the article pipeline: publishes the slices of each record into the Kinesis batch writer, which sends them
+    in batches, and keeps the published timestamp of the newest published article
+    """
 
-    query_str_list = query_str.split(",") if query_str else []
+    def __init__(self):
+        self.records_published = 0
+        self.slices_published = 0
+        self.newest_published_timestamp = None
+        self.elapsed = 0.0
 
-    # strip off html tags and other html tags starting with '&' and '#' present in regular text from RSS feeds controlled by
-    # a list of sites stored in SQLLite. Any ReDoS attack may stop ingestion of news feeds, with lambda timing out for a
-    # specific RSS provider site
-    cleanr = re.compile("<.*?>|&([a-z0-9]+|#[0-9]{1,6}|#x[0-9a-f]{1,6});")  # NOSONAR - Rule python:S4784.
+    def put(self, item):
+        start = time.perf_counter()
+        publish_record(item["record"], item["id_str"], item["text_array"])
+        self.elapsed += time.perf_counter() - start
 
-    for article in articles:
-        published_timestamp = None
-        try:
-            published_timestamp = news_feed_timestamp(article)
-        except ValueError:
-            logger.warning(f"Cannot parse published timestamp for {article}")
-            continue
+        self.records_published += 1
+        self.slices_published += len(item["text_array"])
+        if not self.newest_published_timestamp or item["published_timestamp"] > self.newest_published_timestamp:
+            self.newest_published_timestamp = item["published_timestamp"]
 
-        if last_published_timestamp and published_timestamp <= datetime.fromisoformat(last_published_timestamp):
-            continue
+    def get_stats(self):
+        return {
+            "records": self.records_published,
+            "slices": self.slices_published,
+            "seconds": round(self.elapsed, 6),
+        }
 
-        text = article.get("summary", article.get("title", None))
-        logger.debug(f"Article Detail: {article}")
-        # check if at least one element of list is present in the article summary else skip this article
-        if not check_article_text_contains_query(text, article, query_str_list):
-            continue
 
-        clean_text = re.sub(cleanr, "", text)
-        text_array = slice_text_into_arrays(clean_text)
-
-        # populate image urls
-        id_str = f"{str(int(datetime.now(timezone.utc).timestamp() * 1000))}#{url}"
-        image_urls = filter_link_types(article["links"], "image/jpeg")
-        entities, extended_entities = dict(), dict()
-        entities["media"], extended_entities["media"] = image_urls, image_urls
-
-                # populate text urls
-        text_urls = filter_link_types(article["links"], "text/html")
-        text_urls = filter_link_types(article["links"], "audio/mpeg") if not text_urls else text_urls
-
-        if text_urls:
-            entities["urls"], extended_entities["urls"] = text_urls, text_urls
-            publish_record(
-                {
-                    "account_name": account_name,
-                    "platform": platform,
-                    "search_query": query_str,
-                    "feed": {
-                        "created_at": published_timestamp.strftime("%Y-%m-%d %H:%M:%S"),
-                        "entities": entities,
-                        "extended_entities": extended_entities,
-                        "lang": language,
-                        "metadata": {"website": url, "country": country, "topic": topic},
-                    },
-                },
-                id_str,
-                text_array,
-            )
-        else:
-            logger.debug(f"Skipping news feed from {url} since could not get url from {json.dumps(article)}")
+def parse_published_timestamp_stage(url, item):
+    try:
+        item["published_timestamp"] = news_feed_timestamp(item["article"], site=url)
+    except ValueError:
+        logger.warning(f"Cannot parse published timestamp for {item['article']}")
+        return None
+    return item
+
+
+def filter_published_timestamp_stage(last_published_datetime, item):
+    if last_published_datetime and item["published_timestamp"] <= last_published_datetime:
+        return None
+    return item
+
+
+def filter_query_stage(keyword_matcher, item):
+    article = item["article"]
+    text = article.get("summary", article.get("title", None))
+    logger.debug(f"Article Detail: {article}")
+    # check if at least one keyword of the query is present in the article summary else skip this article
+    contains_query, item["matched_keywords"] = check_article_text_contains_query(text, article, keyword_matcher)
+    if not contains_query:
+        return None
+    item["text"] = text
+    return item
+
+
+def clean_text_stage(item):
+    # strip off html tags and decode html entities present in regular text from RSS feeds. The cleaner runs in linear
+    # time, hence a malformed summary from an RSS provider site cannot stall the ingestion
+    item["text_array"] = slice_text_into_arrays(html_to_text(item["text"]))
+    return item
+
+
+def create_record_stage(news_feed, account_name, platform, query_str, item):
+    article, url = item["article"], news_feed["url"]
+
+    # populate image urls
+    image_urls = filter_link_types(article["links"], "image/jpeg")
+    entities, extended_entities = dict(), dict()
+    entities["media"], extended_entities["media"] = image_urls, image_urls
+
+    # populate text urls
+    text_urls = filter_link_types(article["links"], "text/html")
+    text_urls = filter_link_types(article["links"], "audio/mpeg") if not text_urls else text_urls
+    if not text_urls:
+        logger.debug(f"Skipping news feed from {url} since could not get url from {json.dumps(article)}")
+        return None
+    entities["urls"], extended_entities["urls"] = text_urls, text_urls
+
+    metadata = {"website": url, "country": news_feed["country"], "topic": news_feed["topic"]}
+    if item["matched_keywords"]:
+        metadata["matched_keywords"] = item["matched_keywords"]
+
+    item["id_str"] = f"{get_article_id(article)}#{url}"
+    item["record"] = {
+        "account_name": account_name,
+        "platform": platform,
+        "search_query": query_str,
+        "feed": {
+            "created_at": item["published_timestamp"].strftime("%Y-%m-%d %H:%M:%S"),
+            "entities": entities,
+            "extended_entities": extended_entities,
+            "lang": news_feed["language"],
+            "metadata": metadata,
+        },
+    }
+    return item
+
+
+def filter_seen_stage(seen_cache, account_name, query_str, claimed_ids, item):
+    # skip the articles already published for this configuration, by a previous run or by an overlapping one
+    if not seen_cache.claim(account_name, query_str, item["id_str"]):
+        return None
+    claimed_ids.append(item["id_str"])
+    return item
+
+
+def get_article_id(article):
+    """
+    Deterministic id of an article, the same every time the article is polled: a digest of its guid, or of its link if
+    the feed has no guids, or of its title, summary and published date if it has neither
+    """
+    key = article.get("id", None) or article.get("link", None)
+    if not key:
+        key = "#".join(str(article.get(field, "")) for field in ("title", "summary", "published"))
+    return blake2b(key.encode("utf-8"), digest_size=ARTICLE_ID_DIGEST_SIZE).hexdigest()
+
+
+def create_article_pipeline(
+    news_feed,
+    account_name,
+    platform,
+    last_published_timestamp=None,
+    query_str=None,
+    case_insensitive=False,
+    whole_word=False,
+    seen_cache=None,
+    claimed_ids=None,
+):
+    """
+    Build the stages that turn the articles of a news feed into published records. With a 'seen_cache', articles that
+    were already published are skipped, and the ids of the articles claimed are appended to 'claimed_ids'
+    """
+    last_published_datetime = datetime.fromisoformat(last_published_timestamp) if last_published_timestamp else None
+    keyword_matcher = get_keyword_matcher(query_str, case_insensitive, whole_word) if query_str else None
+
+    stages = [
+        ArticleStage("parse_timestamp", partial(parse_published_timestamp_stage, news_feed["url"])),
+        ArticleStage("filter_timestamp", partial(filter_published_timestamp_stage, last_published_datetime)),
+        ArticleStage("filter_query", partial(filter_query_stage, keyword_matcher)),
+        ArticleStage("clean_text", clean_text_stage),
+        ArticleStage("create_record", partial(create_record_stage, news_feed, account_name, platform, query_str)),
+    ]
+    if seen_cache:
+        claimed_ids = claimed_ids if claimed_ids is not None else []
+        stages.append(
+            ArticleStage("filter_seen", partial(filter_seen_stage, seen_cache, account_name, query_str, claimed_ids))
+        )
+    return ArticlePipeline(stages, PublishSink())
+
+
+def create_and_publish_record(
+    news_feed,
+    account_name,
+    platform,
+    last_published_timestamp=None,
+    query_str=None,
+    case_insensitive=False,
+    whole_word=False,
+    seen_cache=None,
+    claimed_ids=None,
+):
+    """
+    Publish the articles of a news feed that are newer than 'last_published_timestamp' and contain a keyword of the
+    search query (and, with a 'seen_cache', that were not published before). Returns the published timestamp of the
+    newest published article, or None if nothing was published
+    """
+    pipeline = create_article_pipeline(
+        news_feed,
+        account_name,
+        platform,
+        last_published_timestamp,
+        query_str,
+        case_insensitive,
+        whole_word,
+        seen_cache=seen_cache,
+        claimed_ids=claimed_ids,
+    )
+    sink = pipeline.run({"article": article} for article in news_feed["articles"])
+    logger.info(f"Article pipeline stats for {news_feed['url']} {news_feed['topic']}: {pipeline.get_stats()}")
+    return sink.newest_published_timestamp
 
 
-def check_article_text_contains_query(text, article, query_str_list):
+def check_article_text_contains_query(text, article, keyword_matcher=None):
+    """
+    Returns whether the article should be published and the keywords of the search query found in its text. Without a
+    'keyword_matcher' (no search query) every article with text is published
+    """
     if not text:
         logger.debug(f"Could not find article in newsfeed {article}")
-        return False
-    if len(query_str_list) > 0 and not any(keyword in text for keyword in query_str_list):
-        logger.debug(f"Did not find keywords from {query_str_list} in {article}")
-        return False
-    return True
+        return False, []
+    if not keyword_matcher:
+        return True, []
+
+    matched_keywords = keyword_matcher.find(text)
+    if not matched_keywords:
+        logger.debug(f"Did not find keywords from {keyword_matcher.keywords} in {article}")
+        return False, []
+    return True, matched_keywords
 
 
 def publish_record(record_to_publish, id_str, text_array):
@@ -225,7 +435,7 @@ def publish_record(record_to_publish, id_str, text_array):
         buffer_data_into_stream(record_to_publish, partition_key=id_str)
 
 
-def news_feed_timestamp(article):
+def news_feed_timestamp(article, site=None):
     published_timestamp = None
     published_parsed = article.get("published_parsed", None)
     if published_parsed:
@@ -233,7 +443,7 @@ def news_feed_timestamp(article):
     elif article.get("published", None):
         # sample published time stamp Thu, 18 Mar 2021 20:06:58 +0200
         try:
-            published_timestamp = get_published_timestamp(article["published"])
+            published_timestamp = get_published_timestamp(article["published"], site=site)
         except (ValueError, KeyError) as error:
             logger.debug(f"Could not parse time information and hence skipping record {article}")
             raise error
@@ -243,14 +453,6 @@ def news_feed_timestamp(article):
     return published_timestamp
 
 
-def slice_text_into_arrays(text):
-    # Amazon Comprehend has a size limit of 5000 bytes for async jobs and sync jobs. Hence the need to split
-    # an utf-8 or unicode charset can take up to 4 bytes. Each slice cannot be more than 5000.
-    # Hence taking 1250 (5000/4) to make sure a slice of a string does not split the bytes of a single character.
-    each_string_element_size = 1250
-    return [text[i : i + each_string_element_size] for i in range(0, len(text), each_string_element_size)]
-
-
 def filter_link_types(links, content_type):
     media_list = list(filter(lambda link: content_type in link["type"], links))
     response_list = list()
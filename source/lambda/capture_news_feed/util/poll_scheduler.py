@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+######################################################################################################################
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+######################################################################################################################
+
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+from botocore.exceptions import ClientError
+from shared_util import custom_logging, service_helper
+
+from util.ddb_helper import BASE_BACKOFF_SECONDS, MAX_ATTEMPTS, MAX_BATCH_GET_KEYS
+from util.newscatcher_helper import get_published_parsed_timestamp, get_published_timestamp
+
+logger = custom_logging.get_logger(__name__)
+
+# prefix and fixed sort key of the query tracker table items that hold the polling schedule of a url
+SCHEDULE_PREFIX = "POLL_SCHEDULE"
+
+DEFAULT_MIN_INTERVAL_MINUTES = 15
+DEFAULT_MAX_INTERVAL_MINUTES = 24 * 60
+# a url is polled when it is expected to have published this many articles since the last poll
+TARGET_ARTICLES_PER_POLL = 1
+# weight of the latest poll in the arrival rate, the rest is the rate estimated by the previous polls
+RATE_SMOOTHING = 0.5
+BACKOFF_FACTOR = 2
+# scheduled invocations do not start at the exact same second, a url that becomes due shortly after the start of an
+# invocation is polled by it instead of waiting for the next one
+DUE_TOLERANCE = timedelta(minutes=1)
+
+
+def is_adaptive_polling_enabled():
+    return os.environ.get("ADAPTIVE_POLLING", "false").lower() == "true"
+
+
+def count_new_articles(articles, since):
+    """
+    Number of articles published after 'since'. Articles without a published date, or with one that cannot be parsed,
+    are not counted, and an article that is in more than one feed of a url (same id or link) is counted once
+    """
+    count = 0
+    seen_ids = set()
+    for article in articles:
+        article_id = article.get("id", None) or article.get("link", None)
+        if article_id:
+            if article_id in seen_ids:
+                continue
+            seen_ids.add(article_id)
+        try:
+            if article.get("published_parsed", None):
+                published_timestamp = get_published_parsed_timestamp(article["published_parsed"])
+            elif article.get("published", None):
+                published_timestamp = get_published_timestamp(article["published"])
+            else:
+                continue
+        except (ValueError, KeyError, TypeError):
+            continue
+        if published_timestamp > since:
+            count += 1
+    return count
+
+
+def compute_schedule(schedule, articles, now, min_interval, max_interval):
+    """
+    Returns the schedule of a url after a poll that returned 'articles'. The arrival rate (articles per hour) is
+    estimated from the articles published since the last poll and smoothed over the polls. A poll that found new
+    articles sets the interval to the time in which the url is expected to publish TARGET_ARTICLES_PER_POLL articles;
+    a poll that found none doubles the interval (exponential backoff). The interval is kept between 'min_interval' and
+    'max_interval'. On the first poll the articles of the last 'max_interval' are used
+    """
+    since = schedule["last_polled"] if schedule else now - max_interval
+    elapsed_hours = max((now - since).total_seconds() / 3600, 1 / 60)
+    new_articles = count_new_articles(articles, since)
+
+    observed_rate = new_articles / elapsed_hours
+    if schedule:
+        arrival_rate = RATE_SMOOTHING * observed_rate + (1 - RATE_SMOOTHING) * schedule["arrival_rate"]
+    else:
+        arrival_rate = observed_rate
+
+    if new_articles:
+        interval = timedelta(hours=TARGET_ARTICLES_PER_POLL / arrival_rate)
+    elif schedule:
+        interval = schedule["interval"] * BACKOFF_FACTOR
+    else:
+        interval = min_interval
+    interval = min(max(interval, min_interval), max_interval)
+
+    return {
+        "last_polled": now,
+        "next_due": now + interval,
+        "interval": interval,
+        "arrival_rate": arrival_rate,
+        "new_articles": new_articles,
+    }
+
+
+def is_due(schedule, now):
+    return not schedule or schedule["next_due"] <= now + DUE_TOLERANCE
+
+
+class PollScheduler:
+    """
+    This class keeps a polling schedule per configuration (account and search query) and url in the query tracker
+    table, so that urls that rarely publish are polled less often than the busy ones. 'get_due_urls' is called when
+    publishing the config events of a configuration, to only emit the urls that are due; 'record_poll' is called after
+    a url is polled for that configuration, to compute when it is due next. The schedules are per configuration since
+    every configuration polls a url on its own: a poll by one configuration does not tell when the url is due for
+    another one.
+
+    Errors are logged and not raised, a url without a readable schedule is polled
+    """
+
+    def __init__(self, account, search_query=None, dynamodb_client=None, min_interval=None, max_interval=None):
+        self.dynamodb_client = dynamodb_client if dynamodb_client else service_helper.get_service_client("dynamodb")
+        self.table_name = os.environ["TARGET_DDB_TABLE"]
+        self.account = account
+        self.search_query = search_query
+        self.min_interval = (
+            min_interval
+            if min_interval
+            else timedelta(minutes=int(os.environ.get("MIN_POLL_INTERVAL_MINUTES", DEFAULT_MIN_INTERVAL_MINUTES)))
+        )
+        self.max_interval = (
+            max_interval
+            if max_interval
+            else timedelta(minutes=int(os.environ.get("MAX_POLL_INTERVAL_MINUTES", DEFAULT_MAX_INTERVAL_MINUTES)))
+        )
+
+    def _get_id(self, url):
+        return "#".join([SCHEDULE_PREFIX, self.account, self.search_query or "", url])
+
+    def _get_key(self, url):
+        return {"ID": {"S": self._get_id(url)}, "LAST_PUBLISHED_TIMESTAMP": {"S": SCHEDULE_PREFIX}}
+
+    @staticmethod
+    def _from_item(item):
+        return {
+            "last_polled": datetime.fromisoformat(item["LAST_POLLED"]["S"]),
+            "next_due": datetime.fromisoformat(item["NEXT_DUE"]["S"]),
+            "interval": timedelta(seconds=int(item["INTERVAL"]["N"])),
+            "arrival_rate": float(item["ARRIVAL_RATE"]["N"]),
+        }
+
+    def get_schedules(self, urls):
+        """Returns the schedules of the urls that have one, keyed by url, reading them with BatchGetItem"""
+        urls_by_id = {self._get_id(url): url for url in urls}
+        keys = [self._get_key(url) for url in dict.fromkeys(urls)]
+        schedules = {}
+        for index in range(0, len(keys), MAX_BATCH_GET_KEYS):
+            request_items = {self.table_name: {"Keys": keys[index : index + MAX_BATCH_GET_KEYS]}}
+            for attempt in range(MAX_ATTEMPTS):
+                try:
+                    response = self.dynamodb_client.batch_get_item(RequestItems=request_items)
+                except ClientError as error:
+                    logger.warning(f"Could not read poll schedules: {error}")
+                    break
+
+                for item in response["Responses"].get(self.table_name, []):
+                    schedules[urls_by_id[item["ID"]["S"]]] = self._from_item(item)
+
+                request_items = response.get("UnprocessedKeys", None)
+                if not request_items:
+                    break
+                time.sleep(BASE_BACKOFF_SECONDS * (2**attempt))
+        return schedules
+
+    def get_due_urls(self, urls, now=None):
+        """Returns the urls that are due to be polled, in their original order"""
+        now = now if now else datetime.now(timezone.utc)
+        schedules = self.get_schedules(urls)
+        due_urls = [url for url in urls if is_due(schedules.get(url, None), now)]
+        logger.info(f"{len(due_urls)} of {len(urls)} urls are due to be polled")
+        return due_urls
+
+    def get_schedule(self, url):
+        try:
+            response = self.dynamodb_client.get_item(TableName=self.table_name, Key=self._get_key(url))
+        except ClientError as error:
+            logger.warning(f"Could not read poll schedule of {url}: {error}")
+            return None
+        item = response.get("Item", None)
+        return self._from_item(item) if item else None
+
+    def record_poll(self, url, articles, now=None):
+        """Computes and stores the next schedule of a url from the articles returned by a poll"""
+        now = now if now else datetime.now(timezone.utc)
+        schedule = compute_schedule(self.get_schedule(url), articles, now, self.min_interval, self.max_interval)
+        logger.debug(f"Poll schedule of {url}: {schedule}")
+
+        item = self._get_key(url)
+        item["LAST_POLLED"] = {"S": schedule["last_polled"].isoformat()}
+        item["NEXT_DUE"] = {"S": schedule["next_due"].isoformat()}
+        item["INTERVAL"] = {"N": str(int(schedule["interval"].total_seconds()))}
+        item["ARRIVAL_RATE"] = {"N": f"{schedule['arrival_rate']:.6f}"}
+        # the schedule of a url that is not polled anymore (removed from the configuration) expires
+        item["EXP_DATE"] = {"N": str(int((now + 2 * self.max_interval).timestamp()))}
+        try:
+            self.dynamodb_client.put_item(TableName=self.table_name, Item=item)
+        except ClientError as error:
+            logger.warning(f"Could not update poll schedule of {url}: {error}")
+        return schedule
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+######################################################################################################################
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+######################################################################################################################
+
+import ipaddress
+import os
+import re
+import threading
+from collections import namedtuple
+from functools import lru_cache
+
+# ICANN section of the public suffix list (https://publicsuffix.org/list/public_suffix_list.dat), bundled with the
+# function so that extracting a domain never downloads the list or writes a cache at runtime
+PUBLIC_SUFFIX_FILE = os.path.join(os.path.dirname(__file__), "newscatcher_data", "public_suffix_list.dat")
+MAX_CACHED_HOSTNAMES = 4096
+
+ExtractResult = namedtuple("ExtractResult", ["subdomain", "domain", "suffix"])
+
+# key of the trie nodes that end a rule; labels are strings so it cannot clash with one
+_END = None
+_WILDCARD = "*"
+_EXCEPTION = "!"
+
+SCHEME_PATTERN = re.compile(r"^[A-Za-z0-9+.-]+://")
+LABEL_SEPARATORS = str.maketrans({"。": ".", "．": ".", "｡": "."})
+
+_trie = None
+_trie_lock = threading.Lock()
+
+
+def _to_ascii(label):
+    return "xn--" + label.encode("punycode").decode("ascii") if not label.isascii() else label
+
+
+def load_trie(suffix_file=PUBLIC_SUFFIX_FILE):
+    """
+    Reads the rules of the public suffix list into a trie of nested dicts keyed by label, from the top level domain
+    down: 'co.uk' is trie['uk']['co'], a '*' key is a wildcard rule and a '!label' key an exception to it. Rules with
+    internationalized labels are added in their unicode and punycode forms, so that labels are looked up as they are
+    """
+    trie = {}
+    with open(suffix_file, encoding="utf-8") as suffix_list:
+        for line in suffix_list:
+            rule = line.strip().lower()
+            if not rule or rule.startswith("//"):
+                continue
+            rule = rule.split()[0]
+            for form in {rule, ".".join(_to_ascii(label) for label in rule.split("."))}:
+                node = trie
+                for label in reversed(form.split(".")):
+                    node = node.setdefault(label, {})
+                node[_END] = True
+    return trie
+
+
+def get_trie():
+    """Returns the public suffix trie, loading it once per container on first use"""
+    global _trie
+    if _trie is None:
+        with _trie_lock:
+            if _trie is None:
+                _trie = load_trie()
+    return _trie
+
+
+def get_hostname(url):
+    """
+    Returns the lower case hostname of a url, without scheme, credentials, port or trailing dot. Also accepts a bare
+    hostname ('www.example.com/news')
+    """
+    hostname = SCHEME_PATTERN.sub("", url, count=1)
+    if hostname.startswith("//"):
+        hostname = hostname[2:]
+    hostname = hostname.partition("/")[0].partition("?")[0].partition("#")[0].rpartition("@")[2]
+    if hostname.startswith("["):
+        ipv6, bracket, _ = hostname.partition("]")
+        if bracket:
+            return f"{ipv6}]"
+    return hostname.partition(":")[0].strip().translate(LABEL_SEPARATORS).rstrip(".").lower()
+
+
+def get_suffix_index(labels, trie):
+    """Index of the first label of the longest public suffix of 'labels', len(labels) if there is none"""
+    suffix_index = len(labels)
+    node = trie
+    for index in range(len(labels) - 1, -1, -1):
+        label = labels[index]
+        if label in node:
+            node = node[label]
+            if _END in node:
+                suffix_index = index
+            continue
+        if _WILDCARD in node:
+            # '!www.ck' makes 'ck' the suffix of 'www.ck', '*.ck' makes 'example.ck' a suffix
+            return index + 1 if _EXCEPTION + label in node else index
+        break
+    return suffix_index
+
+
+@lru_cache(maxsize=MAX_CACHED_HOSTNAMES)
+def split_hostname(hostname):
+    """Splits a hostname into subdomain, registrable domain label and public suffix. IP addresses have no suffix"""
+    if hostname.startswith("["):
+        return ExtractResult("", hostname, "")
+
+    labels = hostname.split(".")
+    suffix_index = get_suffix_index(labels, get_trie())
+    if suffix_index == len(labels):
+        try:
+            ipaddress.IPv4Address(hostname)
+            return ExtractResult("", hostname, "")
+        except ValueError:
+            pass
+    return ExtractResult(
+        ".".join(labels[: max(suffix_index - 1, 0)]),
+        labels[suffix_index - 1] if suffix_index else "",
+        ".".join(labels[suffix_index:]),
+    )
+
+
+def extract(url):
+    """
+    Offline replacement of 'tldextract.extract' with the ICANN suffixes only: 'http://news.bbc.co.uk/world' is
+    ExtractResult(subdomain='news', domain='bbc', suffix='co.uk'). Results are memoized per hostname
+    """
+    return split_hostname(get_hostname(url))
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+######################################################################################################################
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+######################################################################################################################
+
+"""
+Compares writing topic terms to Kinesis Data Firehose with one PutRecord call per term against the batched
+'store_topics' path. The firehose client is replaced by a local stand-in that sleeps for a fixed round-trip latency
+on every call, so the comparison reflects the number of round-trips rather than moto overhead.
+
+Run from the lambda function root directory: python -m test.benchmark.bench_topic --topics 100 --terms 10
+"""
+
+import argparse
+import json
+import os
+import time
+from unittest.mock import patch
+
+
+class LatencyFirehoseClient:
+    """Stand-in firehose client that accepts every record after a simulated network round-trip"""
+
+    def __init__(self, latency_ms):
+        self.latency = latency_ms / 1000
+        self.calls = 0
+
+    def put_record(self, DeliveryStreamName, Record):
+        self.calls += 1
+        time.sleep(self.latency)
+        return {"RecordId": "fakerecordid", "Encrypted": False}
+
+    def put_record_batch(self, DeliveryStreamName, Records):
+        self.calls += 1
+        time.sleep(self.latency)
+        return {"FailedPutCount": 0, "RequestResponses": [{"RecordId": "fakerecordid"} for _ in Records]}
+
+
+def set_environment():
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+    os.environ.setdefault("AWS_REGION", "us-east-1")
+    os.environ.setdefault("AWS_SDK_USER_AGENT", '{ "user_agent_extra": "solution/fakeID/fakeVersion" }')
+    os.environ.setdefault("TOPICS_FIREHOSE", "Topics")
+
+
+def create_topics(topic_count, term_count):
+    return {
+        f"{topic_index:03d}": [
+            {
+                "job_id": "1234567890123456789012345",
+                "job_timestamp": "2020-06-26T19:05:16.785Z",
+                "topic": f"{topic_index:03d}",
+                "term": f"term{term_index}",
+                "weight": "0.09484477",
+            }
+            for term_index in range(term_count)
+        ]
+        for topic_index in range(topic_count)
+    }
+
+
+def run_per_record(client, topics):
+    start = time.perf_counter()
+    for key in topics:
+        for record in topics[key]:
+            client.put_record(
+                DeliveryStreamName=os.environ["TOPICS_FIREHOSE"], Record={"Data": json.dumps(record) + "\n"}
+            )
+    return time.perf_counter() - start
+
+
+def run_batched(client, topics):
+    from util import topic
+
+    start = time.perf_counter()
+    with patch.object(topic, "firehose", client):
+        topic.store_topics(topics)
+    return time.perf_counter() - start
+
+
+def main(topic_count, term_count, latency_ms):
+    set_environment()
+    topics = create_topics(topic_count, term_count)
+    record_count = topic_count * term_count
+
+    per_record_client = LatencyFirehoseClient(latency_ms)
+    per_record_elapsed = run_per_record(per_record_client, topics)
+    batched_client = LatencyFirehoseClient(latency_ms)
+    batched_elapsed = run_batched(batched_client, topics)
+
+    print(f"records: {record_count}, simulated latency: {latency_ms}ms")
+    print(f"put_record       : {per_record_elapsed:8.3f}s {per_record_client.calls:6d} calls")
+    print(f"put_record_batch : {batched_elapsed:8.3f}s {batched_client.calls:6d} calls")
+    print(f"speedup          : {per_record_elapsed / batched_elapsed:8.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--topics", type=int, default=100)
+    parser.add_argument("--terms", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    args = parser.parse_args()
+    main(args.topics, args.terms, args.latency_ms)
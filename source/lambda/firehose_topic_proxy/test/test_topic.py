@@ -185,3 +185,69 @@ def test_mappings_topics():
     }
 
     store_mappings(topicsEvent["detail"])
+
+
+def test_store_topics_in_a_single_batch():
+    from util import topic
+
+    topics = {
+        f"{topic_index:03d}": [
+            {
+                "job_id": "1234567890123456789012345",
+                "job_timestamp": "2020-06-26T19:05:16.785Z",
+                "topic": f"{topic_index:03d}",
+                "term": f"term{term_index}",
+                "weight": "0.09484477",
+            }
+            for term_index in range(10)
+        ]
+        for topic_index in range(10)
+    }
+
+    with patch.object(topic, "firehose") as firehose_mock:
+        firehose_mock.put_record_batch.return_value = {"FailedPutCount": 0, "RequestResponses": []}
+        topic.store_topics(topics)
+
+    firehose_mock.put_record.assert_not_called()
+    firehose_mock.put_record_batch.assert_called_once()
+    call_args = firehose_mock.put_record_batch.call_args.kwargs
+    assert call_args["DeliveryStreamName"] == "Topics"
+    assert len(call_args["Records"]) == 100
+    assert json.loads(call_args["Records"][0]["Data"]) == {
+        "job_id": "1234567890123456789012345",
+        "job_timestamp": "2020-06-26 19:05:16",
+        "topic": "000",
+        "term": "term0",
+        "weight": "0.09484477",
+        "created_at": "2020-06-26 19:05:16",
+    }
+
+
+def test_store_mappings_in_a_batch():
+    from util import topic
+
+    mapping = {
+        "platform": "twitter",
+        "job_id": "1234567890123456789012345",
+        "job_timestamp": "2020-06-26T19:05:16.785Z",
+        "id_str": "1274349265528057858",
+        "topic": "001",
+    }
+
+    with patch.object(topic, "firehose") as firehose_mock:
+        firehose_mock.put_record_batch.return_value = {"FailedPutCount": 0, "RequestResponses": [{"RecordId": "1"}]}
+        topic.store_mappings(mapping)
+
+    firehose_mock.put_record.assert_not_called()
+    firehose_mock.put_record_batch.assert_called_once()
+    call_args = firehose_mock.put_record_batch.call_args.kwargs
+    assert call_args["DeliveryStreamName"] == "TopicMappings"
+    assert len(call_args["Records"]) == 1
+    assert json.loads(call_args["Records"][0]["Data"]) == {
+        "platform": "twitter",
+        "job_id": "1234567890123456789012345",
+        "job_timestamp": "2020-06-26 19:05:16",
+        "topic": "001",
+        "id_str": "1274349265528057858",
+        "created_at": "2020-06-26 19:05:16",
+    }
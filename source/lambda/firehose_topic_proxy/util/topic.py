@@ -12,6 +12,7 @@ from datetime import datetime
 import boto3
 from botocore import config
 from shared_util import custom_boto_config, custom_logging
+from shared_util.firehose_helper import FirehoseBatchWriter
 
 logger = custom_logging.get_logger(__name__)
 
@@ -19,17 +20,16 @@ firehose = boto3.client("firehose", config=custom_boto_config.init())
 
 
 def store_topics(data):
-    for key in data:
-        for record in data[key]:
-            logger.debug("Record information for writing to Firehose is " + json.dumps(record))
-            record_timestamp = datetime.strftime(
-                datetime.strptime(record["job_timestamp"], "%Y-%m-%dT%H:%M:%S.%fZ"),
-                "%Y-%m-%d %H:%M:%S",
-            )
-            response = firehose.put_record(
-                DeliveryStreamName=os.environ["TOPICS_FIREHOSE"],
-                Record={
-                    "Data": json.dumps(
+    with FirehoseBatchWriter(os.environ["TOPICS_FIREHOSE"], firehose_client=firehose) as writer:
+        for key in data:
+            for record in data[key]:
+                logger.debug("Record information for writing to Firehose is " + json.dumps(record))
+                record_timestamp = datetime.strftime(
+                    datetime.strptime(record["job_timestamp"], "%Y-%m-%dT%H:%M:%S.%fZ"),
+                    "%Y-%m-%d %H:%M:%S",
+                )
+                writer.put(
+                    json.dumps(
                         {
                             "job_id": record["job_id"],
                             "job_timestamp": record_timestamp,
@@ -42,9 +42,8 @@ def store_topics(data):
                         }
                     )
                     + "\n"
-                },
-            )
-            logger.debug("Response for record " + record["job_id"] + "is " + json.dumps(response))
+                )
+    logger.debug(f"Wrote {writer.records_sent} topic records with batch latencies {writer.batch_latencies}")
 
 
 def store_mappings(data):
@@ -52,10 +51,9 @@ def store_mappings(data):
     record_timestamp = datetime.strftime(
         datetime.strptime(data["job_timestamp"], "%Y-%m-%dT%H:%M:%S.%fZ"), "%Y-%m-%d %H:%M:%S"
     )
-    response = firehose.put_record(
-        DeliveryStreamName=os.environ["TOPIC_MAPPINGS_FIREHOSE"],
-        Record={
-            "Data": json.dumps(
+    with FirehoseBatchWriter(os.environ["TOPIC_MAPPINGS_FIREHOSE"], firehose_client=firehose) as writer:
+        writer.put(
+            json.dumps(
                 {
                     "platform": data["platform"],
                     "job_id": data["job_id"],
@@ -68,11 +66,9 @@ def store_mappings(data):
                 }
             )
             + "\n"
-        },
-    )
+        )
     logger.debug(
-        "Response for record "
+        "Wrote mapping record "
         + json.dumps({"platform": data["platform"], "topic": data["topic"], "id_str": data["id_str"]})
-        + "is "
-        + json.dumps(response)
+        + f" with batch latencies {writer.batch_latencies}"
     )
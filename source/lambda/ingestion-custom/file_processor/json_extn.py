@@ -20,7 +20,7 @@ from abc import ABC
 from datetime import datetime, timezone
 
 from shared_util.custom_logging import get_logger
-from shared_util.stream_helper import buffer_data_into_stream
+from shared_util.stream_helper import KinesisBatchWriter, buffer_data_into_stream
 from util import helpers, s3_util
 
 from file_processor.file_processor import FileProcessor, FileProcessorBuilder
@@ -80,7 +80,8 @@ class JSONFileProcessor(FileProcessor):
     def process_file(self, bucket_name: str, key_prefix: str):
         # download the file and build the array of json documents
         file_path = s3_util.download_file(bucket_name, key_prefix)
-        with open(file_path) as json_file:
+        # records are buffered and written to the stream in batches, the writer flushes when the file is processed
+        with open(file_path) as json_file, KinesisBatchWriter():
             # generating a parent_id as a mechanism to aggregate records from the same file. An index will
             # be appended to this parent_id for each individual record using '#' delimiter
             parent_id = None
@@ -19,7 +19,7 @@ import botocore
 import openpyxl
 from shared_util.custom_logging import get_logger
 from shared_util.service_helper import get_service_client, get_service_resource
-from shared_util.stream_helper import buffer_data_into_stream
+from shared_util.stream_helper import KinesisBatchWriter, buffer_data_into_stream
 from util import helpers, s3_util
 from util.constants import TIMESTAMP_FORMAT, ACCOUNT_NAME, CREATED_DATE, ID, LANG, PLATFORM, TEXT
 from file_processor.file_processor import (
@@ -57,10 +57,11 @@ class ExcelFileProcessor(FileProcessor):
         self.header_list = list(map(lambda x: x.value, worksheet[1]))
 
         """ Process each row of the worksheet. Assuming that it has a header, reading from 2nd row """
-        for row in worksheet.iter_rows(min_row=2, values_only=True):
-            data = self.transform_row(row)
-            data["source_file"] = os.path.basename(file_path)
-            buffer_data_into_stream(data, partition_key=data["feed"]["id_str"])
+        with KinesisBatchWriter():
+            for row in worksheet.iter_rows(min_row=2, values_only=True):
+                data = self.transform_row(row)
+                data["source_file"] = os.path.basename(file_path)
+                buffer_data_into_stream(data, partition_key=data["feed"]["id_str"])
 
         # now since the file is processed, delete the file. This would ensure if the same lambda instance is used,
         # it would not have the same file in the /tmp directory
@@ -10,6 +10,7 @@ import botocore
 import pytest
 import mock
 from botocore.stub import Stubber
+from shared_util.event_bridge_helper import MAX_ATTEMPTS
 from util.event_bridge_util import send_event, EventPublishException
 
 
@@ -71,29 +72,31 @@ def test_send_event(get_event_bus_stubber):
 
 
 @mock.patch.dict(os.environ, env_patcher_dict())
-def test_send_failure(get_event_bus_stubber):
+@mock.patch("shared_util.batch_writer.time.sleep")
+def test_send_failure(mocked_sleep, get_event_bus_stubber):
     payload = json.dumps(get_json_payload())
-    get_event_bus_stubber.add_response(
-        "put_events",
-        {"Entries": [{"EventId": "fakeeventid"}], "FailedEntryCount": 1},
-        {
-            "Entries": [
-                {
-                    "EventBusName": os.environ["INTEGRATION_BUS_NAME"],
-                    "Source": os.environ["NAMESPACE"],
-                    "Detail": payload,
-                    "DetailType": "fakedetailtype",
-                }
-            ]
-        },
-    )
+    # the failed entry is resubmitted until the attempts are exhausted
+    for _ in range(MAX_ATTEMPTS):
+        get_event_bus_stubber.add_response(
+            "put_events",
+            {"Entries": [{"ErrorCode": "InternalFailure", "ErrorMessage": "fake error"}], "FailedEntryCount": 1},
+            {
+                "Entries": [
+                    {
+                        "EventBusName": os.environ["INTEGRATION_BUS_NAME"],
+                        "Source": os.environ["NAMESPACE"],
+                        "Detail": payload,
+                        "DetailType": "fakedetailtype",
+                    }
+                ]
+            },
+        )
 
     get_event_bus_stubber.activate()
 
-    try:
-        response = send_event(payload, "fakedetailtype", os.environ["NAMESPACE"])
-    except EventPublishException as e:
-        assert str(e) == f"Following record failed publishing {payload}"
+    with pytest.raises(EventPublishException) as e:
+        send_event(payload, "fakedetailtype", os.environ["NAMESPACE"])
+    assert str(e.value) == f"Following record failed publishing {payload}"
 
     get_event_bus_stubber.assert_no_pending_responses()
     get_event_bus_stubber.deactivate()
@@ -18,6 +18,7 @@ import botocore
 import json
 from shared_util.custom_logging import get_logger
 from shared_util.service_helper import get_service_client
+from shared_util.event_bridge_helper import EventBridgeBatcher
 from file_processor.file_processor import IncorrectEnvSetup
 
 logger = get_logger(__name__)
@@ -33,17 +34,16 @@ def send_event(payload, detail_type, source):
     name to be set as a lambda environment variable
     """
     if os.environ.get("INTEGRATION_BUS_NAME", None):
-        events = get_service_client("events")
-        response = events.put_events(
-            Entries=[
-                {
-                    "EventBusName": os.environ["INTEGRATION_BUS_NAME"],
-                    "Detail": payload,
-                    "DetailType": detail_type,
-                    "Source": source,
-                }
-            ]
+        batcher = EventBridgeBatcher(event_bus=get_service_client("events"))
+        batcher.put(
+            {
+                "EventBusName": os.environ["INTEGRATION_BUS_NAME"],
+                "Detail": payload,
+                "DetailType": detail_type,
+                "Source": source,
+            }
         )
+        response = batcher.flush()
 
         if response["FailedEntryCount"] and response["FailedEntryCount"] > 0:
             err_msg = f"Following record failed publishing {payload}"
@@ -12,11 +12,9 @@
 #  and limitations under the License.                                                                                #
 ######################################################################################################################
 
-import re
-
-# compiled regex expression to strip html tags from string
-html_regex_compiled = re.compile(r"<.*?>")
+from shared_util.text_helper import html_to_text
 
 
 def strip_html(data):
-    return html_regex_compiled.sub("", data)
+    """Strip html tags, decode html entities and collapse whitespace in a text field of a custom ingestion record"""
+    return html_to_text(data)
@@ -23,5 +23,9 @@ def search_videos(event, _):
     video.search_videos()
 
 
-def search_comments(event, _):
-    comment.search_comments(event)
+def search_comments(event, context):
+    # a 'Videos' event carries the videos of a search page, a 'Video' event a single video
+    if "Videos" in event["detail"]:
+        comment.search_comments_batch(event, context)
+    else:
+        comment.search_comments(event)
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+######################################################################################################################
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+######################################################################################################################
+
+"""
+Cold start of the YouTube client: each run is a new interpreter that imports the client library, builds the client and
+executes a first commentThreads.list request (against 'FakeYouTubeHttp', without network latency), and reports the
+time of each step. The client is built with 'discovery.build' from the discovery document of google-api-python-client
+(the previous path), and with 'build_from_document' from the document bundled with the lambda function. The import
+step is the same for both, the reading and parsing of the document is part of the build step.
+
+Run from the lambda function root directory: python -m test.benchmark.bench_cold_start --cold-starts 10
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+DISCOVERY_DOCUMENT_PATH = "util/discovery/youtube.v3.json"
+
+COLD_START_SCRIPT = """
+import json
+import time
+
+start = time.perf_counter()
+{import_statement}
+imported = time.perf_counter()
+
+from test.fixtures.youtube_http_fixture import FakeYouTubeHttp
+
+http = FakeYouTubeHttp({{"fakeVideoId": [10] * 100}})
+build_start = time.perf_counter()
+youtube = {build_statement}
+built = time.perf_counter()
+youtube.commentThreads().list(part="snippet, replies", videoId="fakeVideoId", maxResults=100).execute()
+called = time.perf_counter()
+print(json.dumps({{"import": imported - start, "build": built - build_start, "first call": called - built}}))
+"""
+
+VARIANTS = {
+    "library document": {
+        "import_statement": "import googleapiclient.discovery",
+        "build_statement": 'googleapiclient.discovery.build("youtube", "v3", developerKey="fakeKey", http=http)',
+    },
+    "bundled document": {
+        "import_statement": "import googleapiclient.discovery",
+        # read as 'youtube_service_helper.get_discovery_document' does, without importing boto3 for the credentials
+        "build_statement": (
+            "googleapiclient.discovery.build_from_document("
+            f'open("{DISCOVERY_DOCUMENT_PATH}", encoding="utf-8").read(), developerKey="fakeKey", http=http)'
+        ),
+    },
+}
+
+
+def cold_start(variant):
+    output = subprocess.run(
+        [sys.executable, "-c", COLD_START_SCRIPT.format(**VARIANTS[variant])],
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(cold_starts):
+    print(f"median of {cold_starts} cold starts, in milliseconds")
+    for variant in VARIANTS:
+        runs = [cold_start(variant) for _ in range(cold_starts)]
+        medians = {step: statistics.median(run[step] for run in runs) * 1000 for step in runs[0]}
+        steps = ", ".join(f"{step} {value:6.1f}" for step, value in medians.items())
+        print(f"  {variant:17}: {steps}, total {sum(medians.values()):6.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cold-starts", type=int, default=10)
+    args = parser.parse_args()
+    main(args.cold_starts)
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+######################################################################################################################
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+######################################################################################################################
+
+"""
+Harvests the comments of a 'Videos' event against a fake YouTube API ('FakeYouTubeHttp'), with each first comment
+page requested on its own (the serial path) and with the first pages requested in batch requests, and reports the
+HTTP round-trips and the wall time per 100 videos. Each round-trip waits 'latency' seconds and each request of a batch
+'part-latency' seconds. A share of the videos ('changed') has new comments since the last harvest, of which half have
+more than a page of them; the trackers and the stream are kept in memory.
+
+Run from the lambda function root directory: python -m test.benchmark.bench_comment_batch --videos 200 --changed 0.2
+"""
+
+import argparse
+import os
+import random
+import time
+from contextlib import nullcontext
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+import googleapiclient.discovery
+
+from test.fixtures.youtube_http_fixture import FakeYouTubeHttp
+
+
+def set_environment():
+    os.environ.setdefault("AWS_REGION", "us-east-1")
+    os.environ.setdefault("AWS_SDK_USER_AGENT", '{ "user_agent_extra": "solution/fakeID/fakeVersion" }')
+    os.environ.setdefault("EVENT_BUS_NAME", "benchmarkeventbus")
+    os.environ.setdefault("VIDEO_NAMESPACE", "com.youtube.video")
+
+
+def create_comment_ages(video_count, changed):
+    """Comments of the videos, in minutes since they were updated. The last harvest was an hour ago"""
+    random.seed(0)
+    comment_ages = {}
+    for index in range(video_count):
+        if random.random() < changed:
+            new_comments = random.choice([random.randint(1, 99), random.randint(101, 250)])
+        else:
+            new_comments = 0
+        comment_ages[f"video{index}"] = [10] * new_comments + [120] * random.randint(0, 300)
+    return comment_ages
+
+
+def run(comment_ages, pages_per_batch, workers, latency, part_latency):
+    from util import comment
+
+    http = FakeYouTubeHttp(comment_ages, latency=latency, part_latency=part_latency)
+    youtube = googleapiclient.discovery.build("youtube", "v3", developerKey="benchmark", http=http)
+    last_queried = {"LAST_QUERIED_TIMESTAMP": (datetime.now(timezone.utc) - timedelta(hours=1)).isoformat()}
+    published = []
+    event = {
+        "detail-type": "Videos",
+        "detail": {
+            "Videos": [
+                {"VideoId": video_id, "SearchQuery": "benchmark", "Title": video_id} for video_id in comment_ages
+            ]
+        },
+    }
+
+    with mock.patch.multiple(
+        comment,
+        get_youtube_service_resource=lambda: youtube,
+        get_thread_http=lambda: http,
+        KinesisBatchWriter=lambda: nullcontext(mock.MagicMock()),
+        buffer_data_into_stream=lambda data, partition_key=None: published.append(partition_key),
+    ), mock.patch.multiple(
+        comment.ddb_helper,
+        get_query_timestamp=lambda video_id: last_queried,
+        update_query_timestamp=lambda video_id: None,
+    ), mock.patch.dict(
+        os.environ, {"COMMENT_PAGES_PER_BATCH": str(pages_per_batch), "MAX_CONCURRENT_VIDEOS": str(workers)}
+    ):
+        start = time.perf_counter()
+        unfinished_videos = comment.search_comments_batch(event, None)
+        elapsed = time.perf_counter() - start
+
+    assert not unfinished_videos
+    return elapsed, http.round_trips, len(http.requests), len(published)
+
+
+def main(video_count, changed, workers, latency, part_latency):
+    set_environment()
+    comment_ages = create_comment_ages(video_count, changed)
+    per_100 = 100 / video_count
+    print(
+        f"{video_count} videos, {changed:.0%} with new comments, {workers} threads, "
+        f"{latency * 1000:.0f} ms per round-trip + {part_latency * 1000:.0f} ms per request"
+    )
+
+    results = {}
+    for name, pages_per_batch in (("serial first pages", 0), ("batched first pages", 50)):
+        elapsed, round_trips, requests, published = run(comment_ages, pages_per_batch, workers, latency, part_latency)
+        results[name] = elapsed
+        print(
+            f"  {name:20}: {requests * per_100:6.1f} requests, {round_trips * per_100:6.1f} round-trips, "
+            f"{elapsed * per_100:6.2f} s per 100 videos ({published} comments published)"
+        )
+    print(f"speed-up: {results['serial first pages'] / results['batched first pages']:.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--videos", type=int, default=200)
+    parser.add_argument("--changed", type=float, default=0.2, help="share of the videos with new comments")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.1, help="seconds per HTTP round-trip")
+    parser.add_argument("--part-latency", type=float, default=0.005, help="seconds per request")
+    args = parser.parse_args()
+    main(args.videos, args.changed, args.workers, args.latency, args.part_latency)
@@ -29,3 +29,12 @@ def aws_environment_variables():
     os.environ["QUERY"] = "fakeSearch"
     os.environ["VIDEO_NAMESPACE"] = "com.youtube.video"
     os.environ["VIDEO_SEARCH_INGESTION_WINDOW"] = "7"
+
+
+@pytest.fixture(autouse=True)
+def clear_youtube_client_cache():
+    """The API key and the YouTube client are kept across invocations, each test starts without them"""
+    from util import credential_helper, youtube_service_helper
+
+    credential_helper.clear_api_key_cache()
+    youtube_service_helper.youtube_resource = None
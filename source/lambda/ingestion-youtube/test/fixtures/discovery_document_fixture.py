@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+######################################################################################################################
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+######################################################################################################################
+
+"""
+Creates the YouTube Data API discovery document bundled with the lambda function (util/discovery/youtube.v3.json)
+from the one of the installed google-api-python-client: only the methods called by the function, the schemas they
+refer to and no descriptions. After an upgrade of google-api-python-client, run from the lambda function root
+directory: python -m test.fixtures.discovery_document_fixture
+"""
+
+import json
+import os
+
+import googleapiclient.discovery_cache
+
+from util.youtube_service_helper import DISCOVERY_DOCUMENT_PATH
+
+# resource -> methods called by the lambda function
+METHODS = {"commentThreads": ["list"], "search": ["list"], "videos": ["list"]}
+# documentation only, not read to build the client
+DROPPED_KEYS = {"description", "documentationLink", "icons", "enumDescriptions", "ownerDomain", "ownerName"}
+
+
+def get_library_document():
+    path = os.path.join(os.path.dirname(googleapiclient.discovery_cache.__file__), "documents", "youtube.v3.json")
+    with open(path, encoding="utf-8") as document_file:
+        return json.load(document_file)
+
+
+def strip_documentation(value):
+    if isinstance(value, dict):
+        return {key: strip_documentation(item) for key, item in value.items() if key not in DROPPED_KEYS}
+    if isinstance(value, list):
+        return [strip_documentation(item) for item in value]
+    return value
+
+
+def find_references(value, references):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if key == "$ref":
+                references.add(item)
+            else:
+                find_references(item, references)
+    elif isinstance(value, list):
+        for item in value:
+            find_references(item, references)
+
+
+def create_discovery_document(document, methods=None):
+    methods = methods if methods else METHODS
+    document = dict(document)
+    document["resources"] = {
+        resource: {"methods": {method: document["resources"][resource]["methods"][method] for method in method_names}}
+        for resource, method_names in methods.items()
+    }
+
+    # the schemas that the methods refer to, directly or through another schema
+    references = set()
+    find_references(document["resources"], references)
+    pending = list(references)
+    while pending:
+        schema_references = set()
+        find_references(document["schemas"][pending.pop()], schema_references)
+        pending.extend(schema_references - references)
+        references |= schema_references
+    document["schemas"] = {name: schema for name, schema in document["schemas"].items() if name in references}
+    return strip_documentation(document)
+
+
+if __name__ == "__main__":
+    discovery_document = create_discovery_document(get_library_document())
+    with open(DISCOVERY_DOCUMENT_PATH, "w", encoding="utf-8") as document_file:
+        json.dump(discovery_document, document_file, separators=(",", ":"), sort_keys=True)
+        document_file.write("\n")
+    print(f"{DISCOVERY_DOCUMENT_PATH}: {os.path.getsize(DISCOVERY_DOCUMENT_PATH)} bytes")
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+######################################################################################################################
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+######################################################################################################################
+
+import json
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from email.parser import Parser
+from urllib.parse import parse_qs, urlparse
+
+import httplib2
+
+api_response_time_format = "%Y-%m-%dT%H:%M:%SZ"
+
+
+def create_comment_thread(video_id, comment_id, updated_at):
+    return {
+        "id": comment_id,
+        "kind": "youtube#commentThread",
+        "snippet": {
+            "topLevelComment": {
+                "id": comment_id,
+                "kind": "youtube#comment",
+                "snippet": {
+                    "publishedAt": updated_at,
+                    "textDisplay": f"comment {comment_id}",
+                    "textOriginal": f"comment {comment_id}",
+                    "updatedAt": updated_at,
+                    "videoId": video_id,
+                    "viewerRating": 2,
+                    "likeCount": 0,
+                },
+            },
+            "videoId": video_id,
+        },
+    }
+
+
+class FakeYouTubeHttp:
+    """
+    Stands in for the httplib2.Http object of the YouTube client: answers commentThreads.list requests, alone or in a
+    batch request, from the comments of 'comment_ages' (video id -> ages in minutes of its comments, most recent
+    first) and counts the HTTP round-trips. Each round-trip waits 'latency' seconds, plus 'part_latency' seconds per
+    request of a batch. Thread safe, it can be shared by the worker threads
+    """
+
+    def __init__(self, comment_ages, page_size=100, latency=0, part_latency=0):
+        self.comment_ages = comment_ages
+        self.page_size = page_size
+        self.latency = latency
+        self.part_latency = part_latency
+        self.now = datetime.now(timezone.utc)
+        self.round_trips = 0
+        self.requests = []  # (video id, page token) of every commentThreads.list request
+        self._lock = threading.Lock()
+
+    def _list_comment_threads(self, uri):
+        params = {key: values[0] for key, values in parse_qs(urlparse(uri).query).items()}
+        video_id = params["videoId"]
+        with self._lock:
+            self.requests.append((video_id, params.get("pageToken", None)))
+        if video_id not in self.comment_ages:
+            return 404, {"error": {"code": 404, "message": "video not found", "errors": [{"reason": "videoNotFound"}]}}
+
+        start = int(params.get("pageToken", 0))
+        ages = self.comment_ages[video_id][start : start + int(params.get("maxResults", self.page_size))]
+        response = {
+            "kind": "youtube#commentThreadListResponse",
+            "items": [
+                create_comment_thread(
+                    video_id,
+                    f"{video_id}-{start + index}",
+                    (self.now - timedelta(minutes=age)).strftime(api_response_time_format),
+                )
+                for index, age in enumerate(ages)
+            ],
+        }
+        if start + len(ages) < len(self.comment_ages[video_id]):
+            response["nextPageToken"] = str(start + len(ages))
+        return 200, response
+
+    def _batch(self, body, headers):
+        request = Parser().parsestr(f"content-type: {headers['content-type']}\r\n\r\n{body}")
+        boundary = uuid.uuid4().hex
+        parts = []
+        for part in request.get_payload():
+            uri = part.get_payload().splitlines()[0].split(" ")[1]
+            status, content = self._list_comment_threads(uri)
+            parts.append(
+                f"--{boundary}\r\nContent-Type: application/http\r\n"
+                f"Content-ID: <response-{part['Content-ID'][1:-1]}>\r\n\r\n"
+                f"HTTP/1.1 {status} {'OK' if status == 200 else 'Not Found'}\r\n"
+                f"Content-Type: application/json; charset=UTF-8\r\n\r\n{json.dumps(content)}\r\n"
+            )
+        time.sleep(self.part_latency * len(parts))
+        content = "".join(parts) + f"--{boundary}--\r\n"
+        return httplib2.Response({"status": 200, "content-type": f"multipart/mixed; boundary={boundary}"}), content
+
+    def request(self, uri, method="GET", body=None, headers=None, redirections=None, connection_type=None):
+        with self._lock:
+            self.round_trips += 1
+        time.sleep(self.latency)
+        if method == "POST" and urlparse(uri).path.endswith("/batch"):
+            response, content = self._batch(body, headers)
+            return response, content.encode("utf-8")
+
+        status, content = self._list_comment_threads(uri)
+        time.sleep(self.part_latency)
+        return (
+            httplib2.Response({"status": status, "content-type": "application/json; charset=UTF-8"}),
+            json.dumps(content).encode("utf-8"),
+        )
@@ -6,14 +6,27 @@
 
 import json
 import os
+import time
 from datetime import datetime, timedelta, timezone
+from test.fixtures.youtube_http_fixture import FakeYouTubeHttp
 from test.test_credential_helper import ssm_setup
 from test.test_ddb_helper import ddb_setup
 from test.test_stream_helper import stream_setup
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 
+import googleapiclient.discovery
+import googleapiclient.errors
 from moto import mock_dynamodb, mock_kinesis, mock_ssm
-from util.comment import Comment, search_comments, slice_text_into_arrays
+from shared_util.service_helper import get_service_client, get_service_resource
+from shared_util.stream_helper import KinesisBatchWriter
+from util.comment import (
+    TERMINATION_INTERVAL,
+    Comment,
+    search_comments,
+    search_comments_batch,
+    slice_text_into_arrays,
+)
+from util.quota_budget import DailyQuotaBudget
 
 api_response_time_format = "%Y-%m-%dT%H:%M:%SZ"
 
@@ -90,7 +103,7 @@ def test_search_comments_with_tracker_date(mock_youtube_resource):
 
     current_time = datetime.now(timezone.utc)
     expiry_window = str(
-        int((current_time + timedelta(days=int(os.environ.get("VIDEO_SEARCH_INGESTION_WINDOW", 7)))).timestamp() * 1000)
+        int((current_time + timedelta(days=int(os.environ.get("VIDEO_SEARCH_INGESTION_WINDOW", 7)))).timestamp())
     )
     ddb_item = {
         "VIDEO_ID": video_id,
@@ -160,7 +173,7 @@ def test_search_comments_with_page_token(mock_youtube_resource):
 
     current_time = datetime.now(timezone.utc)
     expiry_window = str(
-        int((current_time + timedelta(days=int(os.environ.get("VIDEO_SEARCH_INGESTION_WINDOW", 7)))).timestamp() * 1000)
+        int((current_time + timedelta(days=int(os.environ.get("VIDEO_SEARCH_INGESTION_WINDOW", 7)))).timestamp())
     )
     ddb_item = {
         "VIDEO_ID": video_id,
@@ -258,7 +271,7 @@ def test_search_comments_with_replies(mock_youtube_resource):
 
     current_time = datetime.now(timezone.utc)
     expiry_window = str(
-        int((current_time + timedelta(days=int(os.environ.get("VIDEO_SEARCH_INGESTION_WINDOW", 7)))).timestamp() * 1000)
+        int((current_time + timedelta(days=int(os.environ.get("VIDEO_SEARCH_INGESTION_WINDOW", 7)))).timestamp())
     )
     ddb_item = {
         "VIDEO_ID": video_id,
@@ -344,7 +357,7 @@ def test_search_comments_not_publishing_record(mock_youtube_resource):
 
     current_time = datetime.now(timezone.utc)
     expiry_window = str(
-        int((current_time + timedelta(days=int(os.environ.get("VIDEO_SEARCH_INGESTION_WINDOW", 7)))).timestamp() * 1000)
+        int((current_time + timedelta(days=int(os.environ.get("VIDEO_SEARCH_INGESTION_WINDOW", 7)))).timestamp())
     )
     ddb_item = {
         "VIDEO_ID": video_id,
@@ -501,8 +514,369 @@ def test_slice_text_into_arrays():
 
     split_comment_text = slice_text_into_arrays(comment_text)
 
-    assert split_comment_text[0] == comment_text[0:1250]
-    assert split_comment_text[1] == comment_text[1250:2500]
-    assert split_comment_text[2] == comment_text[2500:3750]
+    for text in split_comment_text:
+        assert len(text.encode("utf-8")) <= 5000
+        assert text.endswith(". ")
 
     assert comment_text == "".join(split_comment_text)
+
+
+def create_comment_threads_response(video_id, next_page_token=None):
+    return {
+        "items": [
+            {
+                "id": f"{video_id}Thread",
+                "kind": "youtube#commentThread",
+                "snippet": {
+                    "topLevelComment": {
+                        "id": f"{video_id}Comment",
+                        "kind": "youtube#comment",
+                        "snippet": {
+                            "textDisplay": f"Comment on {video_id}",
+                            "textOriginal": f"Comment on {video_id}",
+                            "videoId": video_id,
+                            "viewerRating": 2,
+                            "likeCount": 0,
+                            "publishedAt": datetime.now(timezone.utc).strftime(api_response_time_format),
+                            "updatedAt": datetime.now(timezone.utc).strftime(api_response_time_format),
+                        },
+                    },
+                    "videoId": video_id,
+                },
+            }
+        ],
+        "kind": "youtube#commentThreadListResponse",
+        "nextPageToken": next_page_token,
+    }
+
+
+def create_videos_event(video_count):
+    videos = [
+        {"VideoId": f"fakeVideoId{index}", "SearchQuery": "fakeQuery", "Title": f"fakeTitle{index}"}
+        for index in range(video_count)
+    ]
+    return {"detail-type": "Videos", "source": "com.youtube.video", "detail": {"Videos": videos}}
+
+
+def mock_comment_threads(mock_youtube_resource, latency=0):
+    """Each video has a single page of comments, returned after 'latency' seconds"""
+
+    def list_comment_threads(**params):
+        request = MagicMock()
+
+        def execute(http=None):
+            time.sleep(latency)
+            return create_comment_threads_response(params["videoId"])
+
+        request.execute.side_effect = execute
+        return request
+
+    mock_youtube_resource.return_value.commentThreads.return_value.list.side_effect = list_comment_threads
+
+
+def get_trackers(video_ids):
+    table = get_service_resource("dynamodb").Table(os.environ["TARGET_DDB_TABLE"])
+    return [table.get_item(Key={"VIDEO_ID": video_id}).get("Item", None) for video_id in video_ids]
+
+
+@mock_kinesis
+@mock_dynamodb
+@patch("util.comment.publish_videos")
+@patch("util.comment.get_youtube_service_resource")
+def test_search_comments_batch(mock_youtube_resource, mock_publish_videos):
+    ddb_setup(os.environ["TARGET_DDB_TABLE"])
+    stream_setup(os.environ["STREAM_NAME"])
+    mock_comment_threads(mock_youtube_resource, latency=0.2)
+    event = create_videos_event(8)
+    context = MagicMock()
+    context.get_remaining_time_in_millis.return_value = 600000
+
+    start = time.perf_counter()
+    assert search_comments_batch(event, context) == []
+    elapsed = time.perf_counter() - start
+
+    # the 8 videos are harvested concurrently, on one client
+    assert elapsed < 8 * 0.2 / 2
+    mock_youtube_resource.assert_called_once()
+    assert all(get_trackers([video["VideoId"] for video in event["detail"]["Videos"]]))
+    mock_publish_videos.assert_not_called()
+
+
+@mock_kinesis
+@mock_dynamodb
+@patch("util.comment.publish_videos")
+@patch("util.comment.get_youtube_service_resource")
+def test_search_comments_batch_shares_clients(mock_youtube_resource, mock_publish_videos):
+    ddb_setup(os.environ["TARGET_DDB_TABLE"])
+    stream_setup(os.environ["STREAM_NAME"])
+    mock_comment_threads(mock_youtube_resource)
+    event = create_videos_event(8)
+    worker_client_error = AssertionError("a worker created a client")
+
+    with patch("util.comment.get_service_client", wraps=get_service_client) as mock_get_service_client, patch(
+        "shared_util.stream_helper.get_service_client", side_effect=worker_client_error
+    ), patch("util.ddb_helper.get_service_client", side_effect=worker_client_error):
+        assert search_comments_batch(event, None) == []
+
+    # the kinesis and dynamodb clients are created once, by the handler thread, and shared by the workers
+    assert sorted(call.args[0] for call in mock_get_service_client.call_args_list) == ["dynamodb", "kinesis"]
+    assert all(get_trackers([video["VideoId"] for video in event["detail"]["Videos"]]))
+
+
+@mock_kinesis
+@mock_dynamodb
+@patch("util.comment.publish_videos")
+@patch("util.comment.get_youtube_service_resource")
+def test_search_comments_batch_stops_when_time_is_low(mock_youtube_resource, mock_publish_videos):
+    ddb_setup(os.environ["TARGET_DDB_TABLE"])
+    stream_setup(os.environ["STREAM_NAME"])
+    mock_comment_threads(mock_youtube_resource)
+    event = create_videos_event(3)
+    context = MagicMock()
+    # enough time to start the first video, not to request its page
+    context.get_remaining_time_in_millis.side_effect = [TERMINATION_INTERVAL + 1000] + [1000] * 10
+
+    unfinished_videos = search_comments_batch(event, context)
+
+    assert unfinished_videos == event["detail"]["Videos"]
+    mock_youtube_resource.return_value.commentThreads.return_value.list.assert_not_called()
+    assert get_trackers(["fakeVideoId0"]) == [None]
+    mock_publish_videos.assert_called_once_with(unfinished_videos, videos_per_event=3)
+
+
+@mock_kinesis
+@mock_dynamodb
+@patch("util.comment.publish_videos")
+@patch("util.comment.get_youtube_service_resource")
+def test_search_comments_batch_quota_budget(mock_youtube_resource, mock_publish_videos):
+    ddb_setup(os.environ["TARGET_DDB_TABLE"])
+    stream_setup(os.environ["STREAM_NAME"])
+    mock_comment_threads(mock_youtube_resource)
+    event = create_videos_event(5)
+
+    with patch.dict(os.environ, {"QUOTA_UNITS_PER_INVOCATION": "2", "MAX_CONCURRENT_VIDEOS": "1"}):
+        unfinished_videos = search_comments_batch(event, None)
+
+    assert unfinished_videos == event["detail"]["Videos"][2:]
+    assert mock_youtube_resource.return_value.commentThreads.return_value.list.call_count == 2
+    # the videos are not republished, the next video search publishes them again
+    mock_publish_videos.assert_not_called()
+
+
+@mock_kinesis
+@mock_dynamodb
+@patch("util.comment.publish_videos")
+@patch("util.comment.get_youtube_service_resource")
+def test_lambda_search_comments_batch(mock_youtube_resource, mock_publish_videos):
+    ddb_setup(os.environ["TARGET_DDB_TABLE"])
+    stream_setup(os.environ["STREAM_NAME"])
+    mock_comment_threads(mock_youtube_resource)
+
+    from lambda_function import search_comments as search_comments_handler
+
+    search_comments_handler(create_videos_event(2), None)
+    assert all(get_trackers(["fakeVideoId0", "fakeVideoId1"]))
+
+
+@mock_kinesis
+@mock_dynamodb
+@patch("util.comment.publish_videos")
+@patch("util.comment.get_youtube_service_resource")
+def test_search_comments_batch_defers_low_yield_videos(mock_youtube_resource, mock_publish_videos):
+    ddb_setup(os.environ["TARGET_DDB_TABLE"])
+    stream_setup(os.environ["STREAM_NAME"])
+    mock_comment_threads(mock_youtube_resource)
+    event = create_videos_event(3)
+    event["detail"]["Videos"][0]["CommentCountDelta"] = 0
+    event["detail"]["Videos"][2]["CommentCountDelta"] = 100
+
+    # 8500 of the 10000 units of the day are used, the quota is low
+    table = get_service_resource("dynamodb").Table(os.environ["TARGET_DDB_TABLE"])
+    with patch.dict(os.environ, {"DAILY_QUOTA_UNITS": "10000", "MAX_CONCURRENT_VIDEOS": "1"}):
+        table.put_item(Item={"VIDEO_ID": DailyQuotaBudget()._get_key()["VIDEO_ID"]["S"], "UNITS": 8500})
+        unfinished_videos = search_comments_batch(event, None)
+
+    assert unfinished_videos == []
+    # the video with the highest yield is harvested first, the one without new comments is deferred
+    harvested = [call.kwargs["videoId"] for call in mock_youtube_resource().commentThreads().list.call_args_list]
+    assert harvested == ["fakeVideoId2", "fakeVideoId1"]
+    assert get_trackers(["fakeVideoId0"]) == [None]
+    mock_publish_videos.assert_not_called()
+    assert (
+        int(table.get_item(Key={"VIDEO_ID": DailyQuotaBudget()._get_key()["VIDEO_ID"]["S"]})["Item"]["UNITS"]) == 8502
+    )
+
+
+def set_tracker(video_id, last_queried):
+    table = get_service_resource("dynamodb").Table(os.environ["TARGET_DDB_TABLE"])
+    table.put_item(Item={"VIDEO_ID": video_id, "LAST_QUERIED_TIMESTAMP": last_queried.isoformat()})
+
+
+@mock_kinesis
+@mock_dynamodb
+@patch("util.comment.publish_videos")
+@patch("util.comment.get_thread_http")
+@patch("util.comment.get_youtube_service_resource")
+def test_search_comments_batch_first_pages_in_batch_request(
+    mock_youtube_resource, mock_thread_http, mock_publish_videos
+):
+    ddb_setup(os.environ["TARGET_DDB_TABLE"])
+    stream_setup(os.environ["STREAM_NAME"])
+    http = FakeYouTubeHttp(
+        {
+            "fakeVideoId0": [10] * 150,  # no tracker, all the comments are new
+            "fakeVideoId1": [120] * 150,  # no comment since the last harvest
+            "fakeVideoId3": [10] * 120 + [120] * 30,  # more new comments than a page
+        }
+    )
+    mock_youtube_resource.return_value = googleapiclient.discovery.build("youtube", "v3", developerKey="fakeKey")
+    mock_thread_http.return_value = http
+    last_queried = datetime.now(timezone.utc) - timedelta(hours=1)
+    for video_id in ["fakeVideoId1", "fakeVideoId2", "fakeVideoId3"]:
+        set_tracker(video_id, last_queried)
+
+    with patch.dict(os.environ, {"COMMENT_PAGES_PER_BATCH": "50"}):
+        unfinished_videos = search_comments_batch(create_videos_event(4), None)
+
+    assert unfinished_videos == []
+    # one batch request for the first pages, the next pages only for the videos with more new comments
+    assert http.round_trips == 3
+    assert len(http.requests) == 6
+    assert set(http.requests) == {(f"fakeVideoId{index}", None) for index in range(4)} | {
+        ("fakeVideoId0", "100"),
+        ("fakeVideoId3", "100"),
+    }
+    trackers = get_trackers([f"fakeVideoId{index}" for index in range(4)])
+    assert trackers[0] is not None
+    assert [datetime.fromisoformat(tracker["LAST_QUERIED_TIMESTAMP"]) > last_queried for tracker in trackers[1:]] == [
+        True,
+        False,  # the video was not found
+        True,
+    ]
+    mock_publish_videos.assert_not_called()
+
+
+@mock_kinesis
+@mock_dynamodb
+@patch("util.comment.fetch_first_pages")
+@patch("util.comment.publish_videos")
+@patch("util.comment.get_youtube_service_resource")
+def test_search_comments_batch_request_fails(mock_youtube_resource, mock_publish_videos, mock_fetch_first_pages):
+    ddb_setup(os.environ["TARGET_DDB_TABLE"])
+    stream_setup(os.environ["STREAM_NAME"])
+    mock_comment_threads(mock_youtube_resource)
+    mock_fetch_first_pages.side_effect = googleapiclient.errors.BatchError("fakeError")
+
+    with patch.dict(os.environ, {"COMMENT_PAGES_PER_BATCH": "50"}):
+        unfinished_videos = search_comments_batch(create_videos_event(3), None)
+
+    # the first pages are requested one by one instead
+    assert unfinished_videos == []
+    mock_fetch_first_pages.assert_called_once()
+    assert mock_youtube_resource().commentThreads().list.call_count == 3
+    assert None not in get_trackers([f"fakeVideoId{index}" for index in range(3)])
+
+
+@mock_kinesis
+@mock_dynamodb
+@patch("util.comment.fetch_first_pages")
+@patch("util.comment.publish_videos")
+@patch("util.comment.get_youtube_service_resource")
+def test_search_comments_batch_request_fails_refunds_quota(
+    mock_youtube_resource, mock_publish_videos, mock_fetch_first_pages
+):
+    ddb_setup(os.environ["TARGET_DDB_TABLE"])
+    stream_setup(os.environ["STREAM_NAME"])
+    mock_comment_threads(mock_youtube_resource)
+    mock_fetch_first_pages.side_effect = googleapiclient.errors.BatchError("fakeError")
+
+    # the budget only fits the first pages once: the units of the failed batch request are used again
+    with patch.dict(os.environ, {"COMMENT_PAGES_PER_BATCH": "50", "QUOTA_UNITS_PER_INVOCATION": "3"}):
+        unfinished_videos = search_comments_batch(create_videos_event(3), None)
+
+    assert unfinished_videos == []
+    assert mock_youtube_resource().commentThreads().list.call_count == 3
+    assert None not in get_trackers([f"fakeVideoId{index}" for index in range(3)])
+
+
+@mock_kinesis
+@mock_dynamodb
+@patch("util.comment.publish_videos")
+@patch("util.comment.get_youtube_service_resource")
+def test_search_comments_batch_stores_comment_count(mock_youtube_resource, mock_publish_videos):
+    ddb_setup(os.environ["TARGET_DDB_TABLE"])
+    stream_setup(os.environ["STREAM_NAME"])
+    mock_comment_threads(mock_youtube_resource)
+    event = create_videos_event(2)
+    event["detail"]["Videos"][0]["CommentCount"] = 42
+
+    assert search_comments_batch(event, None) == []
+
+    trackers = get_trackers(["fakeVideoId0", "fakeVideoId1"])
+    assert trackers[0]["COMMENT_COUNT"] == 42
+    assert "COMMENT_COUNT" not in trackers[1]
+
+
+@mock_kinesis
+@mock_dynamodb
+@patch("shared_util.batch_writer.time.sleep")
+@patch("util.comment.publish_videos")
+@patch("util.comment.get_thread_http")
+@patch("util.comment.get_youtube_service_resource")
+def test_search_comments_batch_writer_per_video(
+    mock_youtube_resource, mock_thread_http, mock_publish_videos, mock_sleep
+):
+    ddb_setup(os.environ["TARGET_DDB_TABLE"])
+    stream_setup(os.environ["STREAM_NAME"])
+    # fakeVideoId0 completes on its second page while the records of the first pages of fakeVideoId1 are buffered
+    mock_thread_http.return_value = FakeYouTubeHttp(
+        {"fakeVideoId0": [10] * 150, "fakeVideoId1": [10] * 250}, latency=0.1
+    )
+    mock_youtube_resource.return_value = googleapiclient.discovery.build("youtube", "v3", developerKey="fakeKey")
+    put_batch = KinesisBatchWriter._put_batch
+
+    def fail_video_records(writer, records):
+        # the records of fakeVideoId1 are rejected by the stream
+        results = put_batch(writer, records)
+        return [
+            {"ErrorCode": "InternalFailure"} if b"fakeVideoId1" in record["Data"] else result
+            for record, result in zip(records, results)
+        ]
+
+    with patch.object(KinesisBatchWriter, "_put_batch", fail_video_records):
+        search_comments_batch(create_videos_event(2), None)
+
+    # the flush of fakeVideoId0 only sends its own records, its tracker moves and the one of fakeVideoId1 does not
+    trackers = get_trackers(["fakeVideoId0", "fakeVideoId1"])
+    assert trackers[0] is not None
+    assert trackers[1] is None
+
+
+@mock_kinesis
+@mock_dynamodb
+@patch("util.comment.publish_videos")
+@patch("util.comment.get_thread_http")
+@patch("util.comment.get_youtube_service_resource")
+def test_search_comments_batch_resumes_stopped_video(mock_youtube_resource, mock_thread_http, mock_publish_videos):
+    ddb_setup(os.environ["TARGET_DDB_TABLE"])
+    stream_setup(os.environ["STREAM_NAME"])
+    http = FakeYouTubeHttp({"fakeVideoId0": [10] * 150})
+    mock_youtube_resource.return_value = googleapiclient.discovery.build("youtube", "v3", developerKey="fakeKey")
+    mock_thread_http.return_value = http
+    context = MagicMock()
+    # enough time to request the first page, not the next one
+    context.get_remaining_time_in_millis.side_effect = lambda: 1000 if http.requests else TERMINATION_INTERVAL + 1000
+
+    unfinished_videos = search_comments_batch(create_videos_event(1), context)
+
+    assert unfinished_videos == [
+        {"VideoId": "fakeVideoId0", "SearchQuery": "fakeQuery", "Title": "fakeTitle0", "PageToken": "100"}
+    ]
+    mock_publish_videos.assert_called_once_with(unfinished_videos, videos_per_event=1)
+    assert get_trackers(["fakeVideoId0"]) == [None]
+
+    # the follow-up event resumes the harvest from the next page instead of publishing the first page again
+    with patch.dict(os.environ, {"COMMENT_PAGES_PER_BATCH": "50"}):
+        assert search_comments_batch({"detail": {"Videos": unfinished_videos}}, None) == []
+    assert http.requests == [("fakeVideoId0", None), ("fakeVideoId0", "100")]
+    assert get_trackers(["fakeVideoId0"])[0] is not None
@@ -14,6 +14,7 @@
 
 import os
 import unittest
+from unittest import mock
 
 import boto3
 import botocore
@@ -46,3 +47,21 @@ class TestCredentialHelper(unittest.TestCase):
         os.environ.pop("SSM_API_KEY")
         self.assertRaises(Exception, credential_helper.get_api_key)
         os.environ["SSM_API_KEY"] = "fakessmapikey"
+
+    def test_api_key_is_cached(self):
+        self.assertEqual(credential_helper.get_api_key(), self.set_api_key)
+        self.ssm.put_parameter(Name=os.environ["SSM_API_KEY"], Type="SecureString", Value="rotatedkey", Overwrite=True)
+        self.assertEqual(credential_helper.get_api_key(), self.set_api_key)
+
+        # the rotated key is read once the cached one expires
+        expires_at = credential_helper._api_key_expires_at
+        with mock.patch("util.credential_helper.time.monotonic", return_value=expires_at):
+            self.assertEqual(credential_helper.get_api_key(), "rotatedkey")
+
+    def test_api_key_ttl_from_environment(self):
+        with mock.patch.dict(os.environ, {"API_KEY_TTL_SECONDS": "0"}):
+            credential_helper.get_api_key()
+            self.ssm.put_parameter(
+                Name=os.environ["SSM_API_KEY"], Type="SecureString", Value="rotatedkey", Overwrite=True
+            )
+            self.assertEqual(credential_helper.get_api_key(), "rotatedkey")
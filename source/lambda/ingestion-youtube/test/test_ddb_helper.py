@@ -6,6 +6,7 @@
 
 import os
 import unittest
+import unittest.mock
 from datetime import datetime, timedelta, timezone
 
 import boto3
@@ -37,10 +38,7 @@ class TestQueryDDBHelper(unittest.TestCase):
         self.video_id = "fakevideoid"
         current_time = datetime.now(timezone.utc)
         expiry_window = str(
-            int(
-                (current_time + timedelta(days=int(os.environ.get("VIDEO_SEARCH_INGESTION_WINDOW", 7)))).timestamp()
-                * 1000
-            )
+            int((current_time + timedelta(days=int(os.environ.get("VIDEO_SEARCH_INGESTION_WINDOW", 7)))).timestamp())
         )
         self.item = {
             "VIDEO_ID": self.video_id,
@@ -57,6 +55,32 @@ class TestQueryDDBHelper(unittest.TestCase):
     def test_update_query(self):
         self.assertIsNone(ddb_helper.update_query_timestamp(self.video_id))
 
+    def test_update_query_with_comment_count(self):
+        ddb_helper.update_query_timestamp(self.video_id, 42)
+        self.assertEqual(self.table.get_item(Key={"VIDEO_ID": self.video_id})["Item"]["COMMENT_COUNT"], 42)
+
+    def test_update_query_expiry_in_seconds(self):
+        ddb_helper.update_query_timestamp(self.video_id)
+        expiry = int(self.table.get_item(Key={"VIDEO_ID": self.video_id})["Item"]["EXP_DATE"])
+        expected = datetime.now(timezone.utc) + timedelta(days=int(os.environ.get("VIDEO_SEARCH_INGESTION_WINDOW", 7)))
+        self.assertAlmostEqual(expiry, expected.timestamp(), delta=60)
+
+    def test_get_last_comment_counts(self):
+        video_ids = [f"fakevideoid{index}" for index in range(150)]
+        for index, video_id in enumerate(video_ids[:120]):
+            ddb_helper.update_query_timestamp(video_id, index)
+
+        comment_counts = ddb_helper.get_last_comment_counts(video_ids + [self.video_id, "fakevideoid0"])
+        self.assertEqual(len(comment_counts), 121)
+        self.assertEqual(comment_counts["fakevideoid119"], 119)
+        # the tracker of a video harvested without its comment count
+        self.assertIsNone(comment_counts[self.video_id])
+        self.assertNotIn("fakevideoid120", comment_counts)
+
+    def test_get_last_comment_counts_when_table_not_exists(self):
+        with unittest.mock.patch.dict(os.environ, {"TARGET_DDB_TABLE": "nonexistingmocktable"}):
+            self.assertEqual(ddb_helper.get_last_comment_counts([self.video_id]), {})
+
     def test_get_query_timestamp(self):
         item = ddb_helper.get_query_timestamp(self.video_id)
         self.assertEqual(item, self.item)
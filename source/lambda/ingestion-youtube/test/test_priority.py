@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+######################################################################################################################
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+######################################################################################################################
+
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+
+from util.priority import (
+    DEFAULT_EXPECTED_COMMENTS,
+    RECENCY_HALF_LIFE_HOURS,
+    get_expected_yield,
+    is_deferred,
+    prioritize,
+)
+
+NOW = datetime(2021, 8, 12, 12, 0, 0, tzinfo=timezone.utc)
+
+
+def create_video(video_id, age_hours=None, comment_count_delta=None):
+    video = {"VideoId": video_id, "SearchQuery": "fakeQuery", "Title": "fakeTitle"}
+    if age_hours is not None:
+        video["PublishedAt"] = (NOW - timedelta(hours=age_hours)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    if comment_count_delta is not None:
+        video["CommentCountDelta"] = comment_count_delta
+    return video
+
+
+def test_get_expected_yield():
+    assert get_expected_yield(create_video("fakeId"), NOW) == DEFAULT_EXPECTED_COMMENTS
+    assert get_expected_yield(create_video("fakeId", age_hours=0), NOW) == DEFAULT_EXPECTED_COMMENTS
+    assert (
+        get_expected_yield(create_video("fakeId", age_hours=RECENCY_HALF_LIFE_HOURS, comment_count_delta=40), NOW) == 20
+    )
+    assert get_expected_yield(create_video("fakeId", age_hours=1, comment_count_delta=0), NOW) == 0
+
+
+def test_prioritize():
+    videos = [
+        create_video("old", age_hours=6 * 24),
+        create_video("busy", age_hours=24, comment_count_delta=500),
+        create_video("recent", age_hours=1),
+        create_video("quiet", age_hours=1, comment_count_delta=0),
+    ]
+    assert [video["VideoId"] for video in prioritize(videos, NOW)] == ["busy", "recent", "old", "quiet"]
+
+
+def test_is_deferred():
+    quota_budget = MagicMock()
+    quota_budget.is_low.return_value = False
+    assert not is_deferred(create_video("quiet", age_hours=1, comment_count_delta=0), quota_budget, NOW)
+
+    quota_budget.is_low.return_value = True
+    assert is_deferred(create_video("quiet", age_hours=1, comment_count_delta=0), quota_budget, NOW)
+    assert is_deferred(create_video("old", age_hours=6 * 24), quota_budget, NOW)
+    assert not is_deferred(create_video("recent", age_hours=1), quota_budget, NOW)
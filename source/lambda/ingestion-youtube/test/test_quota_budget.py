@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+######################################################################################################################
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+######################################################################################################################
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from test.test_ddb_helper import ddb_setup
+from unittest.mock import patch
+
+from botocore.exceptions import ClientError
+from moto import mock_dynamodb
+from shared_util.service_helper import get_service_client, get_service_resource
+from util.quota_budget import (
+    COMMENT_THREADS_LIST_COST,
+    SEARCH_LIST_COST,
+    DailyQuotaBudget,
+    QuotaBudget,
+    get_quota_budget,
+)
+
+
+def test_quota_budget():
+    quota_budget = QuotaBudget(limit=10)
+    assert quota_budget.try_consume(4)
+    assert quota_budget.try_consume(4)
+    assert not quota_budget.try_consume(4)
+    assert not quota_budget.is_exhausted()
+    assert quota_budget.try_consume(2)
+    assert quota_budget.is_exhausted()
+    assert quota_budget.get_stats() == {"limit": 10, "consumed": 10, "rejected": 1}
+
+
+def test_quota_budget_refund():
+    quota_budget = QuotaBudget(limit=10)
+    assert quota_budget.try_consume(10)
+    quota_budget.refund(4)
+    assert not quota_budget.is_exhausted()
+    assert quota_budget.try_consume(4)
+    assert quota_budget.get_stats() == {"limit": 10, "consumed": 10, "rejected": 0}
+
+
+def test_quota_budget_is_shared_by_threads():
+    quota_budget = QuotaBudget(limit=100)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        consumed = list(executor.map(lambda _: quota_budget.try_consume(1), range(1000)))
+
+    assert sum(consumed) == 100
+    assert quota_budget.get_stats()["rejected"] == 900
+
+
+def test_quota_budget_from_environment():
+    assert QuotaBudget.from_environment().limit is None
+    assert QuotaBudget.from_environment().try_consume(10**6)
+
+    with patch.dict(os.environ, {"QUOTA_UNITS_PER_INVOCATION": "500"}):
+        assert QuotaBudget.from_environment().limit == 500
+
+
+def get_daily_units():
+    table = get_service_resource("dynamodb").Table(os.environ["TARGET_DDB_TABLE"])
+    items = [item for item in table.scan()["Items"] if item["VIDEO_ID"].startswith("QUOTA#")]
+    return int(items[0]["UNITS"]) if items else 0
+
+
+def get_units_by_day():
+    table = get_service_resource("dynamodb").Table(os.environ["TARGET_DDB_TABLE"])
+    return {
+        item["VIDEO_ID"]: int(item["UNITS"]) for item in table.scan()["Items"] if item["VIDEO_ID"].startswith("QUOTA#")
+    }
+
+
+@mock_dynamodb
+def test_daily_quota_budget_reserves_blocks():
+    ddb_setup(os.environ["TARGET_DDB_TABLE"])
+    quota_budget = DailyQuotaBudget(daily_limit=1000, reserve_units=20)
+
+    for _ in range(50):
+        assert quota_budget.try_consume(COMMENT_THREADS_LIST_COST)
+    assert quota_budget.reservations == 3
+    assert get_daily_units() == 60
+
+    # the units reserved and not used are returned
+    quota_budget.release()
+    assert get_daily_units() == 50
+    assert quota_budget.refresh() == 950
+
+
+@mock_dynamodb
+def test_daily_quota_budget_is_shared_by_invocations():
+    ddb_setup(os.environ["TARGET_DDB_TABLE"])
+    first_budget = DailyQuotaBudget(daily_limit=250, reserve_units=20)
+    second_budget = DailyQuotaBudget(daily_limit=250, reserve_units=20)
+
+    assert first_budget.try_consume(SEARCH_LIST_COST)
+    assert second_budget.try_consume(SEARCH_LIST_COST)
+    # 200 units used, a search does not fit anymore but comment pages do
+    assert not first_budget.try_consume(SEARCH_LIST_COST)
+    assert not first_budget.is_exhausted()
+
+    consumed = 0
+    while second_budget.try_consume(COMMENT_THREADS_LIST_COST):
+        consumed += 1
+    assert consumed == 50
+    assert second_budget.is_exhausted()
+    assert not first_budget.try_consume(COMMENT_THREADS_LIST_COST)
+    assert get_daily_units() == 250
+
+
+@mock_dynamodb
+def test_daily_quota_budget_is_low():
+    ddb_setup(os.environ["TARGET_DDB_TABLE"])
+    quota_budget = DailyQuotaBudget(daily_limit=1000, reserve_units=1, low_quota_ratio=0.2)
+    assert quota_budget.refresh() == 1000
+    assert not quota_budget.is_low()
+
+    for _ in range(8):
+        assert quota_budget.try_consume(SEARCH_LIST_COST)
+    assert quota_budget.get_remaining() == 200
+    assert not quota_budget.is_low()
+    assert quota_budget.try_consume(COMMENT_THREADS_LIST_COST)
+    assert quota_budget.is_low()
+
+
+@mock_dynamodb
+def test_daily_quota_budget_allows_calls_on_errors():
+    # no table: the budget cannot be read or updated
+    quota_budget = DailyQuotaBudget(daily_limit=100)
+    assert quota_budget.refresh() is None
+    assert not quota_budget.is_low()
+    assert quota_budget.try_consume(SEARCH_LIST_COST)
+
+
+@mock_dynamodb
+def test_daily_quota_budget_releases_only_reserved_units():
+    ddb_setup(os.environ["TARGET_DDB_TABLE"])
+    dynamodb_client = get_service_client("dynamodb")
+    quota_budget = DailyQuotaBudget(daily_limit=1000, reserve_units=20, dynamodb_client=dynamodb_client)
+    for _ in range(20):
+        assert quota_budget.try_consume(COMMENT_THREADS_LIST_COST)
+
+    # the next block cannot be reserved, its units are allowed without being counted in the daily budget
+    error = ClientError({"Error": {"Code": "ProvisionedThroughputExceededException", "Message": "fake"}}, "UpdateItem")
+    with patch.object(dynamodb_client, "update_item", side_effect=error):
+        for _ in range(5):
+            assert quota_budget.try_consume(COMMENT_THREADS_LIST_COST)
+    assert quota_budget.get_stats()["reserved"] == 0
+    assert quota_budget.get_stats()["allowed"] == 15
+
+    # the allowed units that were not used are not returned to the daily budget
+    quota_budget.release()
+    assert get_daily_units() == 20
+    assert quota_budget.get_stats()["allowed"] == 0
+
+
+@mock_dynamodb
+def test_daily_quota_budget_releases_to_the_day_of_the_reservation():
+    ddb_setup(os.environ["TARGET_DDB_TABLE"])
+    quota_budget = DailyQuotaBudget(daily_limit=1000, reserve_units=20)
+    # the quota day ends at midnight Pacific time
+    first_day = datetime(2021, 3, 18, 7, 0, tzinfo=timezone.utc)
+
+    with patch("util.quota_budget.datetime") as mock_datetime:
+        mock_datetime.now.return_value = first_day
+        for _ in range(20):
+            assert quota_budget.try_consume(COMMENT_THREADS_LIST_COST)
+
+        mock_datetime.now.return_value = first_day + timedelta(days=1)
+        for _ in range(5):
+            assert quota_budget.try_consume(COMMENT_THREADS_LIST_COST)
+        # the last 10 calls were not made, their units go back to the latest reservations first
+        quota_budget.refund(10)
+        assert quota_budget.get_stats()["consumed"] == 15
+        quota_budget.release()
+
+    assert get_units_by_day() == {"QUOTA#2021-03-18": 15, "QUOTA#2021-03-19": 0}
+
+
+@mock_dynamodb
+def test_daily_quota_budget_refunds_allowed_units():
+    ddb_setup(os.environ["TARGET_DDB_TABLE"])
+    dynamodb_client = get_service_client("dynamodb")
+    quota_budget = DailyQuotaBudget(daily_limit=1000, reserve_units=20, dynamodb_client=dynamodb_client)
+    assert quota_budget.try_consume(COMMENT_THREADS_LIST_COST)
+
+    error = ClientError({"Error": {"Code": "ProvisionedThroughputExceededException", "Message": "fake"}}, "UpdateItem")
+    with patch.object(dynamodb_client, "update_item", side_effect=error):
+        assert quota_budget.try_consume(SEARCH_LIST_COST)
+    assert quota_budget.get_stats()["allowed"] == 0
+
+    # the units of the search were allowed (81) and reserved (19), only the reserved ones are released
+    quota_budget.refund(SEARCH_LIST_COST)
+    assert quota_budget.get_stats()["reserved"] == 19
+    assert quota_budget.get_stats()["allowed"] == 81
+    quota_budget.release()
+    assert get_daily_units() == 1
+
+
+@mock_dynamodb
+def test_daily_quota_budget_reserves_without_blocking_consumers():
+    ddb_setup(os.environ["TARGET_DDB_TABLE"])
+    dynamodb_client = get_service_client("dynamodb")
+    quota_budget = DailyQuotaBudget(daily_limit=1000, reserve_units=20, dynamodb_client=dynamodb_client)
+    for _ in range(19):
+        assert quota_budget.try_consume(COMMENT_THREADS_LIST_COST)
+
+    update_item = dynamodb_client.update_item
+    reserving, resume = threading.Event(), threading.Event()
+
+    def slow_update_item(**kwargs):
+        reserving.set()
+        resume.wait(5)
+        return update_item(**kwargs)
+
+    with patch.object(dynamodb_client, "update_item", side_effect=slow_update_item), ThreadPoolExecutor(2) as executor:
+        reservation = executor.submit(quota_budget.try_consume, 2)
+        assert reserving.wait(5)
+        # the unit left is used while the other thread reserves the next block
+        assert executor.submit(quota_budget.try_consume, COMMENT_THREADS_LIST_COST).result(timeout=1)
+        resume.set()
+        assert reservation.result(timeout=5)
+
+    assert quota_budget.get_stats()["consumed"] == 22
+    assert get_daily_units() == 40
+
+
+@mock_dynamodb
+def test_get_quota_budget():
+    ddb_setup(os.environ["TARGET_DDB_TABLE"])
+    assert type(get_quota_budget()) is QuotaBudget
+
+    with patch.dict(os.environ, {"DAILY_QUOTA_UNITS": "5000", "QUOTA_UNITS_PER_INVOCATION": "300"}):
+        quota_budget = get_quota_budget()
+    assert isinstance(quota_budget, DailyQuotaBudget)
+    assert quota_budget.daily_limit == 5000
+    assert quota_budget.limit == 300
+    assert quota_budget.get_remaining() == 5000
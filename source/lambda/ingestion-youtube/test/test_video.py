@@ -9,9 +9,13 @@ import os
 from datetime import datetime, timezone
 from test.fixtures.event_bus_fixture import get_event_bus_stubber
 from test.test_credential_helper import ssm_setup
-from unittest.mock import patch
+from test.test_ddb_helper import ddb_setup
+from unittest.mock import MagicMock, patch
 
-from moto import mock_ssm
+import googleapiclient.errors
+from moto import mock_dynamodb, mock_ssm
+from util import ddb_helper
+from util.quota_budget import QuotaBudget
 
 
 @mock_ssm
@@ -408,3 +412,125 @@ def test_youtube_search_request():
         assert "0,0" == query_response["location"]
         assert None == query_response.get("channelId", None)
         assert "fakeSearch" == query_response["q"]
+
+
+@mock_ssm
+@patch("util.video.get_youtube_service_resource")
+def test_search_video_in_batches(mock_youtube_resource, get_event_bus_stubber):
+    ssm_setup("fakeapikey")
+    search_query = f'{os.environ["QUERY"]}#None'
+    videos = [{"VideoId": f"fakeId{index}", "SearchQuery": search_query, "Title": "fakeTitle"} for index in range(3)]
+
+    get_event_bus_stubber.add_response(
+        "put_events",
+        {"Entries": [{"EventId": "fakeeventid1"}, {"EventId": "fakeeventid2"}], "FailedEntryCount": 0},
+        {
+            "Entries": [
+                {
+                    "EventBusName": os.environ["EVENT_BUS_NAME"],
+                    "Source": os.environ["VIDEO_NAMESPACE"],
+                    "Detail": json.dumps({"Videos": batch}),
+                    "DetailType": "Videos",
+                }
+                for batch in (videos[:2], videos[2:])
+            ]
+        },
+    )
+
+    mock_youtube_resource.return_value.search.return_value.list.return_value.execute.return_value = {
+        "items": [
+            {"kind": "youtube#searchResult", "id": {"videoId": video["VideoId"]}, "snippet": {"title": "fakeTitle"}}
+            for video in videos
+        ],
+        "nextPageToken": None,
+    }
+
+    get_event_bus_stubber.activate()
+    from util.video import search_videos
+
+    with patch.dict("os.environ", {"VIDEOS_PER_EVENT": "2"}):
+        search_videos()
+
+    get_event_bus_stubber.assert_no_pending_responses()
+    get_event_bus_stubber.deactivate()
+
+
+def create_search_response(video_count):
+    return {
+        "items": [
+            {"kind": "youtube#searchResult", "id": {"videoId": f"fakeId{index}"}, "snippet": {"title": "fakeTitle"}}
+            for index in range(video_count)
+        ]
+    }
+
+
+def mock_videos_statistics(mock_youtube, comment_counts):
+    """videos.list returns the statistics of the videos of 'comment_counts', a video without a count has none"""
+
+    def list_videos(part, id, maxResults):
+        request = MagicMock()
+        request.execute.return_value = {
+            "items": [
+                (
+                    {"id": video_id, "statistics": {"commentCount": str(comment_counts[video_id])}}
+                    if comment_counts[video_id] is not None
+                    else {"id": video_id, "statistics": {}}
+                )
+                for video_id in id.split(",")
+                if video_id in comment_counts
+            ]
+        }
+        return request
+
+    mock_youtube.videos.return_value.list.side_effect = list_videos
+
+
+@mock_dynamodb
+@patch("util.video.publish_videos")
+def test_process_response_skips_unchanged_videos(mock_publish_videos):
+    from util.video import process_response
+
+    ddb_setup(os.environ["TARGET_DDB_TABLE"])
+    comment_counts = {f"fakeId{index}": 10 for index in range(60)}
+    comment_counts["fakeId1"] = 15
+    comment_counts["fakeId2"] = None  # comments are disabled
+    del comment_counts["fakeId3"]  # deleted since the search
+    comment_counts["fakeId4"] = 0
+    ddb_helper.update_query_timestamp("fakeId0", 10)
+    ddb_helper.update_query_timestamp("fakeId1", 10)
+    ddb_helper.update_query_timestamp("fakeId5")  # harvested before the comment counts were stored
+    for index in range(6, 60):
+        ddb_helper.update_query_timestamp(f"fakeId{index}", 10)
+    youtube = MagicMock()
+    mock_videos_statistics(youtube, comment_counts)
+    quota_budget = QuotaBudget()
+
+    with patch.dict(os.environ, {"SKIP_UNCHANGED_VIDEOS": "true", "VIDEOS_PER_EVENT": "10"}):
+        process_response(create_search_response(60), {"q": "fakeSearch"}, youtube, quota_budget)
+
+    # 50 video ids per request
+    assert [len(call.kwargs["id"].split(",")) for call in youtube.videos.return_value.list.call_args_list] == [50, 10]
+    assert quota_budget.consumed == 2
+    videos = mock_publish_videos.call_args.args[0]
+    assert [video["VideoId"] for video in videos] == ["fakeId1", "fakeId5"]
+    assert videos[0]["CommentCount"] == 15 and videos[0]["CommentCountDelta"] == 5
+    assert videos[1]["CommentCount"] == 10 and "CommentCountDelta" not in videos[1]
+
+
+@mock_dynamodb
+@patch("util.video.publish_videos")
+def test_process_response_keeps_videos_when_statistics_fail(mock_publish_videos):
+    from util.video import process_response
+
+    ddb_setup(os.environ["TARGET_DDB_TABLE"])
+    youtube = MagicMock()
+    youtube.videos.return_value.list.return_value.execute.side_effect = googleapiclient.errors.HttpError(
+        MagicMock(status=403), b"quotaExceeded"
+    )
+
+    with patch.dict(os.environ, {"SKIP_UNCHANGED_VIDEOS": "true", "VIDEOS_PER_EVENT": "10"}):
+        process_response(create_search_response(3), {"q": "fakeSearch"}, youtube, QuotaBudget())
+        process_response(create_search_response(3), {"q": "fakeSearch"}, youtube, QuotaBudget(limit=0))
+
+    assert [len(call.args[0]) for call in mock_publish_videos.call_args_list] == [3, 3]
+    assert youtube.videos.return_value.list.call_count == 1
@@ -3,14 +3,19 @@
 # Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 # SPDX-License-Identifier: Apache-2.0
 ######################################################################################################################
+import json
 import os
 import unittest
 from datetime import datetime, timedelta, timezone
+from test.fixtures.discovery_document_fixture import create_discovery_document, get_library_document
+from test.fixtures.youtube_http_fixture import FakeYouTubeHttp
 from test.test_credential_helper import ssm_setup
 from unittest.mock import patch
 
+import googleapiclient.discovery
 from moto import mock_ssm
 from util import credential_helper
+from util.youtube_service_helper import DISCOVERY_DOCUMENT_PATH, get_discovery_document
 
 
 @mock_ssm
@@ -23,7 +28,9 @@ def test_get_youtube_service_resource(mock_youtube_resource):
 
     youtube = get_youtube_service_resource()
 
-    mock_youtube_resource.build.assert_called_once_with("youtube", "v3", developerKey=credential_helper.get_api_key())
+    mock_youtube_resource.build_from_document.assert_called_once()
+    assert mock_youtube_resource.build_from_document.call_args.args == (get_discovery_document(),)
+    assert mock_youtube_resource.build_from_document.call_args.kwargs["developerKey"] == credential_helper.get_api_key()
 
     current_datetime = datetime.now(timezone.utc)
     video_search_params = {
@@ -43,12 +50,54 @@ def test_get_youtube_service_resource(mock_youtube_resource):
         "snippet": {"publishTime": publish_time},
     }
 
-    mock_youtube_resource.build.return_value.search.return_value.list.return_value.execute.return_value = {
+    mock_youtube_resource.build_from_document.return_value.search.return_value.list.return_value.execute.return_value = {
         "items": [test_item]
     }
 
     request = youtube.search().list(**video_search_params)
     response = request.execute()
-    mock_youtube_resource.build.return_value.search.assert_called_once()
-    mock_youtube_resource.build.return_value.search.return_value.list.assert_called_once_with(**video_search_params)
+    mock_youtube_resource.build_from_document.return_value.search.assert_called_once()
+    mock_youtube_resource.build_from_document.return_value.search.return_value.list.assert_called_once_with(
+        **video_search_params
+    )
     assert response["items"] == [test_item]
+
+
+@mock_ssm
+def test_youtube_service_resource_is_memoized():
+    ssm_client = ssm_setup("fakeapikey")
+
+    from util.youtube_service_helper import get_youtube_service_resource
+
+    youtube = get_youtube_service_resource()
+    assert get_youtube_service_resource() is youtube
+
+    # a rotated key builds a new client
+    ssm_client.put_parameter(Name=os.environ["SSM_API_KEY"], Type="SecureString", Value="rotatedkey", Overwrite=True)
+    credential_helper.clear_api_key_cache()
+    rotated_youtube = get_youtube_service_resource()
+    assert rotated_youtube is not youtube
+    assert "key=rotatedkey" in rotated_youtube.videos().list(part="statistics", id="fakeId").uri
+
+
+def test_bundled_discovery_document_requests():
+    http = FakeYouTubeHttp({"fakeVideoId": [10] * 3})
+    youtube = googleapiclient.discovery.build_from_document(get_discovery_document(), developerKey="fakeKey", http=http)
+    library_youtube = googleapiclient.discovery.build("youtube", "v3", developerKey="fakeKey", http=http)
+
+    for get_request in (
+        lambda client: client.commentThreads().list(part="snippet, replies", videoId="fakeVideoId", pageToken="1"),
+        lambda client: client.search().list(part="id,snippet", type="video", q="fakeSearch", maxResults=50),
+        lambda client: client.videos().list(part="statistics", id="fakeId1,fakeId2", maxResults=50),
+    ):
+        assert get_request(youtube).uri == get_request(library_youtube).uri
+    assert len(youtube.commentThreads().list(part="snippet", videoId="fakeVideoId").execute()["items"]) == 3
+
+
+class TestBundledDiscoveryDocument(unittest.TestCase):
+    def test_bundled_discovery_document_is_current(self):
+        """Fails after an upgrade of google-api-python-client: python -m test.fixtures.discovery_document_fixture"""
+        with open(DISCOVERY_DOCUMENT_PATH, encoding="utf-8") as document_file:
+            bundled_document = json.load(document_file)
+        self.assertEqual(bundled_document, create_discovery_document(get_library_document()))
+        self.assertEqual(set(bundled_document["resources"]), {"commentThreads", "search", "videos"})
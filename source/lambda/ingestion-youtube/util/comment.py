@@ -7,17 +7,39 @@
 import copy
 import json
 import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime, timedelta, timezone
 
 import googleapiclient.errors
 from shared_util.custom_logging import get_logger
+from shared_util.service_helper import get_service_client
 
 from util import credential_helper, ddb_helper
-from util.youtube_service_helper import get_youtube_service_resource
-from shared_util.stream_helper import buffer_data_into_stream
+from util.priority import is_deferred, prioritize
+from util.quota_budget import COMMENT_THREADS_LIST_COST, get_quota_budget
+from util.video import publish_videos
+from util.youtube_service_helper import get_thread_http, get_youtube_service_resource
+from shared_util.stream_helper import KinesisBatchWriter, buffer_data_into_stream
+from shared_util.text_helper import slice_text_into_arrays
 
 logger = get_logger(__name__)
 
+# number of videos of a 'Videos' event whose comments are harvested in parallel
+MAX_CONCURRENT_VIDEOS = 8
+# a video page is not requested when the invocation has less time left than this (in milliseconds), so that the
+# requests in flight can finish and the unfinished videos be published
+TERMINATION_INTERVAL = 60000
+
+# maximum number of first comment pages requested in a single batch request, 0 to request them one by one. The first
+# page of most videos holds all their new comments, so only the videos with more new comments request further pages
+DEFAULT_COMMENT_PAGES_PER_BATCH = 0
+MAX_COMMENT_PAGES_PER_BATCH = 50
+
+# outcome of the harvest of a video
+COMPLETED = "completed"
+STOPPED = "stopped"
+FAILED = "failed"
+
 
 class Video:
     def __init__(self, video_id, title):
@@ -72,14 +94,18 @@ class OutputRecord:
 def search_comments(event):
     logger.debug(f"Query handler received event: {json.dumps(event)}")
     youtube = get_youtube_service_resource()
+    quota_budget = get_quota_budget()
 
-    record = event["detail"]
+    try:
+        with KinesisBatchWriter() as stream_writer:
+            harvest_comments(youtube, event["detail"], stream_writer, quota_budget=quota_budget)
+    finally:
+        quota_budget.release()
+    logger.debug(f"Quota budget: {quota_budget.get_stats()}")
 
-    search_query = record["SearchQuery"]
-    video_id = record["VideoId"]
-    title = record["Title"]
 
-    comment_search_params = {
+def get_comment_search_params(video_id):
+    return {
         "part": "snippet, replies",
         "videoId": video_id,
         "maxResults": 100,
@@ -87,16 +113,59 @@ def search_comments(event):
         "textFormat": "plainText",
     }
 
+
+def harvest_comments(
+    youtube,
+    video,
+    stream_writer,
+    should_stop=None,
+    quota_budget=None,
+    http=None,
+    first_response=None,
+    dynamodb_client=None,
+):
+    """
+    Pages through the comment threads of a video (the detail of a 'Video' event) and publishes the comments updated
+    since the last harvest, then updates the tracker of the video. Before each page, 'should_stop' is called and
+    the quota of the request is reserved from 'quota_budget'; if either ends the harvest, the tracker is not updated
+    and the token of the next page is set as the 'PageToken' of the video, so that a follow-up event resumes the
+    harvest from that page. 'first_response' is the first page when it was already requested (see
+    'fetch_first_pages'), or its HttpError. The tracker is read and written with 'dynamodb_client' when set.
+
+    Returns COMPLETED, STOPPED or FAILED (an API error, which is logged)
+    """
+    search_query = video["SearchQuery"]
+    video_id = video["VideoId"]
+    title = video["Title"]
+
+    comment_search_params = get_comment_search_params(video_id)
+    if video.get("PageToken", None):
+        comment_search_params["pageToken"] = video["PageToken"]
+
     # check for tracker and decide if needs to be published
-    tracker = ddb_helper.get_query_timestamp(video_id)
+    tracker = ddb_helper.get_query_timestamp(video_id, dynamodb_client=dynamodb_client)
     logger.debug(f"Tracker for VideoId: {video_id} is {tracker}")
 
     tracker_date = datetime.fromisoformat(tracker["LAST_QUERIED_TIMESTAMP"]) if tracker else None
 
     while True:
-        request = youtube.commentThreads().list(**comment_search_params)
+        if first_response is None and (
+            (should_stop and should_stop())
+            or (quota_budget and not quota_budget.try_consume(COMMENT_THREADS_LIST_COST))
+        ):
+            logger.warning(f"Stopped harvesting the comments of VideoId: {video_id}")
+            if comment_search_params.get("pageToken", None):
+                video["PageToken"] = comment_search_params["pageToken"]
+            return STOPPED
+
         try:
-            youtube_response = request.execute()
+            if first_response is None:
+                request = youtube.commentThreads().list(**comment_search_params)
+                youtube_response = request.execute(http=http) if http else request.execute()
+            else:
+                youtube_response, first_response = first_response, None
+                if isinstance(youtube_response, Exception):
+                    raise youtube_response
             logger.debug(f"Threads, youtube comments {json.dumps(youtube_response)}")
 
             record_published = process_service_response(youtube_response, search_query, tracker_date, title)
@@ -108,14 +177,171 @@ def search_comments(event):
             if next_page_token and record_published:
                 comment_search_params["pageToken"] = next_page_token
             else:
-                # update tracker, since loop is over break
-                ddb_helper.update_query_timestamp(video_id)
-                break
+                # update tracker, since loop is over break. Flushing first so that a failed write is retried
+                stream_writer.flush()
+                ddb_helper.update_query_timestamp(
+                    video_id, video.get("CommentCount", None), dynamodb_client=dynamodb_client
+                )
+                return COMPLETED
         except googleapiclient.errors.HttpError as error:
             logger.error(
                 f"Error occurred when calling list comments for params: {json.dumps(comment_search_params)} and error is {error}"
             )
-            break
+            return FAILED
+
+
+def fetch_first_pages(youtube, videos, http=None):
+    """
+    Requests the first comment page of each of 'videos' in a single batch request, that is a single HTTP round-trip
+    instead of one per video. Returns the response of each video, or the HttpError of its request, by video id.
+    Raises the errors of the batch request itself (googleapiclient.errors.Error or a transport error)
+    """
+    responses = {}
+
+    def callback(request_id, response, exception):
+        responses[request_id] = exception if exception else response
+
+    batch = youtube.new_batch_http_request(callback=callback)
+    for video in videos:
+        batch.add(
+            youtube.commentThreads().list(**get_comment_search_params(video["VideoId"])), request_id=video["VideoId"]
+        )
+    batch.execute(http=http)
+    return responses
+
+
+def search_comments_batch(event, context):
+    """
+    Harvests the comments of the videos of a 'Videos' event concurrently, on MAX_CONCURRENT_VIDEOS worker threads that
+    share the YouTube client, the Kinesis and DynamoDB clients and the quota budget of the invocation. The clients
+    are created before the workers start, since creating a boto3 client is not thread safe. Each video has a stream
+    writer of its own, so that the tracker of a video is only updated once the records of that video were sent. A video is only started,
+    and a video in progress only requests its next page, while the invocation has more than TERMINATION_INTERVAL
+    milliseconds left. The videos that were not started or were stopped are published in a follow-up event, the
+    stopped videos with the token of their next page, unless the quota budget is exhausted: the next video search
+    publishes them again.
+
+    Videos are started by decreasing expected yield of new comments; when the daily quota is low, the videos with a
+    low yield are deferred (see 'priority.is_deferred').
+
+    When COMMENT_PAGES_PER_BATCH is set, the first comment pages of the next videos to start are requested together
+    in batch requests, and only the videos whose first page ends with comments newer than their tracker request
+    further pages
+    """
+    logger.debug(f"Batch query handler received event: {json.dumps(event)}")
+    youtube = get_youtube_service_resource()
+    quota_budget = get_quota_budget()
+    kds_client = get_service_client("kinesis")
+    dynamodb_client = get_service_client("dynamodb")
+    max_workers = int(os.environ.get("MAX_CONCURRENT_VIDEOS", MAX_CONCURRENT_VIDEOS))
+    pages_per_batch = min(
+        int(os.environ.get("COMMENT_PAGES_PER_BATCH", DEFAULT_COMMENT_PAGES_PER_BATCH)), MAX_COMMENT_PAGES_PER_BATCH
+    )
+
+    def should_stop():
+        return context is not None and context.get_remaining_time_in_millis() < TERMINATION_INTERVAL
+
+    def harvest(video, first_response=None):
+        with KinesisBatchWriter(kds_client=kds_client) as stream_writer:
+            return harvest_comments(
+                youtube,
+                video,
+                stream_writer,
+                should_stop,
+                quota_budget,
+                get_thread_http(),
+                first_response,
+                dynamodb_client,
+            )
+
+    pending_videos = prioritize(event["detail"]["Videos"])
+    unfinished_videos = []
+    deferred_videos = []
+    in_flight = {}  # future -> video
+    results = {COMPLETED: 0, STOPPED: 0, FAILED: 0}
+    first_pages = {}  # video id -> first comment page, or its HttpError, requested in a batch request
+    batch_requests = 0
+
+    def fetch_next_first_pages():
+        """Requests the first pages of the next pending videos that fit in the quota budget, in one batch request"""
+        nonlocal pages_per_batch, batch_requests
+        videos, video_ids = [], set()
+        for video in pending_videos:
+            if len(videos) == pages_per_batch:
+                break
+            # a video resumed from a page token does not request its first page
+            if (
+                video["VideoId"] in video_ids
+                or video["VideoId"] in first_pages
+                or video.get("PageToken", None)
+                or is_deferred(video, quota_budget)
+            ):
+                continue
+            if not quota_budget.try_consume(COMMENT_THREADS_LIST_COST):
+                break
+            videos.append(video)
+            video_ids.add(video["VideoId"])
+        if not videos:
+            return
+
+        try:
+            batch_requests += 1
+            first_pages.update(fetch_first_pages(youtube, videos, http=get_thread_http()))
+        except Exception as error:
+            # the videos request their first page one by one instead, with units reserved again then
+            logger.warning(f"Batch request of {len(videos)} comment pages failed, requesting them one by one: {error}")
+            quota_budget.refund(len(videos) * COMMENT_THREADS_LIST_COST)
+            pages_per_batch = 0
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while pending_videos or in_flight:
+                while pending_videos and len(in_flight) < max_workers and not should_stop():
+                    # a video whose first page was requested needs no quota if the page holds all its new comments
+                    if quota_budget.is_exhausted() and pending_videos[0]["VideoId"] not in first_pages:
+                        break
+                    if pages_per_batch and pending_videos[0]["VideoId"] not in first_pages:
+                        fetch_next_first_pages()
+                    video = pending_videos.pop(0)
+                    if is_deferred(video, quota_budget) and video["VideoId"] not in first_pages:
+                        deferred_videos.append(video)
+                        continue
+                    in_flight[executor.submit(harvest, video, first_pages.pop(video["VideoId"], None))] = video
+
+                if not in_flight:
+                    break
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    video = in_flight.pop(future)
+                    if future.exception():
+                        logger.error(
+                            f"Failed to harvest the comments of VideoId: {video['VideoId']}: {future.exception()}"
+                        )
+                        results[FAILED] += 1
+                        continue
+
+                    results[future.result()] += 1
+                    if future.result() == STOPPED:
+                        unfinished_videos.append(video)
+    finally:
+        quota_budget.release()
+
+    unfinished_videos.extend(pending_videos)
+    logger.info(f"Harvested the comments of {len(event['detail']['Videos'])} videos: {results}")
+    if batch_requests:
+        logger.info(f"Requested the first comment pages in {batch_requests} batch requests")
+    logger.info(f"Quota budget: {quota_budget.get_stats()}")
+    if deferred_videos:
+        logger.warning(f"Quota is low, deferred {len(deferred_videos)} videos with a low expected yield")
+
+    if unfinished_videos:
+        if quota_budget.is_exhausted():
+            logger.warning(f"Quota budget exhausted, {len(unfinished_videos)} videos are not harvested")
+        else:
+            logger.warning(f"Publishing {len(unfinished_videos)} unfinished videos in a follow-up event")
+            publish_videos(unfinished_videos, videos_per_event=len(unfinished_videos))
+    return unfinished_videos
 
 
 def process_service_response(youtube_response, search_query, tracker_date, video_title):
@@ -167,11 +393,3 @@ def get_output_record(comment_response, search_query, video_title):
     split_comments = comment.get_split_comments()
     for item in split_comments:
         yield OutputRecord(video, item, search_query)
-
-
-def slice_text_into_arrays(text):
-    # Amazon Comprehend has a size limit of 5000 bytes for async jobs and sync jobs. Hence the need to split
-    # an utf-8 or unicode charset can take up to 4 bytes. Each slice cannot be more than 5000.
-    # Hence taking 1250 (5000/4) to make sure a slice of a string does not split the bytes of a single character.
-    each_string_element_size = 1250
-    return [text[i : i + each_string_element_size] for i in range(0, len(text), each_string_element_size)]
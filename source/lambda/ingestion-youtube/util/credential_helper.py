@@ -13,13 +13,40 @@
 ######################################################################################################################
 
 import os
+import threading
+import time
 
 from shared_util.service_helper import get_service_client, get_service_resource
 
+# the API key is kept in the lambda container for this long, a key rotated in SSM is used once it expires
+DEFAULT_API_KEY_TTL_SECONDS = 300
+
+_api_key = None
+_api_key_expires_at = 0.0
+_api_key_lock = threading.Lock()
+
 
 def get_api_key():
-    api_key = get_service_client("ssm").get_parameter(Name=os.environ["SSM_API_KEY"], WithDecryption=True)["Parameter"][
-        "Value"
-    ]
+    """
+    Returns the API key stored in the SSM parameter 'SSM_API_KEY'. The key is cached across the invocations of a warm
+    lambda container for API_KEY_TTL_SECONDS (default 300), so that it is read from SSM once per TTL, not per call
+    """
+    global _api_key, _api_key_expires_at
+
+    with _api_key_lock:
+        now = time.monotonic()
+        if _api_key is None or now >= _api_key_expires_at:
+            _api_key = get_service_client("ssm").get_parameter(Name=os.environ["SSM_API_KEY"], WithDecryption=True)[
+                "Parameter"
+            ]["Value"]
+            _api_key_expires_at = now + int(os.environ.get("API_KEY_TTL_SECONDS", DEFAULT_API_KEY_TTL_SECONDS))
+
+        return _api_key
+
+
+def clear_api_key_cache():
+    global _api_key, _api_key_expires_at
 
-    return api_key
+    with _api_key_lock:
+        _api_key = None
+        _api_key_expires_at = 0.0
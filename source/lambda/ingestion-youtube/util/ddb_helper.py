@@ -18,34 +18,87 @@ import json
 import os
 from datetime import datetime, timedelta, timezone
 
+from boto3.dynamodb.types import TypeDeserializer
 from botocore.exceptions import ClientError
 from shared_util.custom_logging import get_logger
-from shared_util.service_helper import get_service_client, get_service_resource
+from shared_util.service_helper import get_service_client
 
 logger = get_logger(__name__)
 
+# BatchGetItem reads up to 100 items per request
+MAX_KEYS_PER_BATCH_GET = 100
+MAX_BATCH_GET_ATTEMPTS = 3
 
-def get_query_timestamp(video_id):
-    ddb = get_service_resource("dynamodb")
-    table = ddb.Table(os.environ["TARGET_DDB_TABLE"])
+_deserializer = TypeDeserializer()
+
+
+def get_query_timestamp(video_id, dynamodb_client=None):
+    """
+    Returns the tracker of a video, or None. The tracker is read with a DynamoDB client rather than a resource, since
+    'search_comments_batch' reads the trackers from worker threads that share the 'dynamodb_client' of the handler
+    """
+    ddb = dynamodb_client if dynamodb_client else get_service_client("dynamodb")
 
     try:
-        ddb_response = table.get_item(Key={"VIDEO_ID": video_id})
+        ddb_response = ddb.get_item(TableName=os.environ["TARGET_DDB_TABLE"], Key={"VIDEO_ID": {"S": video_id}})
     except ClientError as e:
         logger.error(f'Error in getting tracker {e.response["Error"]["Message"]}')
         raise e
 
-    return ddb_response.get("Item", None)
+    item = ddb_response.get("Item", None)
+    return {name: _deserializer.deserialize(value) for name, value in item.items()} if item else None
 
 
-def update_query_timestamp(video_id):
+def get_last_comment_counts(video_ids):
+    """
+    Reads the trackers of 'video_ids' with BatchGetItem, up to MAX_KEYS_PER_BATCH_GET at a time. Returns the comment
+    count of the last harvest ('COMMENT_COUNT') by video id, for the videos that have a tracker; the count is None
+    for a tracker written without one. Errors are logged and not raised, the videos whose trackers could not be read
+    are absent
+    """
     ddb = get_service_client("dynamodb")
     table_name = os.environ["TARGET_DDB_TABLE"]
+    video_ids = list(dict.fromkeys(video_ids))
+    comment_counts = {}
+
+    for index in range(0, len(video_ids), MAX_KEYS_PER_BATCH_GET):
+        request_items = {
+            table_name: {
+                "Keys": [
+                    {"VIDEO_ID": {"S": video_id}} for video_id in video_ids[index : index + MAX_KEYS_PER_BATCH_GET]
+                ],
+                "ProjectionExpression": "VIDEO_ID, COMMENT_COUNT",
+            }
+        }
+        for _ in range(MAX_BATCH_GET_ATTEMPTS):
+            try:
+                ddb_response = ddb.batch_get_item(RequestItems=request_items)
+            except ClientError as error:
+                logger.error(f"Error in getting trackers {error.response['Error']['Message']}")
+                break
+
+            for item in ddb_response["Responses"].get(table_name, []):
+                comment_count = item.get("COMMENT_COUNT", None)
+                comment_counts[item["VIDEO_ID"]["S"]] = int(comment_count["N"]) if comment_count else None
+
+            request_items = ddb_response.get("UnprocessedKeys", None)
+            if not request_items:
+                break
+        else:
+            logger.warning(f"Could not read {len(request_items[table_name]['Keys'])} trackers, unprocessed keys")
+
+    return comment_counts
+
+
+def update_query_timestamp(video_id, comment_count=None, dynamodb_client=None):
+    """Updates the tracker of a video, with the comment count of the video when the harvest started if known"""
+    ddb = dynamodb_client if dynamodb_client else get_service_client("dynamodb")
+    table_name = os.environ["TARGET_DDB_TABLE"]
     current_time = datetime.now(timezone.utc)
 
-    # defaulting to 7 days if ingestion window is not provided
+    # defaulting to 7 days if ingestion window is not provided. The TTL attribute is a number of epoch seconds
     expiry_window = str(
-        int((current_time + timedelta(days=int(os.environ.get("VIDEO_SEARCH_INGESTION_WINDOW", 7)))).timestamp() * 1000)
+        int((current_time + timedelta(days=int(os.environ.get("VIDEO_SEARCH_INGESTION_WINDOW", 7)))).timestamp())
     )
 
     ddb_response = ddb.put_item(
@@ -54,6 +107,7 @@ def update_query_timestamp(video_id):
             "VIDEO_ID": {"S": video_id},
             "LAST_QUERIED_TIMESTAMP": {"S": current_time.isoformat()},
             "EXP_DATE": {"N": expiry_window},
+            **({"COMMENT_COUNT": {"N": str(comment_count)}} if comment_count is not None else {}),
         },
     )
 
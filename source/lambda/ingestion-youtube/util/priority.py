@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+######################################################################################################################
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+######################################################################################################################
+
+import os
+from datetime import datetime, timezone
+
+from shared_util.custom_logging import get_logger
+
+logger = get_logger(__name__)
+
+# new comments expected on a video whose comment count since the last harvest is not known
+DEFAULT_EXPECTED_COMMENTS = 10
+# the comments of a video slow down as it gets older: the expected yield halves every RECENCY_HALF_LIFE_HOURS
+RECENCY_HALF_LIFE_HOURS = 48
+# when the quota is low, only the videos expected to yield at least this many new comments are harvested
+DEFAULT_MIN_YIELD_WHEN_LOW = 5
+
+
+def get_expected_yield(video, now=None):
+    """
+    Expected number of new comments of a video (the detail of a 'Video' event): its comment count delta since the
+    last harvest ('CommentCountDelta') if known, else DEFAULT_EXPECTED_COMMENTS, decayed by the age of the video
+    ('PublishedAt'). A video without a publication date is not decayed
+    """
+    now = now if now else datetime.now(timezone.utc)
+    expected_comments = video.get("CommentCountDelta", None)
+    if expected_comments is None:
+        expected_comments = DEFAULT_EXPECTED_COMMENTS
+
+    published_at = video.get("PublishedAt", None)
+    if not published_at:
+        return float(expected_comments)
+    try:
+        published_date = datetime.strptime(published_at, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
+    except ValueError:
+        return float(expected_comments)
+    age_hours = max((now - published_date).total_seconds() / 3600, 0)
+    return expected_comments * 0.5 ** (age_hours / RECENCY_HALF_LIFE_HOURS)
+
+
+def prioritize(videos, now=None):
+    """Returns the videos by decreasing expected yield"""
+    now = now if now else datetime.now(timezone.utc)
+    return sorted(videos, key=lambda video: get_expected_yield(video, now), reverse=True)
+
+
+def is_deferred(video, quota_budget, now=None):
+    """
+    A video is deferred to the next quota window when the quota is low and it is not expected to yield enough new
+    comments. Its tracker is not updated, so its comments are harvested when the video search publishes it again
+    """
+    if not quota_budget.is_low():
+        return False
+    min_yield = float(os.environ.get("MIN_YIELD_WHEN_LOW", DEFAULT_MIN_YIELD_WHEN_LOW))
+    return get_expected_yield(video, now) < min_yield
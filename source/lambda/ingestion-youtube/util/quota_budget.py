@@ -0,0 +1,330 @@
+#!/usr/bin/env python
+######################################################################################################################
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+######################################################################################################################
+
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from botocore.exceptions import ClientError
+from shared_util.custom_logging import get_logger
+from shared_util.service_helper import get_service_client
+
+logger = get_logger(__name__)
+
+# quota cost in units of the YouTube Data API calls, https://developers.google.com/youtube/v3/determine_quota_cost
+COMMENT_THREADS_LIST_COST = 1
+VIDEOS_LIST_COST = 1
+SEARCH_LIST_COST = 100
+
+# default daily quota of a YouTube Data API project, it is reset at midnight Pacific time
+DEFAULT_DAILY_QUOTA_UNITS = 10000
+QUOTA_TIMEZONE = ZoneInfo("America/Los_Angeles")
+# prefix of the tracker table items that hold the units used on a day
+QUOTA_PREFIX = "QUOTA"
+# units reserved from the daily budget at a time, so that a 1 unit call is not a DynamoDB write
+DEFAULT_RESERVE_UNITS = 20
+# below this share of the daily quota, the remaining quota is kept for the work with the highest yield
+DEFAULT_LOW_QUOTA_RATIO = 0.2
+
+
+class QuotaBudget:
+    """
+    Quota units that the API calls of an invocation may spend, shared by the worker threads. 'try_consume' reserves
+    the units of a call before it is made and returns False once the budget would be exceeded, so that the workers
+    stop instead of failing with quotaExceeded errors. 'refund' gives back the units of calls that were reserved and
+    could not be made. A budget without 'limit' is never exhausted.
+    """
+
+    def __init__(self, limit=None):
+        self.limit = limit
+        self.consumed = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_environment(cls):
+        limit = os.environ.get("QUOTA_UNITS_PER_INVOCATION", None)
+        return cls(limit=int(limit) if limit else None)
+
+    def try_consume(self, units):
+        with self._lock:
+            if self.limit is not None and self.consumed + units > self.limit:
+                self.rejected += 1
+                return False
+            self.consumed += units
+            return True
+
+    def refund(self, units):
+        """Gives back 'units' consumed for calls that were not made"""
+        with self._lock:
+            self.consumed -= min(units, self.consumed)
+
+    def is_exhausted(self):
+        with self._lock:
+            return self.limit is not None and self.consumed >= self.limit
+
+    def is_low(self):
+        """An invocation budget is not shared, there is no other work to keep quota for"""
+        return False
+
+    def release(self):
+        pass
+
+    def get_stats(self):
+        with self._lock:
+            return {"limit": self.limit, "consumed": self.consumed, "rejected": self.rejected}
+
+
+class DailyQuotaBudget(QuotaBudget):
+    """
+    Quota budget persisted in the tracker table, shared by the invocations of the video search and comments lambda
+    functions, so that they stop before the daily quota of the API key is used up. The units used on a day are
+    counted in a 'QUOTA#<day>' item; units are reserved from it 'reserve_units' at a time with a conditional update
+    that cannot go over 'daily_limit', and the units that an invocation did not use are returned by 'release' to the
+    item of the day they were reserved from. The units of the oldest reservation are used first.
+
+    Errors are logged and not raised: if the budget cannot be read or updated, the calls are allowed, as the API
+    rejects them anyway once the quota is exceeded. The units allowed that way are not returned by 'release'.
+
+    A single thread reserves units at a time, and the DynamoDB calls are made without holding the lock of the
+    budget, so that the threads that still have units to use are not blocked by a reservation
+    """
+
+    def __init__(
+        self,
+        daily_limit=None,
+        limit=None,
+        reserve_units=DEFAULT_RESERVE_UNITS,
+        low_quota_ratio=None,
+        dynamodb_client=None,
+    ):
+        super().__init__(limit=limit)
+        self.daily_limit = (
+            daily_limit if daily_limit else int(os.environ.get("DAILY_QUOTA_UNITS", DEFAULT_DAILY_QUOTA_UNITS))
+        )
+        self.reserve_units = reserve_units
+        self.low_quota_ratio = (
+            low_quota_ratio
+            if low_quota_ratio is not None
+            else float(os.environ.get("LOW_QUOTA_RATIO", DEFAULT_LOW_QUOTA_RATIO))
+        )
+        self.dynamodb_client = dynamodb_client if dynamodb_client else get_service_client("dynamodb")
+        self.table_name = os.environ["TARGET_DDB_TABLE"]
+
+        self.reserved = 0  # units reserved from the daily budget and not used yet
+        self.allowed = 0  # units allowed when the daily budget could not be updated, and not used yet
+        self._reserved_by_day = {}  # day -> units reserved from the item of that day and not used yet
+        self._used_by_day = {}  # day -> units reserved from the item of that day and used
+        self._allowed_used = 0  # allowed units used
+        self.daily_used = None  # units of the day as of the last read or update, None if unknown
+        self.daily_exhausted = False
+        self.reservations = 0
+        self._reserve_lock = threading.Lock()
+
+    @staticmethod
+    def _get_day(now=None):
+        return (now if now else datetime.now(timezone.utc)).astimezone(QUOTA_TIMEZONE).date().isoformat()
+
+    def _get_key(self, now=None, day=None):
+        return {"VIDEO_ID": {"S": f"{QUOTA_PREFIX}#{day if day else self._get_day(now)}"}}
+
+    def refresh(self):
+        """Reads the units used today, returns the remaining units of the daily budget"""
+        try:
+            response = self.dynamodb_client.get_item(TableName=self.table_name, Key=self._get_key())
+            item = response.get("Item", None)
+            with self._lock:
+                self.daily_used = int(item["UNITS"]["N"]) if item else 0
+        except ClientError as error:
+            logger.warning(f"Could not read the quota budget: {error}")
+        return self.get_remaining()
+
+    def _reserve(self, units):
+        """
+        Reserves 'units' from the daily budget, or allows them if the budget cannot be updated. Returns False if that
+        would exceed the daily limit. Called without the lock held
+        """
+        now = datetime.now(timezone.utc)
+        try:
+            response = self.dynamodb_client.update_item(
+                TableName=self.table_name,
+                Key=self._get_key(now),
+                UpdateExpression="ADD UNITS :units SET EXP_DATE = :exp_date",
+                ConditionExpression="attribute_not_exists(UNITS) OR UNITS <= :max_units",
+                ExpressionAttributeValues={
+                    ":units": {"N": str(units)},
+                    ":max_units": {"N": str(self.daily_limit - units)},
+                    ":exp_date": {"N": str(int((now + timedelta(days=2)).timestamp()))},
+                },
+                ReturnValues="UPDATED_NEW",
+            )
+            with self._lock:
+                self.daily_used = int(response["Attributes"]["UNITS"]["N"])
+                day = self._get_day(now)
+                self._reserved_by_day[day] = self._reserved_by_day.get(day, 0) + units
+                self.reserved += units
+                self.reservations += 1
+        except ClientError as error:
+            if error.response["Error"]["Code"] == "ConditionalCheckFailedException":
+                return False
+            logger.warning(f"Could not update the quota budget, allowing the call: {error}")
+            with self._lock:
+                self.allowed += units
+        return True
+
+    def _take(self, units):
+        """
+        Takes 'units' from the units available to the invocation, with the lock held. Returns False if the budget
+        would be exceeded, None if the available units are not enough and more have to be reserved first
+        """
+        if self.daily_exhausted or (self.limit is not None and self.consumed + units > self.limit):
+            self.rejected += 1
+            return False
+        if self.reserved + self.allowed < units:
+            return None
+
+        # the allowed units are used first, so that the reserved units left can be released
+        allowed_units = min(units, self.allowed)
+        self.allowed -= allowed_units
+        self._allowed_used += allowed_units
+        self.reserved -= units - allowed_units
+        self.consumed += units
+
+        reserved_units = units - allowed_units
+        for day in sorted(self._reserved_by_day):
+            if not reserved_units:
+                break
+            day_units = min(reserved_units, self._reserved_by_day[day])
+            self._reserved_by_day[day] -= day_units
+            self._used_by_day[day] = self._used_by_day.get(day, 0) + day_units
+            reserved_units -= day_units
+        return True
+
+    def refund(self, units):
+        """
+        Gives back 'units' consumed for calls that were not made. The units go back to the allowed units first, then to
+        the reservations of the most recent days, and 'release' returns the reserved ones that are not used again. In
+        doubt a unit is returned as allowed, so that a unit that was used is not released from the daily budget
+        """
+        with self._lock:
+            units = min(units, self.consumed)
+            self.consumed -= units
+            allowed_units = min(units, self._allowed_used)
+            self._allowed_used -= allowed_units
+            self.allowed += allowed_units
+            units -= allowed_units
+
+            for day in sorted(self._used_by_day, reverse=True):
+                if not units:
+                    break
+                day_units = min(units, self._used_by_day[day])
+                self._used_by_day[day] -= day_units
+                self._reserved_by_day[day] = self._reserved_by_day.get(day, 0) + day_units
+                self.reserved += day_units
+                units -= day_units
+
+    def try_consume(self, units):
+        while True:
+            with self._lock:
+                consumed = self._take(units)
+            if consumed is not None:
+                return consumed
+
+            with self._reserve_lock:
+                # another thread may have reserved units while this one waited
+                with self._lock:
+                    consumed = self._take(units)
+                    needed = units - self.reserved - self.allowed
+                if consumed is not None:
+                    return consumed
+
+                # reserve a block, or only what is missing when the block would not fit in the daily budget
+                if not self._reserve(max(needed, self.reserve_units)) and not (
+                    needed < self.reserve_units and self._reserve(needed)
+                ):
+                    with self._lock:
+                        self.rejected += 1
+                        # a search (100 units) may not fit when comment pages (1 unit) still do
+                        if units <= self.reserve_units:
+                            logger.warning(f"Daily quota budget of {self.daily_limit} units is exhausted")
+                            self.daily_exhausted = True
+                    return False
+
+    def release(self):
+        """Returns the reserved units that were not used to the items of the days they were reserved from"""
+        with self._lock:
+            reserved_by_day = self._reserved_by_day
+            self._reserved_by_day = {}
+            self._used_by_day = {}
+            self._allowed_used = 0
+            self.reserved = 0
+            self.allowed = 0
+
+        today = self._get_day()
+        for day, units in sorted(reserved_by_day.items()):
+            if not units:
+                continue
+            try:
+                response = self.dynamodb_client.update_item(
+                    TableName=self.table_name,
+                    Key=self._get_key(day=day),
+                    UpdateExpression="ADD UNITS :units",
+                    ConditionExpression="attribute_exists(UNITS)",
+                    ExpressionAttributeValues={":units": {"N": str(-units)}},
+                    ReturnValues="UPDATED_NEW",
+                )
+                if day == today:
+                    with self._lock:
+                        self.daily_used = int(response["Attributes"]["UNITS"]["N"])
+            except ClientError as error:
+                logger.warning(f"Could not release {units} quota units of {day}: {error}")
+
+    def get_remaining(self):
+        """Units left in the daily budget, including the ones reserved by this invocation; None if unknown"""
+        with self._lock:
+            if self.daily_exhausted:
+                return self.reserved + self.allowed
+            if self.daily_used is None:
+                return None
+            return max(self.daily_limit - self.daily_used, 0) + self.reserved
+
+    def is_exhausted(self):
+        with self._lock:
+            if self.daily_exhausted and self.reserved + self.allowed == 0:
+                return True
+        return super().is_exhausted()
+
+    def is_low(self):
+        remaining = self.get_remaining()
+        return remaining is not None and remaining < self.low_quota_ratio * self.daily_limit
+
+    def get_stats(self):
+        stats = super().get_stats()
+        with self._lock:
+            stats.update(
+                {
+                    "daily_limit": self.daily_limit,
+                    "daily_used": self.daily_used,
+                    "reserved": self.reserved,
+                    "allowed": self.allowed,
+                    "reservations": self.reservations,
+                }
+            )
+        return stats
+
+
+def get_quota_budget():
+    """
+    The quota budget of an invocation: persisted daily when the 'DAILY_QUOTA_UNITS' lambda environment variable is
+    set, else limited to 'QUOTA_UNITS_PER_INVOCATION' units, if set
+    """
+    if os.environ.get("DAILY_QUOTA_UNITS", None):
+        limit = os.environ.get("QUOTA_UNITS_PER_INVOCATION", None)
+        quota_budget = DailyQuotaBudget(limit=int(limit) if limit else None)
+        quota_budget.refresh()
+        return quota_budget
+    return QuotaBudget.from_environment()
@@ -13,26 +13,53 @@ import googleapiclient.errors
 from shared_util.custom_logging import get_logger
 from shared_util.service_helper import get_service_client, get_service_resource
 
-from util import credential_helper
+from util import credential_helper, ddb_helper
+from util.quota_budget import SEARCH_LIST_COST, VIDEOS_LIST_COST, get_quota_budget
 from util.youtube_service_helper import get_youtube_service_resource
 
 logger = get_logger(__name__)
 
+# number of videos per event for the comments lambda function, which harvests the comments of the videos of an event
+# concurrently. With 1, there is one event (and one invocation) per video
+DEFAULT_VIDEOS_PER_EVENT = 1
+MAX_ENTRIES_PER_PUT_EVENTS = 10
+# videos.list accepts up to 50 video ids per request
+MAX_IDS_PER_VIDEOS_LIST = 50
+
 
 def search_videos():
     youtube = get_youtube_service_resource()
+    quota_budget = get_quota_budget()
+    try:
+        search_video_pages(youtube, quota_budget)
+    finally:
+        quota_budget.release()
+    logger.info(f"Quota budget: {quota_budget.get_stats()}")
+
 
+def search_video_pages(youtube, quota_budget):
+    """
+    Pages through the video search results. A page (SEARCH_LIST_COST units) is only requested if the quota budget
+    allows it; when the daily quota is low, only the first page (the most relevant videos) is requested, so that the
+    remaining quota is kept for the comments of the videos found
+    """
     video_search_params = build_youtube_search_request()
 
     while True:
         logger.debug(f"video search parameters: {json.dumps(video_search_params)}")
+        if quota_budget.is_low() and "pageToken" in video_search_params:
+            logger.warning("Quota is low, stopping the video search after the first page")
+            break
+        if not quota_budget.try_consume(SEARCH_LIST_COST):
+            logger.warning(f"Quota budget exhausted, stopping the video search: {quota_budget.get_stats()}")
+            break
 
         request = youtube.search().list(**video_search_params)
         try:
             youtube_response = request.execute()
             if youtube_response.get("items", None) and len(youtube_response["items"]) == 0:
                 logger.warn(f"Found no videos for {json.dumps(video_search_params)}")
-            process_response(youtube_response, video_search_params)
+            process_response(youtube_response, video_search_params, youtube, quota_budget)
 
             next_page_token = youtube_response.get("nextPageToken", None)
             if next_page_token:
@@ -85,29 +112,139 @@ def build_youtube_search_request():
     return video_search_params
 
 
-def process_response(youtube_response, video_search_params):
+def get_videos_per_event():
+    return int(os.environ.get("VIDEOS_PER_EVENT", DEFAULT_VIDEOS_PER_EVENT))
+
+
+def publish_videos(videos, videos_per_event=None):
+    """
+    Publishes 'Videos' events with up to 'videos_per_event' videos each. A video is the detail of a 'Video' event:
+    a dict with the 'VideoId', 'SearchQuery' and 'Title', and the 'PageToken' to resume the harvest of its comments
+    from when it was stopped
+    """
     event_bus = get_service_client("events")
-    count = 1
-    comments = []
+    videos_per_event = videos_per_event if videos_per_event else get_videos_per_event()
+    entries = [
+        {
+            "EventBusName": os.environ["EVENT_BUS_NAME"],
+            "Source": os.environ["VIDEO_NAMESPACE"],
+            "Detail": json.dumps({"Videos": videos[index : index + videos_per_event]}),
+            "DetailType": "Videos",
+        }
+        for index in range(0, len(videos), videos_per_event)
+    ]
+
+    for index in range(0, len(entries), MAX_ENTRIES_PER_PUT_EVENTS):
+        service_response = event_bus.put_events(Entries=entries[index : index + MAX_ENTRIES_PER_PUT_EVENTS])
+        logger.debug(f"Put events response is {json.dumps(service_response)}")
+        if service_response.get("FailedEntryCount", 0) > 0:
+            logger.error(f"Error in put events {json.dumps(service_response['Entries'])}")
+
+
+def skip_unchanged_videos():
+    return os.environ.get("SKIP_UNCHANGED_VIDEOS", "false").lower() == "true"
+
+
+def get_comment_counts(youtube, video_ids, quota_budget):
+    """
+    Comment counts of the videos by video id, from the statistics of videos.list, MAX_IDS_PER_VIDEOS_LIST videos per
+    request. A video that is not returned (deleted or private) or without 'commentCount' (its comments are disabled)
+    is absent. Returns None if the counts could not be requested: the quota budget does not allow it, or an API error
+    (which is logged)
+    """
+    comment_counts = {}
+    for index in range(0, len(video_ids), MAX_IDS_PER_VIDEOS_LIST):
+        if not quota_budget.try_consume(VIDEOS_LIST_COST):
+            logger.warning("Quota budget exhausted, the comment counts of the videos are not requested")
+            return None
+        request = youtube.videos().list(
+            part="statistics",
+            id=",".join(video_ids[index : index + MAX_IDS_PER_VIDEOS_LIST]),
+            maxResults=MAX_IDS_PER_VIDEOS_LIST,
+        )
+        try:
+            youtube_response = request.execute()
+        except googleapiclient.errors.HttpError as error:
+            logger.error(f"Error requesting the statistics of the videos: {error}")
+            return None
+        for item in youtube_response.get("items", []):
+            if item.get("statistics", {}).get("commentCount", None) is not None:
+                comment_counts[item["id"]] = int(item["statistics"]["commentCount"])
+    return comment_counts
+
+
+def filter_changed_videos(youtube, videos, quota_budget):
+    """
+    Returns the videos whose comment count changed since the last harvest, the count stored in their tracker. The
+    comment count ('CommentCount') and its change ('CommentCountDelta') are added to the videos: the tracker stores
+    the count once the comments are harvested, and the change is the expected yield of the video (see 'priority').
+    A video that has no tracker yet is kept if it has comments; a video whose tracker has no count is kept, without
+    'CommentCountDelta'. All the videos are kept if their counts could not be requested
+    """
+    comment_counts = get_comment_counts(youtube, [video["VideoId"] for video in videos], quota_budget)
+    if comment_counts is None:
+        return videos
+
+    last_comment_counts = ddb_helper.get_last_comment_counts(list(comment_counts))
+    changed_videos = []
+    for video in videos:
+        comment_count = comment_counts.get(video["VideoId"], None)
+        if comment_count is None:
+            continue
+        last_comment_count = last_comment_counts.get(video["VideoId"], 0)
+        if comment_count == last_comment_count:
+            continue
+
+        video = dict(video, CommentCount=comment_count)
+        if last_comment_count is not None:
+            video["CommentCountDelta"] = max(comment_count - last_comment_count, 0)
+        changed_videos.append(video)
+
+    logger.info(f"{len(changed_videos)} of {len(videos)} videos have new comments since their last harvest")
+    return changed_videos
 
+
+def process_response(youtube_response, video_search_params, youtube=None, quota_budget=None):
+    """
+    Publishes the videos of a search page, in 'Video' events or in 'Videos' events of VIDEOS_PER_EVENT videos. When
+    SKIP_UNCHANGED_VIDEOS is 'true', only the videos whose comment count changed since their last harvest are
+    published (see 'filter_changed_videos')
+    """
     logger.debug(f"video search parameters {json.dumps(video_search_params)}")
     search_query = f'{video_search_params.get("q", None)}#{video_search_params.get("channelId", None)}'
 
-    for index, item in enumerate(youtube_response["items"]):
-        logger.debug(f"Item is {item}")
+    videos = []
+    for item in youtube_response["items"]:
+        video = {"VideoId": item["id"]["videoId"], "SearchQuery": search_query, "Title": item["snippet"]["title"]}
+        # the publication date is used to prioritize the videos when the quota is low
+        if get_videos_per_event() > 1 and item["snippet"].get("publishedAt", None):
+            video["PublishedAt"] = item["snippet"]["publishedAt"]
+        videos.append(video)
+
+    if youtube and quota_budget and skip_unchanged_videos() and videos:
+        videos = filter_changed_videos(youtube, videos, quota_budget)
+
+    if get_videos_per_event() > 1:
+        publish_videos(videos)
+        return
+
+    event_bus = get_service_client("events")
+    count = 1
+    comments = []
+
+    for index, video in enumerate(videos):
+        logger.debug(f"Video is {video}")
         comments.append(
             {
                 "EventBusName": os.environ["EVENT_BUS_NAME"],
                 "Source": os.environ["VIDEO_NAMESPACE"],
-                "Detail": json.dumps(
-                    {"VideoId": item["id"]["videoId"], "SearchQuery": search_query, "Title": item["snippet"]["title"]}
-                ),
+                "Detail": json.dumps(video),
                 "DetailType": "Video",
             }
         )
         logger.debug(f"Count is {count}")
         # optimize the loop to perform put_events with every 10 items
-        if count == 10 or len(youtube_response["items"]) - index == 1:
+        if count == 10 or len(videos) - index == 1:
             service_response = event_bus.put_events(Entries=comments)
 
             logger.debug(f"Put events response is {json.dumps(service_response)}")
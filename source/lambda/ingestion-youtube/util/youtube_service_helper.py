@@ -4,18 +4,59 @@
 # SPDX-License-Identifier: Apache-2.0
 ######################################################################################################################
 
+import os
+import threading
+
 import googleapiclient.discovery
+import httplib2
 
 from util import credential_helper
 
+# timeout in seconds of a single YouTube API request
+HTTP_TIMEOUT_SECONDS = 30
+# discovery document of the YouTube Data API, limited to the methods called by the lambda functions. It is created
+# from the document of google-api-python-client by test/fixtures/discovery_document_fixture.py
+DISCOVERY_DOCUMENT_PATH = os.path.join(os.path.dirname(__file__), "discovery", "youtube.v3.json")
+
 youtube_resource = None
+_youtube_api_key = None
+_discovery_document = None
+_youtube_resource_lock = threading.Lock()
+_thread_local = threading.local()
+
+
+def get_discovery_document():
+    global _discovery_document
+    if _discovery_document is None:
+        with open(DISCOVERY_DOCUMENT_PATH, encoding="utf-8") as document_file:
+            _discovery_document = document_file.read()
+    return _discovery_document
 
 
 def get_youtube_service_resource():
-    global youtube_resource
-    if not youtube_resource:
-        youtube_resource = googleapiclient.discovery.build(
-            "youtube", "v3", developerKey=credential_helper.get_api_key()
-        )
+    """
+    Returns the YouTube client of the lambda container, built on first use from the bundled discovery document: there
+    is no discovery request, and only the methods that are called are parsed. The client is built again when the API
+    key changes (see 'credential_helper.get_api_key')
+    """
+    global youtube_resource, _youtube_api_key
+
+    api_key = credential_helper.get_api_key()
+    with _youtube_resource_lock:
+        if not youtube_resource or api_key != _youtube_api_key:
+            youtube_resource = googleapiclient.discovery.build_from_document(
+                get_discovery_document(), developerKey=api_key, http=httplib2.Http(timeout=HTTP_TIMEOUT_SECONDS)
+            )
+            _youtube_api_key = api_key
+
+        return youtube_resource
+
 
-    return youtube_resource
+def get_thread_http():
+    """
+    The http object of the service resource (httplib2) is not thread safe. Requests executed from worker threads pass
+    the one of their thread instead: 'request.execute(http=get_thread_http())'. The API key is part of the request uri
+    """
+    if not hasattr(_thread_local, "http"):
+        _thread_local.http = httplib2.Http(timeout=HTTP_TIMEOUT_SECONDS)
+    return _thread_local.http
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+######################################################################################################################
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+######################################################################################################################
+
+import threading
+import time
+from abc import ABC, abstractmethod
+
+from shared_util.custom_logging import get_logger
+
+logger = get_logger(__name__)
+
+MAX_ATTEMPTS = 5
+BASE_BACKOFF_SECONDS = 0.1
+
+
+class BatchWriter(ABC):
+    """
+    Base class of the writers that buffer items and send them with a batch API, such as Kinesis Data Streams
+    PutRecords, Kinesis Data Firehose PutRecordBatch or EventBridge PutEvents. Items are sent when the buffer reaches
+    'max_items' items or 'max_bytes' bytes, and when the writer is flushed. Items reported as failed in a response are
+    resent with exponential backoff; items that were accepted are never resent.
+
+    Subclasses implement the abstract methods '_put_batch', which sends a batch and returns the result of each item,
+    and '_on_failure', which is called with the items that still failed after the last attempt. The writer can be
+    used as a context manager, in which case it flushes when the block exits.
+    """
+
+    def __init__(self, max_items, max_bytes, max_attempts=MAX_ATTEMPTS, backoff_seconds=BASE_BACKOFF_SECONDS):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+
+        self.items_sent = 0
+        self.items_retried = 0
+        self.batches_sent = 0
+
+        self._items = []
+        self._buffered_bytes = 0
+        self._lock = threading.RLock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
+
+    @abstractmethod
+    def _put_batch(self, items):
+        """Sends 'items' in a single call. Returns the result of each item in order, with 'ErrorCode' if it failed"""
+        pass
+
+    @abstractmethod
+    def _on_failure(self, items, results):
+        """Called with the items that still failed after the last attempt, and their results"""
+        pass
+
+    def _add(self, item, size):
+        """Adds an item of 'size' bytes to the buffer. The buffer is sent once it reaches the batch limits"""
+        with self._lock:
+            if self._buffered_bytes + size > self.max_bytes:
+                self.flush()
+
+            self._items.append(item)
+            self._buffered_bytes += size
+
+            if len(self._items) >= self.max_items:
+                self.flush()
+
+    def flush(self):
+        """Sends all buffered items. Returns the final result of each item, in the order the items were added"""
+        with self._lock:
+            items = self._items
+            self._items = []
+            self._buffered_bytes = 0
+            return self._send_batch(items)
+
+    def _send_batch(self, items):
+        if not items:
+            return []
+
+        results = [None] * len(items)
+        pending_indexes = list(range(len(items)))
+        for attempt in range(self.max_attempts):
+            batch_results = self._put_batch([items[index] for index in pending_indexes])
+            self.batches_sent += 1
+
+            # the results are in the same order as the items of the request
+            failed_indexes = []
+            for index, result in zip(pending_indexes, batch_results):
+                results[index] = result
+                if result.get("ErrorCode", None):
+                    failed_indexes.append(index)
+
+            self.items_sent += len(pending_indexes) - len(failed_indexes)
+            pending_indexes = failed_indexes
+            if not pending_indexes:
+                return results
+
+            logger.warning(f"{len(pending_indexes)} items failed on attempt {attempt + 1}, retrying failed items")
+            if attempt + 1 < self.max_attempts:
+                self.items_retried += len(pending_indexes)
+                time.sleep(self.backoff_seconds * (2**attempt))
+
+        self._on_failure([items[index] for index in pending_indexes], [results[index] for index in pending_indexes])
+        return results
@@ -0,0 +1,440 @@
+#!/usr/bin/env python
+######################################################################################################################
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+######################################################################################################################
+
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from hashlib import blake2b
+
+from botocore.exceptions import ClientError
+from shared_util.custom_logging import get_logger
+from shared_util.service_helper import get_service_client
+
+logger = get_logger(__name__)
+
+FINGERPRINT_BITS = 64
+DEFAULT_MAX_DISTANCE = 7
+DEFAULT_MAX_ENTRIES = 100000
+DEFAULT_TTL_DAYS = 7
+DEFAULT_REFRESH_SECONDS = 60
+SHINGLE_SIZE = 2
+MAX_KEYS_PER_BATCH_GET = 100
+MAX_ITEMS_PER_BATCH_WRITE = 25
+MAX_BATCH_ATTEMPTS = 3
+BASE_BACKOFF_SECONDS = 0.1
+
+# items of the fingerprint store: the log items hold the fingerprints written by a flush, the manifest item of an hour
+# holds the ids of the log items written in that hour. A log item is kept well below the 400 KB item size limit
+LOG_PREFIX = "FINGERPRINT_LOG"
+MANIFEST_PREFIX = "FINGERPRINT_MANIFEST"
+MAX_BYTES_PER_LOG_ITEM = 256 * 1024
+
+# what to do with a near duplicate record: drop it, or tag it with the id of the record it duplicates
+DROP = "drop"
+TAG = "tag"
+ACTIONS = (DROP, TAG)
+
+# lambda environment variables to enable the filter of KinesisBatchWriter
+ACTION_ENV = "NEAR_DUPLICATE_ACTION"
+MAX_DISTANCE_ENV = "NEAR_DUPLICATE_MAX_DISTANCE"
+TABLE_NAME_ENV = "NEAR_DUPLICATE_TABLE_NAME"
+
+WORD_PATTERN = re.compile(r"\w+")
+
+# The bits of the feature hashes are counted column by column in C: the digests are concatenated, the byte column of
+# each digest position is sliced out, and for each bit a translation table maps the bytes with that bit set to 1
+DIGEST_SIZE = FINGERPRINT_BITS // 8
+_BIT_TABLES = [bytes((byte >> bit) & 1 for byte in range(256)) for bit in range(8)]
+
+
+def get_features(text):
+    """Lower case word shingles of the text; a text with fewer words than a shingle is a single feature"""
+    words = WORD_PATTERN.findall(text.lower()) if text else []
+    if len(words) <= SHINGLE_SIZE:
+        return [" ".join(words)] if words else []
+    return [" ".join(words[index : index + SHINGLE_SIZE]) for index in range(len(words) - SHINGLE_SIZE + 1)]
+
+
+def simhash(text):
+    """
+    64 bit SimHash of the text: every bit is the majority vote of that bit in the hashes of the features of the text, so
+    that texts that share most of their features have fingerprints that differ in few bits. Returns None if the text
+    has no words
+    """
+    features = get_features(text)
+    if not features:
+        return None
+
+    digests = b"".join(blake2b(feature.encode("utf-8"), digest_size=DIGEST_SIZE).digest() for feature in features)
+    fingerprint = 0
+    for position in range(DIGEST_SIZE):
+        column = digests[position::DIGEST_SIZE]
+        for bit, bit_table in enumerate(_BIT_TABLES):
+            if 2 * column.translate(bit_table).count(1) > len(features):
+                fingerprint |= 1 << (position * 8 + bit)
+    return fingerprint
+
+
+def hamming_distance(fingerprint, other_fingerprint):
+    return (fingerprint ^ other_fingerprint).bit_count()
+
+
+def get_bands(fingerprint, band_count):
+    """
+    Split the fingerprint into 'band_count' bands. Two fingerprints that differ in fewer bits than there are bands have
+    at least one identical band (pigeonhole principle), hence candidates are found by looking up each band exactly
+    """
+    band_bits = -(-FINGERPRINT_BITS // band_count)
+    mask = (1 << band_bits) - 1
+    return [(index, (fingerprint >> (index * band_bits)) & mask) for index in range(band_count)]
+
+
+class FingerprintStore:
+    """
+    DynamoDB backed log of fingerprints, shared by the ingestion lambda functions so that near duplicates are found
+    across sources. The fingerprints added to the store are buffered and written once per flush: as log items, with
+    BatchWriteItem, and the ids of those log items are added to the manifest item of the hour with a single UpdateItem.
+    'get_new_entries' reads the manifests and the log items that the store has not read or written yet, at most every
+    'refresh_seconds', so that a filter can add them to its in-memory index and look records up without a request.
+    Items have an 'EXP_DATE' time to live of 'ttl_days' days; the table should have a string hash key 'ID'.
+
+    Items are written whole and only the manifest of the current hour is updated, hence no item grows past one hour
+    of flushes and the writes are spread over one new key per flush.
+
+    Errors are logged and not raised: not being able to deduplicate should not stop the ingestion
+    """
+
+    def __init__(
+        self, table_name, dynamodb_client=None, ttl_days=DEFAULT_TTL_DAYS, refresh_seconds=DEFAULT_REFRESH_SECONDS
+    ):
+        self.table_name = table_name
+        self.dynamodb_client = dynamodb_client if dynamodb_client else get_service_client("dynamodb")
+        self.ttl_days = ttl_days
+        self.refresh_seconds = refresh_seconds
+
+        self._pending = []  # (fingerprint, record id) added since the last flush
+        self._known_logs = set()  # ids of the log items read or written by this store
+        self._refreshed_at = None  # time.monotonic() of the last refresh, None before the first one
+        self._refreshed_until = None  # datetime of the last refresh
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    @staticmethod
+    def _get_hour(now):
+        return now.strftime("%Y-%m-%dT%H")
+
+    def _get_manifest_key(self, hour):
+        return {"ID": {"S": f"{MANIFEST_PREFIX}#{hour}"}}
+
+    def _get_exp_date(self, now):
+        return str(int((now + timedelta(days=self.ttl_days)).timestamp()))
+
+    def add(self, fingerprint, record_id):
+        """Buffers the fingerprint of a record, it is written by the next 'flush'"""
+        with self._lock:
+            self._pending.append(f"{fingerprint:x}#{record_id}")
+
+    def flush(self):
+        """Writes the buffered fingerprints as log items, and adds the log items to the manifest of the hour"""
+        with self._lock:
+            entries, self._pending = list(dict.fromkeys(self._pending)), []
+        if not entries:
+            return
+
+        now = datetime.now(timezone.utc)
+        hour = self._get_hour(now)
+        exp_date = self._get_exp_date(now)
+        log_items = {}
+        chunk, chunk_bytes = [], 0
+        for entry in entries:
+            if chunk and chunk_bytes + len(entry) > MAX_BYTES_PER_LOG_ITEM:
+                log_items[f"{LOG_PREFIX}#{hour}#{uuid.uuid4().hex}"] = chunk
+                chunk, chunk_bytes = [], 0
+            chunk.append(entry)
+            chunk_bytes += len(entry)
+        log_items[f"{LOG_PREFIX}#{hour}#{uuid.uuid4().hex}"] = chunk
+
+        # the log items are written before they are listed in the manifest, so that every listed item exists
+        written_ids = self._write_log_items(log_items, exp_date)
+        with self._lock:
+            # the fingerprints written by this store are already in the index of its filter
+            self._known_logs.update(written_ids)
+        if not written_ids:
+            return
+
+        try:
+            self.dynamodb_client.update_item(
+                TableName=self.table_name,
+                Key=self._get_manifest_key(hour),
+                UpdateExpression="ADD LOGS :log_ids SET EXP_DATE = :exp_date",
+                ExpressionAttributeValues={":log_ids": {"SS": written_ids}, ":exp_date": {"N": exp_date}},
+            )
+        except ClientError as error:
+            logger.warning(f"Could not add {len(written_ids)} fingerprint log items to the manifest: {error}")
+
+    def _write_log_items(self, log_items, exp_date):
+        """Writes the log items with BatchWriteItem, returns the ids of the items that were written"""
+        log_ids = list(log_items)
+        written_ids = []
+        for index in range(0, len(log_ids), MAX_ITEMS_PER_BATCH_WRITE):
+            pending_ids = log_ids[index : index + MAX_ITEMS_PER_BATCH_WRITE]
+            for attempt in range(MAX_BATCH_ATTEMPTS):
+                request_items = {
+                    self.table_name: [
+                        {
+                            "PutRequest": {
+                                "Item": {
+                                    "ID": {"S": log_id},
+                                    "FINGERPRINTS": {"SS": log_items[log_id]},
+                                    "EXP_DATE": {"N": exp_date},
+                                }
+                            }
+                        }
+                        for log_id in pending_ids
+                    ]
+                }
+                try:
+                    response = self.dynamodb_client.batch_write_item(RequestItems=request_items)
+                except ClientError as error:
+                    logger.warning(f"Could not write fingerprints: {error}")
+                    break
+
+                unprocessed_ids = {
+                    request["PutRequest"]["Item"]["ID"]["S"]
+                    for request in response.get("UnprocessedItems", {}).get(self.table_name, [])
+                }
+                written_ids.extend(log_id for log_id in pending_ids if log_id not in unprocessed_ids)
+                pending_ids = [log_id for log_id in pending_ids if log_id in unprocessed_ids]
+                if not pending_ids:
+                    break
+                if attempt + 1 < MAX_BATCH_ATTEMPTS:
+                    time.sleep(BASE_BACKOFF_SECONDS * (2**attempt))
+            else:
+                logger.warning(f"Could not write {len(pending_ids)} fingerprint log items, unprocessed items")
+        return written_ids
+
+    def _batch_get(self, keys):
+        """Reads the items of 'keys' with BatchGetItem, MAX_KEYS_PER_BATCH_GET keys at a time"""
+        items = []
+        for index in range(0, len(keys), MAX_KEYS_PER_BATCH_GET):
+            request_items = {self.table_name: {"Keys": keys[index : index + MAX_KEYS_PER_BATCH_GET]}}
+            for attempt in range(MAX_BATCH_ATTEMPTS):
+                try:
+                    response = self.dynamodb_client.batch_get_item(RequestItems=request_items)
+                except ClientError as error:
+                    logger.warning(f"Could not read fingerprints: {error}")
+                    return items
+
+                items.extend(response["Responses"].get(self.table_name, []))
+                request_items = response.get("UnprocessedKeys", None)
+                if not request_items:
+                    break
+                if attempt + 1 < MAX_BATCH_ATTEMPTS:
+                    time.sleep(BASE_BACKOFF_SECONDS * (2**attempt))
+            else:
+                logger.warning(f"Could not read {len(request_items[self.table_name]['Keys'])} fingerprint items")
+        return items
+
+    def _is_due(self):
+        return self._refreshed_at is None or time.monotonic() - self._refreshed_at >= self.refresh_seconds
+
+    def get_new_entries(self, max_entries):
+        """
+        Returns the (fingerprint, record id) pairs of the log items that this store did not read or write yet, newest
+        log items first and up to about 'max_entries' pairs. Returns an empty list if the last refresh was less than
+        'refresh_seconds' ago. The first refresh reads the manifests of the last 'ttl_days' days, the next ones the
+        manifests of the hours since the previous refresh
+        """
+        if not self._is_due():
+            return []
+        # only the first refresh waits for the refresh of another thread, the next ones keep using the index meanwhile
+        if not self._refresh_lock.acquire(blocking=self._refreshed_at is None):
+            return []
+        try:
+            if not self._is_due():
+                return []
+
+            now = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+            oldest = now - timedelta(days=self.ttl_days)
+            # the manifest of the hour of the previous refresh may have had log items added since
+            hour = self._refreshed_until.replace(minute=0, second=0, microsecond=0) if self._refreshed_until else oldest
+            hours = []
+            while hour <= now:
+                hours.append(self._get_hour(hour))
+                hour += timedelta(hours=1)
+
+            manifests = self._batch_get([self._get_manifest_key(hour) for hour in hours])
+            with self._lock:
+                log_ids = {
+                    log_id
+                    for manifest in manifests
+                    for log_id in manifest.get("LOGS", {}).get("SS", [])
+                    if log_id not in self._known_logs
+                }
+            # the ids start with the hour of their log item, hence sorting them puts the newest log items first
+            log_ids = sorted(log_ids, reverse=True)
+
+            entries = []
+            for index in range(0, len(log_ids), MAX_KEYS_PER_BATCH_GET):
+                if len(entries) >= max_entries:
+                    break
+                for item in self._batch_get(
+                    [{"ID": {"S": log_id}} for log_id in log_ids[index : index + MAX_KEYS_PER_BATCH_GET]]
+                ):
+                    for entry in item.get("FINGERPRINTS", {}).get("SS", []):
+                        fingerprint, record_id = entry.split("#", 1)
+                        entries.append((int(fingerprint, 16), record_id))
+
+            oldest_hour = self._get_hour(oldest)
+            with self._lock:
+                # the log items that were not read because of 'max_entries' are older than the ones that were
+                self._known_logs.update(log_ids)
+                self._known_logs = {log_id for log_id in self._known_logs if log_id.split("#")[1] >= oldest_hour}
+            self._refreshed_at = time.monotonic()
+            self._refreshed_until = datetime.now(timezone.utc)
+            return entries
+        finally:
+            self._refresh_lock.release()
+
+
+class NearDuplicateFilter:
+    """
+    Finds records whose text is a near duplicate (SimHash fingerprints within 'max_distance' bits) of a record seen
+    before. The fingerprints of the last 'max_entries' records are kept in memory, indexed by band. With a
+    'fingerprint_store' the fingerprints added are also written to DynamoDB by 'flush', and 'find' first adds the
+    fingerprints that the other lambda functions wrote since the last refresh of the store to the in-memory index, so
+    that a lookup makes no DynamoDB request.
+
+    'find' returns the id of the record that a fingerprint duplicates, or None. It does not index the fingerprint:
+    'add' does, once the record was delivered, so that a record that failed to be delivered is not a duplicate of
+    itself when it is sent again. For the same reason a fingerprint indexed with the id of the record is not a match
+    """
+
+    def __init__(self, max_distance=DEFAULT_MAX_DISTANCE, max_entries=DEFAULT_MAX_ENTRIES, fingerprint_store=None):
+        # bands of less than 8 bits would put most fingerprints in the same few buckets
+        if not 0 <= max_distance < FINGERPRINT_BITS // 8:
+            raise ValueError(
+                f"max_distance should be between 0 and {FINGERPRINT_BITS // 8 - 1}, received {max_distance}"
+            )
+
+        self.max_distance = max_distance
+        self.band_count = max_distance + 1
+        self.max_entries = max_entries
+        self.fingerprint_store = fingerprint_store
+
+        self.records_checked = 0
+        self.duplicates_found = 0
+
+        self._entries = OrderedDict()  # fingerprint -> record id, oldest first
+        self._bands = {}  # band -> set of fingerprints
+        self._lock = threading.RLock()
+
+    def is_near(self, fingerprint, other_fingerprint):
+        return hamming_distance(fingerprint, other_fingerprint) <= self.max_distance
+
+    def _find_in_memory(self, fingerprint, record_id, bands):
+        for band in bands:
+            for candidate in self._bands.get(band, ()):
+                if self._entries[candidate] != record_id and self.is_near(fingerprint, candidate):
+                    self._entries.move_to_end(candidate)
+                    return self._entries[candidate]
+        return None
+
+    def _refresh(self):
+        """Indexes the fingerprints written to the store by the other lambda functions, when the store is due"""
+        # the store is read without holding the lock, so that the other threads are not blocked on the requests
+        entries = self.fingerprint_store.get_new_entries(self.max_entries)
+        if not entries:
+            return
+        with self._lock:
+            # the oldest first, so that the newest are the last to be evicted
+            for fingerprint, record_id in reversed(entries):
+                self._add_in_memory(fingerprint, record_id, get_bands(fingerprint, self.band_count))
+
+    def _add_in_memory(self, fingerprint, record_id, bands):
+        if fingerprint in self._entries:
+            return
+        self._entries[fingerprint] = record_id
+        for band in bands:
+            self._bands.setdefault(band, set()).add(fingerprint)
+
+        while len(self._entries) > self.max_entries:
+            evicted, _ = self._entries.popitem(last=False)
+            for band in get_bands(evicted, self.band_count):
+                fingerprints = self._bands[band]
+                fingerprints.discard(evicted)
+                if not fingerprints:
+                    del self._bands[band]
+
+    def find(self, fingerprint, record_id):
+        """Returns the id of a record other than 'record_id' whose fingerprint is near 'fingerprint', or None"""
+        if self.fingerprint_store:
+            self._refresh()
+
+        bands = get_bands(fingerprint, self.band_count)
+        with self._lock:
+            self.records_checked += 1
+            duplicate_of = self._find_in_memory(fingerprint, record_id, bands)
+            if duplicate_of is not None:
+                self.duplicates_found += 1
+        if duplicate_of is not None:
+            logger.debug(f"Record {record_id} is a near duplicate of {duplicate_of}")
+        return duplicate_of
+
+    def check(self, text, record_id):
+        """Returns the id of the record that the text is a near duplicate of, or None. The text is not indexed"""
+        fingerprint = simhash(text)
+        return self.find(fingerprint, record_id) if fingerprint is not None else None
+
+    def add(self, fingerprint, record_id):
+        """Index the fingerprint of a delivered record in memory, and buffer it for the fingerprint store"""
+        bands = get_bands(fingerprint, self.band_count)
+        with self._lock:
+            if fingerprint in self._entries:
+                return
+            self._add_in_memory(fingerprint, record_id, bands)
+        if self.fingerprint_store:
+            self.fingerprint_store.add(fingerprint, record_id)
+
+    def flush(self):
+        """Writes the fingerprints added since the last flush to the fingerprint store, if any"""
+        if self.fingerprint_store:
+            self.fingerprint_store.flush()
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "checked": self.records_checked,
+                "duplicates": self.duplicates_found,
+                "indexed": len(self._entries),
+            }
+
+
+_default_filter = None
+_default_filter_lock = threading.Lock()
+
+
+def get_default_filter():
+    """
+    Returns the filter configured by the lambda environment variables, or None if 'NEAR_DUPLICATE_ACTION' is not set.
+    The filter is created once per container, so that its in-memory index is kept across invocations
+    """
+    global _default_filter
+    if not os.environ.get(ACTION_ENV, None):
+        return None
+
+    with _default_filter_lock:
+        if _default_filter is None:
+            table_name = os.environ.get(TABLE_NAME_ENV, None)
+            _default_filter = NearDuplicateFilter(
+                max_distance=int(os.environ.get(MAX_DISTANCE_ENV, DEFAULT_MAX_DISTANCE)),
+                fingerprint_store=FingerprintStore(table_name) if table_name else None,
+            )
+        return _default_filter
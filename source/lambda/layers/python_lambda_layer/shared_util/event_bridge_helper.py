@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+######################################################################################################################
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+######################################################################################################################
+
+from shared_util.batch_writer import BASE_BACKOFF_SECONDS, MAX_ATTEMPTS, BatchWriter
+from shared_util.custom_logging import get_logger
+from shared_util.service_helper import get_service_client
+
+logger = get_logger(__name__)
+
+# service limits for Amazon EventBridge PutEvents API
+MAX_ENTRIES_PER_BATCH = 10
+MAX_BYTES_PER_BATCH = 256 * 1024
+
+
+def get_entry_size(entry):
+    """
+    Calculate the size of a PutEvents entry as documented in
+    https://docs.aws.amazon.com/eventbridge/latest/userguide/eb-putevent-size.html
+    """
+    size = 14 if entry.get("Time", None) else 0
+    size += len(entry["Source"].encode("utf-8"))
+    size += len(entry["DetailType"].encode("utf-8"))
+    if entry.get("Detail", None):
+        size += len(entry["Detail"].encode("utf-8"))
+    for resource in entry.get("Resources", []):
+        size += len(resource.encode("utf-8"))
+    return size
+
+
+class EventBridgeBatcher(BatchWriter):
+    """
+    This class packs PutEvents entries into batches of up to 10 entries and 256 KB, and publishes them to
+    Amazon EventBridge, see 'BatchWriter'. Entries that still fail after the last attempt are available in
+    'failed_entries'.
+    """
+
+    def __init__(
+        self,
+        event_bus=None,
+        max_entries=MAX_ENTRIES_PER_BATCH,
+        max_bytes=MAX_BYTES_PER_BATCH,
+        max_attempts=MAX_ATTEMPTS,
+        backoff_seconds=BASE_BACKOFF_SECONDS,
+    ):
+        super().__init__(
+            min(max_entries, MAX_ENTRIES_PER_BATCH), min(max_bytes, MAX_BYTES_PER_BATCH), max_attempts, backoff_seconds
+        )
+        self.event_bus = event_bus if event_bus else get_service_client("events")
+        self.failed_entries = []
+
+    @property
+    def entries_sent(self):
+        return self.items_sent
+
+    def put(self, entry):
+        """Add an entry to the buffer. The buffer is published once it reaches the batch limits"""
+        entry_size = get_entry_size(entry)
+        if entry_size > MAX_BYTES_PER_BATCH:
+            err_msg = f"Event entry is {entry_size} bytes, max allowed is {MAX_BYTES_PER_BATCH}"
+            logger.error(err_msg)
+            raise ValueError(err_msg)
+
+        self._add(entry, entry_size)
+
+    def flush(self):
+        """
+        Publish all buffered entries. Returns a PutEvents style response for the flushed entries, with the
+        final result of each entry in the order the entries were added
+        """
+        results = super().flush()
+        failed_count = sum(1 for result in results if result and result.get("ErrorCode", None))
+        return {"FailedEntryCount": failed_count, "Entries": results}
+
+    def _put_batch(self, entries):
+        return self.event_bus.put_events(Entries=entries).get("Entries", [])
+
+    def _on_failure(self, entries, results):
+        for entry, result in zip(entries, results):
+            logger.error(f"Failed to publish event entry {entry} with error {result}")
+            self.failed_entries.append(entry)
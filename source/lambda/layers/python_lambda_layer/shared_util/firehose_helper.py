@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+######################################################################################################################
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+######################################################################################################################
+
+import time
+
+from shared_util.batch_writer import BASE_BACKOFF_SECONDS, MAX_ATTEMPTS, BatchWriter
+from shared_util.custom_logging import get_logger
+from shared_util.service_helper import get_service_client
+
+logger = get_logger(__name__)
+
+# service limits for Amazon Kinesis Data Firehose PutRecordBatch API
+MAX_RECORDS_PER_BATCH = 500
+MAX_BYTES_PER_BATCH = 4 * 1024 * 1024
+MAX_BYTES_PER_RECORD = 1000 * 1024
+
+
+class FirehoseBatchWriteError(Exception):
+    pass
+
+
+class FirehoseBatchWriter(BatchWriter):
+    """
+    This class buffers records and writes them to a Kinesis Data Firehose delivery stream using the PutRecordBatch
+    API, see 'BatchWriter'. Records are sent when the buffer reaches 500 records or 4 MB, and when the writer is
+    flushed.
+
+    The time taken by each PutRecordBatch call (including retries) is recorded in 'batch_latencies' in seconds.
+    """
+
+    def __init__(
+        self,
+        delivery_stream_name,
+        firehose_client=None,
+        max_records=MAX_RECORDS_PER_BATCH,
+        max_bytes=MAX_BYTES_PER_BATCH,
+        max_attempts=MAX_ATTEMPTS,
+        backoff_seconds=BASE_BACKOFF_SECONDS,
+    ):
+        super().__init__(
+            min(max_records, MAX_RECORDS_PER_BATCH), min(max_bytes, MAX_BYTES_PER_BATCH), max_attempts, backoff_seconds
+        )
+        self.delivery_stream_name = delivery_stream_name
+        self.firehose_client = firehose_client if firehose_client else get_service_client("firehose")
+        self.batch_latencies = []
+
+    @property
+    def records_sent(self):
+        return self.items_sent
+
+    @property
+    def records_retried(self):
+        return self.items_retried
+
+    def put(self, data):
+        """Add a record (str or bytes) to the buffer. The buffer is sent once it reaches the batch limits"""
+        encoded_data = data.encode("utf-8") if isinstance(data, str) else data
+        if len(encoded_data) > MAX_BYTES_PER_RECORD:
+            err_msg = f"Record is {len(encoded_data)} bytes, max allowed is {MAX_BYTES_PER_RECORD}"
+            logger.error(err_msg)
+            raise ValueError(err_msg)
+
+        self._add({"Data": encoded_data}, len(encoded_data))
+
+    def _send_batch(self, records):
+        if not records:
+            return []
+
+        start = time.perf_counter()
+        try:
+            return super()._send_batch(records)
+        finally:
+            latency = time.perf_counter() - start
+            self.batch_latencies.append(latency)
+            logger.debug(f"Batch of {len(records)} records to {self.delivery_stream_name} took {latency:.3f}s")
+
+    def _put_batch(self, records):
+        response = self.firehose_client.put_record_batch(DeliveryStreamName=self.delivery_stream_name, Records=records)
+        return response["RequestResponses"]
+
+    def _on_failure(self, records, results):
+        err_msg = (
+            f"Failed to write {len(records)} records to {self.delivery_stream_name} after {self.max_attempts} attempts"
+        )
+        logger.error(err_msg)
+        raise FirehoseBatchWriteError(err_msg)
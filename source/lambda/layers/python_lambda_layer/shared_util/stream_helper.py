@@ -6,20 +6,215 @@
 
 import json
 import os
+import threading
 import uuid
 
 import boto3
+from shared_util import dedup_helper
+from shared_util.batch_writer import BASE_BACKOFF_SECONDS, MAX_ATTEMPTS, BatchWriter
 from shared_util.custom_logging import get_logger
 from shared_util.service_helper import get_service_client
 
 logger = get_logger(__name__)
 
+# service limits for Kinesis Data Streams PutRecords API
+MAX_RECORDS_PER_BATCH = 500
+MAX_BYTES_PER_BATCH = 5 * 1024 * 1024
+MAX_BYTES_PER_RECORD = 1024 * 1024
+
+# writer that buffer_data_into_stream delegates to, set while a KinesisBatchWriter is open. A writer opened in the
+# main thread is used by every thread, a writer opened in another thread only by that thread, so that the writers of
+# concurrent workers do not send (or fail) each other's records
+_active_writer = None
+_thread_writers = threading.local()
+
+
+class StreamBatchWriteError(Exception):
+    pass
+
+
+class KinesisBatchWriter(BatchWriter):
+    """
+    This class buffers records and writes them to a Kinesis Data Stream using the PutRecords API, see 'BatchWriter'.
+    Records are sent when the buffer reaches 500 records or 5 MB, and when the writer is flushed.
+
+    The writer is meant to be used as a context manager around a lambda handler's processing loop, so that the
+    buffer is flushed when the handler exits. While the writer is open, calls to 'buffer_data_into_stream' are
+    routed to it; if it was opened in a worker thread, only the calls of that thread are.
+
+    With a 'dedup_filter' (by default the one configured through the 'NEAR_DUPLICATE_ACTION' lambda environment
+    variable, see 'dedup_helper.get_default_filter'), records whose feed text is a near duplicate of a record seen
+    before are dropped, or tagged with 'near_duplicate_of' when the action is 'tag'. Records are also compared to the
+    records in the buffer, and a record is only added to the filter once the stream accepted it.
+    """
+
+    def __init__(
+        self,
+        stream_name=None,
+        kds_client=None,
+        max_records=MAX_RECORDS_PER_BATCH,
+        max_bytes=MAX_BYTES_PER_BATCH,
+        max_attempts=MAX_ATTEMPTS,
+        backoff_seconds=BASE_BACKOFF_SECONDS,
+        dedup_filter=None,
+        near_duplicate_action=None,
+    ):
+        super().__init__(
+            min(max_records, MAX_RECORDS_PER_BATCH), min(max_bytes, MAX_BYTES_PER_BATCH), max_attempts, backoff_seconds
+        )
+        self.stream_name = stream_name if stream_name else os.environ["STREAM_NAME"]
+        self.kds_client = kds_client if kds_client else get_service_client("kinesis")
+        self.dedup_filter = dedup_filter if dedup_filter else dedup_helper.get_default_filter()
+        self.near_duplicate_action = (
+            near_duplicate_action
+            if near_duplicate_action
+            else os.environ.get(dedup_helper.ACTION_ENV, dedup_helper.DROP)
+        )
+        if self.dedup_filter and self.near_duplicate_action not in dedup_helper.ACTIONS:
+            raise ValueError(
+                f"near_duplicate_action should be one of {dedup_helper.ACTIONS}, received {self.near_duplicate_action}"
+            )
+
+        self.records_dropped = 0
+        self.records_tagged = 0
+        # (fingerprint, record id) of the buffered records by id() of their PutRecords entry, indexed by the filter once
+        # they are sent. The slices of a split article or comment share their partition key (and the slices of a
+        # comment their record id), hence neither identifies a buffered record
+        self._fingerprints = {}
+
+        self._previous_writer = None
+        self._is_thread_writer = False
+
+    @property
+    def records_sent(self):
+        return self.items_sent
+
+    @property
+    def records_retried(self):
+        return self.items_retried
+
+    def __enter__(self):
+        global _active_writer
+        self._is_thread_writer = threading.current_thread() is not threading.main_thread()
+        if self._is_thread_writer:
+            self._previous_writer = getattr(_thread_writers, "writer", None)
+            _thread_writers.writer = self
+        else:
+            self._previous_writer = _active_writer
+            _active_writer = self
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        global _active_writer
+        try:
+            self.flush()
+        finally:
+            if self._is_thread_writer:
+                _thread_writers.writer = self._previous_writer
+            else:
+                _active_writer = self._previous_writer
+            self._previous_writer = None
+
+    def put(self, data, partition_key=None):
+        """Add a record to the buffer. The buffer is sent to the stream once it reaches the batch limits"""
+        if not partition_key:
+            partition_key = str(uuid.uuid4())
+
+        fingerprint = None
+        if self.dedup_filter:
+            data, fingerprint = self._filter_near_duplicate(data, partition_key)
+            if data is None:
+                return
+
+        encoded_data = json.dumps(data).encode("utf-8")
+        record_size = len(encoded_data) + len(partition_key.encode("utf-8"))
+        if record_size > MAX_BYTES_PER_RECORD:
+            err_msg = f"Record with partition key {partition_key} is {record_size} bytes, max allowed is {MAX_BYTES_PER_RECORD}"
+            logger.error(err_msg)
+            raise ValueError(err_msg)
+
+        record = {"Data": encoded_data, "PartitionKey": partition_key}
+        with self._lock:
+            if fingerprint:
+                self._fingerprints[id(record)] = fingerprint
+            self._add(record, record_size)
+
+    def _find_in_buffer(self, fingerprint, record_id):
+        with self._lock:
+            for buffered_fingerprint, buffered_id in self._fingerprints.values():
+                if buffered_id != record_id and self.dedup_filter.is_near(fingerprint, buffered_fingerprint):
+                    return buffered_id
+        return None
+
+    def _filter_near_duplicate(self, data, partition_key):
+        """
+        Returns the record to send, None if it should be dropped, and the (fingerprint, record id) to add to the
+        filter once the record was sent, None if it is not indexed
+        """
+        feed = data.get("feed", None) if isinstance(data, dict) else None
+        fingerprint = dedup_helper.simhash(feed.get("text", None)) if feed else None
+        if fingerprint is None:
+            return data, None
+
+        record_id = feed.get("id_str", partition_key)
+        duplicate_of = self.dedup_filter.find(fingerprint, record_id)
+        if duplicate_of is None:
+            duplicate_of = self._find_in_buffer(fingerprint, record_id)
+        if duplicate_of is None:
+            return data, (fingerprint, record_id)
+
+        if self.near_duplicate_action == dedup_helper.TAG:
+            self.records_tagged += 1
+            # the caller may reuse the record, hence the tag is set on a copy
+            return {**data, "feed": {**feed, "near_duplicate_of": duplicate_of}}, None
+
+        self.records_dropped += 1
+        return None, None
+
+    def _put_batch(self, records):
+        response = self.kds_client.put_records(StreamName=self.stream_name, Records=records)
+        logger.debug(f"Buffered {len(records) - response.get('FailedRecordCount', 0)} records into {self.stream_name}")
+
+        # the fingerprints of the records that were accepted are added to the filter
+        if self._fingerprints:
+            for record, result in zip(records, response["Records"]):
+                fingerprint = self._fingerprints.get(id(record), None)
+                if fingerprint and not result.get("ErrorCode", None):
+                    self.dedup_filter.add(*fingerprint)
+        return response["Records"]
+
+    def _send_batch(self, records):
+        try:
+            return super()._send_batch(records)
+        finally:
+            # the records of the batch were sent and added to the filter, or failed and are not indexed
+            for record in records:
+                self._fingerprints.pop(id(record), None)
+            if self.dedup_filter:
+                # the fingerprints of the batch are written to the fingerprint store together
+                self.dedup_filter.flush()
+
+    def _on_failure(self, records, results):
+        err_msg = (
+            f"Failed to buffer {len(records)} records into stream {self.stream_name} after {self.max_attempts} attempts"
+        )
+        logger.error(err_msg)
+        raise StreamBatchWriteError(err_msg)
+
 
 def buffer_data_into_stream(data, partition_key=None):
     """
     This method buffers data in to a Kinesis Data Stream. The lambda function calling it, should have an environment
     variable 'STREAM_NAME' whose value should be the name of the stream.
+
+    If a KinesisBatchWriter is open, the record is added to its buffer and None is returned. Otherwise the record is
+    written with a single PutRecord call and the service response is returned.
     """
+    writer = getattr(_thread_writers, "writer", None) or _active_writer
+    if writer:
+        writer.put(data, partition_key=partition_key)
+        return None
+
     kds_client = get_service_client("kinesis")
 
     stream_name = os.environ["STREAM_NAME"]
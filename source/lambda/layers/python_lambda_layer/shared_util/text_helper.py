@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+######################################################################################################################
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+######################################################################################################################
+
+import re
+from html import unescape
+
+from shared_util.custom_logging import get_logger
+
+logger = get_logger(__name__)
+
+# Amazon Comprehend has a size limit of 5000 bytes of UTF-8 encoded text for async and sync jobs
+MAX_BYTES_PER_SLICE = 5000
+
+# ascii delimiters can be searched for directly in the encoded bytes, since in UTF-8 the bytes of a multi byte
+# character are never in the ascii range
+SENTENCE_DELIMITERS = [b". ", b"! ", b"? ", b"\n"] + [delimiter.encode("utf-8") for delimiter in ("。", "！", "？")]
+WORD_DELIMITERS = [b" ", b"\t"]
+
+# a boundary is only used if the slice is at least this full, else the next (finer) kind of boundary is tried
+MIN_FILL_RATIO = 0.5
+
+# tags that separate blocks of text, they are replaced with a space instead of being removed so that 'one<br>two'
+# does not become 'onetwo'. Inline tags such as <b> or <a> are removed, since they can be inside a word
+BLOCK_TAGS = (
+    "address article aside blockquote br dd div dl dt figcaption figure footer h1 h2 h3 h4 h5 h6 header hr img li "
+    "main nav ol p pre section table td th tr ul"
+).split()
+# tags whose content is not text
+SKIPPED_CONTENT_TAGS = ["script", "style"]
+
+# None of the patterns below can backtrack quadratically: a tag cannot contain '<', hence every character is scanned
+# by at most one match attempt, the one starting at the closest '<' before it. Comments and the content of skipped
+# tags may contain '<', hence they are removed with a forward scan instead of a lazy '.*?' pattern
+BLOCK_TAG_PATTERN = re.compile(rf"</?(?:{'|'.join(BLOCK_TAGS)})(?![A-Za-z0-9])[^<>]*>", re.IGNORECASE)
+TAG_PATTERN = re.compile(r"</?[A-Za-z][^<>]*>|<[!?][^<>]*>")
+SKIPPED_CONTENT_START_PATTERN = re.compile(rf"<({'|'.join(SKIPPED_CONTENT_TAGS)})(?![A-Za-z0-9])[^<>]*>", re.IGNORECASE)
+SKIPPED_CONTENT_END_PATTERNS = {tag: re.compile(rf"</{tag}\s*>", re.IGNORECASE) for tag in SKIPPED_CONTENT_TAGS}
+COMMENT_START = "<!--"
+COMMENT_END = "-->"
+
+
+def _is_continuation_byte(byte):
+    return byte & 0b11000000 == 0b10000000
+
+
+def _find_boundary(encoded_text, start, end, delimiters):
+    """Return the offset just after the last delimiter in encoded_text[start:end], or -1 if there is none"""
+    boundary = -1
+    for delimiter in delimiters:
+        position = encoded_text.rfind(delimiter, start, end)
+        if position != -1:
+            boundary = max(boundary, position + len(delimiter))
+    return boundary
+
+
+def _find_slice_end(encoded_text, start, max_bytes):
+    end = start + max_bytes
+    if end >= len(encoded_text):
+        return len(encoded_text)
+
+    min_end = start + int(max_bytes * MIN_FILL_RATIO)
+    for delimiters in (SENTENCE_DELIMITERS, WORD_DELIMITERS):
+        boundary = _find_boundary(encoded_text, start, end, delimiters)
+        if boundary > min_end:
+            return boundary
+
+    # no usable boundary, cut at the last complete code point that fits
+    while _is_continuation_byte(encoded_text[end]):
+        end -= 1
+    return end
+
+
+def slice_text_into_arrays(text, max_bytes=MAX_BYTES_PER_SLICE):
+    """
+    Split text into slices of at most 'max_bytes' UTF-8 encoded bytes. Slices are packed as full as possible,
+    preferring to end after a sentence, then after a word, and never split a character. Joining the slices gives back
+    the original text.
+    """
+    if max_bytes < 4:
+        raise ValueError(f"max_bytes should be at least 4 to fit any UTF-8 character, received {max_bytes}")
+
+    if not text:
+        return []
+
+    encoded_text = text.encode("utf-8")
+    if len(encoded_text) <= max_bytes:
+        return [text]
+
+    slices = []
+    start = 0
+    while start < len(encoded_text):
+        end = _find_slice_end(encoded_text, start, max_bytes)
+        slices.append(encoded_text[start:end].decode("utf-8"))
+        start = end
+
+    logger.debug(f"Sliced text of {len(encoded_text)} bytes into {len(slices)} slices")
+    return slices
+
+
+def _remove_comments(text):
+    chunks, position = [], 0
+    while True:
+        start = text.find(COMMENT_START, position)
+        if start == -1:
+            break
+        end = text.find(COMMENT_END, start + len(COMMENT_START))
+        if end == -1:
+            # an unterminated comment is kept as text
+            break
+        chunks.append(text[position:start])
+        position = end + len(COMMENT_END)
+    chunks.append(text[position:])
+    return "".join(chunks)
+
+
+def _remove_skipped_content(text):
+    chunks, position = [], 0
+    while True:
+        start = SKIPPED_CONTENT_START_PATTERN.search(text, position)
+        if not start:
+            break
+        chunks.append(text[position : start.start()])
+        end = SKIPPED_CONTENT_END_PATTERNS[start.group(1).lower()].search(text, start.end())
+        # without an end tag, the rest of the text is content of the tag
+        position = end.end() if end else len(text)
+    chunks.append(text[position:])
+    return "".join(chunks)
+
+
+def html_to_text(text):
+    """
+    Convert an HTML fragment, such as an RSS summary, to plain text: tags and comments are removed, the content of
+    <script> and <style> is dropped, entities are decoded and whitespace is collapsed to single spaces.
+
+    The time is linear in the length of the text, also for adversarial input such as unterminated tags, on which a
+    '<.*?>' regex scans to the end of the text for every '<'. A '<' that does not start a tag, as in 'a < b', or that
+    is never closed, is kept as text.
+    """
+    if not text:
+        return ""
+
+    if COMMENT_START in text:
+        text = _remove_comments(text)
+    text = _remove_skipped_content(text)
+    text = BLOCK_TAG_PATTERN.sub(" ", text)
+    text = TAG_PATTERN.sub("", text)
+    return " ".join(unescape(text).split())
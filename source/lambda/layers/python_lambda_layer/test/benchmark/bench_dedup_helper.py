@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+######################################################################################################################
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+######################################################################################################################
+
+"""
+Reports the dedup rate and the per record overhead of 'NearDuplicateFilter' on a synthetic corpus that mixes original
+texts (news article slices and short comments) with copies of them: exact reposts, syndicated copies with a byline,
+and copies with a few words changed. Originals that are reported as duplicates are false positives.
+
+With --store, it also runs the corpus through a 'FingerprintStore' on a mocked DynamoDB table, flushing every
+--batch-size records like 'KinesisBatchWriter' does, and reports the DynamoDB requests per flush and per record.
+
+Run from the layer root directory: python -m test.benchmark.bench_dedup_helper --originals 20000 --max-distance 3 5 7
+"""
+
+import argparse
+import collections
+import os
+import random
+import time
+from unittest.mock import MagicMock
+
+from moto import mock_dynamodb
+from shared_util.dedup_helper import FingerprintStore, NearDuplicateFilter, simhash
+from shared_util.service_helper import get_service_client
+
+STORE_TABLE_NAME = "benchfingerprints"
+
+
+def set_environment():
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+    os.environ.setdefault("AWS_REGION", "us-east-1")
+    os.environ.setdefault("AWS_SDK_USER_AGENT", '{ "user_agent_extra": "solution/fakeID/fakeVersion" }')
+
+
+VOCABULARY_SIZE = 5000
+BYLINES = ["Copyright Fake News Agency.", "Read more at fakenews.com", "(Reporting by Fake Reporter)", "So true!"]
+
+
+def create_text(rng, vocabulary, word_count):
+    return " ".join(rng.choice(vocabulary) for _ in range(word_count))
+
+
+def create_copy(rng, vocabulary, text):
+    kind = rng.choice(["exact", "byline", "edit"])
+    if kind == "exact":
+        return kind, text
+    if kind == "byline":
+        return kind, f"{text} {rng.choice(BYLINES)}"
+
+    words = text.split()
+    for _ in range(rng.randint(1, 3)):
+        words[rng.randrange(len(words))] = rng.choice(vocabulary)
+    return kind, " ".join(words)
+
+
+def create_corpus(original_count, duplicate_ratio, rng):
+    vocabulary = [f"word{index}" for index in range(VOCABULARY_SIZE)]
+    corpus, originals = [], []
+    for index in range(original_count):
+        # two thirds article slices, one third comments
+        word_count = rng.randint(150, 700) if index % 3 else rng.randint(8, 40)
+        text = create_text(rng, vocabulary, word_count)
+        originals.append(text)
+        corpus.append(("original", text))
+        if rng.random() < duplicate_ratio:
+            corpus.append(create_copy(rng, vocabulary, rng.choice(originals)))
+    return corpus
+
+
+def check_and_add(near_duplicate_filter, text, record_id):
+    """Check a text and index it if it is not a near duplicate, as KinesisBatchWriter does once a record was sent"""
+    duplicate_of = near_duplicate_filter.check(text, record_id)
+    if duplicate_of is None:
+        fingerprint = simhash(text)
+        if fingerprint is not None:
+            near_duplicate_filter.add(fingerprint, record_id)
+    return duplicate_of
+
+
+def main(original_count, duplicate_ratio, max_distances, max_entries):
+    corpus = create_corpus(original_count, duplicate_ratio, random.Random(42))
+    kinds = sorted({kind for kind, _ in corpus})
+    print(f"records: {len(corpus)}, " + ", ".join(f"{kind}: {sum(k == kind for k, _ in corpus)}" for kind in kinds))
+
+    for max_distance in max_distances:
+        near_duplicate_filter = NearDuplicateFilter(max_distance=max_distance, max_entries=max_entries)
+        found = {kind: 0 for kind in kinds}
+        start = time.perf_counter()
+        for index, (kind, text) in enumerate(corpus):
+            if check_and_add(near_duplicate_filter, text, str(index)) is not None:
+                found[kind] += 1
+        elapsed = time.perf_counter() - start
+
+        copies = sum(kind != "original" for kind, _ in corpus)
+        caught = sum(count for kind, count in found.items() if kind != "original")
+        print(
+            f"max distance {max_distance}: dedup rate {(caught + found['original']) / len(corpus):6.1%}, "
+            f"copies caught {caught / copies:6.1%} "
+            + "("
+            + ", ".join(
+                f"{kind} {found[kind] / sum(k == kind for k, _ in corpus):.1%}" for kind in kinds if kind != "original"
+            )
+            + f"), false positives {found['original']}, {elapsed / len(corpus) * 1e6:7.1f} us/record"
+        )
+
+
+@mock_dynamodb
+def report_store_round_trips(corpus, max_distance, max_entries, batch_size):
+    dynamodb_client = get_service_client("dynamodb")
+    dynamodb_client.create_table(
+        TableName=STORE_TABLE_NAME,
+        KeySchema=[{"AttributeName": "ID", "KeyType": "HASH"}],
+        AttributeDefinitions=[{"AttributeName": "ID", "AttributeType": "S"}],
+        BillingMode="PAY_PER_REQUEST",
+    )
+    counting_client = MagicMock(wraps=dynamodb_client)
+    near_duplicate_filter = NearDuplicateFilter(
+        max_distance=max_distance,
+        max_entries=max_entries,
+        fingerprint_store=FingerprintStore(STORE_TABLE_NAME, counting_client),
+    )
+
+    flushes = 0
+    start = time.perf_counter()
+    for batch_start in range(0, len(corpus), batch_size):
+        for index in range(batch_start, min(batch_start + batch_size, len(corpus))):
+            check_and_add(near_duplicate_filter, corpus[index][1], str(index))
+        near_duplicate_filter.flush()
+        flushes += 1
+    elapsed = time.perf_counter() - start
+
+    calls = collections.Counter(name for name, _, _ in counting_client.method_calls)
+    print(
+        f"store, max distance {max_distance}, {flushes} flushes of {batch_size} records: "
+        + ", ".join(f"{name} {count} ({count / flushes:.2f}/flush)" for name, count in sorted(calls.items()))
+        + f", {sum(calls.values()) / len(corpus):.3f} requests/record, {elapsed / len(corpus) * 1e6:7.1f} us/record"
+    )
+
+    # the first refresh of another lambda function reads the manifests of 'ttl_days' days, then the log items
+    counting_client.reset_mock()
+    start = time.perf_counter()
+    entries = FingerprintStore(STORE_TABLE_NAME, counting_client).get_new_entries(max_entries)
+    elapsed = time.perf_counter() - start
+    calls = collections.Counter(name for name, _, _ in counting_client.method_calls)
+    print(
+        f"store, first refresh of another store: {len(entries)} fingerprints, "
+        + ", ".join(f"{name} {count}" for name, count in sorted(calls.items()))
+        + f", {elapsed * 1e3:.1f} ms"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--originals", type=int, default=20000)
+    parser.add_argument("--duplicate-ratio", type=float, default=0.3)
+    parser.add_argument("--max-distance", type=int, nargs="+", default=[3, 5, 7])
+    parser.add_argument("--max-entries", type=int, default=100000)
+    parser.add_argument("--store", action="store_true")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    main(args.originals, args.duplicate_ratio, args.max_distance, args.max_entries)
+    if args.store:
+        set_environment()
+        store_corpus = create_corpus(args.originals, args.duplicate_ratio, random.Random(42))
+        for store_max_distance in args.max_distance:
+            report_store_round_trips(store_corpus, store_max_distance, args.max_entries, args.batch_size)
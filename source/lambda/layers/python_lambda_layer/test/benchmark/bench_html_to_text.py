@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+######################################################################################################################
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+######################################################################################################################
+
+"""
+Compares 'html_to_text' with the previous cleaners: the regex compiled per call in the news feed ingestion (which
+removes tags and deletes entities) and the '<.*?>' regex of the custom ingestion (which only removes tags). Inputs are
+summaries shaped like the ones of RSS providers, large text fields of custom ingestion files, and adversarial text
+with unterminated tags, on which both regexes backtrack to the end of the text for every '<'.
+
+Run from the layer root directory: python -m test.benchmark.bench_html_to_text --summaries 20000
+"""
+
+import argparse
+import random
+import re
+import time
+
+from shared_util.text_helper import html_to_text
+
+RSS_SUMMARIES = [
+    '<p>The city council approved the new budget after a long debate about public transport.</p><p><a href="https://'
+    'www.fakenews.com/politics/budget">Read more</a></p>',
+    '<img src="https://www.fakenews.com/images/storm.jpg" width="300" height="200" alt="Storm" /><br/>A storm '
+    "brought heavy rain &amp; strong winds to the coast on Monday&#8230;",
+    '<div class="feed-description"><strong>Markets</strong> &ndash; Shares rose 2&#37; in early trading as '
+    "investors welcomed the quarterly results.</div>",
+    "Researchers say the new study on climate &quot;changes everything&quot; we know about coastal erosion.",
+    '<ul><li>Team wins the final</li><li>Player of the season announced</li></ul><p style="display:none">'
+    "tracking</p>",
+]
+
+
+def news_feed_cleaner(text):
+    cleanr = re.compile("<.*?>|&([a-z0-9]+|#[0-9]{1,6}|#x[0-9a-f]{1,6});")
+    return re.sub(cleanr, "", text)
+
+
+custom_ingestion_regex = re.compile(r"<.*?>")
+
+
+def custom_ingestion_cleaner(text):
+    return custom_ingestion_regex.sub("", text)
+
+
+def create_large_field(size, rng):
+    parts, length = [], 0
+    while length < size:
+        part = rng.choice(RSS_SUMMARIES) + "\n"
+        parts.append(part)
+        length += len(part)
+    return "".join(parts)
+
+
+def report(name, count, elapsed, unit):
+    print(f"{name:28s}: {elapsed:8.3f}s {count / elapsed:12.1f} {unit}/sec")
+
+
+def run(title, texts, unit):
+    print(title)
+    for name, cleaner in [
+        ("news feed regex", news_feed_cleaner),
+        ("custom ingestion regex", custom_ingestion_cleaner),
+        ("html_to_text", html_to_text),
+    ]:
+        start = time.perf_counter()
+        for text in texts:
+            cleaner(text)
+        report(name, len(texts), time.perf_counter() - start, unit)
+
+
+def main(summary_count, field_count, field_size, adversarial_size):
+    rng = random.Random(42)
+    run("rss summaries", [rng.choice(RSS_SUMMARIES) for _ in range(summary_count)], "summaries")
+    run(
+        f"custom ingestion fields of {field_size // 1024} KB",
+        [create_large_field(field_size, rng) for _ in range(field_count)],
+        "fields",
+    )
+    run(f"adversarial text of {adversarial_size // 1024} KB", ["<a" * (adversarial_size // 2)], "texts")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--summaries", type=int, default=20000)
+    parser.add_argument("--fields", type=int, default=20)
+    parser.add_argument("--field-size", type=int, default=1024 * 1024)
+    parser.add_argument("--adversarial-size", type=int, default=32 * 1024)
+    args = parser.parse_args()
+    main(args.summaries, args.fields, args.field_size, args.adversarial_size)
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+######################################################################################################################
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+######################################################################################################################
+
+"""
+Compares the records/sec of writing records one at a time with 'buffer_data_into_stream' against the
+'KinesisBatchWriter', using a moto backed Kinesis Data Stream.
+
+Run from the layer root directory: python -m test.benchmark.bench_stream_helper --records 5000
+"""
+
+import argparse
+import os
+import time
+
+from moto import mock_kinesis
+
+
+def set_environment():
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+    os.environ.setdefault("AWS_REGION", "us-east-1")
+    os.environ.setdefault("AWS_SDK_USER_AGENT", '{ "user_agent_extra": "solution/fakeID/fakeVersion" }')
+    os.environ.setdefault("STREAM_NAME", "benchmarkstream")
+
+
+def create_record(index):
+    return {
+        "account_name": "fakeaccount",
+        "platform": "fakeplatform",
+        "search_query": "query_str",
+        "feed": {
+            "created_at": "2021-01-01 00:00:00",
+            "id_str": f"fakeid{index}",
+            "text": "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor incididunt ut labore",
+            "lang": "en",
+        },
+    }
+
+
+def run_per_record(record_count):
+    from shared_util.stream_helper import buffer_data_into_stream
+
+    start = time.perf_counter()
+    for index in range(record_count):
+        buffer_data_into_stream(create_record(index), partition_key=f"fakeid{index}")
+    return time.perf_counter() - start
+
+
+def run_batched(record_count):
+    from shared_util.stream_helper import KinesisBatchWriter
+
+    start = time.perf_counter()
+    with KinesisBatchWriter() as writer:
+        for index in range(record_count):
+            writer.put(create_record(index), partition_key=f"fakeid{index}")
+    return time.perf_counter() - start
+
+
+@mock_kinesis
+def main(record_count):
+    set_environment()
+    from shared_util.service_helper import get_service_client
+
+    get_service_client("kinesis").create_stream(StreamName=os.environ["STREAM_NAME"], ShardCount=1)
+
+    per_record_elapsed = run_per_record(record_count)
+    batched_elapsed = run_batched(record_count)
+
+    print(f"records: {record_count}")
+    print(f"put_record   : {per_record_elapsed:8.3f}s {record_count / per_record_elapsed:10.1f} records/sec")
+    print(f"put_records  : {batched_elapsed:8.3f}s {record_count / batched_elapsed:10.1f} records/sec")
+    print(f"speedup      : {per_record_elapsed / batched_elapsed:8.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--records", type=int, default=5000)
+    main(parser.parse_args().records)
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+######################################################################################################################
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+######################################################################################################################
+
+"""
+Compares the number of records emitted per MB of UTF-8 text by the previous fixed 1250 character slicing against
+the byte-aware 'slice_text_into_arrays', for a multilingual corpus of long articles.
+
+Run from the layer root directory: python -m test.benchmark.bench_text_helper --documents 200
+"""
+
+import argparse
+import time
+
+from shared_util.text_helper import slice_text_into_arrays
+
+SENTENCES = {
+    "en": "The city council approved the new budget after a long debate about public transport. ",
+    "es": "El ayuntamiento aprobó el nuevo presupuesto después de un largo debate sobre el transporte público. ",
+    "de": "Der Stadtrat genehmigte den neuen Haushalt nach einer langen Debatte über den öffentlichen Verkehr. ",
+    "fr": "Le conseil municipal a approuvé le nouveau budget après un long débat sur les transports publics. ",
+    "ru": "Городской совет утвердил новый бюджет после долгих дебатов об общественном транспорте. ",
+    "ar": "وافق مجلس المدينة على الميزانية الجديدة بعد نقاش طويل حول النقل العام. ",
+    "hi": "लंबी बहस के बाद नगर परिषद ने सार्वजनिक परिवहन के लिए नया बजट मंजूर किया। ",
+    "ja": "市議会は公共交通機関に関する長い議論の末、新しい予算を承認しました。",
+    "zh": "市议会在关于公共交通的长时间辩论后批准了新预算。",
+    "emoji": "Great news for commuters 🚌🚆🎉 finally! ",
+}
+
+
+def fixed_character_slices(text):
+    each_string_element_size = 1250
+    return [text[i : i + each_string_element_size] for i in range(0, len(text), each_string_element_size)]
+
+
+def create_corpus(document_count):
+    languages = list(SENTENCES)
+    corpus = []
+    for index in range(document_count):
+        sentence = SENTENCES[languages[index % len(languages)]]
+        # documents from a couple of sentences up to ~30 KB, so that most of them need slicing
+        corpus.append(sentence * (2 + (index * 37) % 300))
+    return corpus
+
+
+def measure(corpus, slicer):
+    start = time.perf_counter()
+    slices = [text_slice for text in corpus for text_slice in slicer(text)]
+    elapsed = time.perf_counter() - start
+    assert all(len(text_slice.encode("utf-8")) <= 5000 for text_slice in slices)
+    return len(slices), elapsed
+
+
+def main(document_count):
+    corpus = create_corpus(document_count)
+    corpus_mb = sum(len(text.encode("utf-8")) for text in corpus) / (1024 * 1024)
+
+    print(f"documents: {document_count}, corpus size: {corpus_mb:.2f} MB")
+    for name, slicer in (("fixed 1250 chars", fixed_character_slices), ("byte-aware", slice_text_into_arrays)):
+        record_count, elapsed = measure(corpus, slicer)
+        print(f"{name:18s}: {record_count:8d} records {record_count / corpus_mb:10.1f} records/MB {elapsed:8.3f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", type=int, default=200)
+    main(parser.parse_args().documents)
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+######################################################################################################################
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+######################################################################################################################
+
+import unittest
+
+from shared_util.batch_writer import BatchWriter
+
+
+class FakeBatchWriter(BatchWriter):
+    """Items listed in 'failures' fail that many times before they are accepted"""
+
+    def __init__(self, failures=None, **kwargs):
+        super().__init__(**kwargs)
+        self.failures = dict(failures) if failures else {}
+        self.batches = []
+        self.failed = []
+
+    def _put_batch(self, items):
+        self.batches.append(list(items))
+        results = []
+        for item in items:
+            if self.failures.get(item, 0):
+                self.failures[item] -= 1
+                results.append({"ErrorCode": "FakeError"})
+            else:
+                results.append({"Id": item})
+        return results
+
+    def _on_failure(self, items, results):
+        self.failed.extend(items)
+
+
+class TestBatchWriter(unittest.TestCase):
+    def test_batch_limits(self):
+        with FakeBatchWriter(max_items=3, max_bytes=10) as writer:
+            for item in ["a", "b", "c", "d"]:
+                writer._add(item, 1)
+            writer._add("large", 10)
+
+        self.assertEqual(writer.batches, [["a", "b", "c"], ["d"], ["large"]])
+        self.assertEqual(writer.items_sent, 5)
+        self.assertEqual(writer.batches_sent, 3)
+
+    def test_only_failed_items_are_retried(self):
+        writer = FakeBatchWriter(failures={"b": 2}, max_items=10, max_bytes=100, backoff_seconds=0)
+        for item in ["a", "b", "c"]:
+            writer._add(item, 1)
+
+        self.assertEqual(writer.flush(), [{"Id": "a"}, {"Id": "b"}, {"Id": "c"}])
+        self.assertEqual(writer.batches, [["a", "b", "c"], ["b"], ["b"]])
+        self.assertEqual(writer.items_retried, 2)
+        self.assertEqual(writer.failed, [])
+
+    def test_failure_after_max_attempts(self):
+        writer = FakeBatchWriter(failures={"b": 5}, max_items=10, max_bytes=100, max_attempts=2, backoff_seconds=0)
+        writer._add("a", 1)
+        writer._add("b", 1)
+
+        self.assertEqual(writer.flush(), [{"Id": "a"}, {"ErrorCode": "FakeError"}])
+        self.assertEqual(writer.failed, ["b"])
+        self.assertEqual(writer.items_sent, 1)
+        self.assertEqual(writer.flush(), [])
+        self.assertEqual(writer.batches_sent, 2)
+
+    def test_subclass_without_put_batch_cannot_be_created(self):
+        class IncompleteBatchWriter(BatchWriter):
+            def _on_failure(self, items, results):
+                pass
+
+        with self.assertRaises(TypeError):
+            IncompleteBatchWriter(max_items=10, max_bytes=100)
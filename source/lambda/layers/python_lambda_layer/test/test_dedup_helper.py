@@ -0,0 +1,324 @@
+#!/usr/bin/env python
+######################################################################################################################
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+######################################################################################################################
+
+import os
+import random
+import time
+import unittest
+from unittest import mock
+from unittest.mock import MagicMock
+
+from moto import mock_dynamodb
+from shared_util import dedup_helper
+from shared_util.dedup_helper import (
+    DEFAULT_MAX_DISTANCE,
+    FingerprintStore,
+    NearDuplicateFilter,
+    get_bands,
+    hamming_distance,
+    simhash,
+)
+from shared_util.service_helper import get_service_client
+from shared_util.stream_helper import KinesisBatchWriter, StreamBatchWriteError
+
+ARTICLE = (
+    "The city council approved the new budget on Monday after a long debate about public transport, housing and the "
+    "maintenance of roads. The mayor said the budget would fund three new bus lines and the repair of two bridges, "
+    "while the opposition criticised the increase of local taxes for small businesses in the city centre."
+)
+OTHER_ARTICLE = (
+    "The home team won the final of the national cup on Sunday evening with a goal in extra time, in front of a sold "
+    "out stadium. The coach praised the young players of the squad and said the club would now focus on the league."
+)
+
+
+def create_record(text, id_str):
+    return {"account_name": "fakeaccount", "platform": "fakeplatform", "feed": {"id_str": id_str, "text": text}}
+
+
+class TestSimHash(unittest.TestCase):
+    def test_near_duplicates_are_close(self):
+        syndicated = ARTICLE.replace("Monday", "Tuesday") + " Copyright Fake News Agency."
+        self.assertEqual(simhash(ARTICLE), simhash(ARTICLE.upper()))
+        self.assertLessEqual(hamming_distance(simhash(ARTICLE), simhash(syndicated)), DEFAULT_MAX_DISTANCE)
+        self.assertGreater(hamming_distance(simhash(ARTICLE), simhash(OTHER_ARTICLE)), 10)
+
+    def test_text_without_words(self):
+        self.assertIsNone(simhash(""))
+        self.assertIsNone(simhash("!!! ..."))
+        self.assertIsNotNone(simhash("First!"))
+
+    def test_bands_of_close_fingerprints(self):
+        rng = random.Random(5)
+        for _ in range(100):
+            fingerprint = rng.getrandbits(64)
+            other = fingerprint
+            for bit in rng.sample(range(64), 3):
+                other ^= 1 << bit
+            # 4 bands, hence 3 different bits leave at least one identical band
+            self.assertTrue(set(get_bands(fingerprint, 4)) & set(get_bands(other, 4)))
+
+
+def check_and_add(near_duplicate_filter, text, record_id):
+    """Check a text and index it if it is not a near duplicate, as KinesisBatchWriter does once a record was sent"""
+    duplicate_of = near_duplicate_filter.check(text, record_id)
+    if duplicate_of is None:
+        near_duplicate_filter.add(simhash(text), record_id)
+        near_duplicate_filter.flush()
+    return duplicate_of
+
+
+def create_fingerprint_table(dynamodb_client):
+    dynamodb_client.create_table(
+        TableName="fakefingerprints",
+        KeySchema=[{"AttributeName": "ID", "KeyType": "HASH"}],
+        AttributeDefinitions=[{"AttributeName": "ID", "AttributeType": "S"}],
+        BillingMode="PAY_PER_REQUEST",
+    )
+
+
+class TestNearDuplicateFilter(unittest.TestCase):
+    def test_check(self):
+        near_duplicate_filter = NearDuplicateFilter()
+        self.assertIsNone(check_and_add(near_duplicate_filter, ARTICLE, "fakeid1"))
+        self.assertIsNone(check_and_add(near_duplicate_filter, OTHER_ARTICLE, "fakeid2"))
+        self.assertEqual(check_and_add(near_duplicate_filter, ARTICLE + " Read more.", "fakeid3"), "fakeid1")
+        self.assertEqual(check_and_add(near_duplicate_filter, ARTICLE, "fakeid4"), "fakeid1")
+        self.assertEqual(near_duplicate_filter.get_stats(), {"checked": 4, "duplicates": 2, "indexed": 2})
+
+    def test_check_does_not_index(self):
+        near_duplicate_filter = NearDuplicateFilter()
+        self.assertIsNone(near_duplicate_filter.check(ARTICLE, "fakeid1"))
+        self.assertIsNone(near_duplicate_filter.check(ARTICLE, "fakeid2"))
+        self.assertEqual(near_duplicate_filter.get_stats()["indexed"], 0)
+
+    def test_record_is_not_a_duplicate_of_itself(self):
+        near_duplicate_filter = NearDuplicateFilter()
+        near_duplicate_filter.add(simhash(ARTICLE), "fakeid1")
+        self.assertIsNone(near_duplicate_filter.check(ARTICLE, "fakeid1"))
+        self.assertEqual(near_duplicate_filter.check(ARTICLE, "fakeid2"), "fakeid1")
+
+    def test_index_is_bounded(self):
+        near_duplicate_filter = NearDuplicateFilter(max_entries=10)
+        for index in range(50):
+            check_and_add(
+                near_duplicate_filter, f"distinct comment number {index} about {index * 7} things", f"fakeid{index}"
+            )
+
+        self.assertEqual(near_duplicate_filter.get_stats()["indexed"], 10)
+        self.assertLessEqual(
+            sum(len(fingerprints) for fingerprints in near_duplicate_filter._bands.values()),
+            10 * (DEFAULT_MAX_DISTANCE + 1),
+        )
+
+    def test_invalid_max_distance(self):
+        with self.assertRaises(ValueError):
+            NearDuplicateFilter(max_distance=8)
+
+    @mock_dynamodb
+    def test_fingerprint_store_across_filters(self):
+        create_fingerprint_table(get_service_client("dynamodb"))
+
+        # filters of two lambda functions that share the store
+        news_filter = NearDuplicateFilter(fingerprint_store=FingerprintStore("fakefingerprints", refresh_seconds=0))
+        comments_filter = NearDuplicateFilter(fingerprint_store=FingerprintStore("fakefingerprints", refresh_seconds=0))
+
+        self.assertIsNone(check_and_add(news_filter, ARTICLE, "fakenewsid"))
+        self.assertEqual(check_and_add(comments_filter, ARTICLE + " So true!", "fakecommentid"), "fakenewsid")
+        self.assertIsNone(check_and_add(comments_filter, OTHER_ARTICLE, "fakecommentid2"))
+        # the record stored by the news filter is not a duplicate of itself in another filter
+        self.assertIsNone(comments_filter.check(ARTICLE, "fakenewsid"))
+
+    @mock_dynamodb
+    def test_fingerprint_store_writes_once_per_flush(self):
+        dynamodb_client = MagicMock(wraps=get_service_client("dynamodb"))
+        create_fingerprint_table(dynamodb_client)
+        store = FingerprintStore("fakefingerprints", dynamodb_client)
+        rng = random.Random(5)
+        fingerprints = [rng.getrandbits(64) for _ in range(500)]
+
+        for index, fingerprint in enumerate(fingerprints):
+            store.add(fingerprint, f"fakeid{index}")
+        store.flush()
+        store.flush()
+
+        # one log item and the manifest of the hour, whatever the number of fingerprints
+        self.assertEqual(dynamodb_client.batch_write_item.call_count, 1)
+        self.assertEqual(dynamodb_client.update_item.call_count, 1)
+
+        other_store = FingerprintStore("fakefingerprints", dynamodb_client)
+        dynamodb_client.batch_get_item.reset_mock()
+        entries = other_store.get_new_entries(max_entries=1000)
+        self.assertEqual(
+            sorted(entries), sorted((fingerprint, f"fakeid{index}") for index, fingerprint in enumerate(fingerprints))
+        )
+        # the manifests of the last 7 days, then the log item
+        self.assertEqual(dynamodb_client.batch_get_item.call_count, 3)
+        # the store does not read back what it wrote
+        self.assertEqual(store.get_new_entries(max_entries=1000), [])
+
+    @mock_dynamodb
+    def test_fingerprint_store_refresh(self):
+        create_fingerprint_table(get_service_client("dynamodb"))
+        writer_store = FingerprintStore("fakefingerprints")
+        reader_store = FingerprintStore("fakefingerprints", refresh_seconds=60)
+        writer_store.add(1, "fakeid1")
+        writer_store.flush()
+
+        self.assertEqual(reader_store.get_new_entries(max_entries=10), [(1, "fakeid1")])
+        writer_store.add(2, "fakeid2")
+        writer_store.flush()
+        # not due before 'refresh_seconds', then only the new log items are read
+        self.assertEqual(reader_store.get_new_entries(max_entries=10), [])
+        with mock.patch.object(dedup_helper.time, "monotonic", return_value=time.monotonic() + 60):
+            self.assertEqual(reader_store.get_new_entries(max_entries=10), [(2, "fakeid2")])
+
+    def test_fingerprint_store_retries_unprocessed_items(self):
+        dynamodb_client = MagicMock()
+        dynamodb_client.batch_write_item.side_effect = lambda RequestItems: (
+            {"UnprocessedItems": RequestItems}
+            if dynamodb_client.batch_write_item.call_count == 1
+            else {"UnprocessedItems": {}}
+        )
+        fingerprint = simhash(ARTICLE)
+        item = {"ID": {"S": "FINGERPRINT_LOG#fakehour#fakeid"}, "FINGERPRINTS": {"SS": [f"{fingerprint:x}#fakeid1"]}}
+        manifest = {"ID": {"S": "FINGERPRINT_MANIFEST#fakehour"}, "LOGS": {"SS": ["FINGERPRINT_LOG#fakehour#fakeid"]}}
+        dynamodb_client.batch_get_item.side_effect = [
+            # the manifests of the last 7 days take two requests
+            {"Responses": {"fakefingerprints": [manifest]}, "UnprocessedKeys": {}},
+            {"Responses": {}, "UnprocessedKeys": {}},
+            {"Responses": {}, "UnprocessedKeys": {"fakefingerprints": {"Keys": [item["ID"]]}}},
+            {"Responses": {"fakefingerprints": [item]}, "UnprocessedKeys": {}},
+        ]
+
+        store = FingerprintStore("fakefingerprints", dynamodb_client)
+        with mock.patch.object(dedup_helper.time, "sleep"):
+            store.add(fingerprint, "fakeid1")
+            store.flush()
+            entries = store.get_new_entries(max_entries=10)
+
+        self.assertEqual(dynamodb_client.batch_write_item.call_count, 2)
+        dynamodb_client.update_item.assert_called_once()
+        self.assertEqual(entries, [(fingerprint, "fakeid1")])
+        self.assertEqual(dynamodb_client.batch_get_item.call_count, 4)
+        self.assertEqual(
+            dynamodb_client.batch_get_item.call_args.kwargs["RequestItems"],
+            {"fakefingerprints": {"Keys": [item["ID"]]}},
+        )
+
+    def test_fingerprint_store_errors_are_not_raised(self):
+        from botocore.exceptions import ClientError
+
+        dynamodb_client = MagicMock()
+        error = ClientError({"Error": {"Code": "ResourceNotFoundException"}}, "BatchGetItem")
+        dynamodb_client.batch_get_item.side_effect = error
+        dynamodb_client.batch_write_item.side_effect = error
+        dynamodb_client.update_item.side_effect = error
+
+        near_duplicate_filter = NearDuplicateFilter(
+            fingerprint_store=FingerprintStore("fakefingerprints", dynamodb_client)
+        )
+        self.assertIsNone(check_and_add(near_duplicate_filter, ARTICLE, "fakeid1"))
+        self.assertEqual(check_and_add(near_duplicate_filter, ARTICLE, "fakeid2"), "fakeid1")
+
+
+class TestKinesisBatchWriterFilter(unittest.TestCase):
+    def setUp(self):
+        self.kds_client = MagicMock()
+        self.kds_client.put_records.return_value = {"FailedRecordCount": 0, "Records": []}
+
+    def get_sent_records(self):
+        return [record for call in self.kds_client.put_records.call_args_list for record in call.kwargs["Records"]]
+
+    def test_drop(self):
+        with KinesisBatchWriter("fakestream", self.kds_client, dedup_filter=NearDuplicateFilter()) as writer:
+            writer.put(create_record(ARTICLE, "fakeid1"))
+            writer.put(create_record(ARTICLE, "fakeid2"))
+            writer.put(create_record(OTHER_ARTICLE, "fakeid3"))
+
+        self.assertEqual(len(self.get_sent_records()), 2)
+        self.assertEqual(writer.records_dropped, 1)
+
+    def test_drop_near_duplicate_of_earlier_slice(self):
+        # the slices of a split article share their partition key
+        with KinesisBatchWriter("fakestream", self.kds_client, dedup_filter=NearDuplicateFilter()) as writer:
+            writer.put(create_record(ARTICLE, "art1#0"), partition_key="art1")
+            writer.put(create_record(OTHER_ARTICLE, "art1#1"), partition_key="art1")
+            writer.put(create_record(ARTICLE, "art2"), partition_key="art2")
+
+        self.assertEqual(len(self.get_sent_records()), 2)
+        self.assertEqual(writer.records_dropped, 1)
+
+    def test_slices_are_indexed_once_sent(self):
+        near_duplicate_filter = NearDuplicateFilter()
+        with KinesisBatchWriter("fakestream", self.kds_client, dedup_filter=near_duplicate_filter) as writer:
+            writer.put(create_record(ARTICLE, "art1#0"), partition_key="art1")
+            writer.put(create_record(OTHER_ARTICLE, "art1#1"), partition_key="art1")
+            self.kds_client.put_records.return_value = {
+                "FailedRecordCount": 0,
+                "Records": [{"SequenceNumber": "1"}, {"SequenceNumber": "2"}],
+            }
+
+        self.assertEqual(near_duplicate_filter.get_stats()["indexed"], 2)
+        self.assertEqual(near_duplicate_filter.check(ARTICLE, "art3"), "art1#0")
+
+    def test_tag(self):
+        record = create_record(ARTICLE, "fakeid2")
+        with KinesisBatchWriter(
+            "fakestream", self.kds_client, dedup_filter=NearDuplicateFilter(), near_duplicate_action="tag"
+        ) as writer:
+            writer.put(create_record(ARTICLE, "fakeid1"))
+            writer.put(record)
+
+        self.assertEqual(len(self.get_sent_records()), 2)
+        self.assertIn(b'"near_duplicate_of": "fakeid1"', self.get_sent_records()[1]["Data"])
+        self.assertNotIn("near_duplicate_of", record["feed"])
+        self.assertEqual(writer.records_tagged, 1)
+
+    def test_retried_record_is_not_dropped(self):
+        near_duplicate_filter = NearDuplicateFilter()
+        self.kds_client.put_records.return_value = {"FailedRecordCount": 1, "Records": [{"ErrorCode": "FakeError"}]}
+        with self.assertRaises(StreamBatchWriteError):
+            with KinesisBatchWriter(
+                "fakestream", self.kds_client, backoff_seconds=0, dedup_filter=near_duplicate_filter
+            ) as writer:
+                writer.put(create_record(ARTICLE, "fakeid1"))
+
+        # the record was not delivered, hence it is not indexed and is sent again by the next run
+        self.assertEqual(near_duplicate_filter.get_stats()["indexed"], 0)
+        self.kds_client.put_records.return_value = {"FailedRecordCount": 0, "Records": [{"SequenceNumber": "1"}]}
+        self.kds_client.put_records.reset_mock()
+        with KinesisBatchWriter("fakestream", self.kds_client, dedup_filter=near_duplicate_filter) as writer:
+            writer.put(create_record(ARTICLE, "fakeid1"))
+
+        self.assertEqual(len(self.get_sent_records()), 1)
+        self.assertEqual(writer.records_dropped, 0)
+        self.assertEqual(near_duplicate_filter.get_stats()["indexed"], 1)
+
+    def test_unknown_action(self):
+        with self.assertRaises(ValueError):
+            KinesisBatchWriter(
+                "fakestream", self.kds_client, dedup_filter=NearDuplicateFilter(), near_duplicate_action="fakeaction"
+            )
+
+    def test_disabled_by_default(self):
+        with mock.patch.object(dedup_helper, "_default_filter", None), mock.patch.dict(os.environ, {}, clear=False):
+            os.environ.pop(dedup_helper.ACTION_ENV, None)
+            with KinesisBatchWriter("fakestream", self.kds_client) as writer:
+                writer.put(create_record(ARTICLE, "fakeid1"))
+                writer.put(create_record(ARTICLE, "fakeid2"))
+
+        self.assertIsNone(writer.dedup_filter)
+        self.assertEqual(len(self.get_sent_records()), 2)
+
+    def test_enabled_through_environment(self):
+        with mock.patch.object(dedup_helper, "_default_filter", None), mock.patch.dict(
+            os.environ, {dedup_helper.ACTION_ENV: "drop", dedup_helper.MAX_DISTANCE_ENV: "5"}
+        ):
+            with KinesisBatchWriter("fakestream", self.kds_client) as writer:
+                self.assertEqual(writer.dedup_filter.max_distance, 5)
+                # the filter is kept for the next invocations
+                self.assertIs(dedup_helper.get_default_filter(), writer.dedup_filter)
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+######################################################################################################################
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+######################################################################################################################
+
+import json
+import unittest
+
+import boto3
+import pytest
+from botocore.stub import Stubber
+from shared_util import custom_boto_config
+from shared_util.event_bridge_helper import EventBridgeBatcher, get_entry_size
+
+
+def create_entry(index, detail_size=10):
+    return {
+        "EventBusName": "fakeeventbus",
+        "Source": "com.fake.source",
+        "Detail": json.dumps({"index": index, "text": "a" * detail_size}),
+        "DetailType": "fakedetailtype",
+    }
+
+
+def create_success_response(count):
+    return {"FailedEntryCount": 0, "Entries": [{"EventId": f"fakeeventid{index}"} for index in range(count)]}
+
+
+class TestEventBridgeBatcher(unittest.TestCase):
+    def setUp(self):
+        self.event_bus = boto3.client("events", config=custom_boto_config.init())
+        self.stubber = Stubber(self.event_bus)
+
+    def tearDown(self):
+        self.stubber.assert_no_pending_responses()
+        self.stubber.deactivate()
+
+    def test_get_entry_size(self):
+        entry = create_entry(0)
+        self.assertEqual(get_entry_size(entry), len(entry["Source"]) + len(entry["DetailType"]) + len(entry["Detail"]))
+        entry["Time"] = "2021-01-01T00:00:00Z"
+        entry["Resources"] = ["fakeresource"]
+        self.assertEqual(
+            get_entry_size(entry),
+            14 + len(entry["Source"]) + len(entry["DetailType"]) + len(entry["Detail"]) + len("fakeresource"),
+        )
+
+    def test_batches_by_count(self):
+        entries = [create_entry(index) for index in range(25)]
+        self.stubber.add_response("put_events", create_success_response(10), {"Entries": entries[0:10]})
+        self.stubber.add_response("put_events", create_success_response(10), {"Entries": entries[10:20]})
+        self.stubber.add_response("put_events", create_success_response(5), {"Entries": entries[20:25]})
+        self.stubber.activate()
+
+        with EventBridgeBatcher(event_bus=self.event_bus) as batcher:
+            for entry in entries:
+                batcher.put(entry)
+
+        self.assertEqual(batcher.batches_sent, 3)
+        self.assertEqual(batcher.entries_sent, 25)
+        self.assertEqual(batcher.failed_entries, [])
+
+    def test_batches_by_size(self):
+        entries = [create_entry(index, detail_size=100 * 1024) for index in range(3)]
+        self.stubber.add_response("put_events", create_success_response(2), {"Entries": entries[0:2]})
+        self.stubber.add_response("put_events", create_success_response(1), {"Entries": entries[2:3]})
+        self.stubber.activate()
+
+        with EventBridgeBatcher(event_bus=self.event_bus) as batcher:
+            for entry in entries:
+                batcher.put(entry)
+
+        self.assertEqual(batcher.batches_sent, 2)
+
+    def test_entry_too_big(self):
+        self.stubber.activate()
+        batcher = EventBridgeBatcher(event_bus=self.event_bus)
+        with self.assertRaises(ValueError):
+            batcher.put(create_entry(0, detail_size=256 * 1024))
+
+    def test_only_failed_entries_are_resubmitted(self):
+        entries = [create_entry(index) for index in range(3)]
+        self.stubber.add_response(
+            "put_events",
+            {
+                "FailedEntryCount": 1,
+                "Entries": [
+                    {"EventId": "fakeeventid0"},
+                    {"ErrorCode": "ThrottlingException", "ErrorMessage": "fake error"},
+                    {"EventId": "fakeeventid2"},
+                ],
+            },
+            {"Entries": entries},
+        )
+        self.stubber.add_response(
+            "put_events", {"FailedEntryCount": 0, "Entries": [{"EventId": "fakeeventid1"}]}, {"Entries": [entries[1]]}
+        )
+        self.stubber.activate()
+
+        batcher = EventBridgeBatcher(event_bus=self.event_bus, backoff_seconds=0)
+        for entry in entries:
+            batcher.put(entry)
+        response = batcher.flush()
+
+        self.assertEqual(response["FailedEntryCount"], 0)
+        self.assertEqual(
+            [result["EventId"] for result in response["Entries"]], ["fakeeventid0", "fakeeventid1", "fakeeventid2"]
+        )
+        self.assertEqual(batcher.entries_sent, 3)
+
+    def test_failed_entries_after_max_attempts(self):
+        entry = create_entry(0)
+        for _ in range(2):
+            self.stubber.add_response(
+                "put_events",
+                {"FailedEntryCount": 1, "Entries": [{"ErrorCode": "InternalFailure", "ErrorMessage": "fake error"}]},
+                {"Entries": [entry]},
+            )
+        self.stubber.activate()
+
+        batcher = EventBridgeBatcher(event_bus=self.event_bus, max_attempts=2, backoff_seconds=0)
+        batcher.put(entry)
+        response = batcher.flush()
+
+        self.assertEqual(response["FailedEntryCount"], 1)
+        self.assertEqual(batcher.failed_entries, [entry])
+        self.assertEqual(batcher.entries_sent, 0)
+
+    def test_flush_empty(self):
+        self.stubber.activate()
+        self.assertEqual(EventBridgeBatcher(event_bus=self.event_bus).flush(), {"FailedEntryCount": 0, "Entries": []})
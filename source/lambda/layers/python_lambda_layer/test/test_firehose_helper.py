@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+######################################################################################################################
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+######################################################################################################################
+
+import unittest
+from unittest.mock import MagicMock
+
+from shared_util.firehose_helper import FirehoseBatchWriteError, FirehoseBatchWriter
+
+
+def create_success_response(records):
+    return {"FailedPutCount": 0, "RequestResponses": [{"RecordId": "fakerecordid"} for _ in records]}
+
+
+class TestFirehoseBatchWriter(unittest.TestCase):
+    def setUp(self):
+        self.firehose_client = MagicMock()
+        self.firehose_client.put_record_batch.side_effect = lambda **kwargs: create_success_response(kwargs["Records"])
+
+    def test_batches_by_count(self):
+        with FirehoseBatchWriter("fakestream", firehose_client=self.firehose_client) as writer:
+            for index in range(1001):
+                writer.put(f'{{"index": {index}}}\n')
+
+        self.assertEqual(self.firehose_client.put_record_batch.call_count, 3)
+        self.assertEqual(writer.records_sent, 1001)
+        self.assertEqual(len(writer.batch_latencies), 3)
+        first_call = self.firehose_client.put_record_batch.call_args_list[0].kwargs
+        self.assertEqual(first_call["DeliveryStreamName"], "fakestream")
+        self.assertEqual(first_call["Records"][0], {"Data": b'{"index": 0}\n'})
+
+    def test_batches_by_size(self):
+        with FirehoseBatchWriter("fakestream", firehose_client=self.firehose_client, max_bytes=1000) as writer:
+            for _ in range(10):
+                writer.put("a" * 300)
+
+        self.assertEqual(self.firehose_client.put_record_batch.call_count, 4)
+        self.assertEqual(writer.records_sent, 10)
+
+    def test_record_too_big(self):
+        writer = FirehoseBatchWriter("fakestream", firehose_client=self.firehose_client)
+        with self.assertRaises(ValueError):
+            writer.put("a" * (1000 * 1024 + 1))
+
+    def test_only_failed_records_are_retried(self):
+        self.firehose_client.put_record_batch.side_effect = [
+            {
+                "FailedPutCount": 1,
+                "RequestResponses": [
+                    {"ErrorCode": "ServiceUnavailableException", "ErrorMessage": "fake error"},
+                    {"RecordId": "fakerecordid"},
+                ],
+            },
+            {"FailedPutCount": 0, "RequestResponses": [{"RecordId": "fakerecordid"}]},
+        ]
+
+        with FirehoseBatchWriter("fakestream", firehose_client=self.firehose_client, backoff_seconds=0) as writer:
+            writer.put("first")
+            writer.put(b"second")
+
+        retried_records = self.firehose_client.put_record_batch.call_args_list[1].kwargs["Records"]
+        self.assertEqual(retried_records, [{"Data": b"first"}])
+        self.assertEqual(writer.records_sent, 2)
+        self.assertEqual(writer.records_retried, 1)
+        self.assertEqual(len(writer.batch_latencies), 1)
+
+    def test_error_after_max_attempts(self):
+        self.firehose_client.put_record_batch.side_effect = None
+        self.firehose_client.put_record_batch.return_value = {
+            "FailedPutCount": 1,
+            "RequestResponses": [{"ErrorCode": "ServiceUnavailableException", "ErrorMessage": "fake error"}],
+        }
+
+        writer = FirehoseBatchWriter(
+            "fakestream", firehose_client=self.firehose_client, max_attempts=2, backoff_seconds=0
+        )
+        writer.put("first")
+        with self.assertRaises(FirehoseBatchWriteError):
+            writer.flush()
+        self.assertEqual(self.firehose_client.put_record_batch.call_count, 2)
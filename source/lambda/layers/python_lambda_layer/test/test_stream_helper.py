@@ -7,11 +7,14 @@
 import json
 import os
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
+from unittest.mock import MagicMock
 
 from moto import mock_kinesis
+from shared_util import stream_helper
 from shared_util.service_helper import get_service_client
-from shared_util.stream_helper import buffer_data_into_stream
+from shared_util.stream_helper import KinesisBatchWriter, StreamBatchWriteError, buffer_data_into_stream
 
 
 @mock_kinesis
@@ -25,6 +28,15 @@ def delete_stream_setup(kds_client, stream_name):
     kds_client.delete_stream(StreamName=stream_name)
 
 
+def read_all_records(kds_client, stream_name):
+    response = kds_client.describe_stream(StreamName=stream_name)
+    shard_id = response["StreamDescription"]["Shards"][0]["ShardId"]
+    shard_iterator = kds_client.get_shard_iterator(
+        StreamName=stream_name, ShardId=shard_id, ShardIteratorType="TRIM_HORIZON"
+    )["ShardIterator"]
+    return kds_client.get_records(ShardIterator=shard_iterator, Limit=10000)["Records"]
+
+
 @mock_kinesis
 class TestStreamBuffer(unittest.TestCase):
     def setUp(self):
@@ -63,3 +75,104 @@ class TestStreamBuffer(unittest.TestCase):
         shard_iterator = shard_iterator["ShardIterator"]
         records = self.kds_client.get_records(ShardIterator=shard_iterator, Limit=1)
         self.assertEqual(json.loads(records["Records"][0]["Data"]), data)
+
+
+@mock_kinesis
+class TestKinesisBatchWriter(unittest.TestCase):
+    def setUp(self):
+        self.stream_name = os.environ["STREAM_NAME"]
+        self.kds_client = stream_setup(self.stream_name)
+
+    def tearDown(self):
+        delete_stream_setup(self.kds_client, self.stream_name)
+
+    def test_batches_are_sent_on_exit(self):
+        with KinesisBatchWriter() as writer:
+            for index in range(1200):
+                writer.put({"id_str": f"fakeid{index}"}, partition_key=f"fakeid{index}")
+
+        # 500 + 500 when the buffer fills and the remaining 200 on exit
+        self.assertEqual(writer.batches_sent, 3)
+        self.assertEqual(writer.records_sent, 1200)
+        records = read_all_records(self.kds_client, self.stream_name)
+        self.assertEqual(len(records), 1200)
+        self.assertEqual(json.loads(records[0]["Data"]), {"id_str": "fakeid0"})
+
+    def test_batches_are_split_by_size(self):
+        with KinesisBatchWriter(max_bytes=1000) as writer:
+            for index in range(10):
+                writer.put({"text": "a" * 200})
+
+        self.assertEqual(writer.records_sent, 10)
+        self.assertEqual(writer.batches_sent, 3)
+
+    def test_buffer_data_into_stream_uses_open_writer(self):
+        with KinesisBatchWriter() as writer:
+            self.assertIsNone(buffer_data_into_stream({"id_str": "fakeid"}, partition_key="fakeid"))
+            self.assertEqual(len(read_all_records(self.kds_client, self.stream_name)), 0)
+
+        self.assertEqual(writer.records_sent, 1)
+        self.assertEqual(len(read_all_records(self.kds_client, self.stream_name)), 1)
+        self.assertIsNone(stream_helper._active_writer)
+
+    def test_writers_of_worker_threads(self):
+        def publish(index):
+            with KinesisBatchWriter() as thread_writer:
+                buffer_data_into_stream({"id_str": f"fakeid{index}"}, partition_key=f"fakeid{index}")
+            return thread_writer
+
+        with KinesisBatchWriter() as writer:
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                thread_writers = list(executor.map(publish, range(4)))
+            # a thread without a writer of its own uses the writer of the main thread
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                executor.submit(buffer_data_into_stream, {"id_str": "fakeid"}, "fakeid").result()
+
+        # each thread writer only sent the record of its own thread
+        self.assertEqual([thread_writer.records_sent for thread_writer in thread_writers], [1, 1, 1, 1])
+        self.assertEqual(writer.records_sent, 1)
+        self.assertIsNone(stream_helper._active_writer)
+
+    def test_record_too_big(self):
+        with KinesisBatchWriter() as writer:
+            with self.assertRaises(ValueError):
+                writer.put({"text": "a" * (1024 * 1024)})
+
+
+class TestKinesisBatchWriterFailures(unittest.TestCase):
+    def test_only_failed_records_are_retried(self):
+        kds_client = MagicMock()
+        kds_client.put_records.side_effect = [
+            {
+                "FailedRecordCount": 1,
+                "Records": [
+                    {"SequenceNumber": "1", "ShardId": "shardId-000000000000"},
+                    {"ErrorCode": "ProvisionedThroughputExceededException", "ErrorMessage": "fake error"},
+                    {"SequenceNumber": "3", "ShardId": "shardId-000000000000"},
+                ],
+            },
+            {"FailedRecordCount": 0, "Records": [{"SequenceNumber": "4", "ShardId": "shardId-000000000000"}]},
+        ]
+
+        with KinesisBatchWriter(kds_client=kds_client, backoff_seconds=0) as writer:
+            for index in range(3):
+                writer.put({"id_str": f"fakeid{index}"}, partition_key=f"fakeid{index}")
+
+        self.assertEqual(kds_client.put_records.call_count, 2)
+        retried_records = kds_client.put_records.call_args_list[1].kwargs["Records"]
+        self.assertEqual(retried_records, [{"Data": b'{"id_str": "fakeid1"}', "PartitionKey": "fakeid1"}])
+        self.assertEqual(writer.records_sent, 3)
+        self.assertEqual(writer.records_retried, 1)
+
+    def test_error_after_max_attempts(self):
+        kds_client = MagicMock()
+        kds_client.put_records.return_value = {
+            "FailedRecordCount": 1,
+            "Records": [{"ErrorCode": "InternalFailure", "ErrorMessage": "fake error"}],
+        }
+
+        writer = KinesisBatchWriter(kds_client=kds_client, max_attempts=3, backoff_seconds=0)
+        writer.put({"id_str": "fakeid"})
+        with self.assertRaises(StreamBatchWriteError):
+            writer.flush()
+        self.assertEqual(kds_client.put_records.call_count, 3)
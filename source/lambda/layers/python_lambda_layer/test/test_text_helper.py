@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+######################################################################################################################
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+######################################################################################################################
+
+import time
+import unittest
+
+from shared_util.text_helper import MAX_BYTES_PER_SLICE, html_to_text, slice_text_into_arrays
+
+
+class TestTextHelper(unittest.TestCase):
+    def assert_valid_slices(self, text, slices, max_bytes=MAX_BYTES_PER_SLICE):
+        self.assertEqual("".join(slices), text)
+        for text_slice in slices:
+            self.assertLessEqual(len(text_slice.encode("utf-8")), max_bytes)
+
+    def test_empty_text(self):
+        self.assertEqual(slice_text_into_arrays(""), [])
+        self.assertEqual(slice_text_into_arrays(None), [])
+
+    def test_small_text_is_not_sliced(self):
+        self.assertEqual(slice_text_into_arrays("This is fake text"), ["This is fake text"])
+
+    def test_ascii_text_packs_to_byte_limit(self):
+        text = "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 500
+        slices = slice_text_into_arrays(text)
+
+        self.assert_valid_slices(text, slices)
+        # 1250 character slices would have produced 23 slices
+        self.assertEqual(len(slices), 6)
+        for text_slice in slices[:-1]:
+            self.assertTrue(text_slice.endswith(". "))
+
+    def test_prefers_word_boundary_without_sentences(self):
+        text = "lorem ipsum dolor sit amet " * 400
+        slices = slice_text_into_arrays(text)
+
+        self.assert_valid_slices(text, slices)
+        for text_slice in slices[:-1]:
+            self.assertTrue(text_slice.endswith(" "))
+
+    def test_multi_byte_characters_are_not_split(self):
+        for character in ["é", "日", "😀"]:
+            text = character * 6000
+            slices = slice_text_into_arrays(text)
+
+            self.assert_valid_slices(text, slices)
+            self.assertGreaterEqual(len(slices[0].encode("utf-8")), MAX_BYTES_PER_SLICE - 3)
+
+    def test_cjk_sentence_boundary(self):
+        text = "今日は晴れです。" * 300
+        slices = slice_text_into_arrays(text)
+
+        self.assert_valid_slices(text, slices)
+        for text_slice in slices[:-1]:
+            self.assertTrue(text_slice.endswith("。"))
+
+    def test_custom_max_bytes(self):
+        text = "ab😀cd"
+        slices = slice_text_into_arrays(text, max_bytes=5)
+
+        self.assert_valid_slices(text, slices, max_bytes=5)
+        self.assertEqual(slices, ["ab", "😀c", "d"])
+
+        with self.assertRaises(ValueError):
+            slice_text_into_arrays(text, max_bytes=3)
+
+
+class TestHtmlToText(unittest.TestCase):
+    def test_empty_text(self):
+        self.assertEqual(html_to_text(""), "")
+        self.assertEqual(html_to_text(None), "")
+
+    def test_strip_tags(self):
+        self.assertEqual(
+            html_to_text('<p>Fake <b>Econ</b>omy <a href="https://fakenews.com">news</a></p>'), "Fake Economy news"
+        )
+        self.assertEqual(html_to_text("one<br/>two<p>three</p><li>four"), "one two three four")
+        self.assertEqual(html_to_text("<!-- <p>comment</p> -->text<?xml version='1.0'?>"), "text")
+
+    def test_skip_script_and_style(self):
+        self.assertEqual(html_to_text('<script>var p = "<p>";</script>fake<STYLE>p {}</STYLE > text'), "fake text")
+
+    def test_decode_entities(self):
+        self.assertEqual(html_to_text("Fake &amp; news&nbsp;&#8212;&#x2014; &lt;b&gt;"), "Fake & news —— <b>")
+
+    def test_collapse_whitespace(self):
+        self.assertEqual(html_to_text("  Fake\n\n news \t today  "), "Fake news today")
+
+    def test_text_that_is_not_a_tag(self):
+        self.assertEqual(html_to_text("1 < 2 and 3 > 2"), "1 < 2 and 3 > 2")
+        self.assertEqual(html_to_text("fake <b unterminated"), "fake <b unterminated")
+
+    def test_linear_time_on_adversarial_input(self):
+        start = time.perf_counter()
+        for text in ["<a" * 100000, "<" * 200000, "<!--" * 50000, "<script>" * 25000]:
+            html_to_text(text)
+        # a '<.*?>' regex takes minutes on these inputs
+        self.assertLess(time.perf_counter() - start, 2)
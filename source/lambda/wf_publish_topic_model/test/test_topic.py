@@ -123,6 +123,45 @@ def test_publish_topic_id_mapping():
         assert response["Entries"][0]["EventId"] == "12456663423"
 
 
+def test_publish_topic_id_mapping_in_batches():
+    from wf_publish_topic_model.util import topic
+
+    mappings = [
+        {
+            "platform": "twitter",
+            "id_str": f"fakeid{index}",
+            "job_id": "1234567890123456789012345",
+            "job_timestamp": "2020-06-26T19:05:16.785Z",
+            "topic": "000",
+        }
+        for index in range(15)
+    ]
+    entries = [
+        {
+            "EventBusName": os.environ["EVENT_BUS_NAME"],
+            "Detail": json.dumps(mapping),
+            "Source": os.environ["TOPIC_MAPPINGS_EVENT_NAMESPACE"],
+            "DetailType": "mappings",
+        }
+        for mapping in mappings
+    ]
+
+    event_bridge_client = boto3.client("events", os.environ["AWS_REGION"])
+    stubber = Stubber(event_bridge_client)
+    for batch in [entries[0:10], entries[10:15]]:
+        stubber.add_response(
+            "put_events",
+            {"FailedEntryCount": 0, "Entries": [{"EventId": "12456663423"} for _ in batch]},
+            {"Entries": batch},
+        )
+
+    with stubber, patch.object(topic, "event_bridge_client", event_bridge_client), patch.object(
+        topic, "parse_csv_for_mapping", return_value=mappings
+    ):
+        topic.publish_topic_id_mapping("twitter", "1234567890123456789012345", "2020-06-26T19:05:16.785Z", {})
+        stubber.assert_no_pending_responses()
+
+
 def test_parse_csv_for_topics():
     from collections import defaultdict
 
@@ -12,6 +12,7 @@ from datetime import datetime
 
 import boto3
 from shared_util import custom_boto_config, custom_logging
+from shared_util.event_bridge_helper import EventBridgeBatcher
 
 logger = custom_logging.get_logger(__name__)
 
@@ -40,19 +41,20 @@ class QueueNameNotProvidiedException(Exception):
 def publish_topic_id_mapping(platform, job_id, timestamp, topic):
     topic_id_mapping = parse_csv_for_mapping(platform, job_id, timestamp, topic)
     try:
-        for topic in topic_id_mapping:
-            data = json.dumps(topic)
-            logger.debug("Topic ID mapping to be published is " + data)
-            event_bridge_client.put_events(
-                Entries=[
+        with EventBridgeBatcher(event_bus=event_bridge_client) as batcher:
+            for topic in topic_id_mapping:
+                data = json.dumps(topic)
+                logger.debug("Topic ID mapping to be published is " + data)
+                batcher.put(
                     {
                         "EventBusName": os.environ["EVENT_BUS_NAME"],
                         "Detail": data,
                         "Source": os.environ["TOPIC_MAPPINGS_EVENT_NAMESPACE"],
                         "DetailType": "mappings",
                     }
-                ]
-            )
+                )
+        if batcher.failed_entries:
+            logger.error(f"Failed to publish {len(batcher.failed_entries)} topic id mappings")
     except Exception as e:
         logger.error(f"Exception occurred when processing topic mapping: {e}")
         raise e
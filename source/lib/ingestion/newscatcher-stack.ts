@@ -72,6 +72,7 @@ export class NewsCatcher extends cdk.NestedStack {
                         INGESTION_NAMESPACE: this._newsConfigNamespace,
                         CONFIG_PARAM: _newsFeedConfigParam.valueAsString,
                         SEARCH_QUERY: _newsSearchQuery.valueAsString,
+                        ADAPTIVE_POLLING: 'true',
                     },
                     timeout: cdk.Duration.minutes(15),
                     memorySize: 256
@@ -86,6 +87,7 @@ export class NewsCatcher extends cdk.NestedStack {
                     environment: {
                         INGESTION_NAMESPACE: this._newsConfigNamespace,
                         STREAM_NAME: _stream.streamName,
+                        ADAPTIVE_POLLING: 'true',
                     },
                     reservedConcurrentExecutions: 1, // this is to throttle consumption of config events and also putting onto the data stream
                     timeout: cdk.Duration.minutes(15),
@@ -115,6 +117,10 @@ export class NewsCatcher extends cdk.NestedStack {
 
         _stream.grantWrite(_customDataIngestion.targetLambda);
 
+        // the source function only publishes the urls that are due, from the poll schedules in the state table
+        _customDataIngestion.stateTable.grantReadData(_customDataIngestion.sourceLambda);
+        _customDataIngestion.sourceLambda.addEnvironment('TARGET_DDB_TABLE', _customDataIngestion.stateTable.tableName);
+
         const rule = new events.Rule(this, 'PollFrequency', {
             schedule: events.Schedule.expression(ingestFrequency.valueAsString)
         });
@@ -109,6 +109,9 @@ export class YoutubeComments extends cdk.NestedStack {
                         QUERY: _youtubeSearchQuery.valueAsString,
                         CHANNEL_ID: _youtubeChannel.valueAsString,
                         VIDEO_SEARCH_INGESTION_WINDOW: cdk.Token.asString(_videoSearchIngestionWindow.valueAsNumber),
+                        VIDEOS_PER_EVENT: '50',
+                        SKIP_UNCHANGED_VIDEOS: 'true',
+                        DAILY_QUOTA_UNITS: '10000',
                     },
                     timeout: cdk.Duration.minutes(15),
                     memorySize: 256
@@ -125,7 +128,11 @@ export class YoutubeComments extends cdk.NestedStack {
                         SSM_API_KEY: _youtubeAPIKey.valueAsString,
                         VIDEO_NAMESPACE: this.video_namespace,
                         CHANNEL_ID: _youtubeChannel.valueAsString,
-                        VIDEO_SEARCH_INGESTION_WINDOW: cdk.Token.asString(_videoSearchIngestionWindow.valueAsNumber)
+                        VIDEO_SEARCH_INGESTION_WINDOW: cdk.Token.asString(_videoSearchIngestionWindow.valueAsNumber),
+                        EVENT_BUS_NAME: _eventBus.eventBusName,
+                        MAX_CONCURRENT_VIDEOS: '8',
+                        COMMENT_PAGES_PER_BATCH: '50',
+                        DAILY_QUOTA_UNITS: '10000'
                     },
                     timeout: cdk.Duration.minutes(10),
                     memorySize: 256
@@ -165,6 +172,11 @@ export class YoutubeComments extends cdk.NestedStack {
         }));
 
         _stream.grantWrite(_youTubeDataIngestion.targetLambda);
+        // the videos that a comments invocation could not finish are published in a follow-up event
+        _eventBus.grantPutEventsTo(_youTubeDataIngestion.targetLambda);
+        // the daily quota budget of the API key is kept in the tracker table and shared by both functions
+        _youTubeDataIngestion.stateTable.grantReadWriteData(_youTubeDataIngestion.sourceLambda);
+        _youTubeDataIngestion.sourceLambda.addEnvironment('TARGET_DDB_TABLE', _youTubeDataIngestion.stateTable.tableName);
 
         const rule = new events.Rule(this, 'PollFrequency', {
             schedule: events.Schedule.expression(_youtubeVideoSearchFreq.valueAsString)